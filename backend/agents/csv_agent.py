@@ -1,6 +1,6 @@
 import json
 from typing import List, Dict
-from utils.llm import generate_content
+from utils.llm import generate_content, agenerate_content
 
 CSV_MAPPING_PROMPT = """
 You are an expert data analyst.
@@ -8,14 +8,24 @@ Input: List of CSV headers and sample rows.
 Output: STRICT JSON mapping to internal schema:
 {
   "date_column": "string",
-  "amount_column": "string",
+  "amount_column": "string" | null,
+  "debit_column": "string" | null,
+  "credit_column": "string" | null,
+  "dr_cr_column": "string" | null,
   "description_column": "string",
   "category_column": "string" | null
 }
-Identify the best matching columns.
+Identify the best matching columns. Use debit_column/credit_column when the
+statement has separate withdrawal and deposit columns, amount_column when it
+has a single (signed) amount column. Use dr_cr_column for a column that only
+marks each amount as debit or credit ("Dr"/"Cr").
 Return ONLY JSON.
 """
 
 def map_csv_columns_with_ai(headers: List[str], sample_rows: List[Dict]) -> dict:
     content = f"HEADERS: {headers}\nSAMPLE_ROWS: {sample_rows}"
-    return generate_content(CSV_MAPPING_PROMPT, content)
+    return generate_content(CSV_MAPPING_PROMPT, content, agent="csv_mapping")
+
+async def amap_csv_columns_with_ai(headers: List[str], sample_rows: List[Dict]) -> dict:
+    content = f"HEADERS: {headers}\nSAMPLE_ROWS: {sample_rows}"
+    return await agenerate_content(CSV_MAPPING_PROMPT, content, agent="csv_mapping")
@@ -1,12 +1,13 @@
-import json
 from typing import List, Dict, Any
-from utils.llm import generate_content
+from utils.llm import generate_content, agenerate_content
+from utils.llm_context import compact_context
 
 LEDGER_MAPPING_PROMPT = """
 You are an expert accounting assistant.
 Input:
 - Transaction: {description, amount, counterparty}
-- DB Snapshot: List of existing contacts/invoices.
+- DB Snapshot: Existing contacts/invoices. Usually only the top candidates from a
+  local index, each with a similarity "score" (0-1); pick among them or answer "new".
 Output: STRICT JSON:
 {
   "contact_match": {"contact_id": int | null, "match_type": "exact"|"fuzzy"|"new", "confidence": float},
@@ -29,22 +30,36 @@ Categorize expense/income accurately.
 Return ONLY JSON.
 """
 
+def _ledger_content(transaction_data: Dict, db_snapshot: Dict) -> str:
+    return compact_context({
+        "transaction": transaction_data,
+        "snapshot": db_snapshot
+    }, agent="ledger_match")
+
 def match_ledger_entry(transaction_data: Dict, db_snapshot: Dict) -> Dict:
     """
     Matches a parsed transaction to existing contacts and invoices.
     """
-    content = json.dumps({
-        "transaction": transaction_data,
-        "snapshot": db_snapshot
-    }, indent=2)
-    return generate_content(LEDGER_MAPPING_PROMPT, content)
+    content = _ledger_content(transaction_data, db_snapshot)
+    return generate_content(LEDGER_MAPPING_PROMPT, content, agent="ledger_match")
+
+async def amatch_ledger_entry(transaction_data: Dict, db_snapshot: Dict) -> Dict:
+    content = _ledger_content(transaction_data, db_snapshot)
+    return await agenerate_content(LEDGER_MAPPING_PROMPT, content, agent="ledger_match")
+
+def _categorisation_content(description: str, metadata: Dict) -> str:
+    return compact_context({
+        "description": description,
+        "metadata": metadata
+    }, agent="categorization")
 
 def categorize_transaction(description: str, metadata: Dict) -> Dict:
     """
     Categorizes a transaction based on description.
     """
-    content = json.dumps({
-        "description": description,
-        "metadata": metadata
-    }, indent=2)
-    return generate_content(CATEGORISATION_PROMPT, content)
+    content = _categorisation_content(description, metadata)
+    return generate_content(CATEGORISATION_PROMPT, content, agent="categorization")
+
+async def acategorize_transaction(description: str, metadata: Dict) -> Dict:
+    content = _categorisation_content(description, metadata)
+    return await agenerate_content(CATEGORISATION_PROMPT, content, agent="categorization")
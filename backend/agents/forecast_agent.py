@@ -1,17 +1,21 @@
-import json
 from typing import Dict
-from utils.llm import generate_content
+from utils.llm import generate_content, agenerate_content
+from utils.llm_context import compact_context
+from utils.metrics import agent_fallbacks
 
 FORECAST_EXPLANATION_PROMPT = """
 You are a financial analyst explaining a cashflow forecast to a small business owner.
-Input: Forecasted cashflow data (next 30-90 days).
+Input: Forecasted cashflow data (next 30-90 days). When "horizons" is present it
+holds projected inflow/outflow/net totals per horizon in days, with an 80% band
+(net_low/net_high) and the part already scheduled by open invoices (known_*).
 Output: STRICT JSON:
 {
   "summary": "string",
+  "trend": "improving" | "stable" | "declining",
   "key_drivers": ["string"],
   "recommendations": ["string"]
 }
-Explain why cashflow is trending up/down. Suggest actions.
+Explain why cashflow is trending up/down. Suggest actions. Use only the numbers given.
 Return ONLY JSON.
 """
 
@@ -19,10 +23,44 @@ def explain_forecast(forecast_data: Dict) -> Dict:
     """
     Explains a cashflow forecast.
     """
-    content = json.dumps(forecast_data, indent=2)
-    result = generate_content(FORECAST_EXPLANATION_PROMPT, content)
+    content = compact_context(forecast_data, agent="forecast")
+    result = generate_content(FORECAST_EXPLANATION_PROMPT, content, agent="forecast")
+    return _with_fallback(result, forecast_data)
+
+async def aexplain_forecast(forecast_data: Dict) -> Dict:
+    content = compact_context(forecast_data, agent="forecast")
+    result = await agenerate_content(FORECAST_EXPLANATION_PROMPT, content, agent="forecast")
+    return _with_fallback(result, forecast_data)
+
+def _numeric_explanation(forecast: Dict) -> Dict:
+    """Plain narration of a forecast_services result, used when the LLM is unavailable."""
+    h30 = forecast["horizons"].get("30") or next(iter(forecast["horizons"].values()))
+    drivers = [f"Average daily inflow ₹{forecast['avg_daily_inflow']:,.0f} vs outflow ₹{forecast['avg_daily_outflow']:,.0f}"]
+    if h30["known_inflow"] or h30["known_outflow"]:
+        drivers.append(f"Invoices due: ₹{h30['known_inflow']:,.0f} receivable, ₹{h30['known_outflow']:,.0f} payable")
+    recommendations = []
+    if forecast.get("overdue_receivables"):
+        drivers.append(f"₹{forecast['overdue_receivables']:,.0f} of receivables are already overdue")
+        recommendations.append("Follow up on overdue invoices to bring cash in sooner.")
+    if h30["net_low"] < 0:
+        recommendations.append("Keep a cash buffer: the low end of the 30-day range is negative.")
+    else:
+        recommendations.append("Consider parking surplus cash in short-term liquid funds.")
+    return {
+        "summary": (f"Net cashflow over the next 30 days is projected at ₹{h30['net']:,.0f} "
+                    f"(likely range ₹{h30['net_low']:,.0f} to ₹{h30['net_high']:,.0f})."),
+        "key_drivers": drivers,
+        "recommendations": recommendations,
+        "trend": forecast["trend"],
+        "fallback": True,
+    }
+
+def _with_fallback(result: Dict, forecast_data: Dict = None) -> Dict:
     if not result or "error" in result:
-        print(f"Forecast Agent Error: {result['error']}. Using Mock Data.")
+        agent_fallbacks.inc(agent="forecast")
+        print(f"Forecast Agent Error: {result.get('error', 'Unknown')}. Using Mock Data.")
+        if forecast_data and forecast_data.get("horizons"):
+            return _numeric_explanation(forecast_data)
         return {
             "summary": "Cashflow is projected to remain positive with a steady 5% month-over-month growth. Key drivers include consistent sales volume and controlled operational costs.",
             "key_drivers": ["Steady Sales Volume", "Controlled Expenses", "New Client Acquisition"],
@@ -31,6 +69,7 @@ def explain_forecast(forecast_data: Dict) -> Dict:
                 "Allocate surplus cash to short-term liquid funds.",
                 "Review subscription costs for potential savings."
             ],
-            "trend": "improving"
+            "trend": "improving",
+            "fallback": True,
         }
     return result
@@ -1,10 +1,12 @@
-import json
 from typing import Dict
-from utils.llm import generate_content
+from utils.llm import generate_content, agenerate_content
+from utils.llm_context import compact_context
+from utils.metrics import agent_fallbacks
 
 INSIGHT_SUMMARIZATION_PROMPT = """
 You are a financial advisor for a small business owner.
-Input: Daily/Weekly financial metrics.
+Input: Daily/Weekly financial metrics. "demand_signals", when present, lists detected
+spikes and trend changes in weekly sales per category (confidence 0-1).
 Output: STRICT JSON:
 {
   "insights": [
@@ -25,10 +27,19 @@ def generate_insights(metrics: Dict) -> Dict:
     """
     Generates insights based on pre-computed metrics.
     """
-    content = json.dumps(metrics, indent=2)
-    result = generate_content(INSIGHT_SUMMARIZATION_PROMPT, content)
+    content = compact_context(metrics, agent="insight")
+    result = generate_content(INSIGHT_SUMMARIZATION_PROMPT, content, agent="insight")
+    return _with_fallback(result)
+
+async def agenerate_insights(metrics: Dict) -> Dict:
+    content = compact_context(metrics, agent="insight")
+    result = await agenerate_content(INSIGHT_SUMMARIZATION_PROMPT, content, agent="insight")
+    return _with_fallback(result)
+
+def _with_fallback(result: Dict) -> Dict:
     if not result or "error" in result:
-        print(f"Insight Agent Error: {result['error']}. Using Mock Data.")
+        agent_fallbacks.inc(agent="insight")
+        print(f"Insight Agent Error: {result.get('error', 'Unknown')}. Using Mock Data.")
         return {
             "insights": [
                 {
@@ -52,6 +63,7 @@ def generate_insights(metrics: Dict) -> Dict:
                     "description": "Operational expenses have remained stable over the last quarter.",
                     "actionable_advice": "Continue monitoring overheads."
                 }
-            ]
+            ],
+            "fallback": True,
         }
     return result
@@ -1,6 +1,11 @@
+import asyncio
 import json
-from typing import Dict, Any
-from utils.llm import generate_content
+from typing import Dict, Any, List, Tuple
+from config import settings
+from utils.llm import generate_content, agenerate_content
+from utils.llm_context import estimate_tokens
+from utils.metrics import agent_fallbacks
+from utils.parsing import parse_transaction_fast
 
 TRANSACTION_PARSER_PROMPT = """
 You are an expert financial data parser for Indian MSMEs.
@@ -16,11 +21,41 @@ Output: STRICT JSON schema:
   "invoice": {
     "has_invoice": boolean,
     "invoice_number": "string" | null,
-    "due_date": "YYYY-MM-DD" | null
+    "due_date": "YYYY-MM-DD" | null,
+    "is_paid": boolean
   },
   "notes": "string" // optional
 }
-Extract amount, direction, payment method. Identify customer/supplier name. Detect invoice reference & due date if present. Map to business meaningful category.
+Extract amount, direction, payment method. Identify customer/supplier name. Detect invoice reference & due date if present; is_paid is true only when the message records money actually received or paid against that invoice, not when it raises or sends one. Map to business meaningful category.
+Return ONLY JSON.
+"""
+
+TRANSACTION_BATCH_PARSER_PROMPT = """
+You are an expert financial data parser for Indian MSMEs.
+Input: JSON array of raw text messages (UPI, WhatsApp, POS slip text, SMS, free-text), each as {"i": int, "text": "string"}.
+Output: STRICT JSON schema:
+{
+  "results": [
+    {
+      "i": int, // copy of the input index
+      "direction": "inflow" | "outflow",
+      "amount": float,
+      "currency": "INR",
+      "method": "upi" | "pos" | "cash" | "bank" | "other",
+      "counterparty_name": "string" | null,
+      "category": "sales" | "inventory" | "rent" | "salary" | "other",
+      "invoice": {
+        "has_invoice": boolean,
+        "invoice_number": "string" | null,
+        "due_date": "YYYY-MM-DD" | null,
+        "is_paid": boolean
+      },
+      "notes": "string" // optional
+    }
+  ]
+}
+Parse every message independently and return exactly one result per input index.
+Extract amount, direction, payment method. Identify customer/supplier name. Detect invoice reference & due date if present; is_paid is true only when the message records money actually received or paid against that invoice, not when it raises or sends one. Map to business meaningful category.
 Return ONLY JSON.
 """
 
@@ -45,12 +80,26 @@ Return ONLY JSON.
 
 def parse_transaction_with_ai(raw_text: str) -> Dict[str, Any]:
     """
-    Parses raw text into a structured transaction using LLM.
+    Parses raw text into a structured transaction.
+    Known bank/UPI/POS templates are parsed locally; everything else goes to the LLM.
     """
-    result = generate_content(TRANSACTION_PARSER_PROMPT, raw_text)
-    
+    fast = parse_transaction_fast(raw_text, settings.FAST_PARSER_MIN_CONFIDENCE)
+    if fast is not None:
+        return fast
+    result = generate_content(TRANSACTION_PARSER_PROMPT, raw_text, agent="parser")
+    return _transaction_with_fallback(result)
+
+async def aparse_transaction_with_ai(raw_text: str) -> Dict[str, Any]:
+    fast = parse_transaction_fast(raw_text, settings.FAST_PARSER_MIN_CONFIDENCE)
+    if fast is not None:
+        return fast
+    result = await agenerate_content(TRANSACTION_PARSER_PROMPT, raw_text, agent="parser")
+    return _transaction_with_fallback(result)
+
+def _transaction_with_fallback(result: Dict[str, Any]) -> Dict[str, Any]:
     # Fallback if empty or error
     if not result or "error" in result:
+        agent_fallbacks.inc(agent="parser")
         return {
             "direction": "inflow", # Default safe assumption
             "amount": 0.0,
@@ -64,11 +113,97 @@ def parse_transaction_with_ai(raw_text: str) -> Dict[str, Any]:
         }
     return result
 
+# {"i": n, "text": ...} wrapper around each message in a batch request
+BATCH_ITEM_FRAMING_TOKENS = 7
+
+def _pack_batches(items: List[Tuple[int, str]], token_budget: int, max_items: int) -> List[List[Tuple[int, str]]]:
+    """Greedily packs (index, text) pairs into batches that fit the input token budget."""
+    batches, current, used = [], [], 0
+    for idx, text in items:
+        cost = estimate_tokens(text) + BATCH_ITEM_FRAMING_TOKENS
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append((idx, text))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def _is_valid_parse(result: Any) -> bool:
+    if not isinstance(result, dict) or result.get("direction") not in ("inflow", "outflow"):
+        return False
+    try:
+        return float(result.get("amount")) >= 0
+    except (TypeError, ValueError):
+        return False
+
+async def _parse_batch(batch: List[Tuple[int, str]]) -> Dict[int, Dict[str, Any]]:
+    content = json.dumps([{"i": idx, "text": text} for idx, text in batch], ensure_ascii=False)
+    result = await agenerate_content(TRANSACTION_BATCH_PARSER_PROMPT, content, agent="parser_batch")
+    wanted = {idx for idx, _ in batch}
+    items = result.get("results", []) if isinstance(result, dict) else []
+    parsed = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            idx = int(item.pop("i", None))
+        except (TypeError, ValueError):
+            continue
+        if idx in wanted and _is_valid_parse(item):
+            parsed[idx] = item
+    return parsed
+
+async def aparse_transactions_batch(raw_texts: List[str]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Parses many messages with as few LLM calls as possible.
+
+    Template matches are resolved locally; the rest are packed into
+    list-in/list-out prompts sized to settings.LLM_BATCH_TOKEN_BUDGET and
+    mapped back by index. Items missing from a response are re-batched up to
+    settings.LLM_BATCH_RETRIES times; anything still unparsed gets the usual
+    offline fallback (with "parsing_error").
+    Returns (results in input order, stats).
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    pending: List[Tuple[int, str]] = []
+    for idx, text in enumerate(raw_texts):
+        fast = parse_transaction_fast(text, settings.FAST_PARSER_MIN_CONFIDENCE)
+        if fast is not None:
+            results[idx] = fast
+        else:
+            pending.append((idx, text))
+
+    stats = {"fast_path": len(results), "llm_calls": 0, "retried": 0}
+    for attempt in range(settings.LLM_BATCH_RETRIES + 1):
+        if not pending:
+            break
+        if attempt:
+            stats["retried"] += len(pending)
+        batches = _pack_batches(pending, settings.LLM_BATCH_TOKEN_BUDGET, settings.LLM_BATCH_MAX_ITEMS)
+        stats["llm_calls"] += len(batches)
+        for parsed in await asyncio.gather(*[_parse_batch(b) for b in batches]):
+            results.update(parsed)
+        pending = [(idx, text) for idx, text in pending if idx not in results]
+
+    for idx, _ in pending:
+        results[idx] = _transaction_with_fallback({"error": "Not parsed in batch"})
+    stats["failed"] = len(pending)
+    return [results[i] for i in range(len(raw_texts))], stats
+
 def parse_invoice_with_ai(ocr_text: str) -> Dict[str, Any]:
     """
     Parses OCR text into structured invoice data using LLM.
     """
-    result = generate_content(INVOICE_PARSER_PROMPT, ocr_text)
+    result = generate_content(INVOICE_PARSER_PROMPT, ocr_text, agent="invoice_parser")
+    return _invoice_with_fallback(result)
+
+async def aparse_invoice_with_ai(ocr_text: str) -> Dict[str, Any]:
+    result = await agenerate_content(INVOICE_PARSER_PROMPT, ocr_text, agent="invoice_parser")
+    return _invoice_with_fallback(result)
+
+def _invoice_with_fallback(result: Dict[str, Any]) -> Dict[str, Any]:
     if not result or "error" in result:
         return {"error": result.get("error", "Failed to parse invoice")}
     return result
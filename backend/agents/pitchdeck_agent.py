@@ -1,6 +1,7 @@
-import json
 from typing import Dict
-from utils.llm import generate_content
+from utils.llm import generate_content, agenerate_content
+from utils.llm_context import compact_context
+from utils.metrics import agent_fallbacks
 
 PITCHDECK_SYSTEM_PROMPT = """
 You are an expert in MSME and startup finance.
@@ -24,6 +25,7 @@ You must respond with STRICT JSON in the following schema:
 Guidelines:
 - Keep language simple, suited for Indian micro-entrepreneurs applying for loans / small investors.
 - Focus on: business overview, revenue trends, cashflow health, key customers, risks and opportunities.
+- "demand_signals", when present, are detected spikes/trend changes in weekly sales per category; use them for opportunities.
 - DO NOT invent crazy metrics: only use or derive from provided numbers.
 - If some data is missing, be honest ("Data not available") instead of guessing.
 - Return ONLY JSON, no commentary.
@@ -33,11 +35,19 @@ def generate_pitchdeck_outline(metrics: Dict) -> Dict:
     """
     Generates a pitch deck outline.
     """
-    content = json.dumps(metrics, indent=2)
-    result = generate_content(PITCHDECK_SYSTEM_PROMPT, content)
-    
+    content = compact_context(metrics, agent="pitchdeck")
+    result = generate_content(PITCHDECK_SYSTEM_PROMPT, content, agent="pitchdeck")
+    return _with_fallback(result, metrics)
+
+async def agenerate_pitchdeck_outline(metrics: Dict) -> Dict:
+    content = compact_context(metrics, agent="pitchdeck")
+    result = await agenerate_content(PITCHDECK_SYSTEM_PROMPT, content, agent="pitchdeck")
+    return _with_fallback(result, metrics)
+
+def _with_fallback(result: Dict, metrics: Dict) -> Dict:
     # Fallback structure if error
     if not result or "error" in result:
+        agent_fallbacks.inc(agent="pitchdeck")
         print(f"Pitchdeck Agent Error: {result.get('error', 'Unknown')}. Using Mock Data.")
         return {
             "title": f"{metrics.get('business_name', 'Business')} – Growth Strategy",
@@ -54,8 +64,8 @@ def generate_pitchdeck_outline(metrics: Dict) -> Dict:
                 {
                     "title": "Financial Highlights",
                     "bullets": [
-                        f"Total Inflow (Last 3M): ₹{metrics.get('total_inflow_last_3m', 0):,.2f}",
-                        f"Revenue Growth: {metrics.get('revenue_growth_percent', 0):.1f}% MoM",
+                        f"Total Inflow (Last 3M): ₹{metrics.get('total_inflow_last_3m') or 0:,.2f}",
+                        f"Revenue Growth: {metrics.get('revenue_growth_percent') or 0:.1f}% MoM",
                         "Healthy cashflow management with controlled expenses."
                     ]
                 },
@@ -75,6 +85,7 @@ def generate_pitchdeck_outline(metrics: Dict) -> Dict:
                         "Projected ROI of 20% within 12 months."
                     ]
                 }
-            ]
+            ],
+            "fallback": True,
         }
     return result
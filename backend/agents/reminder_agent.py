@@ -1,6 +1,7 @@
-import json
-from typing import Dict
-from utils.llm import generate_content
+from typing import Dict, List
+from utils.llm import generate_content, agenerate_content
+from utils.llm_context import compact_context, compact_json
+from utils.metrics import agent_fallbacks
 
 REMINDER_PROMPT = """
 You are a helpful assistant for a small business owner.
@@ -22,6 +23,35 @@ Output: STRICT JSON schema:
 }
 """
 
+REMINDER_BATCH_PROMPT = """
+You are a helpful assistant for a small business owner.
+Input: a JSON list of reminder requests, each with an integer "i" and the fields
+business_name, customer_name, invoice_number, due_date, amount_due, days_overdue
+(negative = due in that many days), preferred_tone and preferred_language.
+
+Write one WhatsApp payment reminder per request in its tone and language.
+Output: STRICT JSON schema:
+{
+  "messages": [{"i": int, "message": "string"}]
+}
+Return one entry per input "i". Return ONLY JSON.
+"""
+
+# Opening and closing lines of the local template per standard tone
+TEMPLATE_TONES = {
+    "friendly": ("this is a gentle reminder", "Please ignore this message if you have already paid. Thank you!"),
+    "firm": ("this is a reminder", "Please arrange the payment at the earliest. Thank you."),
+    "urgent": ("this is an urgent reminder", "Please clear it today to avoid any disruption to our services."),
+}
+
+
+def _format_amount(amount) -> str:
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        return str(amount)
+    return f"{amount:,.0f}" if amount.is_integer() else f"{amount:,.2f}"
+
 
 def _fallback_template(context: Dict) -> Dict:
     """Local template when LLM is unavailable / fails."""
@@ -31,20 +61,23 @@ def _fallback_template(context: Dict) -> Dict:
     amount = context.get("amount_due", 0)
     due_date = context.get("due_date", "")
     days_overdue = context.get("days_overdue")
+    opener, closer = TEMPLATE_TONES.get(context.get("preferred_tone"), TEMPLATE_TONES["friendly"])
 
     extra = ""
     if days_overdue is not None and days_overdue > 0:
         extra = f" It is overdue by {days_overdue} days."
+    elif days_overdue is not None and days_overdue < 0:
+        extra = f" It is due in {-days_overdue} days."
 
     msg = (
-        f"Hi {customer}, this is a gentle reminder from {business} "
-        f"for the pending payment of ₹{amount} for invoice {invoice}"
+        f"Hi {customer}, {opener} from {business} "
+        f"for the pending payment of ₹{_format_amount(amount)} for invoice {invoice}"
     )
     if due_date:
         msg += f" (due on {due_date})."
     else:
         msg += "."
-    msg += extra + " Please ignore this message if you have already paid. Thank you!"
+    msg += extra + " " + closer
 
     return {"message": msg}
 
@@ -54,14 +87,48 @@ def generate_payment_reminder(context: Dict) -> Dict:
     Generates a payment reminder message.
     Tries Grok (via utils.llm) first, then falls back to a local template.
     """
-    content = json.dumps(context, indent=2)
+    content = compact_context(context, agent="reminder")
 
     # 1. Try Grok
-    result = generate_content(REMINDER_PROMPT, content)
+    result = generate_content(REMINDER_PROMPT, content, agent="reminder")
 
     # 2. If Grok failed / empty message → fallback template
+    return _with_fallback(result, context)
+
+
+async def agenerate_payment_reminder(context: Dict) -> Dict:
+    content = compact_context(context, agent="reminder")
+    result = await agenerate_content(REMINDER_PROMPT, content, agent="reminder")
+    return _with_fallback(result, context)
+
+
+def _with_fallback(result: Dict, context: Dict) -> Dict:
     if not result or not result.get("message") or "error" in result:
+        agent_fallbacks.inc(agent="reminder")
         print(f"[REMINDER] Grok failed or returned error, using fallback. Result: {result}")
         return _fallback_template(context)
 
     return result
+
+
+async def agenerate_payment_reminders_batch(contexts: List[Dict]) -> List[Dict]:
+    """
+    One LLM call for many reminders; results keep the input order. Items the
+    model skipped (or a failed call) get the local template, marked "fallback".
+    """
+    content = compact_json([dict(context, i=i) for i, context in enumerate(contexts)])
+    result = await agenerate_content(REMINDER_BATCH_PROMPT, content, agent="reminder_batch")
+    by_index = {}
+    items = result.get("messages", []) if isinstance(result, dict) else []
+    for item in items:
+        if not isinstance(item, dict) or not item.get("message"):
+            continue
+        try:
+            by_index[int(item.get("i"))] = {"message": str(item["message"])}
+        except (TypeError, ValueError):
+            continue
+    missing = sum(1 for i in range(len(contexts)) if i not in by_index)
+    if missing:
+        agent_fallbacks.inc(missing, agent="reminder_batch")
+    return [by_index.get(i) or dict(_fallback_template(context), fallback=True)
+            for i, context in enumerate(contexts)]
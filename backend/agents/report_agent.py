@@ -1,6 +1,6 @@
-import json
 from typing import Dict
-from utils.llm import generate_content
+from utils.llm import generate_content, agenerate_content
+from utils.llm_context import compact_context
 
 REPORT_GENERATION_PROMPT = """
 You are a credit analyst preparing a report for a lender.
@@ -21,5 +21,9 @@ def generate_financial_report(metrics: Dict) -> Dict:
     """
     Generates a financial health report.
     """
-    content = json.dumps(metrics, indent=2)
-    return generate_content(REPORT_GENERATION_PROMPT, content)
+    content = compact_context(metrics, agent="report")
+    return generate_content(REPORT_GENERATION_PROMPT, content, agent="report")
+
+async def agenerate_financial_report(metrics: Dict) -> Dict:
+    content = compact_context(metrics, agent="report")
+    return await agenerate_content(REPORT_GENERATION_PROMPT, content, agent="report")
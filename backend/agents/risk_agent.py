@@ -1,6 +1,10 @@
-import json
 from typing import List, Dict
-from utils.llm import generate_content
+from utils.llm import generate_content, agenerate_content
+from utils.llm_context import compact_context
+from utils.logger import get_logger
+from utils.metrics import agent_fallbacks
+
+logger = get_logger(__name__)
 
 RISK_DEMAND_PROMPT = """
 You are a financial risk analyst for small businesses.
@@ -18,8 +22,52 @@ def analyze_risk_and_demand(recent_transactions: List[Dict], metrics: Dict) -> D
     """
     Analyzes transactions and metrics to flag risks and demand signals.
     """
-    content = json.dumps({
+    content = _risk_content(recent_transactions, metrics)
+    return generate_content(RISK_DEMAND_PROMPT, content, agent="risk")
+
+async def aanalyze_risk_and_demand(recent_transactions: List[Dict], metrics: Dict) -> Dict:
+    content = _risk_content(recent_transactions, metrics)
+    return await agenerate_content(RISK_DEMAND_PROMPT, content, agent="risk")
+
+def _risk_content(recent_transactions: List[Dict], metrics: Dict) -> str:
+    return compact_context({
         "recent_transactions": recent_transactions,
         "metrics": metrics
-    }, indent=2)
-    return generate_content(RISK_DEMAND_PROMPT, content)
+    }, agent="risk")
+
+RISK_EXPLANATION_PROMPT = """
+You are a credit controller explaining late-payment risk to a small business owner.
+Input: Locally computed risk scores for open receivables. "invoices" holds the riskiest
+ones with risk_score (0-1), risk_band, amount_due, and the customer's payment behaviour
+(mean_days_late, days_late_std, partial_ratio, days_since_last_payment, days_overdue).
+Output: STRICT JSON:
+{
+  "summary": "string",
+  "priorities": [{"invoice_id": int, "action": "string"}],
+  "recommendations": ["string"]
+}
+Do not change the scores. Use only the numbers given.
+Return ONLY JSON.
+"""
+
+async def aexplain_risk_scores(risk: Dict) -> Dict:
+    content = compact_context(risk, agent="risk")
+    result = await agenerate_content(RISK_EXPLANATION_PROMPT, content, agent="risk")
+    if not result or "error" in result:
+        agent_fallbacks.inc(agent="risk")
+        logger.warning("Risk agent error: %s. Using local summary.", (result or {}).get("error", "Unknown"))
+        return _numeric_explanation(risk)
+    return result
+
+def _numeric_explanation(risk: Dict) -> Dict:
+    """Plain narration of a risk_services result, used when the LLM is unavailable."""
+    risky = [inv for inv in risk.get("invoices", []) if inv["risk_band"] != "low"]
+    return {
+        "summary": (f"{risk['high_risk']} of {risk['open_invoices']} open invoices are high risk; "
+                    f"about ₹{risk['expected_late_amount']:,.0f} of ₹{risk['amount_due']:,.0f} due may come in late."),
+        "priorities": [{"invoice_id": inv["invoice_id"],
+                        "action": f"Follow up with {inv.get('contact_name') or 'the customer'}: {inv['reason'].lower()}."}
+                       for inv in risky[:5]],
+        "recommendations": ["Ask high-risk customers for part-payment or an advance on new orders."] if risky else [],
+        "fallback": True,
+    }
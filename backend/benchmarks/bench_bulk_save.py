@@ -0,0 +1,90 @@
+# backend/benchmarks/bench_bulk_save.py
+"""
+Rows/sec of save_parsed_transaction (commit + refresh per contact, invoice
+and transaction) against save_parsed_transactions_bulk on a file-backed
+SQLite database, so fsync cost is included.
+
+    python benchmarks/bench_bulk_save.py --rows 5000 --batch 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session, create_engine
+
+from migrations import run_migrations
+from models.business import Business
+from services.parser_services import save_parsed_transaction, save_parsed_transactions_bulk
+
+
+def make_items(rows: int, contacts: int):
+    rnd = random.Random(7)
+    items = []
+    for i in range(rows):
+        direction = rnd.choice(["inflow", "outflow"])
+        parsed = {
+            "direction": direction,
+            "amount": float(rnd.randint(100, 50000)),
+            "method": rnd.choice(["upi", "cash", "bank_transfer"]),
+            "category": "other",
+            "counterparty_name": f"Contact {rnd.randint(1, contacts)}",
+        }
+        if rnd.random() < 0.1:
+            parsed["invoice"] = {"has_invoice": True, "due_date": "2025-01-31"}
+        items.append((parsed, f"bench message {i}"))
+    return items
+
+
+def fresh_engine(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    run_migrations(engine)
+    with Session(engine) as session:
+        session.add(Business(id=1, name="Bench Business"))
+        session.commit()
+    return engine
+
+
+def bench_per_row(engine, items) -> float:
+    start = time.perf_counter()
+    with Session(engine) as session:
+        for parsed, raw_text in items:
+            save_parsed_transaction(session, 1, parsed, raw_text, "bench")
+    return time.perf_counter() - start
+
+
+def bench_bulk(engine, items, batch: int) -> float:
+    start = time.perf_counter()
+    with Session(engine) as session:
+        for offset in range(0, len(items), batch):
+            save_parsed_transactions_bulk(session, 1, items[offset:offset + batch], "bench")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=500, help="rows per bulk call")
+    parser.add_argument("--contacts", type=int, default=300)
+    args = parser.parse_args()
+
+    items = make_items(args.rows, args.contacts)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        per_row = bench_per_row(fresh_engine(path), items)
+        bulk = bench_bulk(fresh_engine(path), items, args.batch)
+
+    print(f"rows: {args.rows}, bulk batch size: {args.batch}")
+    print(f"per-row : {per_row:8.2f}s  {args.rows / per_row:10.0f} rows/sec")
+    print(f"bulk    : {bulk:8.2f}s  {args.rows / bulk:10.0f} rows/sec")
+    print(f"speedup : {per_row / bulk:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
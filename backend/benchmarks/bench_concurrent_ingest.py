@@ -0,0 +1,128 @@
+# backend/benchmarks/bench_concurrent_ingest.py
+"""
+Concurrent ingest on a file-backed SQLite database: W writer threads each
+save transactions one commit at a time (save_parsed_transaction, with all
+write hooks) while R reader threads poll a dashboard-style aggregate.
+Runs once with a plain create_engine (rollback journal, synchronous=FULL)
+and once with db.make_engine (WAL, synchronous=NORMAL, mmap, cache, busy
+timeout), reporting write throughput, read latency and lock errors.
+
+    python benchmarks/bench_concurrent_ingest.py --writers 8 --rows 250 --readers 2
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, create_engine, func, select
+
+from db import make_engine
+from migrations import run_migrations
+from models.business import Business
+from models.transaction import Transaction
+from services.parser_services import save_parsed_transaction
+
+
+def parsed_item(rnd: random.Random):
+    return {
+        "direction": rnd.choice(["inflow", "outflow"]),
+        "amount": float(rnd.randint(100, 50000)),
+        "method": rnd.choice(["upi", "cash", "bank_transfer"]),
+        "category": "other",
+        "counterparty_name": f"Contact {rnd.randint(1, 50)}",
+    }
+
+
+def run(engine, writers: int, rows: int, readers: int):
+    run_migrations(engine)
+    with Session(engine) as session:
+        session.add(Business(id=1, name="Bench Business"))
+        session.commit()
+
+    errors = {"write": 0, "read": 0}
+    read_latencies = []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def write(worker: int):
+        rnd = random.Random(worker)
+        with Session(engine) as session:
+            for i in range(rows):
+                while True:
+                    try:
+                        save_parsed_transaction(session, 1, parsed_item(rnd), f"w{worker} m{i}", "bench")
+                        break
+                    except OperationalError:
+                        session.rollback()
+                        with lock:
+                            errors["write"] += 1
+
+    def read():
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    session.exec(
+                        select(Transaction.direction, func.count(), func.sum(Transaction.amount))
+                        .where(Transaction.business_id == 1).group_by(Transaction.direction)
+                    ).all()
+            except OperationalError:
+                with lock:
+                    errors["read"] += 1
+                continue
+            with lock:
+                read_latencies.append(time.perf_counter() - start)
+
+    reader_threads = [threading.Thread(target=read) for _ in range(readers)]
+    writer_threads = [threading.Thread(target=write, args=(w,)) for w in range(writers)]
+    for t in reader_threads:
+        t.start()
+    start = time.perf_counter()
+    for t in writer_threads:
+        t.start()
+    for t in writer_threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in reader_threads:
+        t.join()
+
+    with Session(engine) as session:
+        saved = session.exec(select(func.count()).select_from(Transaction)).one()
+    engine.dispose()
+    read_latencies.sort()
+    pct = lambda p: read_latencies[min(int(p * len(read_latencies)), len(read_latencies) - 1)] * 1000 \
+        if read_latencies else float("nan")
+    return {"saved": saved, "elapsed": elapsed, "reads": len(read_latencies),
+            "read_p50": pct(0.5), "read_p95": pct(0.95), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=250, help="transactions per writer")
+    parser.add_argument("--readers", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name, factory in [("default", create_engine), ("tuned", make_engine)]:
+            url = f"sqlite:///{os.path.join(tmp, f'{name}.db')}"
+            results[name] = run(factory(url), args.writers, args.rows, args.readers)
+
+    print(f"{args.writers} writers x {args.rows} transactions, {args.readers} readers")
+    for name, r in results.items():
+        print(f"{name:8s}: {r['saved']} saved in {r['elapsed']:6.2f}s  {r['saved'] / r['elapsed']:8.1f} writes/sec  "
+              f"reads {r['reads']:6d}  read p50 {r['read_p50']:6.2f}ms  p95 {r['read_p95']:6.2f}ms  "
+              f"lock errors {r['errors']}")
+    print(f"speedup : {results['default']['elapsed'] / results['tuned']['elapsed']:.1f}x write throughput")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# backend/benchmarks/bench_inbound.py
+"""
+Webhook acknowledgement latency and retry de-duplication for inbound
+WhatsApp messages: N payment-confirmation replies (a share of them repeated
+as Twilio retries of the same MessageSid) posted concurrently to
+/webhooks/whatsapp on a file-backed SQLite database while the inbound
+consumer runs, which then drains the rest. Reports ack latency
+percentiles, rows logged, consumer throughput and invoices settled.
+
+    python benchmarks/bench_inbound.py --messages 2000 --retry-share 0.3 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from sqlmodel import Session, create_engine, select
+
+from migrations import run_migrations
+from models.business import Business
+from models.contact import Contact
+from models.invoice import Invoice
+from models.raw_event import RawEvent
+from models.transaction import Transaction
+from routers import webhooks
+from workers.inbound import InboundConsumer
+
+
+def seed(engine, count: int):
+    with Session(engine) as session:
+        session.add(Business(id=1, name="Bench Business"))
+        session.add_all([Contact(business_id=1, name=f"Customer {i}", phone=f"+9198{i:08d}") for i in range(count)])
+        session.commit()
+        contacts = session.exec(select(Contact.id, Contact.phone).order_by(Contact.id)).all()
+        session.add_all([Invoice(business_id=1, contact_id=cid, amount=1000.0 + i, type="receivable",
+                                 status="overdue", due_date=date.today() - timedelta(days=3))
+                         for i, (cid, _) in enumerate(contacts)])
+        session.commit()
+        return [(phone, inv_id) for (_, phone), inv_id in
+                zip(contacts, session.exec(select(Invoice.id).order_by(Invoice.id)).all())]
+
+
+async def run(app, consumer, requests, concurrency):
+    consumer.start()
+    latencies, elapsed = await post_all(app, requests, concurrency)
+    await consumer.stop()
+    start = time.perf_counter()
+    await consumer.run_pending()
+    return latencies, elapsed, time.perf_counter() - start
+
+
+async def post_all(app, requests, concurrency):
+    latencies = []
+    limit = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def post(data):
+            async with limit:
+                start = time.perf_counter()
+                response = await client.post("/webhooks/whatsapp", data=data)
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*[post(data) for data in requests])
+        return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000, help="distinct inbound messages")
+    parser.add_argument("--retry-share", type=float, default=0.3, help="share of messages Twilio posts twice")
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        run_migrations(engine)
+        targets = seed(engine, args.messages)
+
+        rnd = random.Random(1)
+        requests = []
+        for i, (phone, invoice_id) in enumerate(targets):
+            data = {"From": f"whatsapp:{phone}", "Body": f"Paid for INV-{invoice_id} via GPay",
+                    "MessageSid": f"SM{i:032d}", "To": "whatsapp:+14155238886"}
+            requests.append(data)
+            if rnd.random() < args.retry_share:
+                requests.append(dict(data))
+        rnd.shuffle(requests)
+
+        consumer = InboundConsumer(engine)
+        webhooks.inbound_consumer = consumer
+        app = FastAPI()
+        app.include_router(webhooks.router, prefix="/webhooks")
+
+        start = time.perf_counter()
+        latencies, elapsed, drained = asyncio.run(run(app, consumer, requests, args.concurrency))
+        total = time.perf_counter() - start
+
+        with Session(engine) as session:
+            events = session.exec(select(RawEvent)).all()
+            processed = sum(1 for e in events if e.processed_at is not None)
+            statuses = Counter(e.status for e in events)
+            transactions = len(session.exec(select(Transaction.id)).all())
+            invoices = Counter(session.exec(select(Invoice.status)).all())
+        engine.dispose()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000
+    print(f"webhooks posted : {len(requests)} ({len(requests) - args.messages} retries), concurrency {args.concurrency}")
+    print(f"ack latency     : p50 {pct(0.5):6.2f}ms  p95 {pct(0.95):6.2f}ms  p99 {pct(0.99):6.2f}ms  "
+          f"mean {statistics.mean(latencies) * 1000:6.2f}ms")
+    print(f"ingest rate     : {len(requests) / elapsed:8.1f} webhooks/sec")
+    print(f"rows logged     : {len(events)}  (expected {args.messages})")
+    print(f"consumer        : {processed} events processed in {total:.2f}s overall "
+          f"({drained:.2f}s draining after the burst)  {processed / total:8.1f} events/sec")
+    print(f"event statuses  : {dict(statuses)}  transactions {transactions}")
+    print(f"invoice statuses: {dict(invoices)}")
+
+
+if __name__ == "__main__":
+    main()
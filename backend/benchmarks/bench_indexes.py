@@ -0,0 +1,158 @@
+# backend/benchmarks/bench_indexes.py
+"""
+Query plans and timings for the hot lookups, before and after migration 2
+(composite indexes) on a seeded database.
+
+    python benchmarks/bench_indexes.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import extract, func, text
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from migrations import run_migrations, _m002_hot_path_indexes
+from models.business import Business
+from models.contact import Contact
+from models.invoice import Invoice
+from models.transaction import Transaction
+from services.cashflow_services import monthly_totals_by_direction, overdue_invoice_amount
+
+CHUNK = 50_000
+
+
+def seed(engine, rows: int, businesses: int):
+    rnd = random.Random(42)
+    start = datetime(2022, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(Business.__table__.insert(), [
+            {"id": b, "name": f"Business {b}", "created_at": start} for b in range(1, businesses + 1)
+        ])
+        conn.execute(Contact.__table__.insert(), [
+            {"business_id": b, "name": f"Contact {b}-{c}", "type": "customer"}
+            for b in range(1, businesses + 1) for c in range(50)
+        ])
+        conn.execute(Invoice.__table__.insert(), [
+            {
+                "business_id": rnd.randint(1, businesses),
+                "amount": rnd.randint(1000, 50000),
+                "type": "receivable",
+                "status": rnd.choice(["pending", "paid", "paid", "overdue"]),
+                "due_date": (start + timedelta(days=rnd.randint(0, 1000))).date(),
+            }
+            for _ in range(max(rows // 50, 1))
+        ])
+        for offset in range(0, rows, CHUNK):
+            conn.execute(Transaction.__table__.insert(), [
+                {
+                    "business_id": rnd.randint(1, businesses),
+                    "direction": rnd.choice(["inflow", "outflow"]),
+                    "amount": rnd.randint(100, 50000),
+                    "method": "upi",
+                    "category": "other",
+                    "date": start + timedelta(minutes=rnd.randint(0, 1_500_000)),
+                    "source": "bench",
+                }
+                for _ in range(min(CHUNK, rows - offset))
+            ])
+
+
+def hot_queries(business_id: int):
+    year, month = extract("year", Transaction.date), extract("month", Transaction.date)
+    return {
+        "monthly_totals": select(year, month, Transaction.direction, func.sum(Transaction.amount))
+        .where(Transaction.business_id == business_id)
+        .group_by(year, month, Transaction.direction),
+        "overdue_sum": select(func.sum(Invoice.amount))
+        .where(Invoice.business_id == business_id, Invoice.status == "overdue"),
+        "contact_lookup": select(Contact)
+        .where(Contact.business_id == business_id, Contact.name == f"Contact {business_id}-7"),
+    }
+
+
+def explain(session: Session, stmt) -> str:
+    dialect = session.get_bind().dialect
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    prefix = "EXPLAIN QUERY PLAN " if dialect.name == "sqlite" else "EXPLAIN "
+    rows = session.exec(text(prefix + sql)).all()
+    return "\n".join("    " + str(r[-1]) for r in rows)
+
+
+def timings(session: Session, businesses: int, runs: int) -> dict:
+    ids = [random.randint(1, businesses) for _ in range(runs)]
+    calls = {
+        "monthly_totals": lambda b: monthly_totals_by_direction(session, b),
+        "overdue_sum": lambda b: overdue_invoice_amount(session, b),
+        "contact_lookup": lambda b: session.exec(hot_queries(b)["contact_lookup"]).first(),
+    }
+    out = {}
+    for name, call in calls.items():
+        samples = []
+        for b in ids:
+            t0 = time.perf_counter()
+            call(b)
+            samples.append((time.perf_counter() - t0) * 1000)
+        out[name] = statistics.median(samples)
+    return out
+
+
+def report(label: str, session: Session, businesses: int, runs: int) -> dict:
+    print(f"\n=== {label} ===")
+    for name, stmt in hot_queries(1).items():
+        print(f"  {name}:\n{explain(session, stmt)}")
+    result = timings(session, businesses, runs)
+    for name, ms in result.items():
+        print(f"  {name:<16} median {ms:8.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--businesses", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--url", help="database URL (defaults to a temporary SQLite file)")
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    # Start from the pre-migration schema: tables without the composite indexes.
+    with engine.begin() as conn:
+        for name in ("transaction", "invoice", "contact"):
+            for index in SQLModel.metadata.tables[name].indexes:
+                index.drop(bind=conn, checkfirst=True)
+
+    t0 = time.perf_counter()
+    seed(engine, args.rows, args.businesses)
+    print(f"Seeded {args.rows:,} transactions in {time.perf_counter() - t0:.1f}s ({url})")
+
+    with Session(engine) as session:
+        before = report("before (no indexes)", session, args.businesses, args.runs)
+
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        _m002_hot_path_indexes(conn)
+        if engine.dialect.name == "sqlite":
+            conn.exec_driver_sql("ANALYZE")
+    print(f"\nBuilt indexes in {time.perf_counter() - t0:.1f}s")
+    run_migrations(engine)  # records the versions, nothing left to apply
+
+    with Session(engine) as session:
+        after = report("after (migration 2)", session, args.businesses, args.runs)
+
+    print("\n=== speedup ===")
+    for name in before:
+        print(f"  {name:<16} {before[name] / max(after[name], 1e-6):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# backend/benchmarks/bench_matching.py
+"""
+Ledger matching on a synthetic 50k-contact ledger: index build time,
+search latency (p50/p95), how often match_locally resolves without the
+LLM, how accurate those local answers are, and prompt size for the full
+ledger versus the top-k candidates.
+
+    python benchmarks/bench_matching.py --contacts 50000 --queries 2000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.matching_services import LedgerIndex, match_locally
+
+FIRST = ["Ramesh", "Suresh", "Anita", "Priya", "Vikram", "Meena", "Arjun", "Kavita", "Rahul", "Sunita",
+         "Deepak", "Pooja", "Manoj", "Neha", "Sanjay", "Rekha", "Amit", "Geeta", "Rajesh", "Lata"]
+LAST = ["Sharma", "Gupta", "Verma", "Kumar", "Singh", "Patel", "Reddy", "Iyer", "Nair", "Das",
+        "Joshi", "Mehta", "Shah", "Rao", "Pillai", "Bose", "Menon", "Chopra", "Malhotra", "Agarwal"]
+TRADES = ["Traders", "Electricals", "Textiles", "Stores", "Enterprises", "Hardware", "Pharma", "Foods"]
+
+
+def make_ledger(contacts: int, invoices: int, rnd: random.Random):
+    names, seen = [], set()
+    while len(names) < contacts:
+        if rnd.random() < 0.5:
+            name = f"{rnd.choice(FIRST)} {rnd.choice(LAST)} {rnd.randint(1, 999)}"
+        else:
+            name = f"{rnd.choice(LAST)} {rnd.choice(TRADES)} {rnd.choice(['', 'Pvt Ltd', '& Sons'])} {rnd.randint(1, 999)}"
+        name = " ".join(name.split())
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    contact_rows = [{"id": i + 1, "name": n, "phone": f"+9190000{i:05d}"} for i, n in enumerate(names)]
+    invoice_rows = [
+        {"id": i + 1, "contact_id": rnd.randint(1, contacts), "amount": float(rnd.randint(100, 200000)),
+         "type": "receivable", "due_date": f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+         "status": "pending"}
+        for i in range(invoices)
+    ]
+    return contact_rows, invoice_rows
+
+
+def typo(name: str, rnd: random.Random) -> str:
+    i = rnd.randrange(1, len(name) - 1)
+    return name[:i] + name[i + 1:] if rnd.random() < 0.5 else name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def make_queries(contacts, invoices, count: int, rnd: random.Random):
+    by_contact = {}
+    for inv in invoices:
+        by_contact.setdefault(inv["contact_id"], inv)
+    queries = []
+    for _ in range(count):
+        contact = rnd.choice(contacts)
+        inv = by_contact.get(contact["id"])
+        kind = rnd.choice(["exact", "case", "typo"])
+        name = contact["name"]
+        name = name.upper() if kind == "case" else typo(name, rnd) if kind == "typo" else name
+        tx = {"counterparty": name, "amount": inv["amount"] if inv else float(rnd.randint(100, 5000)),
+              "date": inv["due_date"] if inv else "2025-06-01"}
+        queries.append((tx, contact["id"]))
+    return queries
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=50000)
+    parser.add_argument("--invoices", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rnd = random.Random(11)
+    contacts, invoices = make_ledger(args.contacts, args.invoices, rnd)
+    queries = make_queries(contacts, invoices, args.queries, rnd)
+
+    start = time.perf_counter()
+    index = LedgerIndex(contacts, invoices)
+    build = time.perf_counter() - start
+
+    latencies, local, correct, prompt_sizes = [], 0, 0, []
+    for tx, expected in queries:
+        start = time.perf_counter()
+        result, candidates = match_locally(index, tx)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if result is not None:
+            local += 1
+            correct += result["contact_match"]["contact_id"] == expected
+        else:
+            prompt_sizes.append(len(json.dumps(candidates, separators=(",", ":"), default=str)))
+    full_prompt = len(json.dumps({"contacts": contacts, "invoices": invoices}, indent=2))
+
+    print(f"ledger: {args.contacts} contacts, {args.invoices} open invoices, {args.queries} queries")
+    print(f"index build     : {build:8.2f}s")
+    print(f"match latency   : p50 {percentile(latencies, 0.5):6.2f}ms  p95 {percentile(latencies, 0.95):6.2f}ms")
+    print(f"resolved locally: {local / len(queries):8.1%}  (accuracy {correct / max(local, 1):.1%})")
+    if prompt_sizes:
+        print(f"LLM prompt size : full ledger {full_prompt / 1e6:.1f} MB vs top-k "
+              f"{sum(prompt_sizes) / len(prompt_sizes) / 1e3:.1f} kB on average")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# backend/benchmarks/bench_risk.py
+"""
+Time to score a whole receivables book with services.risk_services on a
+file-backed SQLite database: C contacts with a payment history of settled
+invoices (each paid a contact-specific number of days late) and open
+invoices to score. --limit 0 lists every scored invoice.
+
+    python benchmarks/bench_risk.py --contacts 2000 --settled 20 --open 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlmodel import Session, create_engine, select
+
+from migrations import run_migrations
+from models.business import Business
+from models.contact import Contact
+from models.invoice import Invoice
+from models.transaction import Transaction
+from services.risk_services import score_business_risk
+
+TODAY = date(2024, 6, 30)
+
+
+def seed(engine, contacts: int, settled: int, open_: int):
+    rnd = random.Random(3)
+    with Session(engine) as session:
+        session.add(Business(id=1, name="Bench Business"))
+        session.commit()
+        session.execute(insert(Contact), [{"business_id": 1, "name": f"Customer {i}"} for i in range(contacts)])
+        contact_ids = session.exec(select(Contact.id)).all()
+        invoices, payments = [], []
+        for contact_id in contact_ids:
+            habit = rnd.choice([0, 0, 5, 15, 45])
+            for k in range(settled + open_):
+                due = TODAY - timedelta(days=rnd.randint(-20, 360))
+                is_settled = k < settled and due < TODAY
+                invoices.append({"business_id": 1, "contact_id": contact_id, "amount": float(rnd.randint(500, 50000)),
+                                 "type": "receivable", "status": "paid" if is_settled else "pending",
+                                 "due_date": due, "amount_paid": 0.0})
+        session.execute(insert(Invoice), invoices)
+        rows = session.exec(select(Invoice.id, Invoice.contact_id, Invoice.due_date, Invoice.amount)
+                            .where(Invoice.status == "paid")).all()
+        for invoice_id, _, due, amount in rows:
+            paid_on = datetime.combine(due, datetime.min.time()) + timedelta(days=rnd.randint(0, 60))
+            payments.append({"business_id": 1, "invoice_id": invoice_id, "direction": "inflow", "amount": amount,
+                             "date": min(paid_on, datetime.combine(TODAY, datetime.min.time())), "method": "upi",
+                             "category": "sales", "source": "bench"})
+        session.execute(insert(Transaction), payments)
+        session.commit()
+    return len(invoices), len(payments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contacts", type=int, default=2000)
+    parser.add_argument("--settled", type=int, default=20, help="settled invoices per contact")
+    parser.add_argument("--open", type=int, default=5, help="open invoices per contact")
+    parser.add_argument("--limit", type=int, default=100, help="invoices listed, as in GET /risk/{id}")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        run_migrations(engine)
+        invoices, payments = seed(engine, args.contacts, args.settled, args.open)
+        timings = []
+        with Session(engine) as session:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                risk = score_business_risk(session, 1, today=TODAY, limit=args.limit or None)
+                timings.append(time.perf_counter() - start)
+        engine.dispose()
+
+    print(f"book            : {invoices} receivables ({risk['open_invoices']} open), {payments} payments, "
+          f"{args.contacts} contacts")
+    print(f"score full book : (top {args.limit or 'all'} listed) median {statistics.median(timings) * 1000:8.1f}ms  "
+          f"best {min(timings) * 1000:8.1f}ms over {args.repeat} runs")
+    print(f"bands           : {risk['high_risk']} high, {risk['medium_risk']} medium")
+
+
+if __name__ == "__main__":
+    main()
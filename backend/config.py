@@ -2,15 +2,141 @@ import os
 from dotenv import load_dotenv
 load_dotenv()
 
+def _per_agent(name, default, cast):
+    """Parses "agent:value,agent:value" settings."""
+    return {
+        key.strip(): cast(value) for key, value in (
+            item.split(":", 1) for item in os.getenv(name, default).split(",") if item.strip()
+        )
+    }
+
 class Settings:
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'verity.db')}")
+    # Optional read replica for the read-only dashboard routes; unset = they read from DATABASE_URL
+    DATABASE_READ_URL = os.getenv("DATABASE_READ_URL") or None
+    # Connection pool (server databases): size, overflow, seconds to wait for a connection,
+    # seconds before a connection is recycled, and a liveness check on checkout
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    # SQLite pragmas set on every connection: journal mode, synchronous level, memory-mapped I/O,
+    # page cache and how long a writer waits for the lock before "database is locked"
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+    SQLITE_CACHE_SIZE_MB = int(os.getenv("SQLITE_CACHE_SIZE_MB", "64"))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-flash") # Default to Gemini model
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "256"))
+    LLM_MAX_CONCURRENCY_PER_MODEL = int(os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", "64"))
+    # Rule-based transaction parser: below this confidence the LLM is used instead
+    FAST_PARSER_MIN_CONFIDENCE = float(os.getenv("FAST_PARSER_MIN_CONFIDENCE", "0.85"))
+    # Batched parsing: input-token budget and item cap per LLM call, and retry rounds for failed items
+    LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "6000"))
+    LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", "50"))
+    LLM_BATCH_RETRIES = int(os.getenv("LLM_BATCH_RETRIES", "1"))
+    # Statement upload (CSV/XLSX): rows per bulk insert / commit
+    INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+    # Background jobs: worker tasks per process, idle poll interval and per-job timeout
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "1.0"))
+    JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "300"))
+    # Narrative store: tolerances for "meaningfully changed" inputs, and max age before a refresh
+    NARRATIVE_AMOUNT_STEP = float(os.getenv("NARRATIVE_AMOUNT_STEP", "500"))
+    NARRATIVE_RELATIVE_STEP = float(os.getenv("NARRATIVE_RELATIVE_STEP", "0.05"))
+    NARRATIVE_PERCENT_STEP = float(os.getenv("NARRATIVE_PERCENT_STEP", "2.0"))
+    NARRATIVE_IGNORE_KEYS = [k.strip() for k in os.getenv("NARRATIVE_IGNORE_KEYS", "as_of").split(",") if k.strip()]
+    NARRATIVE_MAX_AGE_HOURS = float(os.getenv("NARRATIVE_MAX_AGE_HOURS", "168"))
+    # Ledger matching index: candidates sent to the LLM, auto-accept / "new contact" name scores,
+    # relative amount tolerance for invoices, and how many business indexes stay in memory
+    MATCH_TOP_K = int(os.getenv("MATCH_TOP_K", "5"))
+    MATCH_AUTO_ACCEPT = float(os.getenv("MATCH_AUTO_ACCEPT", "0.9"))
+    MATCH_MIN_SCORE = float(os.getenv("MATCH_MIN_SCORE", "0.6"))
+    MATCH_AMOUNT_TOLERANCE = float(os.getenv("MATCH_AMOUNT_TOLERANCE", "0.01"))
+    MATCH_INDEX_CACHE_SIZE = int(os.getenv("MATCH_INDEX_CACHE_SIZE", "64"))
+    # Local categorizer: model directory, hash buckets, confidence needed to skip the LLM,
+    # labelled rows a business needs before its own model is consulted, and how many models stay in memory
+    CATEGORY_MODEL_DIR = os.getenv("CATEGORY_MODEL_DIR", os.path.join(BASE_DIR, "category_models"))
+    CATEGORY_MODEL_DIM = int(os.getenv("CATEGORY_MODEL_DIM", "65536"))
+    CATEGORY_MIN_CONFIDENCE = float(os.getenv("CATEGORY_MIN_CONFIDENCE", "0.8"))
+    CATEGORY_MIN_LABELS = int(os.getenv("CATEGORY_MIN_LABELS", "50"))
+    CATEGORY_MODEL_CACHE_SIZE = int(os.getenv("CATEGORY_MODEL_CACHE_SIZE", "32"))
+    # LLM response cache: agents listed here opt in; empty path disables the SQLite tier
+    LLM_CACHE_AGENTS = [a.strip() for a in os.getenv(
+        "LLM_CACHE_AGENTS",
+        "parser,parser_batch,invoice_parser,csv_mapping,ledger_match,categorization,risk,insight,forecast,report,pitchdeck",
+    ).split(",") if a.strip()]
+    LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+    LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(BASE_DIR, "llm_cache.db"))
+    # Agent inputs (utils.llm_context): default token budget, per-agent overrides as agent:tokens,
+    # and how many items of a long list are sent alongside its summary
+    LLM_CONTEXT_TOKEN_BUDGET = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", "3000"))
+    LLM_CONTEXT_BUDGETS = _per_agent(
+        "LLM_CONTEXT_BUDGETS", "ledger_match:1500,categorization:500,risk:2500,report:4000", int)
+    LLM_CONTEXT_LIST_TOP_K = int(os.getenv("LLM_CONTEXT_LIST_TOP_K", "10"))
+    # LLM gateway (utils.llm_gateway): seconds an agent's call may take in total (default, per-agent
+    # overrides), retries per model with jittered backoff, and models tried after the requested one
+    LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "20"))
+    LLM_DEADLINES = _per_agent(
+        "LLM_DEADLINES",
+        "parser:8,ledger_match:8,categorization:5,csv_mapping:10,reminder:10,insight:15,forecast:15,risk:15",
+        float,
+    )
+    LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+    LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.25"))
+    LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "4"))
+    LLM_FALLBACK_MODELS = [m.strip() for m in os.getenv("LLM_FALLBACK_MODELS", "gemini-2.5-flash-lite").split(",")
+                           if m.strip()]
+    # Hedged requests for the listed agents: a second request once the first outlasts the model's
+    # recent p95 (LLM_HEDGE_DELAY_SECONDS until LLM_HEDGE_MIN_SAMPLES calls have been seen)
+    LLM_HEDGE_AGENTS = [a.strip() for a in os.getenv("LLM_HEDGE_AGENTS", "").split(",") if a.strip()]
+    LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    LLM_HEDGE_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "3"))
+    LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    # Circuit breaker per model: consecutive failures that open it, seconds before a probe is let through
+    LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+    LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
     TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
     TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
     TWILIO_WHATSAPP_FROM = os.getenv("TWILIO_WHATSAPP_FROM")
+    TWILIO_STATUS_CALLBACK_URL = os.getenv("TWILIO_STATUS_CALLBACK_URL") # e.g. https://api.example.com/webhooks/whatsapp/status
+    # Outbound WhatsApp queue: "auto" (Twilio when configured, else mock) | "twilio" | "fake" | "mock",
+    # sends per second and burst, concurrent sends, attempts per message and first retry delay
+    WHATSAPP_TRANSPORT = os.getenv("WHATSAPP_TRANSPORT", "auto")
+    WHATSAPP_RATE_PER_SECOND = float(os.getenv("WHATSAPP_RATE_PER_SECOND", "20"))
+    WHATSAPP_BURST = float(os.getenv("WHATSAPP_BURST", "20"))
+    WHATSAPP_CONCURRENCY = int(os.getenv("WHATSAPP_CONCURRENCY", "16"))
+    WHATSAPP_MAX_ATTEMPTS = int(os.getenv("WHATSAPP_MAX_ATTEMPTS", "5"))
+    WHATSAPP_RETRY_BASE_SECONDS = float(os.getenv("WHATSAPP_RETRY_BASE_SECONDS", "2.0"))
+    # Reminder campaigns: tones served by the local template (others go to the LLM), reminders per
+    # LLM call, invoices per generate-and-queue chunk, and how far ahead "soon due" reaches
+    REMINDER_TEMPLATE_TONES = [t.strip() for t in os.getenv("REMINDER_TEMPLATE_TONES", "friendly,firm,urgent").split(",") if t.strip()]
+    REMINDER_LLM_BATCH_SIZE = int(os.getenv("REMINDER_LLM_BATCH_SIZE", "20"))
+    REMINDER_CAMPAIGN_CHUNK = int(os.getenv("REMINDER_CAMPAIGN_CHUNK", "500"))
+    REMINDER_DUE_WITHIN_DAYS = int(os.getenv("REMINDER_DUE_WITHIN_DAYS", "3"))
+    # Language of reminders that don't ask for one (single reminders and campaigns alike)
+    REMINDER_LANGUAGE = os.getenv("REMINDER_LANGUAGE", "English/Hinglish")
+    # Invoice status sweep (payments reconciled, pending/partial/paid/overdue derived); 0 disables it
+    INVOICE_SWEEP_INTERVAL_SECONDS = float(os.getenv("INVOICE_SWEEP_INTERVAL_SECONDS", "900"))
+    # Demand-signal detector run (folds newly completed weeks of per-category sales); 0 disables it
+    DEMAND_SIGNAL_INTERVAL_SECONDS = float(os.getenv("DEMAND_SIGNAL_INTERVAL_SECONDS", "3600"))
+    # Inbound WhatsApp consumer: events per claim, idle poll, attempts per event, events processed at
+    # once (SQLite serializes the writes anyway; raise it on Postgres or when most messages need the
+    # LLM parser), how long a reply is tied to our last message to that phone, and the business that
+    # owns unknown senders' messages (a single-business deployment forwarding its own alerts; unset =
+    # such messages are ignored)
+    INBOUND_BATCH_SIZE = int(os.getenv("INBOUND_BATCH_SIZE", "50"))
+    INBOUND_POLL_INTERVAL_SECONDS = float(os.getenv("INBOUND_POLL_INTERVAL_SECONDS", "5"))
+    INBOUND_MAX_ATTEMPTS = int(os.getenv("INBOUND_MAX_ATTEMPTS", "3"))
+    INBOUND_CONCURRENCY = int(os.getenv("INBOUND_CONCURRENCY", "1"))
+    WHATSAPP_REPLY_WINDOW_DAYS = int(os.getenv("WHATSAPP_REPLY_WINDOW_DAYS", "30"))
+    WHATSAPP_DEFAULT_BUSINESS_ID = int(os.getenv("WHATSAPP_DEFAULT_BUSINESS_ID")) if os.getenv("WHATSAPP_DEFAULT_BUSINESS_ID") else None
 
 
 settings = Settings()
@@ -0,0 +1,4 @@
+# backend/conftest.py
+# Loaded by pytest before it collects anything (test_all_layers_mocked.py
+# at this level imports config first): applies the test settings overrides.
+import tests  # noqa: F401
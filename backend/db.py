@@ -1,15 +1,94 @@
-from sqlmodel import SQLModel, create_engine, Session
+from typing import Any, Dict
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlmodel import create_engine, Session
 try:
     from config import settings
+    from migrations import run_migrations
+    from services import rollup_services  # noqa: F401  registers the rollup write hook
+    from services import metrics_services  # noqa: F401  registers the data-version write hook
+    from services import invoice_services  # noqa: F401  registers the invoice status-event hook
+    from utils.metrics import instrument_engine
 except ImportError:
     from .config import settings
+    from .migrations import run_migrations
+    from .services import rollup_services  # noqa: F401
+    from .services import metrics_services  # noqa: F401
+    from .services import invoice_services  # noqa: F401
+    from .utils.metrics import instrument_engine
 
-engine = create_engine(settings.DATABASE_URL, echo=False)
+
+def _is_memory_sqlite(url) -> bool:
+    return url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+
+
+def engine_options(database_url: str, read_only: bool = False) -> Dict[str, Any]:
+    """create_engine keyword arguments for the URL's dialect."""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        return {}
+    options: Dict[str, Any] = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if read_only and url.get_backend_name() == "postgresql":
+        options["connect_args"] = {"options": "-c default_transaction_read_only=on"}
+    return options
+
+
+def sqlite_pragmas(database_url: str, read_only: bool = False) -> Dict[str, Any]:
+    """PRAGMAs applied to every new SQLite connection, in order."""
+    pragmas: Dict[str, Any] = {}
+    if not _is_memory_sqlite(make_url(database_url)):
+        # WAL lets dashboard reads run alongside a writer; NORMAL only fsyncs at checkpoints
+        pragmas["journal_mode"] = settings.SQLITE_JOURNAL_MODE
+        pragmas["mmap_size"] = settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024
+    pragmas["synchronous"] = settings.SQLITE_SYNCHRONOUS
+    pragmas["cache_size"] = -settings.SQLITE_CACHE_SIZE_MB * 1024  # negative = KiB
+    pragmas["busy_timeout"] = settings.SQLITE_BUSY_TIMEOUT_MS
+    if read_only:
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def make_engine(database_url: str, read_only: bool = False, **kwargs) -> Engine:
+    """
+    Engine tuned for the URL's dialect: pool sizing, pre-ping and recycling
+    for server databases, WAL and the pragmas above for SQLite. read_only
+    engines (replicas) refuse writes at the connection level.
+    """
+    engine = create_engine(database_url, **{"echo": False, **engine_options(database_url, read_only), **kwargs})
+    if engine.dialect.name == "sqlite":
+        pragmas = sqlite_pragmas(database_url, read_only)
+
+        @event.listens_for(engine, "connect")
+        def _set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return engine
+
+
+instrument_engine()
+engine = make_engine(settings.DATABASE_URL)
+read_engine = make_engine(settings.DATABASE_READ_URL, read_only=True) if settings.DATABASE_READ_URL else engine
 
 def init_db():
-    from models import business, contact, invoice, transaction, raw_event
-    SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+def get_read_session():
+    """
+    Session for read-only dashboard routes, on the replica when one is
+    configured. Its info["read_only"] tells services not to write through it.
+    """
+    with Session(read_engine, info={"read_only": read_engine is not engine}) as session:
+        yield session
@@ -1,14 +1,26 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 try:
     from config import settings
     from db import init_db
-    from routers import ingest, cashflow, actions, insights, business, pitchdeck, enrichment, risk, forecast, reports, webhooks
+    from routers import ingest, cashflow, actions, insights, business, pitchdeck, enrichment, risk, forecast, reports, webhooks, jobs
+    from workers.jobs import job_queue
+    from workers.inbound import inbound_consumer
+    from workers.messaging import message_queue
+    from workers.scheduler import scheduler
+    from utils import metrics
 except ImportError:
     from .config import settings
     from .db import init_db
-    from .routers import ingest, cashflow, actions, insights, business, pitchdeck, enrichment, risk, forecast, reports, webhooks
+    from .routers import ingest, cashflow, actions, insights, business, pitchdeck, enrichment, risk, forecast, reports, webhooks, jobs
+    from .workers.jobs import job_queue
+    from .workers.inbound import inbound_consumer
+    from .workers.messaging import message_queue
+    from .workers.scheduler import scheduler
+    from .utils import metrics
 
 
 app = FastAPI(title="Verity API", version="1.0.0")
@@ -22,14 +34,63 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Request latency, plus the DB time and query count the request caused, per route template."""
+    stats = metrics.RequestStats()
+    token = metrics.current_request.set(stats)
+    started = time.perf_counter()
+
+    def record(status: int):
+        route = metrics.route_label(request.scope)
+        metrics.http_request_seconds.observe(time.perf_counter() - started, method=request.method,
+                                             route=route, status=status)
+        metrics.http_request_db_seconds.observe(stats.db_seconds, method=request.method, route=route)
+        metrics.http_request_db_queries.observe(stats.db_queries, method=request.method, route=route)
+
+    try:
+        response = await call_next(request)
+    except BaseException:
+        record(500)
+        raise
+    finally:
+        metrics.current_request.reset(token)
+    # Recorded once the last chunk is sent, not with the headers: streamed
+    # responses (the NDJSON statement upload) do their work in the body.
+    response.body_iterator = _timed_body(response.body_iterator, lambda: record(response.status_code))
+    return response
+
+async def _timed_body(body, done):
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        done()
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    job_queue.start()
+    message_queue.start()
+    inbound_consumer.start()
+    scheduler.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await job_queue.stop()
+    await scheduler.stop()
+    await inbound_consumer.stop()
+    await message_queue.stop()
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Verity API"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    """Prometheus text exposition of the request, DB and LLM metrics (utils.metrics)."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 # Register routes
 app.include_router(business.router, prefix="/business", tags=["Business"])
 app.include_router(ingest.router, prefix="/ingest", tags=["Ingest"])
@@ -42,3 +103,4 @@ app.include_router(reports.router, prefix="/reports", tags=["Reports"])
 app.include_router(pitchdeck.router, prefix="/pitchdeck", tags=["Pitchdeck"])
 app.include_router(cashflow.router, prefix="/cashflow", tags=["Cashflow"])
 app.include_router(webhooks.router, prefix="/webhooks", tags=["Webhooks"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
@@ -0,0 +1,184 @@
+# backend/migrations.py
+"""
+Versioned schema migrations, applied in order and recorded in `schema_version`.
+Every step must be idempotent: a fresh database gets the full schema from
+step 1, and later steps then find their tables/indexes already present.
+"""
+from datetime import datetime
+from typing import Callable, List, Tuple
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import SQLModel
+
+try:
+    from utils.logger import get_logger
+except ImportError:
+    from .utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_version_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _import_models():
+    from models import business, contact, invoice, transaction, raw_event, monthly_rollup, job, metrics_snapshot, narrative, outbound_message, invoice_event, weekly_rollup, demand_signal  # noqa: F401
+
+
+def _create_indexes(conn: Connection, *table_names: str):
+    for name in table_names:
+        for index in SQLModel.metadata.tables[name].indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+def _m001_initial_schema(conn: Connection):
+    SQLModel.metadata.create_all(conn)
+
+
+def _m002_hot_path_indexes(conn: Connection):
+    _create_indexes(conn, "transaction", "invoice", "contact")
+
+
+def _m003_monthly_rollup(conn: Connection):
+    from services.rollup_services import rebuild_rollups
+
+    SQLModel.metadata.tables["monthly_rollup"].create(bind=conn, checkfirst=True)
+    rebuild_rollups(conn)
+
+
+def _m004_job_table(conn: Connection):
+    SQLModel.metadata.tables["job"].create(bind=conn, checkfirst=True)
+    _create_indexes(conn, "job")
+
+
+def _m005_metrics_snapshot(conn: Connection):
+    SQLModel.metadata.tables["metrics_snapshot"].create(bind=conn, checkfirst=True)
+
+
+def _m006_narrative(conn: Connection):
+    SQLModel.metadata.tables["narrative"].create(bind=conn, checkfirst=True)
+
+
+def _m007_outbound_message(conn: Connection):
+    SQLModel.metadata.tables["outbound_message"].create(bind=conn, checkfirst=True)
+    _create_indexes(conn, "outbound_message")
+
+
+def _m008_invoice_status_engine(conn: Connection):
+    existing = {c["name"] for c in inspect(conn).get_columns("invoice")}
+    if "amount_paid" not in existing:
+        conn.execute(text("ALTER TABLE invoice ADD COLUMN amount_paid FLOAT NOT NULL DEFAULT 0"))
+    if "status_changed_at" not in existing:
+        conn.execute(text("ALTER TABLE invoice ADD COLUMN status_changed_at TIMESTAMP"))
+    SQLModel.metadata.tables["invoice_event"].create(bind=conn, checkfirst=True)
+    _create_indexes(conn, "invoice_event")
+
+
+_RAW_EVENT_COLUMNS = [
+    "external_id VARCHAR UNIQUE",
+    "sender VARCHAR",
+    "payload TEXT",
+    "status VARCHAR NOT NULL DEFAULT 'processed'",
+    "kind VARCHAR",
+    "attempts INTEGER NOT NULL DEFAULT 0",
+    "invoice_id INTEGER REFERENCES invoice (id)",
+    "transaction_id INTEGER REFERENCES \"transaction\" (id)",
+    "error VARCHAR",
+    "updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP",
+    "processed_at TIMESTAMP",
+]
+
+
+def _m009_inbound_event_log(conn: Connection):
+    existing = {c["name"] for c in inspect(conn).get_columns("rawevent")}
+    if "external_id" not in existing:
+        if conn.dialect.name == "sqlite":
+            # SQLite can't drop NOT NULL on business_id: rebuild the table
+            conn.execute(text("ALTER TABLE rawevent RENAME TO rawevent_old"))
+            SQLModel.metadata.tables["rawevent"].create(bind=conn)
+            conn.execute(text(
+                "INSERT INTO rawevent (id, business_id, source, raw_text, status, attempts, created_at, updated_at) "
+                "SELECT id, business_id, source, raw_text, 'processed', 0, created_at, created_at FROM rawevent_old"
+            ))
+            conn.execute(text("DROP TABLE rawevent_old"))
+        else:
+            conn.execute(text("ALTER TABLE rawevent ALTER COLUMN business_id DROP NOT NULL"))
+            for column in _RAW_EVENT_COLUMNS:
+                conn.execute(text(f"ALTER TABLE rawevent ADD COLUMN {column}"))
+    _create_indexes(conn, "rawevent", "outbound_message")
+
+
+def _m010_demand_signals(conn: Connection):
+    from services.rollup_services import rebuild_weekly_rollups
+
+    SQLModel.metadata.tables["weekly_rollup"].create(bind=conn, checkfirst=True)
+    SQLModel.metadata.tables["demand_signal"].create(bind=conn, checkfirst=True)
+    rebuild_weekly_rollups(conn)
+
+
+def _m011_unique_active_jobs(conn: Connection):
+    # Earlier submits could race into duplicate active jobs; the oldest one stays queued
+    conn.execute(text(
+        "UPDATE job SET status = 'failed', error = 'duplicate of an earlier identical job', finished_at = :now "
+        "WHERE status IN ('queued', 'running') AND id > ("
+        "SELECT MIN(j.id) FROM job j WHERE j.dedupe_key = job.dedupe_key AND j.status IN ('queued', 'running'))"
+    ), {"now": datetime.utcnow()})
+    _create_indexes(conn, "job")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "initial schema", _m001_initial_schema),
+    (2, "composite indexes on transaction, invoice and contact", _m002_hot_path_indexes),
+    (3, "monthly_rollup table, backfilled from transactions", _m003_monthly_rollup),
+    (4, "job table for the background job queue", _m004_job_table),
+    (5, "metrics_snapshot table with per-business data versions", _m005_metrics_snapshot),
+    (6, "narrative store", _m006_narrative),
+    (7, "outbound message queue", _m007_outbound_message),
+    (8, "invoice amount_paid/status_changed_at and invoice_event table", _m008_invoice_status_engine),
+    (9, "rawevent as the inbound WhatsApp log, outbound to_phone index", _m009_inbound_event_log),
+    (10, "weekly_rollup table, backfilled from transactions, and demand_signal state", _m010_demand_signals),
+    (11, "unique dedupe_key among queued/running jobs", _m011_unique_active_jobs),
+]
+
+
+def applied_versions(conn: Connection) -> set:
+    return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """
+    Applies all pending migrations, each in its own transaction.
+    Returns the versions that were applied.
+    """
+    _import_models()
+    _version_metadata.create_all(engine)
+
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        if version in done:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(schema_version.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()
+            ))
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    from db import engine
+
+    versions = run_migrations(engine)
+    print(f"Applied migrations: {versions or 'none (up to date)'}")
@@ -1,7 +1,12 @@
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 class Contact(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_contact_business_id_name", "business_id", "name"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     business_id: int = Field(foreign_key="business.id")
     name: str
@@ -0,0 +1,28 @@
+from typing import Optional
+from datetime import date, datetime
+from sqlalchemy import UniqueConstraint
+from sqlmodel import SQLModel, Field
+
+class DemandSignal(SQLModel, table=True):
+    """Detector state and latest signal for one (business, sales category), advanced a week at a time."""
+    __tablename__ = "demand_signal"
+    __table_args__ = (
+        UniqueConstraint("business_id", "category", name="uq_demand_signal_key"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    business_id: int = Field(foreign_key="business.id")
+    category: str
+    last_week: Optional[date] = None # last completed week folded into the state
+    weeks: int = 0
+    baseline: float = 0.0 # EWMA of weekly sales
+    variance: float = 0.0 # EWMA variance
+    cusum_up: float = 0.0
+    cusum_down: float = 0.0
+    last_total: float = 0.0
+    last_z: float = 0.0
+    signal: Optional[str] = None # "spike" | "trend_up" | "trend_down"
+    signal_week: Optional[date] = None
+    signal_score: float = 0.0 # z-score (spike) or CUSUM statistic (trend) that fired
+    confidence: float = 0.0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,13 +1,21 @@
 from typing import Optional
-from datetime import date
+from datetime import date, datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 class Invoice(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_invoice_business_id_status_due_date", "business_id", "status", "due_date"),
+        Index("ix_invoice_contact_id", "contact_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     business_id: int = Field(foreign_key="business.id")
     contact_id: Optional[int] = Field(default=None, foreign_key="contact.id")
     amount: float
     type: str # "receivable" | "payable"
-    status: str = "pending"
+    status: str = "pending" # "pending" | "partial" | "paid" | "overdue", kept current by the invoice sweep
+    amount_paid: float = 0.0 # sum of linked transactions in the invoice's direction
+    status_changed_at: Optional[datetime] = None
     due_date: Optional[date] = None
     description: Optional[str] = None
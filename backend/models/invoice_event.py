@@ -0,0 +1,19 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+class InvoiceEvent(SQLModel, table=True):
+    __tablename__ = "invoice_event"
+    __table_args__ = (
+        Index("ix_invoice_event_business_id_id", "business_id", "id"),
+        Index("ix_invoice_event_invoice_id", "invoice_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    business_id: int = Field(foreign_key="business.id")
+    invoice_id: int = Field(foreign_key="invoice.id")
+    old_status: Optional[str] = None
+    new_status: str
+    amount_paid: float = 0.0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,26 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Column, Index, Text, text
+from sqlmodel import SQLModel, Field
+
+class Job(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_job_status_created_at", "status", "created_at"),
+        Index("ix_job_dedupe_key_status", "dedupe_key", "status"),
+        # at most one queued/running job per dedupe key, whoever submits it
+        Index("ux_job_dedupe_key_active", "dedupe_key", unique=True,
+              sqlite_where=text("status IN ('queued', 'running')"),
+              postgresql_where=text("status IN ('queued', 'running')")),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str # handler name, e.g. "pitchdeck" | "report" | "insights" | "forecast"
+    dedupe_key: str # sha256 of kind + payload
+    status: str = "queued" # "queued" | "running" | "succeeded" | "failed"
+    payload: str = Field(sa_column=Column(Text, nullable=False)) # JSON
+    result: Optional[str] = Field(default=None, sa_column=Column(Text)) # JSON
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,13 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Column, Text
+from sqlmodel import SQLModel, Field
+
+class MetricsSnapshot(SQLModel, table=True):
+    __tablename__ = "metrics_snapshot"
+
+    business_id: int = Field(foreign_key="business.id", primary_key=True)
+    data_version: int = 0 # bumped on every Business/Transaction/Invoice write
+    snapshot_version: Optional[int] = None # data_version the payload was computed at
+    payload: Optional[str] = Field(default=None, sa_column=Column(Text)) # JSON metrics
+    computed_at: Optional[datetime] = None
@@ -0,0 +1,17 @@
+from typing import Optional
+from sqlalchemy import UniqueConstraint
+from sqlmodel import SQLModel, Field
+
+class MonthlyRollup(SQLModel, table=True):
+    __tablename__ = "monthly_rollup"
+    __table_args__ = (
+        UniqueConstraint("business_id", "month", "direction", "category", name="uq_monthly_rollup_key"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    business_id: int = Field(foreign_key="business.id")
+    month: str # "YYYY-MM"
+    direction: str # "inflow" | "outflow"
+    category: str = "other"
+    total: float = 0.0
+    count: int = 0
@@ -0,0 +1,18 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Column, Text, UniqueConstraint
+from sqlmodel import SQLModel, Field
+
+class Narrative(SQLModel, table=True):
+    __table_args__ = (
+        UniqueConstraint("business_id", "agent", name="uq_narrative_business_agent"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    business_id: int = Field(foreign_key="business.id")
+    agent: str # "insight" | "forecast" | "report" | "pitchdeck"
+    fingerprint: str # sha256 of the bucketed inputs
+    content: str = Field(sa_column=Column(Text, nullable=False)) # JSON agent output
+    is_fallback: bool = False # content is the agent's mock, regenerate when possible
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
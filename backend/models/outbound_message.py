@@ -0,0 +1,29 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Column, Index, Text
+from sqlmodel import SQLModel, Field
+
+class OutboundMessage(SQLModel, table=True):
+    __tablename__ = "outbound_message"
+    __table_args__ = (
+        Index("ix_outbound_message_status_next_attempt_at", "status", "next_attempt_at"),
+        Index("ix_outbound_message_provider_sid", "provider_sid"),
+        Index("ix_outbound_message_business_id_created_at", "business_id", "created_at"),
+        Index("ix_outbound_message_to_phone_created_at", "to_phone", "created_at"), # matching replies
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    business_id: int = Field(foreign_key="business.id")
+    invoice_id: Optional[int] = Field(default=None, foreign_key="invoice.id")
+    idempotency_key: str = Field(unique=True) # one row per logical message, e.g. per invoice reminder
+    channel: str = "whatsapp"
+    to_phone: str # E.164, with or without the "whatsapp:" prefix
+    body: str = Field(sa_column=Column(Text, nullable=False))
+    status: str = "queued" # "queued" | "sending" | "sent" | "delivered" | "read" | "failed"
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    provider_sid: Optional[str] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
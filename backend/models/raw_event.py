@@ -1,10 +1,26 @@
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Column, Index, Text
 from sqlmodel import SQLModel, Field
 
 class RawEvent(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_rawevent_status_id", "status", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    business_id: int = Field(foreign_key="business.id")
+    business_id: Optional[int] = Field(default=None, foreign_key="business.id") # resolved by the consumer
     source: str
     raw_text: str
+    external_id: Optional[str] = Field(default=None, unique=True) # provider message id, e.g. Twilio MessageSid
+    sender: Optional[str] = None # E.164 phone, without the "whatsapp:" prefix
+    payload: Optional[str] = Field(default=None, sa_column=Column(Text)) # JSON of the provider's fields
+    status: str = "received" # "received" | "processing" | "processed" | "needs_review" | "ignored" | "failed"
+    kind: Optional[str] = None # "payment_confirmation" | "payment_promise" | "transaction" | "other"
+    attempts: int = 0
+    invoice_id: Optional[int] = Field(default=None, foreign_key="invoice.id")
+    transaction_id: Optional[int] = Field(default=None, foreign_key="transaction.id")
+    error: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    processed_at: Optional[datetime] = None
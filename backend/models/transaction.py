@@ -1,8 +1,14 @@
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 class Transaction(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_transaction_business_id_date", "business_id", "date"),
+        Index("ix_transaction_invoice_id", "invoice_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     business_id: int = Field(foreign_key="business.id")
     invoice_id: Optional[int] = Field(default=None, foreign_key="invoice.id")
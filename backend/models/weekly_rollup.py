@@ -0,0 +1,18 @@
+from typing import Optional
+from datetime import date
+from sqlalchemy import UniqueConstraint
+from sqlmodel import SQLModel, Field
+
+class WeeklyRollup(SQLModel, table=True):
+    __tablename__ = "weekly_rollup"
+    __table_args__ = (
+        UniqueConstraint("business_id", "week", "direction", "category", name="uq_weekly_rollup_key"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    business_id: int = Field(foreign_key="business.id")
+    week: date # Monday the week starts on
+    direction: str # "inflow" | "outflow"
+    category: str = "other"
+    total: float = 0.0
+    count: int = 0
@@ -0,0 +1,34 @@
+import argparse
+from sqlmodel import Session
+from db import engine, init_db
+from services.rollup_services import rebuild_rollups, rebuild_weekly_rollups, check_rollup_consistency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the monthly and weekly rollup tables, or check the monthly one.")
+    parser.add_argument("--business-id", type=int, default=None, help="limit to one business (default: all)")
+    parser.add_argument("--check", action="store_true", help="only compare the rollup with the raw transactions")
+    args = parser.parse_args()
+
+    init_db()
+    with Session(engine) as session:
+        conn = session.connection()
+        if args.check:
+            mismatches = check_rollup_consistency(conn, args.business_id)
+            for m in mismatches:
+                print(
+                    f"  business={m['business_id']} {m['month']} {m['direction']}/{m['category']}: "
+                    f"raw={m['expected_total']:.2f} ({m['expected_count']}) "
+                    f"rollup={m['rollup_total']:.2f} ({m['rollup_count']})"
+                )
+            print(f"{len(mismatches)} mismatching rollup buckets")
+            raise SystemExit(1 if mismatches else 0)
+
+        written = rebuild_rollups(conn, args.business_id)
+        weekly = rebuild_weekly_rollups(conn, args.business_id)
+        session.commit()
+        print(f"Rebuilt {written} monthly and {weekly} weekly rollup rows")
+
+
+if __name__ == "__main__":
+    main()
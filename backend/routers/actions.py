@@ -1,10 +1,19 @@
 # backend/routers/actions.py
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlmodel import Session
+from config import settings
 from db import get_session
 from agents import reminder_agent
-from utils.whatsapp import send_whatsapp_message
+from schemas.actions import (
+    BulkMessageRequest, BulkMessageResponse, MessageStatusResponse, ReminderCampaignRequest, ReminderCampaignResponse,
+)
+from services.reminder_services import business_name, reminder_idempotency_key, run_reminder_campaign
+from routers.jobs import submit_job
+from workers.jobs import register_job
+from workers.messaging import make_idempotency_key, message_queue, message_status
 
 router = APIRouter()
 
@@ -17,7 +26,8 @@ class SendReminderRequest(BaseModel):
     due_date: str         # ISO date string "2025-01-15"
     days_overdue: int | None = None
     preferred_tone: str = "friendly"
-    preferred_language: str = "English/Hinglish"
+    preferred_language: Optional[str] = None # REMINDER_LANGUAGE when not given
+    idempotency_key: Optional[str] = None # defaults to one reminder per invoice per day
 
 
 class SendReminderResponse(BaseModel):
@@ -26,34 +36,113 @@ class SendReminderResponse(BaseModel):
 
 
 @router.post("/send_whatsapp_reminder", response_model=SendReminderResponse)
-def send_whatsapp_reminder(payload: SendReminderRequest, session: Session = Depends(get_session)):
+async def send_whatsapp_reminder(payload: SendReminderRequest, session: Session = Depends(get_session)):
+    """
+    Generates the reminder and queues it for delivery; `delivery.status` is
+    "queued" until the messaging worker sends it (see GET /actions/messages/{id}).
+    Repeating the request for the same invoice on the same day returns the
+    already-queued message instead of sending twice.
+    """
+    key = payload.idempotency_key or reminder_idempotency_key(payload.business_id, payload.invoice_number)
+    existing = await run_in_threadpool(message_queue.get_by_key, key)
+    if existing is not None:
+        return SendReminderResponse(message=existing.body,
+                                    delivery=dict(message_status(existing, created=False), body=existing.body))
+
     # 1. Build context for agent
+    try:
+        name = await run_in_threadpool(business_name, session, payload.business_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Business not found")
     context = {
-        "business_name": "Demo Business",  # in real code, fetch from DB using business_id
+        "business_name": name,
         "customer_name": payload.customer_name,
         "invoice_number": payload.invoice_number,
         "amount_due": payload.amount_due,
         "due_date": payload.due_date,
         "days_overdue": payload.days_overdue,
         "preferred_tone": payload.preferred_tone,
-        "preferred_language": payload.preferred_language,
+        "preferred_language": payload.preferred_language or settings.REMINDER_LANGUAGE,
     }
 
     # 2. Call AI agent to generate message text
-    print(f"[DEBUG] Calling reminder_agent for {payload.customer_name}")
     try:
-        agent_result = reminder_agent.generate_payment_reminder(context)
-        print(f"[DEBUG] reminder_agent returned: {agent_result}")
+        agent_result = await reminder_agent.agenerate_payment_reminder(context)
         message = agent_result.get("message")
         if not message:
             raise ValueError("Agent did not return 'message'")
     except Exception as e:
-        print(f"[DEBUG] Error in reminder_agent: {e}")
         raise HTTPException(status_code=500, detail=f"Error generating reminder: {e}")
 
-    # 3. Send via WhatsApp
-    print(f"[DEBUG] Sending WhatsApp to {payload.customer_phone}")
-    delivery = send_whatsapp_message(payload.customer_phone, message)
-    print(f"[DEBUG] WhatsApp delivery result: {delivery}")
+    # 3. Queue for WhatsApp delivery
+    row, created = await message_queue.submit({
+        "business_id": payload.business_id,
+        "to": payload.customer_phone,
+        "body": message,
+        "idempotency_key": key,
+    })
+    return SendReminderResponse(message=row.body, delivery=dict(message_status(row, created), body=row.body))
+
+
+async def reminder_campaign(payload: dict, db: Session) -> dict:
+    """Runs a campaign from a ReminderCampaignRequest dict; ValueError for unknown businesses."""
+    return await run_reminder_campaign(
+        db, payload["business_id"], tone=payload.get("tone", "friendly"),
+        language=payload.get("language"), due_within_days=payload.get("due_within_days"),
+        dry_run=payload.get("dry_run", False),
+    )
+
+
+@register_job("reminder_campaign")
+async def reminder_campaign_job(payload: dict, db: Session) -> dict:
+    return await reminder_campaign(payload, db)
+
+
+@router.post("/reminders/campaign", response_model=ReminderCampaignResponse)
+async def send_reminder_campaign(payload: ReminderCampaignRequest, background: bool = False,
+                                 session: Session = Depends(get_session)):
+    """
+    Reminders for every overdue or soon-due receivable of a business, queued
+    for WhatsApp delivery in one request. Invoices already reminded today
+    are skipped. With ?background=true, returns 202 and a job id instead.
+    """
+    if background:
+        return await submit_job("reminder_campaign", payload.model_dump())
+    try:
+        return await reminder_campaign(payload.model_dump(), session)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Business not found")
+
+
+@router.post("/messages/bulk", response_model=BulkMessageResponse)
+async def send_messages_bulk(payload: BulkMessageRequest):
+    """
+    Queues many WhatsApp messages at once. Messages whose idempotency key was
+    already used are not sent again; their existing status is returned.
+    """
+    if not payload.messages:
+        raise HTTPException(status_code=400, detail="messages is empty")
+    results = await message_queue.submit_many([
+        {
+            "business_id": m.business_id,
+            "to": m.to,
+            "body": m.body,
+            "invoice_id": m.invoice_id,
+            "idempotency_key": m.idempotency_key or make_idempotency_key("message", m.business_id, m.to, m.body),
+        }
+        for m in payload.messages
+    ])
+    created = sum(1 for _, is_new in results if is_new)
+    return {
+        "queued": created,
+        "deduplicated": len(results) - created,
+        "messages": [message_status(row, is_new) for row, is_new in results],
+    }
+
 
-    return SendReminderResponse(message=message, delivery=delivery)
+@router.get("/messages/{message_id}", response_model=MessageStatusResponse)
+async def get_message_status(message_id: int):
+    message = await run_in_threadpool(message_queue.get, message_id)
+    if message is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return message_status(message)
@@ -1,8 +1,10 @@
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlmodel import Session, select
-from db import get_session
+from db import get_read_session, get_session
 from models.business import Business
+from models.invoice_event import InvoiceEvent
+from services.metrics_services import get_business_metrics, metrics_etag
 
 router = APIRouter()
 
@@ -14,6 +16,36 @@ def create_business(business: Business, session: Session = Depends(get_session))
     return business
 
 @router.get("/list", response_model=List[Business])
-def list_businesses(session: Session = Depends(get_session)):
+def list_businesses(session: Session = Depends(get_read_session)):
     businesses = session.exec(select(Business)).all()
     return businesses
+
+@router.get("/{business_id}/metrics")
+def get_metrics(business_id: int, request: Request, response: Response,
+                session: Session = Depends(get_read_session)):
+    """
+    Metrics from the per-business snapshot. The ETag changes whenever a
+    transaction, invoice or the business itself is written, so clients can
+    send If-None-Match and get a 304 for unchanged data.
+    """
+    try:
+        metrics, version = get_business_metrics(session, business_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Business not found")
+    etag = metrics_etag(business_id, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return metrics
+
+
+@router.get("/{business_id}/invoice_events", response_model=List[InvoiceEvent])
+def list_invoice_events(business_id: int, after_id: int = 0, limit: int = Query(100, ge=1, le=1000),
+                        session: Session = Depends(get_read_session)):
+    """Invoice status changes in order; pass the last seen id as after_id to poll for new ones."""
+    return session.exec(
+        select(InvoiceEvent)
+        .where(InvoiceEvent.business_id == business_id, InvoiceEvent.id > after_id)
+        .order_by(InvoiceEvent.id).limit(limit)
+    ).all()
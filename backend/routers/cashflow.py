@@ -1,14 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session
-from db import get_session
-from services.pitchdeck_service import compute_business_metrics
+from db import get_read_session
+from services.metrics_services import get_business_metrics
 
 router = APIRouter()
 
 @router.get("/summary/{business_id}")
-def get_cashflow_summary(business_id: int, db: Session = Depends(get_session)):
+def get_cashflow_summary(business_id: int, db: Session = Depends(get_read_session)):
     try:
-        metrics = compute_business_metrics(db, business_id)
+        metrics, _ = get_business_metrics(db, business_id)
     except ValueError:
         raise HTTPException(status_code=404, detail="Business not found")
     
@@ -1,10 +1,46 @@
-from fastapi import APIRouter
-from schemas.enrichment import LedgerMatchRequest, LedgerMatchResponse
-from agents.enrichment_agent import match_ledger_entry
+from typing import Optional
+from fastapi import APIRouter, Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session
+from db import get_session
+from schemas.enrichment import LedgerMatchRequest, LedgerMatchResponse, CategorizeRequest, CategorizeResponse
+from agents.enrichment_agent import amatch_ledger_entry
+from services.categorization_services import acategorize, categorization_stats, model_metrics
+from services.matching_services import amatch_transaction, get_ledger_index, index_from_snapshot
 
 router = APIRouter()
 
 @router.post("/match", response_model=LedgerMatchResponse)
-def match_ledger(payload: LedgerMatchRequest):
-    result = match_ledger_entry(payload.transaction, payload.ledger_context)
+async def match_ledger(payload: LedgerMatchRequest, db: Session = Depends(get_session)):
+    """
+    Matches against the business's ledger index when business_id is given, or
+    an index over ledger_context when it has contacts/invoices lists. Only
+    ambiguous matches reach the LLM, with the top candidates instead of the
+    whole ledger. Other ledger_context shapes go to the LLM as before.
+    """
+    if payload.business_id is not None:
+        index = await run_in_threadpool(get_ledger_index, db, payload.business_id)
+    else:
+        index = index_from_snapshot(payload.ledger_context)
+    if index is None:
+        result = await amatch_ledger_entry(payload.transaction, payload.ledger_context)
+    else:
+        result = await amatch_transaction(payload.transaction, index)
     return {"match_result": result}
+
+@router.post("/categorize", response_model=CategorizeResponse)
+async def categorize(payload: CategorizeRequest, db: Session = Depends(get_session)):
+    """Local classifier first; the LLM only when it is not confident enough."""
+    result = await acategorize(db, payload.description, payload.metadata, payload.business_id)
+    return {"category_result": result}
+
+@router.get("/categorize/stats")
+async def get_categorizer_stats(business_id: Optional[int] = None):
+    """
+    Fast-path coverage since startup, plus each model's progressive-validation
+    accuracy and coverage at CATEGORY_MIN_CONFIDENCE.
+    """
+    models = {"global": await run_in_threadpool(model_metrics, None)}
+    if business_id is not None:
+        models["business"] = await run_in_threadpool(model_metrics, business_id)
+    return {"fast_path": categorization_stats.snapshot(), "models": models}
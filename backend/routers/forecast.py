@@ -1,30 +1,41 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session
 from db import get_session
 from schemas.forecast import ForecastExplainRequest, ForecastExplainResponse
-from agents.forecast_agent import explain_forecast
-from services.pitchdeck_service import compute_business_metrics
+from agents.forecast_agent import aexplain_forecast
+from services.forecast_services import forecast_business
+from services.narrative_services import cached_narrative
+from routers.jobs import submit_job
+from workers.jobs import register_job
 
 router = APIRouter()
 
 @router.post("/explain", response_model=ForecastExplainResponse)
-def explain_forecast_endpoint(payload: ForecastExplainRequest):
-    result = explain_forecast(payload.forecast_data)
+async def explain_forecast_endpoint(payload: ForecastExplainRequest):
+    result = await aexplain_forecast(payload.forecast_data)
     return result
 
+async def business_forecast(business_id: int, db: Session) -> dict:
+    """Forecast plus its narrative; ValueError for unknown businesses (the job stores it as its error)."""
+    forecast = await run_in_threadpool(forecast_business, db, business_id)
+
+    # Only the compact numeric result goes to the agent for narration
+    result = await cached_narrative(db, business_id, "forecast", forecast)
+    result.setdefault("trend", forecast["trend"])
+    result["forecast"] = forecast
+    return result
+
+@register_job("forecast")
+async def forecast_job(payload: dict, db: Session) -> dict:
+    return await business_forecast(payload["business_id"], db)
+
 @router.get("/{business_id}")
-def get_business_forecast(business_id: int, db: Session = Depends(get_session)):
+async def get_business_forecast(business_id: int, background: bool = False, db: Session = Depends(get_session)):
+    """With ?background=true, returns 202 and a job id instead (see /jobs)."""
+    if background:
+        return await submit_job("forecast", {"business_id": business_id})
     try:
-        metrics = compute_business_metrics(db, business_id)
+        return await business_forecast(business_id, db)
     except ValueError:
         raise HTTPException(status_code=404, detail="Business not found")
-    
-    # Construct forecast data from metrics for the agent
-    forecast_data = {
-        "cashflow_summary": metrics.get("monthly_revenue", {}),
-        "total_inflow": metrics.get("total_inflow_last_3m", 0),
-        "growth": metrics.get("revenue_growth_percent", 0)
-    }
-    
-    result = explain_forecast(forecast_data)
-    return result
@@ -1,26 +1,44 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session
 from db import get_session
 from schemas.insights import InsightGenerateRequest, InsightGenerateResponse
-from agents.insight_agent import generate_insights
-from services.pitchdeck_service import compute_business_metrics # Reusing metrics logic
+from agents.insight_agent import agenerate_insights
+from services.metrics_services import get_business_metrics # Reusing metrics logic
+from services.demand_services import demand_signals
+from services.narrative_services import cached_narrative
+from routers.jobs import submit_job
+from workers.jobs import register_job
 
 router = APIRouter()
 
 @router.post("/generate", response_model=InsightGenerateResponse)
-def generate_insights_endpoint(payload: InsightGenerateRequest):
-    result = generate_insights(payload.metrics)
+async def generate_insights_endpoint(payload: InsightGenerateRequest):
+    result = await agenerate_insights(payload.metrics)
     return {"insights": result.get("insights", [])}
 
-@router.get("/{business_id}")
-def get_business_insights(business_id: int, db: Session = Depends(get_session)):
+async def business_insights(business_id: int, db: Session) -> dict:
+    """Insights for a business; ValueError for unknown businesses (the job stores it as its error)."""
     # 1. Compute metrics
+    metrics, _ = await run_in_threadpool(get_business_metrics, db, business_id)
+
+    # 2. Stored demand signals ride along with the metrics
+    metrics = {**metrics, "demand_signals": await run_in_threadpool(demand_signals, db, business_id)}
+
+    # 3. Stored insights while the metrics are roughly unchanged, else regenerate
+    result = await cached_narrative(db, business_id, "insight", metrics)
+    return {"insights": result.get("insights", [])}
+
+@register_job("insights")
+async def insights_job(payload: dict, db: Session) -> dict:
+    return await business_insights(payload["business_id"], db)
+
+@router.get("/{business_id}")
+async def get_business_insights(business_id: int, background: bool = False, db: Session = Depends(get_session)):
+    """With ?background=true, returns 202 and a job id instead (see /jobs)."""
+    if background:
+        return await submit_job("insights", {"business_id": business_id})
     try:
-        metrics = compute_business_metrics(db, business_id)
+        return await business_insights(business_id, db)
     except ValueError:
         raise HTTPException(status_code=404, detail="Business not found")
-    
-    # 2. Generate insights on the fly (or fetch from DB if we were storing them)
-    # For now, we generate fresh insights
-    result = generate_insights(metrics)
-    return {"insights": result.get("insights", [])}
@@ -0,0 +1,51 @@
+import json
+from typing import Any, Dict
+from fastapi import APIRouter, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from models.job import Job
+from schemas.jobs import JobStatusResponse, JobResultResponse
+from workers.jobs import job_queue
+
+router = APIRouter()
+
+def job_status(job: Job, deduplicated: bool = False) -> Dict[str, Any]:
+    return JobStatusResponse(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        deduplicated=deduplicated,
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+        result_url=f"/jobs/{job.id}/result",
+    ).model_dump(mode="json")
+
+async def submit_job(kind: str, payload: Dict[str, Any]) -> JSONResponse:
+    """202 response for the `?background=true` variant of a slow endpoint."""
+    job, created = await job_queue.submit(kind, payload)
+    return JSONResponse(status_code=202, content=job_status(job, deduplicated=not created))
+
+async def _get_job(job_id: int) -> Job:
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: int):
+    return job_status(await _get_job(job_id))
+
+@router.get("/{job_id}/result", response_model=JobResultResponse)
+async def get_job_result(job_id: int, response: Response):
+    """200 with the result (or error) once the job has finished, 202 while it is still queued/running."""
+    job = await _get_job(job_id)
+    if job.status in ("queued", "running"):
+        response.status_code = 202
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+    }
@@ -1,18 +1,24 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session
 from db import get_session
 from schemas.pitchdeck import PitchdeckRequest, PitchdeckResponse, PitchdeckSlide
-from agents.pitchdeck_agent import generate_pitchdeck_outline
-from services.pitchdeck_service import create_pitchdeck
+from agents.pitchdeck_agent import agenerate_pitchdeck_outline
+from services.metrics_services import get_business_metrics
+from services.demand_services import demand_signals
+from services.narrative_services import cached_narrative
+from routers.jobs import submit_job
+from workers.jobs import register_job
 
 router = APIRouter()
 
-@router.post("/generate", response_model=PitchdeckResponse)
-def generate_pitchdeck_endpoint(payload: PitchdeckRequest, db: Session = Depends(get_session)):
+async def build_pitchdeck(payload: PitchdeckRequest, db: Session) -> PitchdeckResponse:
     if payload.metrics:
-        deck_data = generate_pitchdeck_outline(payload.metrics)
+        deck_data = await agenerate_pitchdeck_outline(payload.metrics)
     elif payload.business_id:
-        deck_data = create_pitchdeck(db, payload.business_id)
+        metrics, _ = await run_in_threadpool(get_business_metrics, db, payload.business_id)
+        metrics = {**metrics, "demand_signals": await run_in_threadpool(demand_signals, db, payload.business_id)}
+        deck_data = await cached_narrative(db, payload.business_id, "pitchdeck", metrics)
     else:
         raise HTTPException(status_code=400, detail="Either metrics or business_id is required")
 
@@ -21,9 +27,22 @@ def generate_pitchdeck_endpoint(payload: PitchdeckRequest, db: Session = Depends
         PitchdeckSlide(title=s["title"], bullets=s.get("bullets", []))
         for s in deck_data.get("slides", [])
     ]
-    response = PitchdeckResponse(
+    return PitchdeckResponse(
         title=deck_data.get("title", "Business Pitchdeck"),
         subtitle=deck_data.get("subtitle"),
         slides=slides,
     )
-    return response
+
+@register_job("pitchdeck")
+async def pitchdeck_job(payload: dict, db: Session) -> dict:
+    return (await build_pitchdeck(PitchdeckRequest(**payload), db)).model_dump()
+
+@router.post("/generate", response_model=PitchdeckResponse)
+async def generate_pitchdeck_endpoint(payload: PitchdeckRequest, background: bool = False,
+                                      db: Session = Depends(get_session)):
+    """With ?background=true, returns 202 and a job id instead (see /jobs)."""
+    if background:
+        if not payload.metrics and not payload.business_id:
+            raise HTTPException(status_code=400, detail="Either metrics or business_id is required")
+        return await submit_job("pitchdeck", payload.model_dump())
+    return await build_pitchdeck(payload, db)
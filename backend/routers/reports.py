@@ -1,10 +1,29 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from sqlmodel import Session
+from db import get_session
 from schemas.reports import FinancialReportRequest, FinancialReportResponse
-from agents.report_agent import generate_financial_report
+from agents.report_agent import agenerate_financial_report
+from services.narrative_services import cached_narrative
+from routers.jobs import submit_job
+from workers.jobs import register_job
 
 router = APIRouter()
 
+async def financial_report(metrics: dict, db: Session) -> dict:
+    # Metrics from compute_business_metrics carry business_id; those reports go through the narrative store
+    business_id = metrics.get("business_id")
+    if isinstance(business_id, int):
+        return {"report": await cached_narrative(db, business_id, "report", metrics)}
+    return {"report": await agenerate_financial_report(metrics)}
+
+@register_job("report")
+async def report_job(payload: dict, db: Session) -> dict:
+    return await financial_report(payload["metrics"], db)
+
 @router.post("/financial", response_model=FinancialReportResponse)
-def generate_report(payload: FinancialReportRequest):
-    result = generate_financial_report(payload.metrics)
-    return {"report": result}
+async def generate_report(payload: FinancialReportRequest, background: bool = False,
+                          db: Session = Depends(get_session)):
+    """With ?background=true, returns 202 and a job id instead (see /jobs)."""
+    if background:
+        return await submit_job("report", payload.model_dump())
+    return await financial_report(payload.metrics, db)
@@ -1,10 +1,61 @@
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session
+from db import get_read_session, get_session
 from schemas.risk import RiskAnalysisRequest, RiskAnalysisResponse
-from agents.risk_agent import analyze_risk_and_demand
+from agents.risk_agent import aanalyze_risk_and_demand
+from services.demand_services import demand_signals
+from services.narrative_services import cached_narrative
+from services.risk_services import score_business_risk
+
+# Invoices listed by default; the totals always cover the whole book
+DEFAULT_LIMIT = 100
+# Riskiest invoices passed to the explanation agent
+EXPLAIN_TOP_N = 10
 
 router = APIRouter()
 
+def local_risk_analysis(db: Session, business_id: int) -> dict:
+    risk = score_business_risk(db, business_id)
+    return {
+        "late_payment_risk": [
+            {"invoice_id": inv["invoice_id"], "risk_score": inv["risk_score"], "reason": inv["reason"]}
+            for inv in risk["invoices"]
+        ],
+        "high_demand_signals": demand_signals(db, business_id),
+    }
+
 @router.post("/analyze", response_model=RiskAnalysisResponse)
-def analyze_risk(payload: RiskAnalysisRequest):
-    result = analyze_risk_and_demand(payload.history, payload.context)
+async def analyze_risk(payload: RiskAnalysisRequest, db: Session = Depends(get_session)):
+    """With context.business_id, both halves come from the local scorers and the LLM is not called."""
+    business_id = payload.context.get("business_id")
+    if isinstance(business_id, int):
+        try:
+            return {"risk_analysis": await run_in_threadpool(local_risk_analysis, db, business_id)}
+        except ValueError:
+            raise HTTPException(status_code=404, detail="Business not found")
+    result = await aanalyze_risk_and_demand(payload.history, payload.context)
     return {"risk_analysis": result}
+
+@router.get("/{business_id}/demand")
+def get_demand_signals(business_id: int, db: Session = Depends(get_read_session)):
+    """Stored spikes and trend changes in weekly sales per category (see services.demand_services)."""
+    return {"business_id": business_id, "high_demand_signals": demand_signals(db, business_id)}
+
+@router.get("/{business_id}")
+async def get_business_risk(business_id: int, limit: Optional[int] = Query(DEFAULT_LIMIT, ge=1),
+                            explain: bool = False, db: Session = Depends(get_session)):
+    """
+    Late-payment risk for every open receivable, scored locally; the
+    riskiest `limit` are listed. With ?explain=true the riskiest ones are
+    also narrated by the LLM (through the narrative store).
+    """
+    try:
+        risk = await run_in_threadpool(score_business_risk, db, business_id, None, limit)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Business not found")
+    if explain:
+        inputs = {**risk, "invoices": risk["invoices"][:EXPLAIN_TOP_N]}
+        risk["explanation"] = await cached_narrative(db, business_id, "risk", inputs)
+    return risk
@@ -1,15 +1,44 @@
 # backend/routers/webhooks.py
-from fastapi import APIRouter, Form, Request
+from typing import Optional
+from fastapi import APIRouter, Depends, Form, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session
+from db import get_session
+from services.inbound_services import normalize_sender
+from workers.inbound import inbound_consumer
+from workers.messaging import apply_status_callback
 
 router = APIRouter()
 
+# Acknowledges the message without replying
+EMPTY_TWIML = '<?xml version="1.0" encoding="UTF-8"?><Response></Response>'
+
 @router.post("/whatsapp")
 async def whatsapp_webhook(
     request: Request,
     From: str = Form(...),
-    Body: str = Form(...)
+    Body: str = Form(...),
+    MessageSid: Optional[str] = Form(None),
+):
+    """
+    Twilio incoming-message webhook. Only logs the message as a RawEvent
+    (once per MessageSid, so Twilio's retries are harmless) and returns;
+    the inbound consumer parses it, classifies replies and matches payments
+    to invoices in the background.
+    """
+    form = await request.form()
+    await inbound_consumer.append(
+        "whatsapp", Body, sender=normalize_sender(From), external_id=MessageSid,
+        payload={key: value for key, value in form.items() if isinstance(value, str)},
+    )
+    return Response(content=EMPTY_TWIML, media_type="application/xml")
+
+@router.post("/whatsapp/status")
+async def whatsapp_status_callback(
+    MessageSid: str = Form(...),
+    MessageStatus: str = Form(...),
+    session: Session = Depends(get_session),
 ):
-    # Twilio posts form-encoded data
-    print(f"[INCOMING WHATSAPP] From={From} Body={Body}")
-    # Optional: run AI to categorize reply or update DB
-    return "OK"
+    """Twilio delivery status callback (TWILIO_STATUS_CALLBACK_URL) for queued outbound messages."""
+    updated = await run_in_threadpool(apply_status_callback, session, MessageSid, MessageStatus)
+    return {"updated": updated}
@@ -0,0 +1,35 @@
+import argparse
+import json
+import time
+from sqlmodel import Session
+from db import engine, init_db
+from services.forecast_services import all_business_ids, forecast_businesses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nightly batch cashflow forecast for every business.")
+    parser.add_argument("--batch-size", type=int, default=5000, help="businesses per vectorized pass")
+    parser.add_argument("--out", default=None, help="write one JSON forecast per line to this file")
+    args = parser.parse_args()
+
+    init_db()
+    started = time.perf_counter()
+    count = 0
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    try:
+        with Session(engine) as session:
+            ids = all_business_ids(session)
+            for offset in range(0, len(ids), args.batch_size):
+                results = forecast_businesses(session, ids[offset:offset + args.batch_size])
+                count += len(results)
+                if out:
+                    for forecast in results.values():
+                        out.write(json.dumps(forecast) + "\n")
+    finally:
+        if out:
+            out.close()
+    print(f"Forecast {count} businesses in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 class ReminderRequest(BaseModel):
@@ -6,3 +6,43 @@ class ReminderRequest(BaseModel):
 
 class ReminderResponse(BaseModel):
     message: str
+
+class OutboundMessageIn(BaseModel):
+    business_id: int
+    to: str # E.164, e.g. +9198xxxxxxx
+    body: str
+    invoice_id: Optional[int] = None
+    idempotency_key: Optional[str] = None # defaults to a hash of business, recipient and body
+
+class BulkMessageRequest(BaseModel):
+    messages: List[OutboundMessageIn]
+
+class MessageStatusResponse(BaseModel):
+    message_id: int
+    idempotency_key: str
+    status: str
+    attempts: int = 0
+    provider_sid: Optional[str] = None
+    last_error: Optional[str] = None
+    invoice_id: Optional[int] = None
+    to: str
+    deduplicated: Optional[bool] = None
+
+class BulkMessageResponse(BaseModel):
+    queued: int
+    deduplicated: int
+    messages: List[MessageStatusResponse]
+
+class ReminderCampaignRequest(BaseModel):
+    business_id: int
+    tone: str = "friendly" # "friendly" | "firm" | "urgent" use the template; anything else goes to the LLM
+    language: Optional[str] = None # REMINDER_LANGUAGE when not given
+    due_within_days: Optional[int] = None # also remind invoices due this many days ahead (REMINDER_DUE_WITHIN_DAYS)
+    dry_run: bool = False # generate and return the messages without queueing them
+
+class ReminderCampaignResponse(BaseModel):
+    business_id: int
+    as_of: str
+    dry_run: bool
+    stats: Dict[str, int]
+    reminders: List[Dict[str, Any]]
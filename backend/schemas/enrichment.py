@@ -1,9 +1,18 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from pydantic import BaseModel
 
 class LedgerMatchRequest(BaseModel):
     transaction: Dict[str, Any]
-    ledger_context: Dict[str, Any]
+    ledger_context: Dict[str, Any] = {}
+    business_id: Optional[int] = None # match against the stored ledger instead of ledger_context
 
 class LedgerMatchResponse(BaseModel):
     match_result: Dict[str, Any]
+
+class CategorizeRequest(BaseModel):
+    description: str
+    metadata: Dict[str, Any] = {}
+    business_id: Optional[int] = None # use this business's local model before the global one
+
+class CategorizeResponse(BaseModel):
+    category_result: Dict[str, Any]
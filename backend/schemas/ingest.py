@@ -8,6 +8,17 @@ class TransactionParseRequest(BaseModel):
 class TransactionParseResponse(BaseModel):
     parsed_transaction: Dict[str, Any]
 
+class TransactionBatchRequest(BaseModel):
+    business_id: int
+    raw_texts: List[str]
+    source: str = "batch"
+
+class TransactionBatchResponse(BaseModel):
+    transaction_ids: List[Optional[int]]
+    parsed_transactions: List[Dict[str, Any]]
+    failed_indices: List[int]
+    stats: Dict[str, int]
+
 class InvoiceParseRequest(BaseModel):
     ocr_text: str
 
@@ -0,0 +1,20 @@
+from typing import Any, Optional
+from datetime import datetime
+from pydantic import BaseModel
+
+class JobStatusResponse(BaseModel):
+    job_id: int
+    kind: str
+    status: str
+    deduplicated: bool = False
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result_url: str
+
+class JobResultResponse(BaseModel):
+    job_id: int
+    status: str
+    result: Optional[Any] = None
+    error: Optional[str] = None
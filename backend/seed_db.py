@@ -4,6 +4,7 @@ from models.business import Business
 from models.contact import Contact
 from models.invoice import Invoice
 from models.transaction import Transaction
+from services.rollup_services import rebuild_rollups, rebuild_weekly_rollups
 from datetime import datetime, timedelta
 import random
 
@@ -121,5 +122,10 @@ def seed_data():
         session.commit()
         print("Created Invoices")
 
+        # The bulk deletes above bypass the rollup write hook, so resync it.
+        rebuild_rollups(session.connection(), business.id)
+        rebuild_weekly_rollups(session.connection(), business.id)
+        session.commit()
+
 if __name__ == "__main__":
     seed_data()
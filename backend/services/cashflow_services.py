@@ -0,0 +1,87 @@
+# backend/services/cashflow_services.py
+from typing import Dict, List, Tuple
+from sqlalchemy import extract, func
+from sqlmodel import Session, select
+from models.transaction import Transaction
+from models.invoice import Invoice
+from models.monthly_rollup import MonthlyRollup
+
+
+def month_key(y, m) -> str:
+    return f"{int(y)}-{int(m):02d}"
+
+
+def monthly_totals_by_direction(session: Session, business_id: int) -> List[Tuple[str, str, float]]:
+    """
+    Returns (month_key, direction, total) rows aggregated inside the database.
+
+    EXTRACT is compiled per dialect by SQLAlchemy (STRFTIME on SQLite,
+    EXTRACT on Postgres), so only one row per month/direction crosses the wire.
+    """
+    year = extract("year", Transaction.date)
+    month = extract("month", Transaction.date)
+    stmt = (
+        select(year, month, Transaction.direction, func.sum(Transaction.amount))
+        .where(Transaction.business_id == business_id)
+        .group_by(year, month, Transaction.direction)
+    )
+    return [
+        (month_key(y, m), direction, float(total or 0.0))
+        for y, m, direction, total in session.exec(stmt).all()
+    ]
+
+
+def monthly_totals_from_rollup(session: Session, business_id: int) -> List[Tuple[str, str, float]]:
+    """
+    Same shape as monthly_totals_by_direction, read from the MonthlyRollup
+    table (summed over categories) instead of the raw transactions.
+    """
+    stmt = (
+        select(MonthlyRollup.month, MonthlyRollup.direction, func.sum(MonthlyRollup.total))
+        .where(MonthlyRollup.business_id == business_id)
+        .group_by(MonthlyRollup.month, MonthlyRollup.direction)
+    )
+    return [(month, direction, float(total or 0.0)) for month, direction, total in session.exec(stmt).all()]
+
+
+def summarize_monthly_totals(rows: List[Tuple[str, str, float]]) -> Dict:
+    """
+    Folds (month_key, direction, total) rows into the revenue / last-3-months
+    figures used by the metrics dict.
+    """
+    monthly_revenue = {}
+    monthly_outflow = {}
+    for key, direction, total in rows:
+        if direction == "inflow":
+            monthly_revenue[key] = monthly_revenue.get(key, 0.0) + total
+        elif direction == "outflow":
+            monthly_outflow[key] = monthly_outflow.get(key, 0.0) + total
+
+    # last 3 months that have any activity, in either direction
+    last_keys = sorted(set(k for k, _, _ in rows))[-3:]
+    total_inflow_last_3m = sum(monthly_revenue.get(k, 0.0) for k in last_keys)
+    total_outflow_last_3m = sum(monthly_outflow.get(k, 0.0) for k in last_keys)
+
+    # very rough growth calculation: last month vs previous month
+    revenue_growth_percent = None
+    if len(last_keys) >= 2:
+        last = monthly_revenue.get(last_keys[-1], 0.0)
+        prev = monthly_revenue.get(last_keys[-2], 0.0)
+        if prev > 0:
+            revenue_growth_percent = (last - prev) / prev * 100
+
+    return {
+        "monthly_revenue": dict(sorted(monthly_revenue.items())),
+        "total_inflow_last_3m": total_inflow_last_3m,
+        "total_outflow_last_3m": total_outflow_last_3m,
+        "revenue_growth_percent": revenue_growth_percent,
+    }
+
+
+def overdue_invoice_amount(session: Session, business_id: int) -> float:
+    """Outstanding (unpaid) amount of the business's overdue invoices."""
+    stmt = select(func.coalesce(func.sum(Invoice.amount - Invoice.amount_paid), 0.0)).where(
+        Invoice.business_id == business_id,
+        Invoice.status == "overdue",
+    )
+    return float(session.exec(stmt).one())
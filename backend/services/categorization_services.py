@@ -0,0 +1,242 @@
+# backend/services/categorization_services.py
+"""
+Local-first transaction categorisation.
+
+A hashed n-gram linear model (utils.classifier) is trained per business and
+globally from labelled Transaction rows (raw_text + category; "other" is
+the unlabelled default and is skipped) and stored under
+CATEGORY_MODEL_DIR. Retraining is incremental: each model remembers the
+last transaction id it learned from. acategorize asks the business model,
+then the global one, and only calls the categorization agent when neither
+reaches CATEGORY_MIN_CONFIDENCE. Inference copies of the models (no
+AdaGrad state) are kept in an LRU of CATEGORY_MODEL_CACHE_SIZE entries.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session, select
+from config import settings
+from agents.enrichment_agent import acategorize_transaction
+from models.transaction import Transaction
+from services.metrics_services import get_data_version
+from utils.classifier import HashedLinearClassifier
+from utils.logger import get_logger
+from workers.jobs import job_queue, register_job
+
+logger = get_logger(__name__)
+
+GLOBAL_MODEL = "global"
+UNLABELLED = ("", "other")
+TRAIN_CHUNK = 10000
+
+
+def model_name(business_id: Optional[int]) -> str:
+    return GLOBAL_MODEL if business_id is None else f"business_{business_id}"
+
+
+def model_path(name: str) -> str:
+    return os.path.join(settings.CATEGORY_MODEL_DIR, f"{name}.npz")
+
+
+def training_text(text: Optional[str], direction: Optional[str] = None) -> str:
+    return f"{direction or ''} {text or ''}".strip()
+
+
+class CategorizationStats:
+    """Thread-safe counters for how often the local model answers without the LLM."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.by_model: Dict[str, int] = {}
+
+    def reset(self):
+        with self._lock:
+            self.attempts = 0
+            self.by_model = {}
+
+    def record(self, resolved_by: str):
+        with self._lock:
+            self.attempts += 1
+            self.by_model[resolved_by] = self.by_model.get(resolved_by, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            local = sum(n for key, n in self.by_model.items() if key.startswith("local"))
+            return {
+                "attempts": self.attempts,
+                "local": local,
+                "llm": self.attempts - local,
+                "coverage": local / self.attempts if self.attempts else 0.0,
+                "by_model": dict(self.by_model),
+            }
+
+
+categorization_stats = CategorizationStats()
+
+_models: "OrderedDict[str, Tuple[float, HashedLinearClassifier]]" = OrderedDict()
+_models_lock = threading.Lock()
+
+
+def _cache_model(name: str, mtime: float, model: HashedLinearClassifier):
+    with _models_lock:
+        _models[name] = (mtime, model)
+        _models.move_to_end(name)
+        while len(_models) > settings.CATEGORY_MODEL_CACHE_SIZE:
+            _models.popitem(last=False)
+
+
+def load_model(name: str) -> Optional[HashedLinearClassifier]:
+    """
+    The stored model for inference, cached in memory until its file changes
+    (e.g. retrained by another process). It cannot be trained further.
+    """
+    path = model_path(name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _models_lock:
+        cached = _models.get(name)
+        if cached is not None and cached[0] == mtime:
+            _models.move_to_end(name)
+            return cached[1]
+    model = HashedLinearClassifier.load(path, trainable=False)
+    _cache_model(name, mtime, model)
+    return model
+
+
+def _load_trainable(name: str) -> Optional[HashedLinearClassifier]:
+    path = model_path(name)
+    return HashedLinearClassifier.load(path) if os.path.exists(path) else None
+
+
+def _store_model(name: str, model: HashedLinearClassifier):
+    path = model_path(name)
+    model.save(path)
+    _cache_model(name, os.path.getmtime(path), model.for_inference())
+
+
+def _labelled_rows(session: Session, business_id: Optional[int], after_id: int, limit: int) -> List[Tuple]:
+    stmt = (
+        select(Transaction.id, Transaction.raw_text, Transaction.direction, Transaction.category)
+        .where(Transaction.id > after_id, Transaction.raw_text.is_not(None),
+               Transaction.category.not_in(UNLABELLED))
+        .order_by(Transaction.id)
+        .limit(limit)
+    )
+    if business_id is not None:
+        stmt = stmt.where(Transaction.business_id == business_id)
+    return session.exec(stmt).all()
+
+
+def train_category_model(session: Session, business_id: Optional[int] = None, full: bool = False) -> Dict[str, Any]:
+    """
+    Folds labelled transactions newer than the model's watermark into the
+    business model (or the global one for business_id=None). full=True
+    starts from scratch, which also picks up relabelled old rows.
+    """
+    name = model_name(business_id)
+    model = None if full else _load_trainable(name)
+    if model is None:
+        model = HashedLinearClassifier(settings.CATEGORY_MODEL_DIM)
+    version = get_data_version(session, business_id) if business_id is not None else None
+    after_id = model.meta.get("trained_through", 0)
+    trained = 0
+    while True:
+        rows = _labelled_rows(session, business_id, after_id, TRAIN_CHUNK)
+        if not rows:
+            break
+        model.partial_fit([training_text(text, direction) for _, text, direction, _ in rows],
+                          [category for _, _, _, category in rows],
+                          min_confidence=settings.CATEGORY_MIN_CONFIDENCE)
+        after_id = rows[-1][0]
+        trained += len(rows)
+    model.meta["trained_through"] = after_id
+    if trained or model.meta.get("data_version") != version:
+        model.meta["data_version"] = version
+        _store_model(name, model)
+    return dict(model.metrics(), model=name, trained=trained)
+
+
+def predict_category(business_id: Optional[int], description: str,
+                     metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Most confident local prediction: the business model when it has seen
+    CATEGORY_MIN_LABELS rows and is confident, else the global model.
+    None when no model exists yet.
+    """
+    text = training_text(description, (metadata or {}).get("direction"))
+    best = None
+    names = [model_name(business_id)] if business_id is not None else []
+    for name in names + [GLOBAL_MODEL]:
+        model = load_model(name)
+        if model is None or (name != GLOBAL_MODEL and model.meta["samples"] < settings.CATEGORY_MIN_LABELS):
+            continue
+        label, confidence = model.predict([text])[0]
+        if label is None:
+            continue
+        prediction = {"category": label, "confidence": round(confidence, 4),
+                      "model": "business" if name != GLOBAL_MODEL else "global"}
+        if confidence >= settings.CATEGORY_MIN_CONFIDENCE:
+            return prediction
+        if best is None or confidence > best["confidence"]:
+            best = prediction
+    return best
+
+
+def _needs_retrain(session: Session, business_id: int) -> bool:
+    model = load_model(model_name(business_id))
+    return model is None or model.meta.get("data_version") != get_data_version(session, business_id)
+
+
+async def request_retrain(business_id: Optional[int], full: bool = False):
+    try:
+        await job_queue.submit("category_train", {"business_id": business_id, "full": full},
+                               dedupe_on={"business_id": business_id})
+    except Exception as e:
+        logger.warning(f"Could not queue categorizer training for {model_name(business_id)}: {e}")
+
+
+async def acategorize(session: Session, description: str, metadata: Optional[Dict[str, Any]] = None,
+                      business_id: Optional[int] = None) -> Dict[str, Any]:
+    """
+    The categorization agent's output shape plus `confidence` and
+    `resolved_by` ("local_business", "local_global" or "llm"). Queues a
+    retrain when the business's ledger changed since its model was trained.
+    """
+    metadata = metadata or {}
+    prediction = await run_in_threadpool(predict_category, business_id, description, metadata)
+    if business_id is not None and await run_in_threadpool(_needs_retrain, session, business_id):
+        await request_retrain(business_id)
+
+    if prediction is not None and prediction["confidence"] >= settings.CATEGORY_MIN_CONFIDENCE:
+        resolved_by = f"local_{prediction['model']}"
+        categorization_stats.record(resolved_by)
+        return {"category": prediction["category"], "sub_category": None, "tax_code": None,
+                "confidence": prediction["confidence"], "resolved_by": resolved_by}
+
+    categorization_stats.record("llm")
+    result = await acategorize_transaction(description, metadata)
+    if isinstance(result, dict) and "error" not in result:
+        return dict(result, resolved_by="llm")
+    if prediction is not None:
+        # LLM unavailable: low-confidence local guess beats nothing
+        return {"category": prediction["category"], "sub_category": None, "tax_code": None,
+                "confidence": prediction["confidence"], "resolved_by": "local_fallback"}
+    return result
+
+
+def model_metrics(business_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    model = load_model(model_name(business_id))
+    if model is None:
+        return None
+    return dict(model.metrics(), trained_through=model.meta.get("trained_through", 0))
+
+
+@register_job("category_train")
+async def run_category_training(payload: Dict[str, Any], session: Session) -> Dict[str, Any]:
+    return await run_in_threadpool(train_category_model, session, payload.get("business_id"),
+                                   bool(payload.get("full")))
@@ -0,0 +1,234 @@
+# backend/services/demand_services.py
+"""
+Local demand-signal detection over weekly sales per category.
+
+The weekly_rollup table (kept current by the rollup write hook) holds
+inflow totals per (business, week, category). For each category a
+DemandSignal row keeps an exponentially weighted baseline and variance
+plus two-sided CUSUM statistics. update_demand_signals folds only the
+weeks completed since the row's last_week, vectorized over categories,
+so a run never rescans history:
+
+- spike: the week's z-score against the baseline reaches SPIKE_Z,
+- trend_up / trend_down: the standardized CUSUM crosses CUSUM_H (then resets).
+
+Weeks that were already folded are not revisited when back-dated
+transactions land in them. demand_signals() reads the stored signals
+(plus a provisional spike when the current week already exceeds its
+threshold), so insights and the pitchdeck get them without computing.
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlmodel import Session, select
+from config import settings
+from models.business import Business
+from models.demand_signal import DemandSignal
+from models.weekly_rollup import WeeklyRollup
+from services.rollup_services import week_of
+from utils.datetime import parse_iso_date
+from workers.jobs import job_queue, register_job
+from workers.scheduler import scheduler
+
+ALPHA = 0.2 # baseline smoothing once warmed up
+MIN_WEEKS = 6 # weeks of history before anything is flagged
+SPIKE_Z = 3.0
+CUSUM_K = 0.5 # allowance, in standard deviations
+CUSUM_H = 4.0 # decision threshold
+# Floors on the standard deviation: relative to the baseline, and absolute
+SD_FLOOR_RATIO = 0.1
+SD_FLOOR = 1.0
+SIGNAL_TTL_WEEKS = 4 # signals older than this are no longer reported
+
+
+def _confidence(score: np.ndarray, threshold: float) -> np.ndarray:
+    return np.round(1.0 - np.exp(-np.abs(score) / threshold), 3)
+
+
+def _scale(baseline: np.ndarray, variance: np.ndarray) -> np.ndarray:
+    return np.maximum(np.sqrt(variance), np.maximum(SD_FLOOR_RATIO * np.abs(baseline), SD_FLOOR))
+
+
+def detect(series: np.ndarray, active_from: np.ndarray, state: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Advances detector state over `series` (categories x new weeks), column by
+    column; rows start at `active_from`. `state` holds baseline, variance,
+    weeks, cusum_up, cusum_down and is updated in place; the returned arrays
+    give each row's last fired signal (code 0 = none, 1 spike, 2 trend_up,
+    3 trend_down), the week index and score it fired at, and the last z-score.
+    """
+    n, t = series.shape
+    signal = np.zeros(n, dtype=np.int64)
+    signal_at = np.full(n, -1, dtype=np.int64)
+    signal_score = np.zeros(n)
+    last_z = np.zeros(n)
+    for step in range(t):
+        active = step >= active_from
+        x = series[:, step]
+        baseline, variance, weeks = state["baseline"], state["variance"], state["weeks"]
+        scale = _scale(baseline, variance)
+        z = (x - baseline) / scale
+        warm = active & (weeks >= MIN_WEEKS)
+
+        # a lone outlier is a spike, not a trend: CUSUM sees z capped at SPIKE_Z
+        capped = np.clip(z, -SPIKE_Z, SPIKE_Z)
+        up = np.where(warm, np.maximum(0.0, state["cusum_up"] + capped - CUSUM_K), 0.0)
+        down = np.where(warm, np.maximum(0.0, state["cusum_down"] - capped - CUSUM_K), 0.0)
+        fired = np.select([warm & (z >= SPIKE_Z), up >= CUSUM_H, down >= CUSUM_H], [1, 2, 3], 0)
+        score = np.select([fired == 1, fired == 2, fired == 3], [z, up, -down], 0.0)
+        signal = np.where(fired > 0, fired, signal)
+        signal_at = np.where(fired > 0, step, signal_at)
+        signal_score = np.where(fired > 0, score, signal_score)
+        state["cusum_up"] = np.where(fired == 2, 0.0, up)
+        state["cusum_down"] = np.where(fired == 3, 0.0, down)
+        last_z = np.where(warm, z, last_z)
+
+        # spikes are clipped before they move the baseline
+        clipped = np.where(warm, np.minimum(x, baseline + SPIKE_Z * scale), x)
+        alpha = np.maximum(ALPHA, 1.0 / (weeks + 1))
+        diff = clipped - baseline
+        state["baseline"] = np.where(active, baseline + alpha * diff, baseline)
+        state["variance"] = np.where(active, np.where(weeks > 0, (1 - alpha) * (variance + alpha * diff * diff), 0.0),
+                                     variance)
+        state["weeks"] = np.where(active, weeks + 1, weeks)
+    return {"signal": signal, "signal_at": signal_at, "signal_score": signal_score, "last_z": last_z}
+
+
+SIGNAL_NAMES = {1: "spike", 2: "trend_up", 3: "trend_down"}
+
+
+def update_demand_signals(session: Session, business_id: int, today: Optional[date] = None) -> Dict[str, int]:
+    """Folds the business's newly completed weeks into its DemandSignal rows; returns counts."""
+    today = today or date.today()
+    last_complete = week_of(today) - timedelta(days=7)
+    states = {s.category: s for s in session.exec(
+        select(DemandSignal).where(DemandSignal.business_id == business_id)
+    ).all()}
+    first_weeks = session.exec(
+        select(WeeklyRollup.category, func.min(WeeklyRollup.week))
+        .where(WeeklyRollup.business_id == business_id, WeeklyRollup.direction == "inflow")
+        .group_by(WeeklyRollup.category)
+    ).all()
+    start_of: Dict[str, date] = {}
+    for category, first in first_weeks:
+        state = states.get(category)
+        start = state.last_week + timedelta(days=7) if state and state.last_week else parse_iso_date(first)
+        if start <= last_complete:
+            start_of[category] = start
+    if not start_of:
+        return {"categories": 0, "weeks": 0, "signals": 0}
+
+    categories = sorted(start_of)
+    row_of = {c: i for i, c in enumerate(categories)}
+    origin = min(start_of.values())
+    t = (last_complete - origin).days // 7 + 1
+    series = np.zeros((len(categories), t))
+    rows = session.exec(
+        select(WeeklyRollup.category, WeeklyRollup.week, WeeklyRollup.total)
+        .where(WeeklyRollup.business_id == business_id, WeeklyRollup.direction == "inflow",
+               WeeklyRollup.category.in_(categories),
+               WeeklyRollup.week >= origin, WeeklyRollup.week <= last_complete)
+    ).all()
+    for category, week, total in rows:
+        series[row_of[category], (parse_iso_date(week) - origin).days // 7] += total
+    active_from = np.array([(start_of[c] - origin).days // 7 for c in categories], dtype=np.int64)
+
+    existing = [states.get(c) for c in categories]
+    state = {
+        field: np.array([getattr(s, field) if s is not None else 0 for s in existing], dtype=float)
+        for field in ("baseline", "variance", "weeks", "cusum_up", "cusum_down")
+    }
+    result = detect(series, active_from, state)
+
+    now = datetime.utcnow()
+    fired = 0
+    for i, category in enumerate(categories):
+        row = existing[i] or DemandSignal(business_id=business_id, category=category)
+        row.last_week = last_complete
+        row.weeks = int(state["weeks"][i])
+        row.baseline = float(state["baseline"][i])
+        row.variance = float(state["variance"][i])
+        row.cusum_up = float(state["cusum_up"][i])
+        row.cusum_down = float(state["cusum_down"][i])
+        row.last_total = float(series[i, -1])
+        row.last_z = round(float(result["last_z"][i]), 3)
+        if result["signal"][i]:
+            fired += 1
+            row.signal = SIGNAL_NAMES[int(result["signal"][i])]
+            row.signal_week = origin + timedelta(days=7 * int(result["signal_at"][i]))
+            row.signal_score = round(float(result["signal_score"][i]), 3)
+            threshold = SPIKE_Z if row.signal == "spike" else CUSUM_H
+            row.confidence = float(_confidence(np.array([row.signal_score]), threshold)[0])
+        row.updated_at = now
+        session.add(row)
+    session.commit()
+    return {"categories": len(categories), "weeks": t, "signals": fired}
+
+
+def demand_signals(session: Session, business_id: int, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Active demand signals for a business, most confident first, in the
+    shape of the risk agent's high_demand_signals. Reads stored state only.
+    """
+    today = today or date.today()
+    current = week_of(today)
+    cutoff = current - timedelta(days=7 * SIGNAL_TTL_WEEKS)
+    states = session.exec(select(DemandSignal).where(DemandSignal.business_id == business_id)).all()
+    this_week = dict(session.exec(
+        select(WeeklyRollup.category, WeeklyRollup.total)
+        .where(WeeklyRollup.business_id == business_id, WeeklyRollup.direction == "inflow",
+               WeeklyRollup.week == current)
+    ).all())
+
+    signals = []
+    for s in states:
+        week_to_date = this_week.get(s.category, 0.0)
+        scale = float(_scale(np.array([s.baseline]), np.array([s.variance]))[0])
+        if s.weeks >= MIN_WEEKS and week_to_date > s.baseline + SPIKE_Z * scale:
+            # the week isn't over yet, but sales can only add up
+            z = (week_to_date - s.baseline) / scale
+            signals.append(_signal(s, "spike", current, z, float(_confidence(np.array([z]), SPIKE_Z)[0]),
+                                   provisional=True, total=week_to_date))
+        elif s.signal and s.signal_week and parse_iso_date(s.signal_week) > cutoff:
+            signals.append(_signal(s, s.signal, parse_iso_date(s.signal_week), s.signal_score, s.confidence))
+    return sorted(signals, key=lambda sig: -sig["confidence"])
+
+
+def _signal(s: DemandSignal, kind: str, week: date, score: float, confidence: float,
+            provisional: bool = False, total: Optional[float] = None) -> Dict[str, Any]:
+    return {
+        "product_category": s.category,
+        "trend": "down" if kind == "trend_down" else "up",
+        "confidence": round(confidence, 3),
+        "signal": kind,
+        "week": week.isoformat(),
+        "score": round(score, 2),
+        "weekly_sales": round(s.last_total if total is None else total, 2),
+        "baseline": round(s.baseline, 2),
+        "provisional": provisional,
+    }
+
+
+def update_all_demand_signals(session: Session, business_ids: Optional[Sequence[int]] = None,
+                              today: Optional[date] = None) -> Dict[str, int]:
+    business_ids = business_ids or session.exec(select(Business.id).order_by(Business.id)).all()
+    totals = {"businesses": 0, "categories": 0, "signals": 0}
+    for business_id in business_ids:
+        stats = update_demand_signals(session, business_id, today)
+        totals["businesses"] += 1
+        totals["categories"] += stats["categories"]
+        totals["signals"] += stats["signals"]
+    return totals
+
+
+@register_job("demand_signals")
+async def demand_signals_job(payload: dict, db: Session) -> dict:
+    return await run_in_threadpool(update_all_demand_signals, db, payload.get("business_ids"))
+
+
+@scheduler.every(lambda: settings.DEMAND_SIGNAL_INTERVAL_SECONDS, name="demand_signals")
+async def schedule_demand_signals():
+    # a no-op for businesses without a newly completed week
+    await job_queue.submit("demand_signals", {}, dedupe_on={})
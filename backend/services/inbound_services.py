@@ -0,0 +1,204 @@
+# backend/services/inbound_services.py
+"""
+Processing of inbound WhatsApp messages logged as RawEvent rows.
+
+The webhook only appends to the log (workers/inbound.py); the consumer
+calls process_inbound_event for each row:
+
+- A message from a phone we messaged in the last WHATSAPP_REPLY_WINDOW_DAYS,
+  or from a known contact, is a reply. classify_reply() decides whether it
+  confirms a payment; confirmations naming an amount are saved as a
+  transaction linked to the invoice they refer to (an "INV-<id>" in the
+  text, the invoice we reminded them about, or a confident ledger-index
+  match) and that invoice's status is swept right away. Confirmations
+  without an amount are left "needs_review" rather than guessed.
+- Anything else is the business forwarding its own message and goes
+  through parse_and_save_transaction for WHATSAPP_DEFAULT_BUSINESS_ID;
+  without that setting it is ignored.
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlmodel import Session, select
+from config import settings
+from models.contact import Contact
+from models.invoice import Invoice
+from models.outbound_message import OutboundMessage
+from models.raw_event import RawEvent
+from services.invoice_services import OPEN_INVOICE_STATUSES, sweep_invoice_statuses
+from services.matching_services import get_ledger_index, match_locally
+from services.parser_services import parse_and_save_transaction, save_parsed_transaction
+from utils.parsing import AMOUNT, detect_method, parse_amount
+
+# A payment still to come: "will pay", "kar dunga"
+PROMISE = re.compile(
+    r"\b(?:will|shall|going to)\s+(?:pay|send|transfer|clear)\b|\b(?:kar|bhej|de)\s+(?:dunga|dungi|denge|doonga)\b",
+    re.IGNORECASE,
+)
+# Time words promise a payment only when nothing confirms one ("payment done, will share receipt soon")
+LATER = re.compile(r"\btomorrow\b|\bnext\s+(?:week|month)\b|\bsoon\b|\b(?:kal|parso)\b", re.IGNORECASE)
+# Questions and conditionals don't confirm anything: "Is it done?", "Let me know once done"
+QUESTION = re.compile(r"\?|\b(?:once|when|if|agar|jab)\b", re.IGNORECASE)
+# Negation of the payment itself, not of anything else in the reply ("paid but didn't get receipt")
+NEGATED_PAYMENT = re.compile(
+    r"\b(?:not|never|no|didn'?t|haven'?t|hasn'?t|wasn'?t|isn'?t|don'?t)\s+(?:yet\s+|been\s+|even\s+)*"
+    r"(?:pay|paid|payment|send|sent|transfer(?:red)?|deposit(?:ed)?|cleared)\b"
+    r"|\b(?:payment|paise|paisa)\s+(?:nahi|nahin|nhi)\b|\b(?:nahi|nahin|nhi)\s+(?:kiya|bheja|diya|hua)\b",
+    re.IGNORECASE,
+)
+CONFIRMATION = re.compile(
+    r"\b(?:paid|payment\s+(?:done|made|sent|completed|transferred|cleared)|transferred|deposited"
+    r"|sent\s+(?:the\s+)?(?:money|amount|payment))\b"
+    r"|\b(?:sent|transferred)\s+(?:rs\.?|inr|₹)?\s*\d"
+    r"|\b(?:kar|bhej|de|jama\s+kar)\s+(?:diya|diye|di|dia)\b",
+    re.IGNORECASE,
+)
+# "1500 rupees", "1,500 rs", "1500/-": amounts marked after the number
+SUFFIXED_AMOUNT = re.compile(r"(?<![\w.])(?P<amount>\d[\d,]*(?:\.\d{1,2})?)\s*(?:rupees?|rs\.?|inr|/-)(?!\w)",
+                             re.IGNORECASE)
+INVOICE_REFERENCE = re.compile(r"\bINV-?(\d+)\b", re.IGNORECASE)
+
+
+def normalize_sender(address: Optional[str]) -> Optional[str]:
+    if not address:
+        return None
+    return address[len("whatsapp:"):] if address.startswith("whatsapp:") else address
+
+
+def _phone_variants(phone: str):
+    return [phone, f"whatsapp:{phone}"]
+
+
+def classify_reply(text: str) -> str:
+    """"payment_confirmation", "payment_promise" or "other", from keywords (English and Hinglish)."""
+    if not text:
+        return "other"
+    if PROMISE.search(text):
+        return "payment_promise"
+    if QUESTION.search(text):
+        return "other"
+    if CONFIRMATION.search(text) and not NEGATED_PAYMENT.search(text):
+        return "payment_confirmation"
+    if LATER.search(text):
+        return "payment_promise"
+    return "other"
+
+
+def reply_amount(text: str) -> Optional[float]:
+    """
+    Amount mentioned in a reply, only when marked as money (Rs/INR/₹ before
+    it, rupees/rs/"/-" after it). Plain numbers are dates, references or
+    counts as often as amounts, so those are not taken as one.
+    """
+    m = re.search(AMOUNT, text, re.IGNORECASE) or SUFFIXED_AMOUNT.search(text)
+    return parse_amount(m.group("amount")) if m else None
+
+
+def resolve_sender(session: Session, phone: Optional[str], now: datetime) -> Optional[Dict[str, Any]]:
+    """
+    Business (and contact / reminded invoice) a sender belongs to, with
+    reply=True for customers and suppliers; None when nobody claims them.
+    """
+    if phone:
+        message = session.exec(
+            select(OutboundMessage)
+            .where(OutboundMessage.to_phone.in_(_phone_variants(phone)),
+                   OutboundMessage.created_at >= now - timedelta(days=settings.WHATSAPP_REPLY_WINDOW_DAYS))
+            .order_by(OutboundMessage.created_at.desc(), OutboundMessage.id.desc())
+        ).first()
+        contact_query = select(Contact).where(Contact.phone.in_(_phone_variants(phone)))
+        if message is not None:
+            contact_query = contact_query.where(Contact.business_id == message.business_id)
+        contact = session.exec(contact_query.order_by(Contact.id)).first()
+        if message is not None or contact is not None:
+            return {
+                "business_id": message.business_id if message is not None else contact.business_id,
+                "invoice_id": message.invoice_id if message is not None else None,
+                "contact_id": contact.id if contact else None,
+                "contact_name": contact.name if contact else None,
+                "reply": True,
+            }
+    if settings.WHATSAPP_DEFAULT_BUSINESS_ID is not None:
+        return {"business_id": settings.WHATSAPP_DEFAULT_BUSINESS_ID, "reply": False}
+    return None
+
+
+def _open_invoice(session: Session, business_id: int, invoice_id: Optional[int]) -> Optional[Invoice]:
+    if invoice_id is None:
+        return None
+    invoice = session.get(Invoice, invoice_id)
+    if invoice is None or invoice.business_id != business_id or invoice.status not in OPEN_INVOICE_STATUSES:
+        return None
+    return invoice
+
+
+def match_confirmation(session: Session, sender: Dict[str, Any], text: str,
+                       amount: Optional[float]) -> Optional[Invoice]:
+    """The open invoice a payment confirmation refers to, or None when it isn't clear."""
+    business_id = sender["business_id"]
+    reference = INVOICE_REFERENCE.search(text)
+    if reference:
+        return _open_invoice(session, business_id, int(reference.group(1)))
+    invoice = _open_invoice(session, business_id, sender.get("invoice_id"))
+    if invoice is not None:
+        return invoice
+    if not sender.get("contact_name"):
+        return None
+    result, _ = match_locally(get_ledger_index(session, business_id),
+                              {"counterparty": sender["contact_name"], "amount": amount})
+    if result is None or result["invoice_match"].get("invoice_id") is None:
+        return None
+    return _open_invoice(session, business_id, result["invoice_match"]["invoice_id"])
+
+
+def _record_confirmation(session: Session, event: RawEvent, sender: Dict[str, Any]) -> str:
+    """Books the confirmed payment; returns the event status ("processed" or "needs_review")."""
+    amount = reply_amount(event.raw_text)
+    invoice = match_confirmation(session, sender, event.raw_text, amount)
+    if not amount:
+        # never assume the full balance: the business confirms what was actually paid
+        event.invoice_id = invoice.id if invoice is not None else None
+        event.error = "no amount in the reply"
+        return "needs_review"
+    direction = "outflow" if invoice is not None and invoice.type == "payable" else "inflow"
+    parsed = {
+        "direction": direction,
+        "amount": amount,
+        "currency": "INR",
+        "method": detect_method(event.raw_text),
+        "counterparty_name": sender.get("contact_name"),
+        "category": "sales" if direction == "inflow" else "other",
+        "invoice": {"has_invoice": False},
+    }
+    tx = save_parsed_transaction(session, event.business_id, parsed, event.raw_text, event.source,
+                                 invoice_id=invoice.id if invoice is not None else None, commit=False)
+    event.transaction_id = tx.id
+    if invoice is not None:
+        event.invoice_id = invoice.id
+        sweep_invoice_statuses(session, invoice_ids=[invoice.id], commit=False)
+    return "processed"
+
+
+def process_inbound_event(session: Session, event: RawEvent):
+    """
+    Classifies and applies one logged message and sets its status, all in
+    one commit: a retry after a failure never finds a half-applied event.
+    """
+    now = datetime.utcnow()
+    sender = resolve_sender(session, event.sender, now)
+    if sender is None:
+        event.status, event.error = "ignored", "unknown sender"
+    else:
+        event.business_id = sender["business_id"]
+        event.status = "processed"
+        if sender["reply"]:
+            event.kind = classify_reply(event.raw_text)
+            if event.kind == "payment_confirmation":
+                event.status = _record_confirmation(session, event, sender)
+        else:
+            tx = parse_and_save_transaction(session, event.business_id, event.raw_text, event.source, commit=False)
+            event.kind = "transaction" if tx is not None else "other"
+            event.transaction_id = tx.id if tx is not None else None
+    event.processed_at = event.updated_at = datetime.utcnow()
+    session.add(event)
+    session.commit()
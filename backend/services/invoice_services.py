@@ -1,5 +1,209 @@
+# backend/services/invoice_services.py
+"""
+Invoice status engine.
+
+An invoice's payments are the transactions linked to it through
+Transaction.invoice_id in its direction (inflows for receivables, outflows
+for payables). Its status follows from amount, payments and due date:
+
+    paid     payments cover the amount
+    overdue  past due_date and not fully paid
+    partial  some payment, not yet due
+    pending  no payment, not yet due
+
+sweep_invoice_statuses() reconciles amount_paid and status for every
+invoice (or a set of businesses) with a handful of UPDATE ... SELECT
+statements; workers/scheduler.py runs it every INVOICE_SWEEP_INTERVAL_SECONDS.
+Statuses outside MANAGED_STATUSES (e.g. "cancelled") are left alone.
+
+Every status change, whether made by the sweep or through the ORM, is
+stored as an InvoiceEvent in the same transaction and handed to the
+listeners registered with @on_invoice_status_change once it commits.
+"""
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, case, event, func, insert, inspect, select, update
+from sqlmodel import Session
+from config import settings
 from models.invoice import Invoice
+from models.invoice_event import InvoiceEvent
+from models.transaction import Transaction
+from services.metrics_services import bump_data_version
+from utils.logger import get_logger
+from workers.jobs import job_queue, register_job
+from workers.scheduler import scheduler
+
+logger = get_logger(__name__)
+
+MANAGED_STATUSES = ("pending", "partial", "paid", "overdue")
+# Statuses that still expect money
+OPEN_INVOICE_STATUSES = ("pending", "partial", "overdue")
+# Rupee rounding: a payment this close to the amount settles the invoice
+PAID_TOLERANCE = 0.01
+
+StatusListener = Callable[[List[Dict[str, Any]]], None]
+STATUS_LISTENERS: List[StatusListener] = []
+
+
+def on_invoice_status_change(fn: StatusListener) -> StatusListener:
+    """Decorator registering fn(events), called after each commit that changed invoice statuses."""
+    STATUS_LISTENERS.append(fn)
+    return fn
+
+
+def derive_status(amount: float, amount_paid: float, due_date: Optional[date], today: date) -> str:
+    if amount_paid >= amount - PAID_TOLERANCE:
+        return "paid"
+    if due_date is not None and due_date < today:
+        return "overdue"
+    return "partial" if amount_paid > 0 else "pending"
+
+
+def status_expression(today: date):
+    """derive_status() as a SQL CASE over the invoice table."""
+    inv = Invoice.__table__
+    return case(
+        (inv.c.amount_paid >= inv.c.amount - PAID_TOLERANCE, "paid"),
+        (and_(inv.c.due_date.is_not(None), inv.c.due_date < today), "overdue"),
+        (inv.c.amount_paid > 0, "partial"),
+        else_="pending",
+    )
+
+
+def payments_expression():
+    """Correlated sum of the payments linked to each invoice row."""
+    inv, tx = Invoice.__table__, Transaction.__table__
+    return (
+        select(func.coalesce(func.sum(tx.c.amount), 0.0))
+        .where(tx.c.invoice_id == inv.c.id,
+               tx.c.direction == case((inv.c.type == "payable", "outflow"), else_="inflow"))
+        .scalar_subquery()
+    )
+
+
+def recompute_invoice_status(invoice: Invoice, today: Optional[date] = None):
+    """Sets the status of an invoice from its amount_paid and due date (managed statuses only)."""
+    if invoice.status not in MANAGED_STATUSES:
+        return
+    invoice.status = derive_status(invoice.amount, invoice.amount_paid or 0.0, invoice.due_date,
+                                   today or date.today())
+
+
+def _event(invoice_id: int, business_id: int, old: Optional[str], new: str, amount_paid: float,
+           at: datetime) -> Dict[str, Any]:
+    return {"invoice_id": invoice_id, "business_id": business_id, "old_status": old,
+            "new_status": new, "amount_paid": amount_paid, "created_at": at}
+
 
-def recompute_invoice_status(invoice: Invoice):
-    # TODO: Implement logic
+def _pending_events(session: Session) -> List[Dict[str, Any]]:
+    return session.info.setdefault("invoice_events", [])
+
+
+def sweep_invoice_statuses(session: Session, today: Optional[date] = None,
+                           business_ids: Optional[Iterable[int]] = None,
+                           invoice_ids: Optional[Iterable[int]] = None, commit: bool = True) -> Dict[str, Any]:
+    """
+    Reconciles amount_paid and status for all invoices (or those of
+    business_ids / invoice_ids) in one transaction and commits, unless
+    commit=False leaves that to the caller. Returns counts.
+    """
+    today = today or date.today()
+    now = datetime.utcnow()
+    inv = Invoice.__table__
+    conn = session.connection()
+    scope = []
+    if business_ids is not None:
+        scope.append(inv.c.business_id.in_(sorted(set(business_ids))))
+    if invoice_ids is not None:
+        scope.append(inv.c.id.in_(sorted(set(invoice_ids))))
+
+    paid = payments_expression()
+    drifted = and_(func.abs(inv.c.amount_paid - paid) > PAID_TOLERANCE / 2, *scope)
+    reconciled = set(conn.execute(select(inv.c.business_id).distinct().where(drifted)).scalars())
+    payments_updated = 0
+    if reconciled:
+        payments_updated = conn.execute(update(inv).where(drifted).values(amount_paid=paid)).rowcount
+
+    derived = status_expression(today)
+    changed = and_(inv.c.status.in_(MANAGED_STATUSES), inv.c.status != derived, *scope)
+    events = [
+        _event(invoice_id, business_id, old, new, amount_paid, now)
+        for invoice_id, business_id, old, new, amount_paid in conn.execute(
+            select(inv.c.id, inv.c.business_id, inv.c.status, derived, inv.c.amount_paid).where(changed)
+        )
+    ]
+    if events:
+        conn.execute(insert(InvoiceEvent.__table__), events)
+        conn.execute(update(inv).where(changed).values(status=derived, status_changed_at=now))
+
+    bump_data_version(conn, reconciled | {e["business_id"] for e in events})
+    _pending_events(session).extend(events)
+    if commit:
+        session.commit()
+
+    by_status: Dict[str, int] = {}
+    for e in events:
+        by_status[e["new_status"]] = by_status.get(e["new_status"], 0) + 1
+    return {"as_of": today.isoformat(), "payments_updated": payments_updated,
+            "status_changes": len(events), "by_status": by_status,
+            "businesses": len(reconciled | {e["business_id"] for e in events})}
+
+
+@event.listens_for(Invoice.status, "set", active_history=True)
+def _load_old_status(target, value, oldvalue, initiator):
+    # active_history loads the persisted status before an expired attribute
+    # (an invoice edited after a commit) is overwritten, so the history read
+    # below always holds the old status.
     pass
+
+
+@event.listens_for(Session, "before_flush")
+def _record_orm_status_changes(session: Session, flush_context, instances):
+    now = datetime.utcnow()
+    for obj in list(session.dirty):
+        if not isinstance(obj, Invoice):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.has_changes() or not history.deleted or history.deleted[0] == obj.status:
+            continue
+        obj.status_changed_at = now
+        change = _event(obj.id, obj.business_id, history.deleted[0], obj.status, obj.amount_paid or 0.0, now)
+        session.add(InvoiceEvent(**change))
+        _pending_events(session).append(change)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_listeners(session: Session):
+    events = session.info.pop("invoice_events", None)
+    if not events:
+        return
+    for listener in STATUS_LISTENERS:
+        try:
+            listener(events)
+        except Exception as e:
+            logger.error(f"Invoice status listener {getattr(listener, '__name__', listener)} failed: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_events(session: Session):
+    session.info.pop("invoice_events", None)
+
+
+@on_invoice_status_change
+def _log_status_changes(events: List[Dict[str, Any]]):
+    counts: Dict[str, int] = {}
+    for e in events:
+        counts[e["new_status"]] = counts.get(e["new_status"], 0) + 1
+    logger.info(f"{len(events)} invoice status changes: {counts}")
+
+
+@register_job("invoice_status_sweep")
+async def invoice_status_sweep_job(payload: dict, db: Session) -> dict:
+    return await run_in_threadpool(sweep_invoice_statuses, db, None, payload.get("business_ids"))
+
+
+@scheduler.every(lambda: settings.INVOICE_SWEEP_INTERVAL_SECONDS, name="invoice_status_sweep")
+async def schedule_invoice_sweep():
+    # through the job table, so several API processes don't sweep at the same time
+    await job_queue.submit("invoice_status_sweep", {}, dedupe_on={})
@@ -0,0 +1,227 @@
+# backend/services/matching_services.py
+"""
+Per-business ledger index for matching a transaction to a contact and an
+open invoice without sending the whole ledger to the LLM.
+
+Contacts are indexed by normalised name (exact lookup) and by character
+trigrams (candidate generation), candidates are re-ranked with a
+Jaro-Winkler / trigram-Dice blend. Open invoices are kept sorted by amount for range lookups
+and ranked by amount, due-date distance and contact agreement.
+Confident results resolve locally; ambiguous ones go to the
+ledger_match agent with only the top-k candidates.
+
+Indexes are cached per business and rebuilt when the business's data
+version (services.metrics_services) changes.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict, defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlmodel import Session, select
+from config import settings
+from agents.enrichment_agent import amatch_ledger_entry
+from models.contact import Contact
+from models.invoice import Invoice
+from services.invoice_services import OPEN_INVOICE_STATUSES
+from services.metrics_services import get_data_version
+from utils.datetime import parse_date
+from utils.matching import name_similarity, normalize_name, trigrams
+
+# Trigrams shared by more than this share of contacts are skipped during candidate generation
+COMMON_TRIGRAM_SHARE = 0.05
+MAX_CANDIDATES = 200
+
+
+class LedgerIndex:
+
+    def __init__(self, contacts: Iterable[Dict[str, Any]], invoices: Iterable[Dict[str, Any]]):
+        self.contacts: List[Dict[str, Any]] = []
+        self._normalized: List[str] = []
+        self._exact: Dict[str, List[int]] = defaultdict(list)
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for contact in contacts:
+            pos = len(self.contacts)
+            normalized = normalize_name(contact.get("name") or "")
+            self.contacts.append(contact)
+            self._normalized.append(normalized)
+            self._exact[normalized].append(pos)
+            for gram in trigrams(normalized):
+                self._postings[gram].append(pos)
+        self._common_cutoff = max(int(len(self.contacts) * COMMON_TRIGRAM_SHARE), 50)
+
+        self.invoices = sorted((dict(inv) for inv in invoices), key=lambda inv: float(inv.get("amount") or 0.0))
+        self._amounts = [float(inv.get("amount") or 0.0) for inv in self.invoices]
+
+    @classmethod
+    def from_session(cls, session: Session, business_id: int) -> "LedgerIndex":
+        contacts = session.exec(
+            select(Contact.id, Contact.name, Contact.phone).where(Contact.business_id == business_id)
+        ).all()
+        invoices = session.exec(
+            select(Invoice.id, Invoice.contact_id, Invoice.amount - Invoice.amount_paid, Invoice.type,
+                   Invoice.due_date, Invoice.status)
+            .where(Invoice.business_id == business_id, Invoice.status.in_(OPEN_INVOICE_STATUSES))
+        ).all()
+        return cls(
+            [{"id": c_id, "name": name, "phone": phone} for c_id, name, phone in contacts],
+            [
+                {"id": i_id, "contact_id": contact_id, "amount": amount, "type": kind,
+                 "due_date": due.isoformat() if due else None, "status": status}
+                for i_id, contact_id, amount, kind, due, status in invoices
+            ],
+        )
+
+    def search_contacts(self, name: str, k: int = 5) -> List[Tuple[float, Dict[str, Any]]]:
+        """Top-k (score, contact) pairs; score 1.0 means the normalised names are equal."""
+        normalized = normalize_name(name)
+        if not normalized or not self.contacts:
+            return []
+        exact = [(1.0, self.contacts[pos]) for pos in self._exact.get(normalized, [])]
+        if exact:
+            return exact[:k]
+
+        grams = trigrams(normalized)
+        rare = [g for g in grams if len(self._postings.get(g, ())) <= self._common_cutoff]
+        counts: Counter = Counter()
+        for gram in (rare or grams):
+            counts.update(self._postings.get(gram, ()))
+        scored = [
+            (round(name_similarity(normalized, self._normalized[pos]), 4), pos)
+            for pos, _ in counts.most_common(MAX_CANDIDATES)
+        ]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(score, self.contacts[pos]) for score, pos in scored[:k]]
+
+    def search_invoices(self, amount: Optional[float], when: Optional[date] = None,
+                        contact_ids: Iterable[int] = (), k: int = 5) -> List[Tuple[float, Dict[str, Any]]]:
+        """Open invoices within settings.MATCH_AMOUNT_TOLERANCE of `amount`, best first."""
+        if amount is None or not self.invoices:
+            return []
+        amount = float(amount)
+        tolerance = max(abs(amount) * settings.MATCH_AMOUNT_TOLERANCE, 1.0)
+        lo = bisect_left(self._amounts, amount - tolerance)
+        hi = bisect_right(self._amounts, amount + tolerance)
+        contact_ids = set(contact_ids)
+        scored = []
+        for inv in self.invoices[lo:hi]:
+            score = 1.0 - abs(float(inv["amount"]) - amount) / tolerance * 0.3
+            if contact_ids:
+                score += 0.3 if inv.get("contact_id") in contact_ids else -0.3
+            due = parse_date(inv.get("due_date"))
+            if when is not None and due is not None:
+                score -= min(abs((due.date() - when).days), 90) / 90 * 0.2
+            scored.append((round(score, 4), inv))
+        scored.sort(key=lambda item: -item[0])
+        return scored[:k]
+
+
+_index_cache: "OrderedDict[int, Tuple[int, LedgerIndex]]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def get_ledger_index(session: Session, business_id: int) -> LedgerIndex:
+    version = get_data_version(session, business_id)
+    with _index_lock:
+        cached = _index_cache.get(business_id)
+        if cached is not None and cached[0] == version:
+            _index_cache.move_to_end(business_id)
+            return cached[1]
+    index = LedgerIndex.from_session(session, business_id)
+    with _index_lock:
+        _index_cache[business_id] = (version, index)
+        _index_cache.move_to_end(business_id)
+        while len(_index_cache) > settings.MATCH_INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def index_from_snapshot(snapshot: Dict[str, Any]) -> Optional[LedgerIndex]:
+    """Index over a client-supplied ledger_context ({"contacts": [...], "invoices": [...]}), if it has that shape."""
+    contacts, invoices = snapshot.get("contacts"), snapshot.get("invoices", [])
+    if not isinstance(contacts, list) or not isinstance(invoices, list):
+        return None
+    if not all(isinstance(c, dict) and "name" in c for c in contacts):
+        return None
+    open_invoices = [i for i in invoices if isinstance(i, dict) and "amount" in i
+                     and i.get("status", "pending") in OPEN_INVOICE_STATUSES]
+    return LedgerIndex(contacts, open_invoices)
+
+
+def _counterparty(transaction: Dict[str, Any]) -> str:
+    return str(transaction.get("counterparty") or transaction.get("counterparty_name") or "")
+
+
+def _amount(transaction: Dict[str, Any]) -> Optional[float]:
+    try:
+        return float(transaction.get("amount"))
+    except (TypeError, ValueError):
+        return None
+
+
+def match_locally(index: LedgerIndex, transaction: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    (result, candidates). `result` has the ledger_match agent's output shape
+    when the index is confident, otherwise None; `candidates` is the compact
+    top-k snapshot to send to the agent instead of the full ledger.
+    """
+    k = settings.MATCH_TOP_K
+    contacts = index.search_contacts(_counterparty(transaction), k) if _counterparty(transaction) else []
+    when = parse_date(transaction.get("date"))
+    when = when.date() if when else None
+
+    contact_match, contact_ids = None, []
+    top = contacts[0][0] if contacts else 0.0
+    runner_up = contacts[1][0] if len(contacts) > 1 else 0.0
+    if not _counterparty(transaction):
+        contact_match = {"contact_id": None, "match_type": "new", "confidence": 0.5}
+    elif top == 1.0 and runner_up < 1.0:
+        contact_match = {"contact_id": contacts[0][1]["id"], "match_type": "exact", "confidence": 1.0}
+    elif top >= settings.MATCH_AUTO_ACCEPT and top - runner_up >= 0.03:
+        contact_match = {"contact_id": contacts[0][1]["id"], "match_type": "fuzzy", "confidence": top}
+    elif top < settings.MATCH_MIN_SCORE:
+        contact_match = {"contact_id": None, "match_type": "new", "confidence": round(1.0 - top, 4)}
+    if contact_match and contact_match["contact_id"] is not None:
+        contact_ids = [contact_match["contact_id"]]
+    elif contact_match is None:
+        contact_ids = [c["id"] for _, c in contacts]
+
+    invoices = index.search_invoices(_amount(transaction), when, contact_ids, k)
+    invoice_match = None
+    if not invoices:
+        invoice_match = {"invoice_id": None, "match_type": "none"}
+    elif contact_match and contact_match["contact_id"] is not None:
+        same_contact = [inv for _, inv in invoices if inv.get("contact_id") == contact_match["contact_id"]]
+        exact_amount = [inv for inv in same_contact if abs(float(inv["amount"]) - (_amount(transaction) or 0)) < 0.01]
+        if len(exact_amount) == 1:
+            invoice_match = {"invoice_id": exact_amount[0]["id"], "match_type": "exact"}
+        elif not same_contact:
+            invoice_match = {"invoice_id": None, "match_type": "none"}
+
+    candidates = {
+        "contacts": [dict(c, score=s) for s, c in contacts],
+        "invoices": [dict(i, score=s) for s, i in invoices],
+    }
+    if contact_match is None or invoice_match is None:
+        return None, candidates
+    return {"contact_match": contact_match, "invoice_match": invoice_match}, candidates
+
+
+async def amatch_transaction(transaction: Dict[str, Any], index: LedgerIndex) -> Dict[str, Any]:
+    """Local match when confident, otherwise the LLM over the top-k candidates."""
+    result, candidates = match_locally(index, transaction)
+    if result is not None:
+        return dict(result, resolved_by="index")
+    llm_result = await amatch_ledger_entry(transaction, candidates)
+    if isinstance(llm_result, dict) and "error" not in llm_result:
+        return dict(llm_result, resolved_by="llm")
+    # LLM unavailable: best local guess, flagged as low confidence
+    best = candidates["contacts"][0] if candidates["contacts"] else None
+    return {
+        "contact_match": {"contact_id": best["id"] if best else None,
+                          "match_type": "fuzzy" if best else "new",
+                          "confidence": best["score"] if best else 0.0},
+        "invoice_match": {"invoice_id": candidates["invoices"][0]["id"] if candidates["invoices"] else None,
+                          "match_type": "fuzzy" if candidates["invoices"] else "none"},
+        "resolved_by": "index_fallback",
+    }
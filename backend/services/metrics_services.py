@@ -0,0 +1,118 @@
+# backend/services/metrics_services.py
+"""
+Per-business metrics snapshot with change-driven invalidation.
+
+Every write to a Business, Contact, Transaction or Invoice bumps the business's
+data_version in `metrics_snapshot` (after_flush hook below, same DB
+transaction). get_business_metrics serves the stored payload while its
+snapshot_version matches, and recomputes it otherwise. Bulk Core inserts
+bypass the hook and must call bump_data_version themselves.
+"""
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Set, Tuple
+from sqlalchemy import event, inspect, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+from models.business import Business
+from models.contact import Contact
+from models.invoice import Invoice
+from models.metrics_snapshot import MetricsSnapshot
+from models.transaction import Transaction
+from services.pitchdeck_service import compute_business_metrics
+
+VERSIONED_MODELS = (Business, Contact, Transaction, Invoice)
+
+
+def bump_data_version(conn: Connection, business_ids: Iterable[int]):
+    """Increments data_version for each business (creating its row if needed)."""
+    table = MetricsSnapshot.__table__
+    dialect = conn.dialect.name
+    for business_id in sorted(set(b for b in business_ids if b is not None)):
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).values(business_id=business_id, data_version=1)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=["business_id"],
+                set_={"data_version": table.c.data_version + 1},
+            ))
+        else:
+            result = conn.execute(
+                update(table).where(table.c.business_id == business_id)
+                .values(data_version=table.c.data_version + 1)
+            )
+            if result.rowcount == 0:
+                conn.execute(table.insert().values(business_id=business_id, data_version=1))
+
+
+def _business_ids_of(obj) -> Set[int]:
+    if isinstance(obj, Business):
+        return {obj.id}
+    ids = {obj.business_id}
+    history = inspect(obj).attrs.business_id.history
+    ids.update(history.deleted or ())
+    return ids
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_write(session: Session, flush_context):
+    touched: Set[int] = set()
+    for obj in session.new:
+        if isinstance(obj, VERSIONED_MODELS):
+            touched |= _business_ids_of(obj)
+    for obj in session.deleted:
+        if isinstance(obj, (Contact, Transaction, Invoice)):
+            touched |= _business_ids_of(obj)
+    for obj in session.dirty:
+        if isinstance(obj, VERSIONED_MODELS) and session.is_modified(obj):
+            touched |= _business_ids_of(obj)
+    if touched:
+        bump_data_version(session.connection(), touched)
+
+
+def get_data_version(session: Session, business_id: int) -> int:
+    version = session.exec(
+        select(MetricsSnapshot.data_version).where(MetricsSnapshot.business_id == business_id)
+    ).first()
+    return version or 0
+
+
+def get_business_metrics(session: Session, business_id: int) -> Tuple[Dict, int]:
+    """
+    (metrics, data_version) for a business, from the snapshot when it is
+    current. Raises ValueError for unknown businesses, like compute_business_metrics.
+    On a read-only (replica) session a stale snapshot is recomputed but not stored.
+    """
+    snapshot = session.get(MetricsSnapshot, business_id)
+    if snapshot is not None and snapshot.payload and snapshot.snapshot_version == snapshot.data_version:
+        return json.loads(snapshot.payload), snapshot.data_version
+
+    version = snapshot.data_version if snapshot is not None else 0
+    metrics = compute_business_metrics(session, business_id)
+    payload = json.dumps(metrics, default=str)
+    if session.info.get("read_only"):
+        return json.loads(payload), version
+    try:
+        if snapshot is None:
+            session.add(MetricsSnapshot(business_id=business_id, data_version=0, snapshot_version=0,
+                                        payload=payload, computed_at=datetime.utcnow()))
+        else:
+            # Only store it if no write landed while computing
+            session.execute(
+                update(MetricsSnapshot)
+                .where(MetricsSnapshot.business_id == business_id, MetricsSnapshot.data_version == version)
+                .values(snapshot_version=version, payload=payload, computed_at=datetime.utcnow())
+            )
+        session.commit()
+    except IntegrityError:
+        # another request created the row first; it will be refreshed on the next read
+        session.rollback()
+    return json.loads(payload), version
+
+
+def metrics_etag(business_id: int, version: int) -> str:
+    return f'"metrics-{business_id}-{version}"'
@@ -0,0 +1,144 @@
+# backend/services/narrative_services.py
+"""
+Narrative store: LLM prose per (business, agent), reused while the inputs
+have not meaningfully changed.
+
+Inputs are fingerprinted after bucketing: amounts below
+NARRATIVE_AMOUNT_STEP round to that step, larger amounts fall into
+NARRATIVE_RELATIVE_STEP-wide log buckets, and "*percent*" values round to
+NARRATIVE_PERCENT_STEP points. When the fingerprint drifts (or the stored
+text is an agent fallback, or older than NARRATIVE_MAX_AGE_HOURS) the old
+narrative is still served and a "narrative_refresh" job regenerates it off
+the request path.
+"""
+import hashlib
+import json
+import math
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from config import settings
+from models.narrative import Narrative
+from agents.forecast_agent import aexplain_forecast
+from agents.insight_agent import agenerate_insights
+from agents.pitchdeck_agent import agenerate_pitchdeck_outline
+from agents.report_agent import agenerate_financial_report
+from agents.risk_agent import aexplain_risk_scores
+from utils.logger import get_logger
+from workers.jobs import job_queue, register_job
+
+logger = get_logger(__name__)
+
+NarrativeGenerator = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+NARRATIVE_AGENTS: Dict[str, NarrativeGenerator] = {
+    "insight": agenerate_insights,
+    "forecast": aexplain_forecast,
+    "pitchdeck": agenerate_pitchdeck_outline,
+    "report": agenerate_financial_report,
+    "risk": aexplain_risk_scores,
+}
+
+
+def bucket_value(value: Any, key: str = "") -> Any:
+    """Rounds numbers (recursively) to the configured tolerances; other values pass through."""
+    if isinstance(value, dict):
+        return {k: bucket_value(v, str(k)) for k, v in value.items() if k not in settings.NARRATIVE_IGNORE_KEYS}
+    if isinstance(value, (list, tuple)):
+        return [bucket_value(v, key) for v in value]
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if math.isnan(value) or math.isinf(value):
+        return None
+    if "percent" in key:
+        step = settings.NARRATIVE_PERCENT_STEP
+        return round(value / step) * step
+    if abs(value) < settings.NARRATIVE_AMOUNT_STEP:
+        return round(value / settings.NARRATIVE_AMOUNT_STEP) * settings.NARRATIVE_AMOUNT_STEP
+    bucket = round(math.log(abs(value)) / math.log1p(settings.NARRATIVE_RELATIVE_STEP))
+    return f"{'-' if value < 0 else ''}r{bucket}"
+
+
+def fingerprint(inputs: Dict[str, Any]) -> str:
+    body = json.dumps(bucket_value(inputs), sort_keys=True, default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def _is_fallback(content: Dict[str, Any]) -> bool:
+    return bool(content.get("fallback"))
+
+
+def _is_fresh(row: Narrative, fp: str) -> bool:
+    max_age = timedelta(hours=settings.NARRATIVE_MAX_AGE_HOURS)
+    return row.fingerprint == fp and not row.is_fallback and row.updated_at >= datetime.utcnow() - max_age
+
+
+def load_narrative(session: Session, business_id: int, agent: str) -> Optional[Narrative]:
+    return session.exec(
+        select(Narrative).where(Narrative.business_id == business_id, Narrative.agent == agent)
+    ).first()
+
+
+def save_narrative(session: Session, business_id: int, agent: str, fp: str, content: Dict[str, Any]) -> bool:
+    """Upserts the narrative. Error results are never stored; returns whether anything was written."""
+    if not isinstance(content, dict) or "error" in content:
+        return False
+    row = load_narrative(session, business_id, agent)
+    if row is not None and not row.is_fallback and _is_fallback(content) and row.fingerprint == fp:
+        return False # keep real prose over a mock for the same inputs
+    now = datetime.utcnow()
+    if row is None:
+        row = Narrative(business_id=business_id, agent=agent, created_at=now, fingerprint=fp, content="")
+    row.fingerprint = fp
+    row.content = json.dumps(content, default=str)
+    row.is_fallback = _is_fallback(content)
+    row.updated_at = now
+    session.add(row)
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback() # a concurrent writer stored it first
+        return False
+    return True
+
+
+async def cached_narrative(session: Session, business_id: int, agent: str,
+                           inputs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The agent's output for `inputs`, served from the store when possible.
+    Only the very first call for a (business, agent) waits for the LLM.
+    """
+    fp = fingerprint(inputs)
+    row = await run_in_threadpool(load_narrative, session, business_id, agent)
+    if row is not None:
+        if not _is_fresh(row, fp):
+            await request_refresh(business_id, agent, inputs)
+        return json.loads(row.content)
+
+    content = await NARRATIVE_AGENTS[agent](inputs)
+    await run_in_threadpool(save_narrative, session, business_id, agent, fp, content)
+    return content
+
+
+async def request_refresh(business_id: int, agent: str, inputs: Dict[str, Any]):
+    try:
+        await job_queue.submit(
+            "narrative_refresh",
+            {"business_id": business_id, "agent": agent, "inputs": inputs},
+            dedupe_on={"business_id": business_id, "agent": agent},
+        )
+    except Exception as e:
+        logger.warning(f"Could not queue narrative refresh for business {business_id}/{agent}: {e}")
+
+
+@register_job("narrative_refresh")
+async def refresh_narrative(payload: Dict[str, Any], session: Session) -> Dict[str, Any]:
+    business_id, agent, inputs = payload["business_id"], payload["agent"], payload["inputs"]
+    fp = fingerprint(inputs)
+    row = await run_in_threadpool(load_narrative, session, business_id, agent)
+    if row is not None and _is_fresh(row, fp):
+        return {"refreshed": False}
+    content = await NARRATIVE_AGENTS[agent](inputs)
+    saved = await run_in_threadpool(save_narrative, session, business_id, agent, fp, content)
+    return {"refreshed": saved, "fallback": _is_fallback(content) if isinstance(content, dict) else False}
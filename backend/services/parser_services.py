@@ -1,47 +1,69 @@
-from sqlmodel import Session
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import insert
+from sqlmodel import Session, select
 from models.transaction import Transaction
 from models.invoice import Invoice
 from models.contact import Contact
 from services.invoice_services import recompute_invoice_status
+from services.metrics_services import bump_data_version
+from services.rollup_services import apply_transaction_rows
 from agents.parser_agent import parse_transaction_with_ai
+from utils.datetime import parse_iso_date
 
-def parse_and_save_transaction(session: Session, business_id: int, raw_text: str, source: str):
+def parse_and_save_transaction(session: Session, business_id: int, raw_text: str, source: str,
+                               commit: bool = True) -> Optional[Transaction]:
+    """Parses and saves one message; None when it could not be parsed (nothing is saved)."""
     parsed = parse_transaction_with_ai(raw_text)
+    if "parsing_error" in parsed:
+        return None
+    return save_parsed_transaction(session, business_id, parsed, raw_text, source, commit=commit)
 
+def _save(session: Session, obj, commit: bool):
+    session.add(obj)
+    if commit:
+        session.commit()
+        session.refresh(obj)
+    else:
+        session.flush()
+
+def save_parsed_transaction(session: Session, business_id: int, parsed: Dict[str, Any], raw_text: str, source: str,
+                            invoice_id: Optional[int] = None, commit: bool = True):
+    """
+    Saves one parsed transaction; `invoice_id` links it to an existing invoice instead of a parsed one.
+    With commit=False everything is only flushed and left to the caller's commit.
+    """
     # Contact
     name = parsed.get("counterparty_name")
     contact = None
     if name:
-        from sqlmodel import select
         contact = session.exec(
             select(Contact).where(Contact.business_id == business_id, Contact.name == name)
         ).first()
         if not contact:
             contact = Contact(business_id=business_id, name=name)
-            session.add(contact)
-            session.commit()
-            session.refresh(contact)
+            _save(session, contact, commit)
 
-    # Invoice if present
+    # Invoice if present. The message's own transaction only pays it when the
+    # parser saw a payment; otherwise the invoice stays open for later payments.
     invoice_obj = None
-    inv = parsed.get("invoice", {})
-    if inv.get("has_invoice"):
+    inv = parsed.get("invoice") or {}
+    if inv.get("has_invoice") and invoice_id is None:
         invoice_obj = Invoice(
             business_id=business_id,
             contact_id=contact.id if contact else None,
             amount=parsed["amount"],
             type="receivable" if parsed["direction"] == "inflow" else "payable",
-            due_date=inv.get("due_date"),
+            amount_paid=parsed["amount"] if inv.get("is_paid") else 0.0,
+            due_date=parse_iso_date(inv.get("due_date")),
         )
         recompute_invoice_status(invoice_obj)
-        session.add(invoice_obj)
-        session.commit()
-        session.refresh(invoice_obj)
+        _save(session, invoice_obj, commit)
 
     # Transaction
     tx = Transaction(
         business_id=business_id,
-        invoice_id=invoice_obj.id if invoice_obj else None,
+        invoice_id=invoice_obj.id if invoice_obj and inv.get("is_paid") else invoice_id,
         direction=parsed["direction"],
         amount=parsed["amount"],
         method=parsed.get("method", "other"),
@@ -49,7 +71,99 @@ def parse_and_save_transaction(session: Session, business_id: int, raw_text: str
         raw_text=raw_text,
         source=source,
     )
-    session.add(tx)
-    session.commit()
-    session.refresh(tx)
+    _save(session, tx, commit)
     return tx
+
+
+# Names per IN (...) lookup; stays under SQLite's bound-parameter limit.
+CONTACT_LOOKUP_CHUNK = 500
+
+
+def _resolve_contacts(session: Session, business_id: int, names: Sequence[str]) -> Dict[str, int]:
+    """name -> contact id for the business, creating the missing contacts in one INSERT."""
+    wanted = list(dict.fromkeys(n for n in names if n))
+    ids: Dict[str, int] = {}
+    for i in range(0, len(wanted), CONTACT_LOOKUP_CHUNK):
+        chunk = wanted[i:i + CONTACT_LOOKUP_CHUNK]
+        rows = session.exec(
+            select(Contact.name, Contact.id)
+            .where(Contact.business_id == business_id, Contact.name.in_(chunk))
+            .order_by(Contact.id)
+        ).all()
+        for name, contact_id in rows:
+            ids.setdefault(name, contact_id)
+
+    missing = [n for n in wanted if n not in ids]
+    if missing:
+        created = session.execute(
+            insert(Contact).returning(Contact.id, Contact.name, sort_by_parameter_order=True),
+            [{"business_id": business_id, "name": n, "type": "customer"} for n in missing],
+        ).all()
+        ids.update({name: contact_id for contact_id, name in created})
+    return ids
+
+
+def save_parsed_transactions_bulk(session: Session, business_id: int,
+                                  items: Sequence[Tuple[Dict[str, Any], str]],
+                                  source: str) -> List[int]:
+    """
+    Bulk counterpart of save_parsed_transaction for (parsed, raw_text) pairs.
+
+    Contacts are resolved with one query per batch, invoices and transactions
+    are inserted with executemany, and everything is committed once. Returns
+    the new transaction ids in input order.
+    """
+    if not items:
+        return []
+
+    contact_ids = _resolve_contacts(session, business_id, [p.get("counterparty_name") for p, _ in items])
+
+    invoice_rows, invoice_positions = [], []
+    for pos, (parsed, _) in enumerate(items):
+        inv = parsed.get("invoice") or {}
+        if not inv.get("has_invoice"):
+            continue
+        invoice = Invoice(
+            business_id=business_id,
+            contact_id=contact_ids.get(parsed.get("counterparty_name")),
+            amount=parsed["amount"],
+            type="receivable" if parsed["direction"] == "inflow" else "payable",
+            amount_paid=parsed["amount"] if inv.get("is_paid") else 0.0,
+            due_date=parse_iso_date(inv.get("due_date")),
+        )
+        recompute_invoice_status(invoice)
+        invoice_rows.append(invoice.model_dump(exclude={"id"}))
+        invoice_positions.append(pos)
+
+    invoice_ids: Dict[int, Optional[int]] = {}
+    if invoice_rows:
+        created = session.execute(
+            insert(Invoice).returning(Invoice.id, sort_by_parameter_order=True), invoice_rows
+        ).scalars().all()
+        # as in save_parsed_transaction: linked only when the message records the payment
+        invoice_ids = {pos: invoice_id for pos, invoice_id in zip(invoice_positions, created)
+                       if items[pos][0]["invoice"].get("is_paid")}
+
+    now = datetime.utcnow()
+    tx_rows = [
+        {
+            "business_id": business_id,
+            "invoice_id": invoice_ids.get(pos),
+            "direction": parsed["direction"],
+            "amount": parsed["amount"],
+            "method": parsed.get("method", "other"),
+            "category": parsed.get("category", "other"),
+            "date": now,
+            "raw_text": raw_text,
+            "source": source,
+        }
+        for pos, (parsed, raw_text) in enumerate(items)
+    ]
+    tx_ids = session.execute(
+        insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True), tx_rows
+    ).scalars().all()
+    # Core inserts skip the after_flush rollup and data-version hooks
+    apply_transaction_rows(session.connection(), tx_rows)
+    bump_data_version(session.connection(), [business_id])
+    session.commit()
+    return list(tx_ids)
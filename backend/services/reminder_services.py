@@ -0,0 +1,149 @@
+# backend/services/reminder_services.py
+"""
+Overdue-reminder campaigns: every overdue or soon-due receivable of a
+business, read in one Invoice x Contact query, turned into WhatsApp
+reminders and handed to the outbound message queue.
+
+Standard tones (REMINDER_TEMPLATE_TONES) use the local template; custom
+tones go to the LLM in groups of REMINDER_LLM_BATCH_SIZE. Reminders are
+keyed per invoice per day, so re-running a campaign never generates or
+sends the same reminder twice.
+"""
+import asyncio
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session, select
+from config import settings
+from agents.reminder_agent import _fallback_template, agenerate_payment_reminders_batch
+from models.business import Business
+from models.contact import Contact
+from models.invoice import Invoice
+from services.invoice_services import OPEN_INVOICE_STATUSES
+from workers.messaging import make_idempotency_key, message_queue
+
+
+def invoice_number(invoice_id: int) -> str:
+    return f"INV-{invoice_id}"
+
+
+def reminder_idempotency_key(business_id: int, number: str, day: Optional[date] = None) -> str:
+    """One reminder per invoice per day, shared by the single and campaign endpoints."""
+    return make_idempotency_key("reminder", business_id, number, (day or date.today()).isoformat())
+
+
+def business_name(session: Session, business_id: int) -> str:
+    business = session.get(Business, business_id)
+    if business is None:
+        raise ValueError("Business not found")
+    return business.name
+
+
+def reminder_targets(session: Session, business_id: int, today: date,
+                     due_within_days: int) -> List[Dict[str, Any]]:
+    """
+    Open receivables due on or before today + due_within_days, oldest first,
+    with the unpaid amount, the contact's name and phone (None when missing)
+    and days_overdue (negative when not yet due).
+    """
+    rows = session.exec(
+        select(Invoice.id, Invoice.amount - Invoice.amount_paid, Invoice.due_date, Contact.id, Contact.name, Contact.phone)
+        .join(Contact, Contact.id == Invoice.contact_id, isouter=True)
+        .where(Invoice.business_id == business_id,
+               Invoice.type == "receivable",
+               Invoice.status.in_(OPEN_INVOICE_STATUSES),
+               Invoice.due_date.is_not(None),
+               Invoice.due_date <= today + timedelta(days=due_within_days))
+        .order_by(Invoice.due_date, Invoice.id)
+    ).all()
+    return [
+        {"invoice_id": invoice_id, "amount": amount, "due_date": due, "contact_id": contact_id,
+         "customer_name": name, "phone": phone, "days_overdue": (today - due).days}
+        for invoice_id, amount, due, contact_id, name, phone in rows
+    ]
+
+
+async def _generate(contexts: List[Dict[str, Any]], stats: Dict[str, int]) -> List[Dict[str, Any]]:
+    results: List[Optional[Dict[str, Any]]] = [None] * len(contexts)
+    custom = []
+    for pos, context in enumerate(contexts):
+        if context["preferred_tone"] in settings.REMINDER_TEMPLATE_TONES:
+            results[pos] = _fallback_template(context)
+            stats["template"] += 1
+        else:
+            custom.append(pos)
+
+    size = max(settings.REMINDER_LLM_BATCH_SIZE, 1)
+    groups = [custom[i:i + size] for i in range(0, len(custom), size)]
+    stats["llm_calls"] += len(groups)
+    for group, messages in zip(groups, await asyncio.gather(
+            *[agenerate_payment_reminders_batch([contexts[p] for p in g]) for g in groups])):
+        for pos, message in zip(group, messages):
+            results[pos] = message
+            stats["fallback" if message.get("fallback") else "llm"] += 1
+    return results
+
+
+async def run_reminder_campaign(session: Session, business_id: int, tone: str = "friendly",
+                                language: Optional[str] = None, due_within_days: Optional[int] = None,
+                                dry_run: bool = False, today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Queues reminders for the business's overdue and soon-due receivables.
+    With dry_run the messages are generated and returned but not queued.
+    Raises ValueError for unknown businesses.
+    """
+    today = today or date.today()
+    language = language or settings.REMINDER_LANGUAGE
+    if due_within_days is None:
+        due_within_days = settings.REMINDER_DUE_WITHIN_DAYS
+    name = await run_in_threadpool(business_name, session, business_id)
+    targets = await run_in_threadpool(reminder_targets, session, business_id, today, due_within_days)
+
+    stats = {"invoices": len(targets), "queued": 0, "already_queued": 0, "skipped_no_phone": 0,
+             "template": 0, "llm": 0, "fallback": 0, "llm_calls": 0}
+    reminders = []
+    chunk_size = max(settings.REMINDER_CAMPAIGN_CHUNK, 1)
+    for offset in range(0, len(targets), chunk_size):
+        chunk = []
+        for target in targets[offset:offset + chunk_size]:
+            if not target["phone"]:
+                stats["skipped_no_phone"] += 1
+                continue
+            target["number"] = invoice_number(target["invoice_id"])
+            target["key"] = reminder_idempotency_key(business_id, target["number"], today)
+            chunk.append(target)
+
+        # don't spend generation on reminders already queued today
+        existing = await run_in_threadpool(message_queue.existing_keys, [t["key"] for t in chunk])
+        stats["already_queued"] += sum(1 for t in chunk if t["key"] in existing)
+        chunk = [t for t in chunk if t["key"] not in existing]
+        contexts = [{
+            "business_name": name,
+            "customer_name": t["customer_name"] or "Customer",
+            "invoice_number": t["number"],
+            "amount_due": t["amount"],
+            "due_date": t["due_date"].isoformat(),
+            "days_overdue": t["days_overdue"],
+            "preferred_tone": tone,
+            "preferred_language": language,
+        } for t in chunk]
+        messages = await _generate(contexts, stats)
+
+        queued = [] if dry_run else await message_queue.submit_many([
+            {"business_id": business_id, "invoice_id": t["invoice_id"], "to": t["phone"],
+             "body": m["message"], "idempotency_key": t["key"]}
+            for t, m in zip(chunk, messages)
+        ])
+        stats["queued"] += sum(1 for _, created in queued if created)
+        stats["already_queued"] += sum(1 for _, created in queued if not created)
+        for pos, (target, message) in enumerate(zip(chunk, messages)):
+            reminders.append({
+                "invoice_id": target["invoice_id"],
+                "contact_id": target["contact_id"],
+                "days_overdue": target["days_overdue"],
+                "message": message["message"],
+                "message_id": queued[pos][0].id if queued else None,
+            })
+
+    return {"business_id": business_id, "as_of": today.isoformat(), "dry_run": dry_run,
+            "stats": stats, "reminders": reminders}
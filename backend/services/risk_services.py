@@ -0,0 +1,221 @@
+# backend/services/risk_services.py
+"""
+Local late-payment risk scoring for open receivables.
+
+One grouped query loads every receivable of a business with its last
+linked payment date and payment count. Per-contact payment behaviour is
+then computed with NumPy over the whole book at once:
+
+- mean and standard deviation of days late on settled invoices, shrunk
+  towards the business-wide figures for contacts with little history
+  (PRIOR_WEIGHT pseudo-invoices),
+- partial-payment ratio (invoices paid in more than one instalment, or
+  open and part-paid),
+- recency: days since the contact's last payment.
+
+Each open invoice adds how far past due it already is, and a fixed
+logistic model turns the features into a 0-1 score. The LLM is only used
+to narrate the result (agents.risk_agent.aexplain_risk_scores).
+"""
+from datetime import date
+from typing import Any, Dict, Optional
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+from models.business import Business
+from models.contact import Contact
+from models.invoice import Invoice
+from models.transaction import Transaction
+from services.invoice_services import OPEN_INVOICE_STATUSES
+
+# Days late assumed for a business with no settled invoices yet
+DEFAULT_DAYS_LATE = 7.0
+DEFAULT_DAYS_LATE_STD = 10.0
+# Weight (in invoices) of the business-wide prior in each contact's figures
+PRIOR_WEIGHT = 2.0
+# Recency is capped here; contacts that never paid count as this stale
+RECENCY_CAP_DAYS = 180
+# Logistic model: score = sigmoid(INTERCEPT + sum(weight * feature / scale))
+INTERCEPT = -2.0
+WEIGHTS = {
+    "mean_days_late": (1.5, 30.0),
+    "days_late_std": (0.5, 30.0),
+    "partial_ratio": (1.0, 1.0),
+    "days_since_last_payment": (0.3, 90.0),
+    "days_overdue": (1.2, 30.0),
+}
+HIGH_RISK = 0.6
+MEDIUM_RISK = 0.3
+
+
+def _days(later: np.ndarray, earlier: np.ndarray) -> np.ndarray:
+    return (later - earlier).astype("timedelta64[D]").astype(float)
+
+
+def load_receivables(session: Session, business_id: int) -> Dict[str, np.ndarray]:
+    """
+    Column arrays for every receivable of the business; paid_on is the last
+    linked payment, payments how many there were.
+    """
+    payments = (
+        select(Transaction.invoice_id, func.max(Transaction.date).label("last_payment"),
+               func.count().label("payments"))
+        .where(Transaction.business_id == business_id, Transaction.direction == "inflow",
+               Transaction.invoice_id.is_not(None))
+        .group_by(Transaction.invoice_id)
+        .subquery()
+    )
+    # Core rows with dates as 'YYYY-MM-DD': NumPy parses those in bulk, far cheaper than ORM rows
+    rows = session.connection().execute(
+        select(Invoice.id, Invoice.contact_id, Invoice.amount, Invoice.amount_paid, Invoice.status,
+               func.date(Invoice.due_date), func.date(Invoice.status_changed_at),
+               func.date(payments.c.last_payment), func.coalesce(payments.c.payments, 0))
+        .select_from(Invoice)
+        .outerjoin(payments, payments.c.invoice_id == Invoice.id)
+        .where(Invoice.business_id == business_id, Invoice.type == "receivable")
+    ).all()
+    ids, contacts, amounts, paid, statuses, due, changed, last_payment, payments = zip(*rows) if rows else ([],) * 9
+    status = np.array(statuses, dtype=object)
+    last_payment = np.array(last_payment, dtype="datetime64[D]")
+    # settled without a linked payment: the sweep's status change is the best date we have
+    paid_on = np.where(np.isnat(last_payment) & (status == "paid"), np.array(changed, dtype="datetime64[D]"),
+                       last_payment)
+    return {
+        "invoice_id": np.array(ids, dtype=np.int64),
+        "contact_id": np.array([c if c is not None else -1 for c in contacts], dtype=np.int64),
+        "amount": np.array(amounts, dtype=float),
+        "amount_paid": np.nan_to_num(np.array(paid, dtype=float)),
+        "status": status,
+        "due_date": np.array(due, dtype="datetime64[D]"),
+        "paid_on": paid_on,
+        "payments": np.array(payments, dtype=np.int64),
+    }
+
+
+def score_receivables(book: Dict[str, np.ndarray], today: date) -> Dict[str, np.ndarray]:
+    """Features and risk score for every open invoice in `book` (see load_receivables), in one pass."""
+    today64 = np.datetime64(today, "D")
+    contact_ids, contact_of = np.unique(book["contact_id"], return_inverse=True)
+    n_contacts = len(contact_ids)
+
+    settled = (book["status"] == "paid") & ~np.isnat(book["due_date"]) & ~np.isnat(book["paid_on"])
+    late = np.where(settled, np.maximum(_days(book["paid_on"], book["due_date"]), 0.0), 0.0)
+    if settled.any():
+        prior_mean = late[settled].mean()
+        prior_std = late[settled].std() if settled.sum() > 1 else DEFAULT_DAYS_LATE_STD
+    else:
+        prior_mean, prior_std = DEFAULT_DAYS_LATE, DEFAULT_DAYS_LATE_STD
+
+    n = np.bincount(contact_of, weights=settled.astype(float), minlength=n_contacts)
+    sum_late = np.bincount(contact_of, weights=late, minlength=n_contacts)
+    sum_sq = np.bincount(contact_of, weights=late * late, minlength=n_contacts)
+    mean_late = (sum_late + PRIOR_WEIGHT * prior_mean) / (n + PRIOR_WEIGHT)
+    raw_var = np.where(n > 0, sum_sq / np.maximum(n, 1) - (sum_late / np.maximum(n, 1)) ** 2, 0.0)
+    var_late = (n * np.maximum(raw_var, 0.0) + PRIOR_WEIGHT * prior_std ** 2) / (n + PRIOR_WEIGHT)
+
+    is_open = np.isin(book["status"], OPEN_INVOICE_STATUSES)
+    partial = ((book["payments"] > 1) & (book["status"] == "paid")) | (is_open & (book["amount_paid"] > 0))
+    invoices = np.bincount(contact_of, minlength=n_contacts)
+    partial_ratio = np.bincount(contact_of, weights=partial.astype(float), minlength=n_contacts) / np.maximum(invoices, 1)
+
+    paid_days = np.where(~np.isnat(book["paid_on"]), _days(np.full(len(contact_of), today64), book["paid_on"]),
+                         np.inf)
+    since_payment = np.full(n_contacts, np.inf)
+    np.minimum.at(since_payment, contact_of, paid_days)
+    since_payment = np.minimum(since_payment, RECENCY_CAP_DAYS)
+
+    open_idx = np.flatnonzero(is_open)
+    c = contact_of[open_idx]
+    due = book["due_date"][open_idx]
+    features = {
+        "mean_days_late": mean_late[c],
+        "days_late_std": np.sqrt(var_late[c]),
+        "partial_ratio": partial_ratio[c],
+        "days_since_last_payment": since_payment[c],
+        "days_overdue": np.where(np.isnat(due), 0.0, np.maximum(_days(np.full(len(c), today64), due), 0.0)),
+    }
+    contributions = {name: weight * features[name] / scale for name, (weight, scale) in WEIGHTS.items()}
+    logit = INTERCEPT + sum(contributions.values())
+    return {
+        "index": open_idx,
+        "settled_invoices": n[c],
+        "features": features,
+        "contributions": contributions,
+        "score": 1.0 / (1.0 + np.exp(-logit)),
+    }
+
+
+def risk_band(score: float) -> str:
+    if score >= HIGH_RISK:
+        return "high"
+    return "medium" if score >= MEDIUM_RISK else "low"
+
+
+def _reason(features: Dict[str, float], contributions: Dict[str, float], settled: int) -> str:
+    phrases = {
+        "mean_days_late": f"pays {features['mean_days_late']:.0f} days late on average",
+        "days_late_std": f"payment timing varies by ±{features['days_late_std']:.0f} days",
+        "partial_ratio": f"{features['partial_ratio']:.0%} of invoices paid in parts",
+        "days_since_last_payment": (f"no payment in {features['days_since_last_payment']:.0f} days"
+                                    if features["days_since_last_payment"] < RECENCY_CAP_DAYS
+                                    else "no recent payments"),
+        "days_overdue": f"already {features['days_overdue']:.0f} days overdue",
+    }
+    if not settled:
+        # behaviour figures are the business-wide prior, not this contact's
+        contributions = {"days_overdue": contributions["days_overdue"]}
+    top = [name for name, value in sorted(contributions.items(), key=lambda kv: -kv[1]) if value > 0.1][:2]
+    parts = [phrases[name] for name in top]
+    if not settled:
+        parts.append("no payment history yet")
+    return "; ".join(parts).capitalize() if parts else "Pays on time"
+
+
+def score_business_risk(session: Session, business_id: int, today: Optional[date] = None,
+                        limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Late-payment risk for every open receivable of a business, riskiest
+    first. Raises ValueError for unknown businesses.
+    """
+    if not session.get(Business, business_id):
+        raise ValueError("Business not found")
+    today = today or date.today()
+    book = load_receivables(session, business_id)
+    scored = score_receivables(book, today)
+    idx = scored["index"]
+    order = np.argsort(-scored["score"], kind="stable")
+    outstanding = np.maximum(book["amount"][idx] - book["amount_paid"][idx], 0.0)
+
+    names = dict(session.exec(
+        select(Contact.id, Contact.name).where(Contact.business_id == business_id)
+    ).all())
+    results = []
+    for j in order[:limit] if limit else order:
+        features = {name: round(float(values[j]), 2) for name, values in scored["features"].items()}
+        contributions = {name: float(values[j]) for name, values in scored["contributions"].items()}
+        contact_id = int(book["contact_id"][idx[j]])
+        due = book["due_date"][idx[j]]
+        score = float(scored["score"][j])
+        results.append({
+            "invoice_id": int(book["invoice_id"][idx[j]]),
+            "contact_id": contact_id if contact_id >= 0 else None,
+            "contact_name": names.get(contact_id),
+            "amount_due": round(float(outstanding[j]), 2),
+            "due_date": None if np.isnat(due) else str(due),
+            "risk_score": round(score, 3),
+            "risk_band": risk_band(score),
+            "reason": _reason(features, contributions, int(scored["settled_invoices"][j])),
+            "features": features,
+        })
+    bands = [risk_band(float(s)) for s in scored["score"]]
+    return {
+        "business_id": business_id,
+        "as_of": today.isoformat(),
+        "open_invoices": int(len(idx)),
+        "amount_due": round(float(outstanding.sum()), 2),
+        # outstanding amounts weighted by their risk score
+        "expected_late_amount": round(float((outstanding * scored["score"]).sum()), 2),
+        "high_risk": bands.count("high"),
+        "medium_risk": bands.count("medium"),
+        "invoices": results,
+    }
@@ -0,0 +1,260 @@
+# backend/services/rollup_services.py
+"""
+Maintains the MonthlyRollup and WeeklyRollup tables: one row per
+(business_id, month or week, direction, category) with the running total
+and count. Weeks are keyed by their Monday.
+
+ORM writes (session.add / delete / attribute edits on Transaction) are picked
+up by the after_flush hook below and applied in the same DB transaction.
+Bulk paths that bypass the ORM unit of work must call apply_transaction_rows
+themselves, or run rebuild_rollups / rebuild_weekly_rollups afterwards.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, event, extract, func, inspect, update
+from sqlalchemy.engine import Connection
+from sqlmodel import Session, select
+from models.monthly_rollup import MonthlyRollup
+from models.transaction import Transaction
+from models.weekly_rollup import WeeklyRollup
+from services.cashflow_services import month_key
+from utils.datetime import parse_iso_date
+
+RollupKey = Tuple[int, object, str, str]
+ROLLUP_FIELDS = ("business_id", "date", "direction", "category", "amount")
+# Rows streamed per fetch when rebuilding the weekly rollup
+REBUILD_CHUNK = 10000
+
+
+def _month_of(value) -> str:
+    if isinstance(value, str):
+        return value[:7]
+    return month_key(value.year, value.month)
+
+
+def week_of(value) -> date:
+    day = parse_iso_date(value)
+    return day - timedelta(days=day.weekday())
+
+
+# (table, period column, period of a transaction date)
+ROLLUPS = (
+    (MonthlyRollup.__table__, "month", _month_of),
+    (WeeklyRollup.__table__, "week", week_of),
+)
+
+
+def _key(row: Dict, period: Callable = _month_of) -> RollupKey:
+    return (row["business_id"], period(row["date"]), row["direction"], row.get("category") or "other")
+
+
+def apply_transaction_rows(conn: Connection, rows: Iterable[Dict], sign: int = 1):
+    """
+    Folds transaction rows (dicts with business_id, date, direction, category,
+    amount) into both rollups. sign=-1 removes them again.
+    """
+    rows = list(rows)
+    for table, column, period in ROLLUPS:
+        deltas = _new_deltas()
+        _accumulate(deltas, rows, sign, period)
+        _apply_deltas(conn, deltas, table, column)
+
+
+def _new_deltas() -> Dict[RollupKey, List[float]]:
+    return defaultdict(lambda: [0.0, 0])
+
+
+def _accumulate(deltas: Dict[RollupKey, List[float]], rows: Iterable[Dict], sign: int,
+                period: Callable = _month_of):
+    for row in rows:
+        d = deltas[_key(row, period)]
+        d[0] += sign * float(row["amount"] or 0.0)
+        d[1] += sign
+
+
+def _apply_deltas(conn: Connection, deltas: Dict[RollupKey, List[float]], table=MonthlyRollup.__table__,
+                  column: str = "month"):
+    deltas = {k: v for k, v in deltas.items() if v[1] != 0 or v[0] != 0.0}
+    if not deltas:
+        return
+
+    dialect = conn.dialect.name
+    for (business_id, period, direction, category), (total, count) in deltas.items():
+        values = {"business_id": business_id, column: period, "direction": direction,
+                  "category": category, "total": total, "count": count}
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["business_id", column, "direction", "category"],
+                set_={"total": table.c.total + stmt.excluded.total,
+                      "count": table.c.count + stmt.excluded.count},
+            )
+            conn.execute(stmt)
+        else:
+            result = conn.execute(
+                update(table)
+                .where(table.c.business_id == business_id, table.c[column] == period,
+                       table.c.direction == direction, table.c.category == category)
+                .values(total=table.c.total + total, count=table.c.count + count)
+            )
+            if result.rowcount == 0:
+                conn.execute(table.insert().values(**values))
+
+    # Buckets emptied by deletes/edits are removed so the rollup mirrors the raw table.
+    business_ids = {k[0] for k in deltas}
+    conn.execute(delete(table).where(table.c.business_id.in_(business_ids), table.c.count <= 0))
+
+
+def _row_of(tx: Transaction) -> Dict:
+    return {f: getattr(tx, f) for f in ROLLUP_FIELDS}
+
+
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# active_history loads the persisted value before an expired attribute (any
+# instance edited after a commit) is overwritten, so history.deleted below
+# always holds what the rollup counted.
+for _field in ROLLUP_FIELDS:
+    event.listen(getattr(Transaction, _field), "set", _load_old_value, active_history=True)
+
+
+def _previous_row_of(tx: Transaction) -> Optional[Dict]:
+    """Pre-flush values of a dirty Transaction, or None if no rollup field changed."""
+    state = inspect(tx)
+    row, changed = {}, False
+    for f in ROLLUP_FIELDS:
+        history = state.attrs[f].history
+        if history.deleted:
+            row[f] = history.deleted[0]
+            changed = True
+        else:
+            row[f] = getattr(tx, f)
+    return row if changed else None
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_rollup(session: Session, flush_context):
+    added, removed = [], []
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            added.append(_row_of(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Transaction):
+            removed.append(_row_of(obj))
+    for obj in session.dirty:
+        if isinstance(obj, Transaction) and session.is_modified(obj):
+            previous = _previous_row_of(obj)
+            if previous:
+                removed.append(previous)
+                added.append(_row_of(obj))
+    if not added and not removed:
+        return
+
+    for table, column, period in ROLLUPS:
+        deltas = _new_deltas()
+        _accumulate(deltas, added, 1, period)
+        _accumulate(deltas, removed, -1, period)
+        _apply_deltas(session.connection(), deltas, table, column)
+
+
+def _raw_aggregates(conn: Connection, business_id: Optional[int] = None) -> Dict[RollupKey, Tuple[float, int]]:
+    year = extract("year", Transaction.date)
+    month = extract("month", Transaction.date)
+    stmt = select(
+        Transaction.business_id, year, month, Transaction.direction, Transaction.category,
+        func.sum(Transaction.amount), func.count(),
+    ).group_by(Transaction.business_id, year, month, Transaction.direction, Transaction.category)
+    if business_id is not None:
+        stmt = stmt.where(Transaction.business_id == business_id)
+    return {
+        (b, month_key(y, m), direction, category or "other"): (float(total or 0.0), int(count))
+        for b, y, m, direction, category, total, count in conn.execute(stmt)
+    }
+
+
+def _rollup_rows(conn: Connection, business_id: Optional[int] = None) -> Dict[RollupKey, Tuple[float, int]]:
+    table = MonthlyRollup.__table__
+    stmt = select(table.c.business_id, table.c.month, table.c.direction, table.c.category,
+                  table.c.total, table.c.count)
+    if business_id is not None:
+        stmt = stmt.where(table.c.business_id == business_id)
+    return {
+        (b, month, direction, category): (float(total), int(count))
+        for b, month, direction, category, total, count in conn.execute(stmt)
+    }
+
+
+def rebuild_rollups(conn: Connection, business_id: Optional[int] = None) -> int:
+    """
+    Recomputes the rollup from the raw transaction table (for one business or
+    all of them). Returns the number of rollup rows written.
+    """
+    table = MonthlyRollup.__table__
+    stmt = delete(table)
+    if business_id is not None:
+        stmt = stmt.where(table.c.business_id == business_id)
+    conn.execute(stmt)
+
+    rows = [
+        dict(business_id=b, month=month, direction=direction, category=category, total=total, count=count)
+        for (b, month, direction, category), (total, count) in _raw_aggregates(conn, business_id).items()
+    ]
+    if rows:
+        conn.execute(table.insert(), rows)
+    return len(rows)
+
+
+def rebuild_weekly_rollups(conn: Connection, business_id: Optional[int] = None) -> int:
+    """
+    Recomputes the weekly rollup from the raw transaction table, streaming
+    the rows (week boundaries differ per dialect in SQL). Returns the number
+    of rollup rows written.
+    """
+    table = WeeklyRollup.__table__
+    stmt = delete(table)
+    if business_id is not None:
+        stmt = stmt.where(table.c.business_id == business_id)
+    conn.execute(stmt)
+
+    source = select(*[getattr(Transaction, f) for f in ROLLUP_FIELDS])
+    if business_id is not None:
+        source = source.where(Transaction.business_id == business_id)
+    deltas = _new_deltas()
+    for rows in conn.execution_options(yield_per=REBUILD_CHUNK).execute(source).mappings().partitions():
+        _accumulate(deltas, rows, 1, week_of)
+    rows = [
+        dict(business_id=b, week=week, direction=direction, category=category, total=total, count=count)
+        for (b, week, direction, category), (total, count) in deltas.items()
+    ]
+    if rows:
+        conn.execute(table.insert(), rows)
+    return len(rows)
+
+
+def check_rollup_consistency(conn: Connection, business_id: Optional[int] = None,
+                             tolerance: float = 0.005) -> List[Dict]:
+    """
+    Compares the rollup with an aggregate over the raw transaction table.
+    Returns one entry per mismatching bucket (empty list when consistent).
+    """
+    expected = _raw_aggregates(conn, business_id)
+    actual = _rollup_rows(conn, business_id)
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        exp_total, exp_count = expected.get(key, (0.0, 0))
+        act_total, act_count = actual.get(key, (0.0, 0))
+        if exp_count != act_count or abs(exp_total - act_total) > tolerance:
+            b, month, direction, category = key
+            mismatches.append({
+                "business_id": b, "month": month, "direction": direction, "category": category,
+                "expected_total": exp_total, "rollup_total": act_total,
+                "expected_count": exp_count, "rollup_count": act_count,
+            })
+    return mismatches
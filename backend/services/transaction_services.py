@@ -0,0 +1,217 @@
+# backend/services/transaction_services.py
+"""
+Bulk transaction writes and the CSV/XLSX statement import pipeline.
+
+Rows are mapped with an inverted column map (canonical field -> column index)
+resolved once per file, normalised, and inserted in chunks through SQLAlchemy
+Core. Core inserts bypass the ORM after_flush hooks, so bulk_insert_transactions
+updates the monthly rollup and the metrics data version itself.
+"""
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+from sqlalchemy.engine import Connection
+from sqlmodel import Session
+from models.transaction import Transaction
+from services.metrics_services import bump_data_version
+from services.rollup_services import apply_transaction_rows
+from utils.datetime import DateParser, parse_date
+from utils.parsing import parse_signed_amount
+
+MAPPING_FIELDS = (
+    "date_column", "amount_column", "debit_column", "credit_column", "dr_cr_column",
+    "description_column", "category_column",
+)
+
+# Header keywords for the heuristic mapper, most specific first.
+HEADER_HINTS = {
+    "date_column": ("txn date", "transaction date", "value date", "date"),
+    "debit_column": ("withdrawal", "debit", "dr"),
+    "credit_column": ("deposit", "credit", "cr"),
+    "amount_column": ("amount", "amt"),
+    "description_column": ("narration", "description", "particulars", "remarks", "details"),
+    "category_column": ("category",),
+}
+
+# A single "Dr/Cr" indicator column has one debit and one credit word in its header;
+# its cells hold one of them (or just "D"/"C")
+DEBIT_MARKS = {"dr", "debit"}
+CREDIT_MARKS = {"cr", "credit"}
+
+CATEGORY_WORDS = {"sales", "salary", "rent", "utilities", "inventory", "loan", "other"}
+# Whole words only: "CHQ DEPOSIT" is not a POS payment, "Cashback" is not cash
+METHOD_WORDS = tuple((re.compile(rf"\b{word}\b"), method) for word, method in (
+    ("upi", "upi"), ("neft", "bank_transfer"), ("imps", "bank_transfer"), ("rtgs", "bank_transfer"),
+    ("atm", "cash"), ("cash", "cash"), ("pos", "card"), ("card", "card"),
+))
+
+
+def _normalize_header(value: Any) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", str(value or "").lower()).strip()
+
+
+def _is_dr_cr_header(header: str) -> bool:
+    words = set(header.split())
+    return bool(words & DEBIT_MARKS) and bool(words & CREDIT_MARKS)
+
+
+def guess_column_mapping(headers: Sequence[Any]) -> Dict[str, Optional[str]]:
+    """Keyword-based column mapping, used when the LLM mapping is missing or unusable."""
+    normalized = [_normalize_header(h) for h in headers]
+    mapping: Dict[str, Optional[str]] = {field: None for field in MAPPING_FIELDS}
+    taken = set()
+    # "Cr/Dr", "Debit/Credit": an indicator next to an amount column, not a debit column
+    idx = next((i for i, h in enumerate(normalized) if _is_dr_cr_header(h)), None)
+    if idx is not None:
+        mapping["dr_cr_column"] = str(headers[idx])
+        taken.add(idx)
+    for field, hints in HEADER_HINTS.items():
+        for hint in hints:
+            idx = next((i for i, h in enumerate(normalized)
+                        if i not in taken and (h == hint or hint in h.split() or (len(hint) > 3 and hint in h))),
+                       None)
+            if idx is not None:
+                mapping[field] = str(headers[idx])
+                taken.add(idx)
+                break
+    return mapping
+
+
+def invert_column_mapping(mapping: Dict[str, Any], headers: Sequence[Any]) -> Dict[str, int]:
+    """
+    Turns {"date_column": "Txn Date", ...} into {"date": 0, ...}, so each row
+    is resolved with direct index lookups. Header matching ignores case and
+    whitespace; fields mapped to unknown columns are dropped.
+    """
+    positions = {}
+    for i, header in enumerate(headers):
+        positions.setdefault(_normalize_header(header), i)
+    index_map = {}
+    for field in MAPPING_FIELDS:
+        column = mapping.get(field) if isinstance(mapping, dict) else None
+        if isinstance(column, str) and _normalize_header(column) in positions:
+            index_map[field[:-len("_column")]] = positions[_normalize_header(column)]
+    return index_map
+
+
+def is_usable_mapping(index_map: Dict[str, int]) -> bool:
+    return "date" in index_map and ("amount" in index_map or "debit" in index_map or "credit" in index_map)
+
+
+def resolve_column_mapping(headers: Sequence[Any], ai_mapping: Optional[Dict]) -> Dict[str, int]:
+    """Prefers the LLM mapping; falls back to header keywords when it is an error or incomplete."""
+    if isinstance(ai_mapping, dict) and "error" not in ai_mapping:
+        index_map = invert_column_mapping(ai_mapping, headers)
+        if is_usable_mapping(index_map):
+            return index_map
+    return invert_column_mapping(guess_column_mapping(headers), headers)
+
+
+def _cell(row: Sequence[Any], index_map: Dict[str, int], field: str) -> Any:
+    idx = index_map.get(field)
+    if idx is None or idx >= len(row):
+        return None
+    return row[idx]
+
+
+def _guess_method(text: str) -> str:
+    lowered = text.lower()
+    return next((method for pattern, method in METHOD_WORDS if pattern.search(lowered)), "other")
+
+
+def _dr_cr_sign(value: Any) -> Optional[float]:
+    """-1 for a debit mark, 1 for a credit mark, None for anything else."""
+    mark = _normalize_header(value)
+    if mark in DEBIT_MARKS or mark == "d":
+        return -1.0
+    if mark in CREDIT_MARKS or mark == "c":
+        return 1.0
+    return None
+
+
+def normalize_row(row: Sequence[Any], index_map: Dict[str, int], business_id: int,
+                  source: str = "csv", dates: Optional[DateParser] = None) -> Optional[Dict[str, Any]]:
+    """
+    One statement row -> Transaction column values, or None when the row has
+    no usable date or amount. Separate debit/credit columns win over a signed
+    amount column; negative amounts are outflows, unless a Dr/Cr indicator
+    column gives the sign. `dates` is the import's DateParser.
+    """
+    when = (dates or parse_date)(_cell(row, index_map, "date"))
+    if when is None:
+        return None
+
+    debit = parse_signed_amount(_cell(row, index_map, "debit"))
+    credit = parse_signed_amount(_cell(row, index_map, "credit"))
+    if credit:
+        amount = credit
+    elif debit:
+        amount = -abs(debit)
+    else:
+        amount = parse_signed_amount(_cell(row, index_map, "amount"))
+        sign = _dr_cr_sign(_cell(row, index_map, "dr_cr")) if amount else None
+        if sign is not None:
+            amount = sign * abs(amount)
+    if not amount:
+        return None
+
+    description = _cell(row, index_map, "description")
+    description = str(description).strip() if description not in (None, "") else None
+    category = str(_cell(row, index_map, "category") or "").strip().lower()
+    return {
+        "business_id": business_id,
+        "invoice_id": None,
+        "direction": "inflow" if amount > 0 else "outflow",
+        "amount": abs(amount),
+        "method": _guess_method(description or ""),
+        "category": category if category in CATEGORY_WORDS else "other",
+        "date": when,
+        "raw_text": description,
+        "source": source,
+    }
+
+
+def bulk_insert_transactions(conn: Connection, rows: List[Dict[str, Any]]) -> int:
+    """executemany INSERT of prepared rows plus the matching rollup and data-version updates."""
+    if not rows:
+        return 0
+    conn.execute(Transaction.__table__.insert(), rows)
+    apply_transaction_rows(conn, rows)
+    bump_data_version(conn, {row["business_id"] for row in rows})
+    return len(rows)
+
+
+def import_statement_rows(session: Session, business_id: int, rows: Iterable[Sequence[Any]],
+                          index_map: Dict[str, int], chunk_size: int = 1000,
+                          source: str = "csv") -> Iterator[Dict[str, Any]]:
+    """
+    Normalises and inserts data rows in chunks, committing each chunk.
+    Yields a progress event after every chunk and a final "done" event.
+    """
+    processed = inserted = skipped = 0
+    started = datetime.utcnow()
+    dates = DateParser()
+    chunk: List[Dict[str, Any]] = []
+
+    def flush() -> int:
+        count = bulk_insert_transactions(session.connection(), chunk)
+        session.commit()
+        chunk.clear()
+        return count
+
+    for row in rows:
+        processed += 1
+        values = normalize_row(row, index_map, business_id, source, dates)
+        if values is None:
+            skipped += 1
+            continue
+        chunk.append(values)
+        if len(chunk) >= chunk_size:
+            inserted += flush()
+            yield {"event": "progress", "processed": processed, "inserted": inserted, "skipped": skipped}
+    if chunk:
+        inserted += flush()
+
+    elapsed = (datetime.utcnow() - started).total_seconds()
+    yield {"event": "done", "processed": processed, "inserted": inserted, "skipped": skipped,
+           "seconds": round(elapsed, 3)}
@@ -0,0 +1,21 @@
+# backend/tests/__init__.py
+"""
+Test setup shared by every test module, imported before any of them: the
+settings overrides below are in place before config.py reads them, and all
+models are registered on SQLModel.metadata.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+# The persistent LLM cache goes to a throwaway directory, not backend/llm_cache.db
+_tmp = tempfile.mkdtemp(prefix="verity-tests-")
+atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+os.environ["LLM_CACHE_PATH"] = os.path.join(_tmp, "llm_cache.db")
+
+# create_all() in a test builds the full schema; new models are added to
+# migrations._import_models only
+from migrations import _import_models  # noqa: E402
+
+_import_models()
@@ -0,0 +1,222 @@
+import unittest
+from datetime import date, datetime
+from unittest.mock import patch
+
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from models.business import Business
+from models.invoice import Invoice
+from models.transaction import Transaction
+from models.monthly_rollup import MonthlyRollup
+from models.weekly_rollup import WeeklyRollup
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from db import get_read_session, get_session
+from routers import business as business_router
+from services import metrics_services  # noqa: F401  registers the data-version write hook
+from services.metrics_services import get_business_metrics, get_data_version
+from services.pitchdeck_service import compute_business_metrics
+from services.transaction_services import bulk_insert_transactions
+from services.rollup_services import (
+    apply_transaction_rows,
+    check_rollup_consistency,
+    rebuild_rollups,
+)
+
+
+class LedgerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        SQLModel.metadata.create_all(self.engine)
+        self.session = Session(self.engine)
+        self.session.add(Business(id=1, name="Test Traders", industry="Retail", location="Pune"))
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def add_tx(self, direction, amount, y, m, d=1):
+        self.session.add(Transaction(
+            business_id=1, direction=direction, amount=amount, date=datetime(y, m, d)
+        ))
+
+
+class TestComputeBusinessMetrics(LedgerTestCase):
+
+    def test_monthly_aggregates(self):
+        self.add_tx("inflow", 1000, 2025, 1)
+        self.add_tx("inflow", 500, 2025, 1, 20)
+        self.add_tx("inflow", 2000, 2025, 2)
+        self.add_tx("outflow", 300, 2025, 2)
+        self.add_tx("inflow", 3000, 2025, 3)
+        self.add_tx("outflow", 700, 2025, 4)
+        self.session.add(Invoice(business_id=1, amount=250, type="receivable", status="overdue"))
+        self.session.add(Invoice(business_id=1, amount=999, type="receivable", status="pending"))
+        self.session.commit()
+
+        metrics = compute_business_metrics(self.session, 1)
+
+        self.assertEqual(metrics["monthly_revenue"], {"2025-01": 1500.0, "2025-02": 2000.0, "2025-03": 3000.0})
+        # last three active months are Feb, Mar, Apr
+        self.assertEqual(metrics["total_inflow_last_3m"], 5000.0)
+        self.assertEqual(metrics["total_outflow_last_3m"], 1000.0)
+        # April has no revenue, March was 3000 → -100%
+        self.assertEqual(metrics["revenue_growth_percent"], -100.0)
+        self.assertEqual(metrics["overdue_amount"], 250.0)
+
+    def test_empty_business(self):
+        metrics = compute_business_metrics(self.session, 1)
+        self.assertEqual(metrics["monthly_revenue"], {})
+        self.assertEqual(metrics["total_inflow_last_3m"], 0.0)
+        self.assertIsNone(metrics["revenue_growth_percent"])
+        self.assertEqual(metrics["overdue_amount"], 0.0)
+
+    def test_unknown_business(self):
+        with self.assertRaises(ValueError):
+            compute_business_metrics(self.session, 42)
+
+
+class TestMonthlyRollup(LedgerTestCase):
+
+    def rollup(self):
+        return {
+            (r.month, r.direction, r.category): (r.total, r.count)
+            for r in self.session.exec(select(MonthlyRollup)).all()
+        }
+
+    def test_insert_edit_delete_keep_rollup_in_sync(self):
+        self.add_tx("inflow", 1000, 2025, 1)
+        self.add_tx("inflow", 500, 2025, 1, 15)
+        self.session.commit()
+        self.assertEqual(self.rollup(), {("2025-01", "inflow", "other"): (1500.0, 2)})
+
+        tx = self.session.exec(select(Transaction).where(Transaction.amount == 500)).one()
+        tx.amount = 700
+        tx.date = datetime(2025, 2, 3)
+        tx.category = "sales"
+        self.session.add(tx)
+        self.session.commit()
+        self.assertEqual(self.rollup(), {
+            ("2025-01", "inflow", "other"): (1000.0, 1),
+            ("2025-02", "inflow", "sales"): (700.0, 1),
+        })
+
+        self.session.delete(tx)
+        self.session.commit()
+        self.assertEqual(self.rollup(), {("2025-01", "inflow", "other"): (1000.0, 1)})
+        self.assertEqual(check_rollup_consistency(self.session.connection()), [])
+
+    def test_edit_and_delete_after_commit(self):
+        # after commit the instance is expired: the old values must still come off the rollup
+        tx = Transaction(business_id=1, direction="inflow", amount=500, date=datetime(2025, 1, 15))
+        self.session.add(tx)
+        self.session.commit()
+        tx.amount = 700
+        self.session.commit()
+        tx.date, tx.category = datetime(2025, 2, 3), "sales"
+        self.session.commit()
+        self.assertEqual(self.rollup(), {("2025-02", "inflow", "sales"): (700.0, 1)})
+        self.assertEqual(check_rollup_consistency(self.session.connection()), [])
+        weekly = self.session.exec(select(WeeklyRollup)).all()
+        self.assertEqual([(str(r.week), r.category, r.total) for r in weekly], [("2025-02-03", "sales", 700.0)])
+
+        self.session.delete(tx)
+        self.session.commit()
+        self.assertEqual(self.rollup(), {})
+
+    def test_bulk_rows_and_rebuild(self):
+        rows = [
+            {"business_id": 1, "direction": "outflow", "amount": 200.0, "category": "rent",
+             "date": datetime(2025, 3, 1)},
+            {"business_id": 1, "direction": "outflow", "amount": 300.0, "category": "rent",
+             "date": datetime(2025, 3, 9)},
+        ]
+        conn = self.session.connection()
+        conn.execute(Transaction.__table__.insert(), rows)
+        self.assertEqual(len(check_rollup_consistency(conn)), 1)
+
+        apply_transaction_rows(conn, rows)
+        self.assertEqual(check_rollup_consistency(conn), [])
+        self.assertEqual(self.rollup(), {("2025-03", "outflow", "rent"): (500.0, 2)})
+
+        conn.execute(MonthlyRollup.__table__.delete())
+        self.assertEqual(rebuild_rollups(conn, 1), 1)
+        self.assertEqual(check_rollup_consistency(conn), [])
+
+
+class TestMetricsSnapshot(LedgerTestCase):
+
+    def version(self):
+        return get_data_version(self.session, 1)
+
+    def test_writes_bump_data_version(self):
+        start = self.version()
+        self.add_tx("inflow", 100.0, 2025, 1)
+        self.session.commit()
+        self.assertEqual(self.version(), start + 1)
+
+        inv = Invoice(business_id=1, amount=50.0, type="receivable", due_date=date(2025, 2, 1))
+        self.session.add(inv)
+        self.session.commit()
+        inv.status = "overdue"
+        self.session.add(inv)
+        self.session.commit()
+        self.assertEqual(self.version(), start + 3)
+
+        bulk_insert_transactions(self.session.connection(), [
+            {"business_id": 1, "direction": "outflow", "amount": 10.0, "category": "other",
+             "method": "cash", "date": datetime(2025, 1, 5), "source": "csv"},
+        ])
+        self.session.commit()
+        self.assertEqual(self.version(), start + 4)
+
+    def test_snapshot_reused_until_next_write(self):
+        self.add_tx("inflow", 100.0, 2025, 1)
+        self.session.commit()
+        with patch("services.metrics_services.compute_business_metrics",
+                   wraps=compute_business_metrics) as compute:
+            first, v1 = get_business_metrics(self.session, 1)
+            second, v2 = get_business_metrics(self.session, 1)
+            self.assertEqual(compute.call_count, 1)
+            self.assertEqual((first, v1), (second, v2))
+
+            self.add_tx("inflow", 50.0, 2025, 2)
+            self.session.commit()
+            third, v3 = get_business_metrics(self.session, 1)
+            self.assertEqual(compute.call_count, 2)
+            self.assertEqual(v3, v1 + 1)
+            self.assertEqual(third["monthly_revenue"], {"2025-01": 100.0, "2025-02": 50.0})
+
+        with self.assertRaises(ValueError):
+            get_business_metrics(self.session, 99)
+
+    def test_metrics_endpoint_etag(self):
+        app = FastAPI()
+        app.include_router(business_router.router, prefix="/business")
+        app.dependency_overrides[get_session] = lambda: self.session
+        app.dependency_overrides[get_read_session] = lambda: self.session
+        client = TestClient(app)
+
+        first = client.get("/business/1/metrics")
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers["etag"]
+        self.assertEqual(first.json()["business_name"], "Test Traders")
+
+        self.assertEqual(client.get("/business/1/metrics", headers={"If-None-Match": etag}).status_code, 304)
+
+        self.add_tx("outflow", 20.0, 2025, 1)
+        self.session.commit()
+        changed = client.get("/business/1/metrics", headers={"If-None-Match": etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["etag"], etag)
+        self.assertEqual(client.get("/business/99/metrics").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from config import settings
+from models.transaction import Transaction
+from services import categorization_services
+from services.categorization_services import (
+    acategorize, categorization_stats, load_model, model_name, predict_category, train_category_model,
+)
+from services.metrics_services import get_data_version
+from tests.test_cashflow import LedgerTestCase
+from utils.classifier import HashedLinearClassifier
+
+TEMPLATES = {
+    "rent": ["shop rent paid to landlord {n}", "monthly rent {m}", "rent transfer for godown {m}"],
+    "salary": ["salary to staff {n}", "wages paid to {n}", "staff salary {m}"],
+    "inventory": ["paid {s} for stock", "purchase of goods from {s}", "inventory restock {s}"],
+    "utilities": ["electricity bill {m}", "broadband bill paid", "water bill {m}"],
+}
+NAMES = ["raju", "anita", "vikram", "meena"]
+SUPPLIERS = ["gupta traders", "sharma wholesale", "metro cash"]
+MONTHS = ["jan", "feb", "mar", "apr"]
+
+
+def labelled(count, seed=3, categories=None):
+    rnd = random.Random(seed)
+    categories = categories or list(TEMPLATES)
+    rows = []
+    for _ in range(count):
+        category = rnd.choice(categories)
+        text = rnd.choice(TEMPLATES[category]).format(n=rnd.choice(NAMES), m=rnd.choice(MONTHS), s=rnd.choice(SUPPLIERS))
+        rows.append((f"{text} {rnd.randint(100, 99999)}", category))
+    return rows
+
+
+class TestHashedLinearClassifier(unittest.TestCase):
+
+    def test_learns_and_reports_progressive_accuracy(self):
+        rows = labelled(1500)
+        model = HashedLinearClassifier(dim=2 ** 14)
+        model.partial_fit([t for t, _ in rows], [c for _, c in rows])
+        label, confidence = model.predict(["rent paid for shop"])[0]
+        self.assertEqual(label, "rent")
+        self.assertGreater(confidence, 0.5)
+        metrics = model.metrics()
+        self.assertEqual(metrics["samples"], 1500)
+        self.assertGreater(metrics["accuracy"], 0.9)
+        self.assertGreater(metrics["coverage"], 0.5)
+
+    def test_incremental_fit_adds_classes_and_round_trips(self):
+        model = HashedLinearClassifier(dim=2 ** 14)
+        first = labelled(600, categories=["rent", "salary"])
+        model.partial_fit([t for t, _ in first], [c for _, c in first])
+        more = labelled(600, seed=4, categories=["utilities", "rent"])
+        model.partial_fit([t for t, _ in more], [c for _, c in more])
+        self.assertEqual(model.classes, ["rent", "salary", "utilities"])
+        self.assertEqual(model.predict(["electricity bill feb"])[0][0], "utilities")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "m.npz")
+            model.save(path)
+            loaded = HashedLinearClassifier.load(path)
+        self.assertEqual(loaded.predict(["staff salary"]), model.predict(["staff salary"]))
+        self.assertEqual(loaded.metrics(), model.metrics())
+
+    def test_inference_load_drops_adagrad_state(self):
+        model = HashedLinearClassifier(dim=2 ** 10)
+        rows = labelled(200)
+        model.partial_fit([t for t, _ in rows], [c for _, c in rows])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "m.npz")
+            model.save(path)
+            loaded = HashedLinearClassifier.load(path, trainable=False)
+        self.assertFalse(loaded.trainable)
+        self.assertEqual(loaded.predict(["rent paid"]), model.predict(["rent paid"]))
+        with self.assertRaises(ValueError):
+            loaded.partial_fit(["rent"], ["rent"])
+
+    def test_untrained_model_predicts_nothing(self):
+        self.assertEqual(HashedLinearClassifier(dim=64).predict(["anything"]), [(None, 0.0)])
+
+
+class TestCategorizationService(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patches = [
+            patch.object(settings, "CATEGORY_MODEL_DIR", self.tmp.name),
+            patch.object(settings, "CATEGORY_MODEL_DIM", 2 ** 14),
+            patch.object(settings, "CATEGORY_MIN_LABELS", 50),
+        ]
+        for p in self.patches:
+            p.start()
+        categorization_services._models.clear()
+        categorization_stats.reset()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+        super().tearDown()
+
+    def add_labelled(self, rows, business_id=1):
+        for text, category in rows:
+            self.session.add(Transaction(business_id=business_id, direction="outflow", amount=100.0,
+                                         raw_text=text, category=category))
+        self.session.commit()
+
+    def test_training_skips_unlabelled_rows_and_is_incremental(self):
+        self.add_labelled(labelled(400))
+        self.add_labelled([("misc entry", "other"), ("no label", "")])
+        self.session.add(Transaction(business_id=1, direction="outflow", amount=5.0, category="rent"))
+        self.session.commit()
+
+        first = train_category_model(self.session, 1)
+        self.assertEqual(first["trained"], 400)
+        self.assertNotIn("other", first["classes"])
+
+        self.add_labelled(labelled(30, seed=9))
+        second = train_category_model(self.session, 1)
+        self.assertEqual(second["trained"], 30)
+        self.assertEqual(second["samples"], 430)
+        self.assertEqual(train_category_model(self.session, 1, full=True)["samples"], 430)
+
+    def test_confident_local_prediction_skips_llm(self):
+        self.add_labelled(labelled(400))
+        train_category_model(self.session, 1)
+        train_category_model(self.session, None)
+
+        with patch("services.categorization_services.acategorize_transaction") as mock_llm:
+            result = asyncio.run(acategorize(self.session, "monthly shop rent paid to landlord", {}, 1))
+        mock_llm.assert_not_called()
+        self.assertEqual(result["category"], "rent")
+        self.assertEqual(result["resolved_by"], "local_business")
+        self.assertEqual(categorization_stats.snapshot()["coverage"], 1.0)
+
+    def test_low_confidence_goes_to_llm(self):
+        self.add_labelled(labelled(400))
+        train_category_model(self.session, None)
+
+        async def fake_llm(description, metadata):
+            return {"category": "travel", "sub_category": "fuel", "tax_code": None}
+
+        with patch("services.categorization_services.acategorize_transaction", side_effect=fake_llm), \
+                patch.object(settings, "CATEGORY_MIN_CONFIDENCE", 0.999):
+            result = asyncio.run(acategorize(self.session, "petrol pump", {}, None))
+        self.assertEqual(result["resolved_by"], "llm")
+        self.assertEqual(result["category"], "travel")
+        self.assertEqual(categorization_stats.snapshot()["llm"], 1)
+
+    def test_small_business_model_defers_to_global(self):
+        self.add_labelled(labelled(20), business_id=1)
+        train_category_model(self.session, 1)
+        self.assertIsNone(predict_category(1, "staff salary"))
+
+        self.add_labelled(labelled(400, seed=5), business_id=1)
+        train_category_model(self.session, None)
+        self.assertEqual(predict_category(1, "staff salary raju")["model"], "global")
+
+    def test_model_cache_is_bounded_and_holds_inference_copies(self):
+        for business_id in (1, 2, 3):
+            self.add_labelled(labelled(60, seed=business_id), business_id=business_id)
+        with patch.object(settings, "CATEGORY_MODEL_CACHE_SIZE", 2):
+            for business_id in (1, 2, 3):
+                train_category_model(self.session, business_id)
+            self.assertEqual(list(categorization_services._models), [model_name(2), model_name(3)])
+            load_model(model_name(2))
+            load_model(model_name(1))
+            self.assertEqual(list(categorization_services._models), [model_name(2), model_name(1)])
+        self.assertFalse(any(model.trainable for _, model in categorization_services._models.values()))
+
+        self.add_labelled(labelled(10, seed=9), business_id=1)
+        self.assertEqual(train_category_model(self.session, 1)["trained"], 10)
+
+    def test_ledger_change_queues_retrain(self):
+        self.add_labelled(labelled(100))
+        train_category_model(self.session, 1)
+        self.assertEqual(load_model(model_name(1)).meta["data_version"], get_data_version(self.session, 1))
+
+        async def fake_llm(description, metadata):
+            return {"category": "rent"}
+
+        with patch("services.categorization_services.request_retrain") as retrain, \
+                patch("services.categorization_services.acategorize_transaction", side_effect=fake_llm):
+            asyncio.run(acategorize(self.session, "rent", {}, 1))
+            retrain.assert_not_called()
+            self.add_labelled(labelled(5, seed=8))
+            asyncio.run(acategorize(self.session, "rent", {}, 1))
+            retrain.assert_called_once_with(1)
+
+
+if __name__ == "__main__":
+    unittest.main()
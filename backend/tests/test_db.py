@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, Session
+
+from config import settings
+from models.business import Business
+from models.metrics_snapshot import MetricsSnapshot
+from db import engine_options, get_read_session, make_engine
+from services.metrics_services import get_business_metrics
+
+
+class TestEngineFactory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.tmp.name, 'verity.db')}"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def pragma(self, engine, name):
+        with engine.connect() as conn:
+            return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+    def test_sqlite_pragmas_on_connect(self):
+        engine = make_engine(self.url)
+        self.assertEqual(self.pragma(engine, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(engine, "synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma(engine, "busy_timeout"), settings.SQLITE_BUSY_TIMEOUT_MS)
+        self.assertEqual(self.pragma(engine, "cache_size"), -settings.SQLITE_CACHE_SIZE_MB * 1024)
+        self.assertEqual(self.pragma(engine, "mmap_size"), settings.SQLITE_MMAP_SIZE_MB * 1024 * 1024)
+        engine.dispose()
+
+    def test_in_memory_sqlite_skips_wal(self):
+        engine = make_engine("sqlite://")
+        self.assertEqual(self.pragma(engine, "journal_mode"), "memory")
+        self.assertEqual(self.pragma(engine, "synchronous"), 1)
+        engine.dispose()
+
+    def test_read_only_engine_refuses_writes(self):
+        writer = make_engine(self.url)
+        SQLModel.metadata.create_all(writer)
+        replica = make_engine(self.url, read_only=True)
+        with Session(replica) as session:
+            session.add(Business(name="Nope"))
+            with self.assertRaises(OperationalError):
+                session.commit()
+        writer.dispose()
+        replica.dispose()
+
+    def test_server_database_pool_options(self):
+        with patch.object(settings, "DB_POOL_SIZE", 7), patch.object(settings, "DB_POOL_RECYCLE_SECONDS", 60):
+            options = engine_options("postgresql://verity@db/verity")
+            replica = engine_options("postgresql://verity@replica/verity", read_only=True)
+        self.assertEqual((options["pool_size"], options["pool_recycle"], options["pool_pre_ping"]), (7, 60, True))
+        self.assertNotIn("connect_args", options)
+        self.assertEqual(replica["connect_args"], {"options": "-c default_transaction_read_only=on"})
+        self.assertEqual(engine_options(self.url), {})
+
+
+class TestReadSession(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(self.tmp.name, 'verity.db')}"
+        self.engine = make_engine(url)
+        SQLModel.metadata.create_all(self.engine)
+        with Session(self.engine) as session:
+            session.add(Business(id=1, name="Test Traders"))
+            session.commit()
+        self.replica = make_engine(url, read_only=True)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.replica.dispose()
+        self.tmp.cleanup()
+
+    def test_defaults_to_the_primary(self):
+        with patch("db.read_engine", self.engine), patch("db.engine", self.engine):
+            session = next(get_read_session())
+        self.assertIs(session.get_bind(), self.engine)
+        self.assertFalse(session.info["read_only"])
+        session.close()
+
+    def test_metrics_on_a_replica_are_not_stored(self):
+        with patch("db.read_engine", self.replica), patch("db.engine", self.engine):
+            sessions = get_read_session()
+            session = next(sessions)
+            metrics, version = get_business_metrics(session, 1)
+            sessions.close()
+        self.assertEqual((metrics["business_id"], version), (1, 1))
+        with Session(self.engine) as session:
+            snapshot = session.get(MetricsSnapshot, 1)
+            self.assertEqual((snapshot.data_version, snapshot.payload), (1, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
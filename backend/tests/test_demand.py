@@ -0,0 +1,175 @@
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from db import get_read_session, get_session
+from models.demand_signal import DemandSignal
+from models.transaction import Transaction
+from models.weekly_rollup import WeeklyRollup
+from routers import risk as risk_router
+from services.demand_services import demand_signals, detect, update_demand_signals
+from services.rollup_services import rebuild_weekly_rollups, week_of
+from tests.test_cashflow import LedgerTestCase
+
+TODAY = date(2024, 6, 26) # a Wednesday; the current week starts 2024-06-24
+CURRENT_WEEK = date(2024, 6, 24)
+
+
+def fresh_state(n):
+    return {k: np.zeros(n) for k in ("baseline", "variance", "weeks", "cusum_up", "cusum_down")}
+
+
+class TestDetect(unittest.TestCase):
+
+    def test_spike_trend_and_warm_up(self):
+        rng = np.random.default_rng(0)
+        noise = rng.normal(0, 20, size=(4, 30))
+        series = 1000 + noise
+        series[1, 25] = 2000                       # one-off spike
+        series[2, 20:] += 300                      # sustained step up
+        series[3, 2] = 5000                        # spike during warm-up: ignored
+        state = fresh_state(4)
+        result = detect(series, np.zeros(4, dtype=np.int64), state)
+        self.assertEqual(result["signal"].tolist(), [0, 1, 2, 0])
+        self.assertEqual(result["signal_at"][1], 25)
+        self.assertGreaterEqual(result["signal_at"][2], 20)
+        self.assertTrue(np.all(state["weeks"] == 30))
+        self.assertAlmostEqual(state["baseline"][0], 1000, delta=30)
+
+    def test_split_runs_match_one_run(self):
+        rng = np.random.default_rng(1)
+        series = 500 + rng.normal(0, 50, size=(3, 40))
+        series[0, 30:] *= 0.5
+        active_from = np.array([0, 5, 12])
+        one = fresh_state(3)
+        whole = detect(series, active_from, one)
+        two = fresh_state(3)
+        detect(series[:, :17], active_from, two)
+        rest = detect(series[:, 17:], np.maximum(active_from - 17, 0), two)
+        for key in one:
+            np.testing.assert_allclose(one[key], two[key])
+        self.assertEqual(whole["signal"][0], 3)
+        self.assertEqual(rest["signal"][0], 3)
+
+
+class DemandTestCase(LedgerTestCase):
+
+    def sales(self, category, amounts, first_week):
+        """One inflow per week, on the Wednesday of consecutive weeks from `first_week`."""
+        for i, amount in enumerate(amounts):
+            when = datetime.combine(first_week + timedelta(days=7 * i + 2), datetime.min.time())
+            self.session.add(Transaction(business_id=1, direction="inflow", category=category, amount=amount, date=when))
+        self.session.commit()
+
+
+class TestWeeklyRollup(DemandTestCase):
+
+    def test_hook_matches_rebuild(self):
+        self.sales("sales", [100, 200, 300], date(2024, 5, 6))
+        self.session.add(Transaction(business_id=1, direction="outflow", category="rent", amount=50,
+                                     date=datetime(2024, 5, 12, 18)))  # Sunday: still the week of 6 May
+        self.session.commit()
+        tx = self.session.exec(select(Transaction).where(Transaction.amount == 300)).one()
+        tx.date = datetime(2024, 5, 8)
+        self.session.commit()
+
+        def rows():
+            return sorted((str(r.week), r.direction, r.category, r.total, r.count)
+                          for r in self.session.exec(select(WeeklyRollup)).all())
+
+        live = rows()
+        self.assertEqual(live, [("2024-05-06", "inflow", "sales", 400.0, 2), ("2024-05-06", "outflow", "rent", 50.0, 1),
+                                ("2024-05-13", "inflow", "sales", 200.0, 1)])
+        rebuild_weekly_rollups(self.session.connection())
+        self.session.commit()
+        self.assertEqual(rows(), live)
+        self.assertEqual(week_of("2024-05-12 18:00:00"), date(2024, 5, 6))
+
+
+class TestDemandSignals(DemandTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.seed()
+
+    def seed(self):
+        start = CURRENT_WEEK - timedelta(weeks=16)
+        self.sales("sweets", [1000, 1020, 990, 1010, 1005, 995, 1000, 1015, 985, 1000, 1010, 990, 1000, 1005, 3000, 1000],
+                   start)
+        self.sales("snacks", [800, 810, 790, 805, 795, 800, 810, 790, 805, 800, 795, 810, 500, 480, 460, 440], start)
+        self.sales("tea", [200, 210], CURRENT_WEEK - timedelta(weeks=2))
+
+    def state(self, category):
+        return self.session.exec(select(DemandSignal).where(DemandSignal.category == category)).one()
+
+    def test_signals_are_detected_and_stored(self):
+        stats = update_demand_signals(self.session, 1, today=TODAY)
+        self.assertEqual(stats["categories"], 3)
+        sweets, snacks, tea = self.state("sweets"), self.state("snacks"), self.state("tea")
+        self.assertEqual((sweets.signal, sweets.signal_week), ("spike", CURRENT_WEEK - timedelta(weeks=2)))
+        self.assertEqual(snacks.signal, "trend_down")
+        self.assertEqual((tea.signal, tea.weeks), (None, 2))
+        self.assertEqual(sweets.last_week, CURRENT_WEEK - timedelta(weeks=1))
+
+        signals = demand_signals(self.session, 1, today=TODAY)
+        by_category = {s["product_category"]: s for s in signals}
+        self.assertEqual(set(by_category), {"sweets", "snacks"})
+        self.assertEqual((by_category["sweets"]["trend"], by_category["snacks"]["trend"]), ("up", "down"))
+        self.assertTrue(all(0 < s["confidence"] <= 1 for s in signals))
+        self.assertFalse(by_category["sweets"]["provisional"])
+
+    def test_incremental_runs_only_fold_new_weeks(self):
+        update_demand_signals(self.session, 1, today=TODAY - timedelta(weeks=5))
+        self.assertEqual(update_demand_signals(self.session, 1, today=TODAY - timedelta(weeks=5))["weeks"], 0)
+        stats = update_demand_signals(self.session, 1, today=TODAY)
+        self.assertEqual(stats["weeks"], 5)
+        incremental = {c: (round(self.state(c).baseline, 6), self.state(c).signal) for c in ("sweets", "snacks", "tea")}
+
+        for row in self.session.exec(select(DemandSignal)).all():
+            self.session.delete(row)
+        self.session.commit()
+        update_demand_signals(self.session, 1, today=TODAY)
+        self.assertEqual({c: (round(self.state(c).baseline, 6), self.state(c).signal) for c in incremental},
+                         incremental)
+
+    def test_provisional_spike_and_expiry(self):
+        update_demand_signals(self.session, 1, today=TODAY)
+        self.session.add(Transaction(business_id=1, direction="inflow", category="snacks", amount=2500.0,
+                                     date=datetime.combine(TODAY, datetime.min.time())))
+        self.session.commit()
+        snacks = next(s for s in demand_signals(self.session, 1, today=TODAY) if s["product_category"] == "snacks")
+        self.assertEqual((snacks["signal"], snacks["provisional"], snacks["weekly_sales"]), ("spike", True, 2500.0))
+
+        later = TODAY + timedelta(weeks=6)
+        self.assertEqual([s["product_category"] for s in demand_signals(self.session, 1, today=later)], [])
+
+
+class TestDemandRoutes(DemandTestCase):
+
+    def setUp(self):
+        super().setUp()
+        TestDemandSignals.seed(self)
+        update_demand_signals(self.session, 1, today=TODAY)
+        app = FastAPI()
+        app.include_router(risk_router.router, prefix="/risk")
+        app.dependency_overrides[get_session] = lambda: self.session
+        app.dependency_overrides[get_read_session] = lambda: self.session
+        self.client = TestClient(app)
+
+    def test_analyze_is_fully_local_for_a_business(self):
+        llm = AsyncMock()
+        with patch.object(risk_router, "aanalyze_risk_and_demand", llm):
+            body = self.client.post("/risk/analyze", json={"history": [], "context": {"business_id": 1}}).json()
+        llm.assert_not_called()
+        self.assertEqual(body["risk_analysis"]["late_payment_risk"], [])
+        self.assertEqual(body["risk_analysis"]["high_demand_signals"],
+                         self.client.get("/risk/1/demand").json()["high_demand_signals"])
+
+
+if __name__ == "__main__":
+    unittest.main()
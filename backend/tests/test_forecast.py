@@ -0,0 +1,84 @@
+import unittest
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from agents import forecast_agent
+from models.business import Business
+from models.invoice import Invoice
+from models.transaction import Transaction
+from services.forecast_services import forecast_business, forecast_businesses, smooth_and_project
+from tests.test_cashflow import LedgerTestCase
+
+TODAY = date(2024, 6, 30)
+
+
+class TestSmoothing(unittest.TestCase):
+
+    def test_weekly_pattern_is_projected(self):
+        # 1000 on Mondays, 100 on other days; column 0 is a Monday
+        week = np.array([1000.0] + [100.0] * 6)
+        series = np.tile(week, 12)[None, :]
+        point, sigma = smooth_and_project(series, start_dow=0, horizon=14)
+        np.testing.assert_allclose(point[0], np.tile(week, 2), rtol=0.02)
+        self.assertLess(sigma[0], 10.0)
+
+    def test_rows_are_independent(self):
+        series = np.vstack([np.full(56, 10.0), np.full(56, 500.0), np.zeros(56)])
+        point, _ = smooth_and_project(series, start_dow=3, horizon=30)
+        np.testing.assert_allclose(point[:, 0], [10.0, 500.0, 0.0], atol=1e-6)
+
+
+class TestForecastBusinesses(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.session.add(Business(id=2, name="Quiet Shop"))
+        for days_ago in range(1, 120):
+            when = datetime.combine(TODAY - timedelta(days=days_ago), datetime.min.time())
+            self.session.add(Transaction(business_id=1, direction="inflow", amount=1000.0, date=when))
+            self.session.add(Transaction(business_id=1, direction="outflow", amount=400.0, date=when))
+        self.session.add(Invoice(business_id=1, amount=5000.0, type="receivable",
+                                 due_date=TODAY + timedelta(days=10)))
+        self.session.add(Invoice(business_id=1, amount=2000.0, type="payable",
+                                 due_date=TODAY + timedelta(days=45)))
+        self.session.add(Invoice(business_id=1, amount=750.0, type="receivable", status="overdue",
+                                 due_date=TODAY - timedelta(days=5)))
+        self.session.add(Invoice(business_id=1, amount=9999.0, type="receivable", status="paid",
+                                 due_date=TODAY + timedelta(days=3)))
+        self.session.commit()
+
+    def test_projection_with_known_flows(self):
+        forecast = forecast_business(self.session, 1, today=TODAY)
+        h30, h60 = forecast["horizons"]["30"], forecast["horizons"]["60"]
+        self.assertAlmostEqual(h30["inflow"], 30 * 1000.0 + 5000.0, delta=50)
+        self.assertAlmostEqual(h30["outflow"], 30 * 400.0, delta=50)
+        self.assertEqual((h30["known_inflow"], h30["known_outflow"]), (5000.0, 0.0))
+        self.assertEqual(h60["known_outflow"], 2000.0)
+        self.assertLessEqual(h30["net_low"], h30["net"])
+        self.assertGreaterEqual(h30["net_high"], h30["net"])
+        self.assertEqual(forecast["overdue_receivables"], 750.0)
+        self.assertEqual(forecast["trend"], "improving")  # invoice inflow on top of a flat history
+        self.assertEqual(set(forecast["horizons"]), {"30", "60", "90"})
+
+    def test_batch_matches_single_and_handles_empty_history(self):
+        batch = forecast_businesses(self.session, [2, 1], today=TODAY)
+        self.assertEqual(batch[1], forecast_business(self.session, 1, today=TODAY))
+        quiet = batch[2]
+        self.assertEqual((quiet["history_days"], quiet["horizons"]["90"]["net"], quiet["trend"]),
+                         (0, 0.0, "stable"))
+
+    def test_unknown_business(self):
+        with self.assertRaises(ValueError):
+            forecast_business(self.session, 99)
+
+    def test_fallback_narrates_the_numbers(self):
+        forecast = forecast_business(self.session, 1, today=TODAY)
+        explanation = forecast_agent._with_fallback({"error": "LLM client not initialized"}, forecast)
+        self.assertTrue(explanation["fallback"])
+        self.assertEqual(explanation["trend"], forecast["trend"])
+        self.assertIn(f"{forecast['horizons']['30']['net']:,.0f}", explanation["summary"])
+
+
+if __name__ == "__main__":
+    unittest.main()
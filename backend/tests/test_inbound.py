@@ -0,0 +1,214 @@
+import asyncio
+import unittest
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from config import settings
+from models.contact import Contact
+from models.invoice import Invoice
+from models.raw_event import RawEvent
+from models.transaction import Transaction
+from routers import webhooks
+from services import inbound_services
+from services.inbound_services import classify_reply, reply_amount
+from tests.test_messaging import MessageQueueTestCase, ScriptedTransport
+from workers.inbound import InboundConsumer
+from workers.messaging import make_idempotency_key
+
+
+class TestClassifyReply(unittest.TestCase):
+
+    def test_confirmations_promises_and_other(self):
+        for text in ["Paid", "payment done via gpay", "Transferred 1500, UTR 412345678901",
+                     "bhai paise bhej diya", "Maine kar diya payment",
+                     "payment done, will share receipt soon", "I already paid but didn't get receipt"]:
+            self.assertEqual(classify_reply(text), "payment_confirmation", text)
+        for text in ["will pay tomorrow", "kal kar dunga", "Next week pakka", "not paid yet, will pay tomorrow",
+                     "Will pay once my cheque is cleared"]:
+            self.assertEqual(classify_reply(text), "payment_promise", text)
+        for text in ["not paid yet, amount is wrong", "Who is this?", "", "Done ji", "Is it done?",
+                     "Let me know once done", "What is the UTR for your account?", "payment nahi hua"]:
+            self.assertEqual(classify_reply(text), "other", text)
+
+    def test_reply_amount(self):
+        self.assertEqual(reply_amount("Paid Rs. 1,500 via UPI"), 1500.0)
+        self.assertEqual(reply_amount("sent 750 rupees for INV-12, UTR 412345678901"), 750.0)
+        self.assertEqual(reply_amount("2,000/- transferred"), 2000.0)
+        for text in ["paid INV-12, ref 412345678901", "Payment done on 15/06", "Sent payment 12 June",
+                     "paid via gpay ref 4521", "Paid for 2 invoices", "sent 750 for INV-12"]:
+            self.assertIsNone(reply_amount(text), text)
+
+
+class InboundTestCase(MessageQueueTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.consumer = InboundConsumer(self.engine, batch_size=10, max_attempts=2)
+        app = FastAPI()
+        app.include_router(webhooks.router, prefix="/webhooks")
+        self.patch = patch.object(webhooks, "inbound_consumer", self.consumer)
+        self.patch.start()
+        self.client = TestClient(app)
+        with Session(self.engine) as session:
+            raju = Contact(business_id=1, name="Raju", phone="+919800000001")
+            session.add(raju)
+            session.commit()
+            self.invoice = Invoice(business_id=1, contact_id=raju.id, amount=1500.0, type="receivable",
+                                   status="overdue", due_date=date.today() - timedelta(days=5))
+            other = Invoice(business_id=1, contact_id=raju.id, amount=900.0, type="receivable",
+                            status="pending", due_date=date.today() + timedelta(days=5))
+            session.add_all([self.invoice, other])
+            session.commit()
+            self.invoice_id, self.other_id = self.invoice.id, other.id
+
+    def tearDown(self):
+        self.patch.stop()
+        super().tearDown()
+
+    def post(self, body, sender="whatsapp:+919800000001", sid="SM1"):
+        data = {"From": sender, "Body": body, "To": "whatsapp:+14155238886"}
+        if sid:
+            data["MessageSid"] = sid
+        return self.client.post("/webhooks/whatsapp", data=data)
+
+    def remind(self, invoice_id):
+        queue = self.make_queue(ScriptedTransport({}))
+        asyncio.run(queue.submit({"business_id": 1, "invoice_id": invoice_id, "to": "+919800000001",
+                                  "body": "Reminder", "idempotency_key": make_idempotency_key("r", invoice_id)}))
+
+    def events(self):
+        with Session(self.engine) as session:
+            return session.exec(select(RawEvent).order_by(RawEvent.id)).all()
+
+    def transactions(self):
+        with Session(self.engine) as session:
+            return session.exec(select(Transaction)).all()
+
+    def invoice_status(self, invoice_id):
+        with Session(self.engine) as session:
+            invoice = session.get(Invoice, invoice_id)
+            return invoice.status, invoice.amount_paid
+
+
+class TestWhatsAppWebhook(InboundTestCase):
+
+    def test_webhook_logs_once_per_message_sid_and_returns_twiml(self):
+        responses = [self.post("Paid", sid="SMdup") for _ in range(5)]
+        self.post("Paid again", sid="SMother")
+        self.assertTrue(all(r.status_code == 200 for r in responses))
+        self.assertIn("<Response>", responses[0].text)
+        self.assertEqual(responses[0].headers["content-type"], "application/xml")
+        events = self.events()
+        self.assertEqual([(e.external_id, e.status, e.sender) for e in events],
+                         [("SMdup", "received", "+919800000001"), ("SMother", "received", "+919800000001")])
+        self.assertIn('"To": "whatsapp:+14155238886"', events[0].payload)
+        self.assertEqual(self.transactions(), [])  # nothing processed inline
+
+    def test_concurrent_appends_are_group_committed_while_running(self):
+        async def scenario():
+            self.consumer.poll_interval = 60
+            with patch.object(self.consumer, "_process_batch", return_value=0):
+                self.consumer.start()
+                results = await asyncio.gather(*[
+                    self.consumer.append("whatsapp", "Paid", sender="+919800000001", external_id=f"SM{i % 5}")
+                    for i in range(20)
+                ])
+                await self.consumer.stop()
+            return results
+
+        with patch.object(self.consumer, "_append_many", wraps=self.consumer._append_many) as append_many:
+            results = asyncio.run(scenario())
+        self.assertLess(append_many.call_count, 20)
+        self.assertEqual(sum(1 for _, created in results if created), 5)
+        self.assertEqual(len({event_id for event_id, _ in results}), 5)
+        self.assertEqual(len(self.events()), 5)
+
+    def test_reply_to_reminder_pays_the_reminded_invoice(self):
+        self.remind(self.invoice_id)
+        self.post("Payment done bhai, sent Rs 1500 via PhonePe", sid="SM1")
+        self.post("Payment done bhai, sent Rs 1500 via PhonePe", sid="SM1")  # Twilio retry
+        self.assertEqual(asyncio.run(self.consumer.run_pending()), 1)
+
+        event = self.events()[0]
+        self.assertEqual((event.status, event.kind, event.business_id, event.invoice_id),
+                         ("processed", "payment_confirmation", 1, self.invoice_id))
+        [tx] = self.transactions()
+        self.assertEqual((tx.amount, tx.direction, tx.invoice_id, tx.method, tx.id),
+                         (1500.0, "inflow", self.invoice_id, "upi", event.transaction_id))
+        self.assertEqual(self.invoice_status(self.invoice_id), ("paid", 1500.0))
+
+    def test_partial_payment_with_invoice_reference(self):
+        self.post(f"sent Rs 400 for INV-{self.other_id}")
+        asyncio.run(self.consumer.run_pending())
+        self.assertEqual(self.invoice_status(self.other_id), ("partial", 400.0))
+        self.assertEqual(self.invoice_status(self.invoice_id), ("overdue", 0.0))
+
+    def test_contact_reply_matched_by_amount(self):
+        self.post("paid Rs 900")
+        asyncio.run(self.consumer.run_pending())
+        self.assertEqual(self.invoice_status(self.other_id), ("paid", 900.0))
+
+    def test_confirmation_without_amount_is_left_for_review(self):
+        self.remind(self.invoice_id)
+        self.post("Payment done on 15/06", sid="SM1")
+        self.post("Is it done?", sid="SM2")
+        asyncio.run(self.consumer.run_pending())
+        confirmation, question = self.events()
+        self.assertEqual((confirmation.status, confirmation.kind, confirmation.invoice_id, confirmation.transaction_id),
+                         ("needs_review", "payment_confirmation", self.invoice_id, None))
+        self.assertEqual((question.status, question.kind), ("processed", "other"))
+        self.assertEqual(self.transactions(), [])
+        self.assertEqual(self.invoice_status(self.invoice_id), ("overdue", 0.0))
+
+    def test_failed_event_is_applied_once_on_retry(self):
+        self.remind(self.invoice_id)
+        self.post("Paid Rs 1500")
+        sweep, calls = inbound_services.sweep_invoice_statuses, []
+
+        def flaky_sweep(*args, **kwargs):
+            # fails after the transaction is flushed, then succeeds on the retry
+            calls.append(args)
+            if len(calls) == 1:
+                raise RuntimeError("db down")
+            return sweep(*args, **kwargs)
+
+        with patch.object(inbound_services, "sweep_invoice_statuses", flaky_sweep):
+            self.assertEqual(asyncio.run(self.consumer.run_pending()), 2)
+        self.assertEqual(self.events()[0].attempts, 2)
+        self.assertEqual([tx.amount for tx in self.transactions()], [1500.0])
+        self.assertEqual((self.events()[0].status, self.invoice_status(self.invoice_id)),
+                         ("processed", ("paid", 1500.0)))
+
+    def test_promises_are_classified_without_transactions(self):
+        self.post("will pay tomorrow")
+        asyncio.run(self.consumer.run_pending())
+        self.assertEqual((self.events()[0].status, self.events()[0].kind), ("processed", "payment_promise"))
+        self.assertEqual(self.transactions(), [])
+
+    def test_unknown_senders(self):
+        self.post("Rs.250 credited to A/c XX12 by UPI from Anita", sender="whatsapp:+911234", sid="SMa")
+        asyncio.run(self.consumer.run_pending())
+        self.assertEqual((self.events()[0].status, self.events()[0].error), ("ignored", "unknown sender"))
+
+        with patch.object(settings, "WHATSAPP_DEFAULT_BUSINESS_ID", 1):
+            self.post("Rs.250 credited to A/c XX12 by UPI from Anita", sender="whatsapp:+911234", sid="SMb")
+            asyncio.run(self.consumer.run_pending())
+        event = self.events()[1]
+        self.assertEqual((event.status, event.kind, event.business_id), ("processed", "transaction", 1))
+        [tx] = self.transactions()
+        self.assertEqual((tx.amount, tx.direction, tx.source), (250.0, "inflow", "whatsapp"))
+
+    def test_failures_are_retried_then_marked_failed(self):
+        self.post("Paid Rs 1500")
+        with patch("services.inbound_services.save_parsed_transaction", side_effect=RuntimeError("db down")):
+            self.assertEqual(asyncio.run(self.consumer.run_pending()), 2)
+        event = self.events()[0]
+        self.assertEqual((event.status, event.attempts, event.error), ("failed", 2, "db down"))
+
+
+if __name__ == "__main__":
+    unittest.main()
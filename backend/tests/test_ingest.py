@@ -0,0 +1,238 @@
+import asyncio
+import io
+import json
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine, func, select
+
+from agents import parser_agent
+from models.business import Business
+from models.contact import Contact
+from models.invoice import Invoice
+from models.monthly_rollup import MonthlyRollup
+from models.transaction import Transaction
+from routers import ingest
+from services.parser_services import save_parsed_transaction, save_parsed_transactions_bulk
+from services.transaction_services import guess_column_mapping, invert_column_mapping, normalize_row
+from utils.datetime import DateParser, parse_date
+from utils.parsing import parse_signed_amount
+
+
+class TestBatchParsing(unittest.TestCase):
+
+    def test_pack_batches_respects_budget_and_cap(self):
+        items = [(i, "x" * 400) for i in range(10)]  # ~108 tokens each
+        batches = parser_agent._pack_batches(items, token_budget=250, max_items=50)
+        self.assertEqual([len(b) for b in batches], [2, 2, 2, 2, 2])
+        batches = parser_agent._pack_batches(items, token_budget=10_000, max_items=4)
+        self.assertEqual([len(b) for b in batches], [4, 4, 2])
+        self.assertEqual([i for b in batches for i, _ in b], list(range(10)))
+
+    def test_results_mapped_by_index_and_only_failures_retried(self):
+        calls = []
+
+        async def fake_llm(prompt, content, agent=None):
+            batch = json.loads(content)
+            calls.append([item["i"] for item in batch])
+            results = [
+                {"i": item["i"], "direction": "inflow", "amount": float(item["i"]), "method": "cash"}
+                for item in reversed(batch)          # out of order on purpose
+                if len(calls) > 1 or item["i"] != 2  # first call drops index 2
+            ]
+            return {"results": results}
+
+        texts = ["cash from stall 0", "You paid ₹450 to Sharma Stores", "cash from stall 2", "cash from stall 3"]
+        with patch("agents.parser_agent.agenerate_content", side_effect=fake_llm):
+            parsed, stats = asyncio.run(parser_agent.aparse_transactions_batch(texts))
+
+        self.assertEqual(calls, [[0, 2, 3], [2]])
+        self.assertEqual([p["amount"] for p in parsed], [0.0, 450.0, 2.0, 3.0])
+        self.assertEqual(parsed[1]["parser"], "rules")
+        self.assertEqual(stats, {"fast_path": 1, "llm_calls": 2, "retried": 1, "failed": 0})
+
+    def test_unparsed_items_get_fallback(self):
+        async def broken_llm(prompt, content, agent=None):
+            return {"error": "LLM client not initialized"}
+
+        with patch("agents.parser_agent.agenerate_content", side_effect=broken_llm):
+            parsed, stats = asyncio.run(parser_agent.aparse_transactions_batch(["???"]))
+        self.assertIn("parsing_error", parsed[0])
+        self.assertEqual(stats["failed"], 1)
+
+
+class TestStatementUpload(unittest.TestCase):
+
+    CSV = (
+        "Txn Date,Narration,Withdrawal Amt,Deposit Amt,Closing Balance\n"
+        "01/04/2024,UPI/Ramesh Traders,,\"1,500.00\",10000\n"
+        "02/04/2024,NEFT rent April,\"8,000.00\",,2000\n"
+        "03/04/2024,Opening balance note,,,2000\n"
+        "15/05/2024,CASH DEP,,700,2700\n"
+    )
+
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        SQLModel.metadata.create_all(self.engine)
+        with Session(self.engine) as session:
+            session.add(Business(id=1, name="Test Traders"))
+            session.commit()
+        app = FastAPI()
+        app.include_router(ingest.router, prefix="/ingest")
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def upload(self, content: bytes, filename: str, mapping):
+        async def fake_mapping(headers, rows):
+            return mapping
+
+        with patch("routers.ingest.engine", self.engine), \
+                patch("routers.ingest.amap_csv_columns_with_ai", side_effect=fake_mapping), \
+                patch("routers.ingest.settings.INGEST_CHUNK_SIZE", 2):
+            response = self.client.post(
+                "/ingest/csv/upload", data={"business_id": "1"},
+                files={"file": (filename, io.BytesIO(content))},
+            )
+        self.assertEqual(response.status_code, 200, response.text)
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_csv_upload_streams_progress_and_inserts(self):
+        events = self.upload(self.CSV.encode("utf-8-sig"), "statement.csv", {
+            "date_column": "Txn Date", "debit_column": "Withdrawal Amt",
+            "credit_column": "Deposit Amt", "description_column": "Narration",
+        })
+        self.assertEqual(events[0]["event"], "mapping")
+        self.assertEqual([e["event"] for e in events[1:]], ["progress", "done"])
+        self.assertEqual(events[-1]["inserted"], 3)
+        self.assertEqual(events[-1]["skipped"], 1)
+
+        with Session(self.engine) as session:
+            txs = session.exec(select(Transaction).order_by(Transaction.date)).all()
+            self.assertEqual([(t.direction, t.amount, t.method) for t in txs],
+                             [("inflow", 1500.0, "upi"), ("outflow", 8000.0, "bank_transfer"), ("inflow", 700.0, "cash")])
+            self.assertEqual(txs[0].date, datetime(2024, 4, 1))
+            rollup = session.exec(select(func.sum(MonthlyRollup.total)).where(MonthlyRollup.direction == "inflow")).one()
+            self.assertEqual(rollup, 2200.0)
+
+    def test_xlsx_upload_with_heuristic_mapping_when_llm_fails(self):
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["Date", "Description", "Amount"])
+        ws.append([datetime(2024, 6, 1), "Sale", 250])
+        ws.append([datetime(2024, 6, 2), "Supplies", -90.5])
+        buf = io.BytesIO()
+        wb.save(buf)
+
+        events = self.upload(buf.getvalue(), "statement.xlsx", {"error": "LLM client not initialized"})
+        self.assertEqual(events[0]["columns"], {"date": "Date", "amount": "Amount", "description": "Description"})
+        self.assertEqual(events[-1]["inserted"], 2)
+        with Session(self.engine) as session:
+            sources = session.exec(select(Transaction.source)).all()
+            self.assertEqual(set(sources), {"xlsx"})
+
+    def test_row_normalisation(self):
+        headers = ["Value Date", "Particulars", "Amount", "Dr/Cr"]
+        mapping = guess_column_mapping(headers)
+        self.assertEqual(mapping["date_column"], "Value Date")
+        self.assertEqual(mapping["amount_column"], "Amount")
+        index_map = invert_column_mapping(mapping, headers)
+        row = normalize_row(["05-Jan-24", "POS 1234 DMART", "450.00 Dr", "Dr"], index_map, 1)
+        self.assertEqual((row["direction"], row["amount"], row["method"]), ("outflow", 450.0, "card"))
+        self.assertIsNone(normalize_row(["not a date", "x", "10"], index_map, 1))
+        self.assertEqual(parse_signed_amount("(1,200)"), -1200.0)
+
+    def test_dr_cr_indicator_column_sets_the_sign(self):
+        headers = ["Date", "Narration", "Amount", "Cr/Dr"]
+        mapping = guess_column_mapping(headers)
+        self.assertEqual((mapping["dr_cr_column"], mapping["debit_column"], mapping["credit_column"]),
+                         ("Cr/Dr", None, None))
+        index_map = invert_column_mapping(mapping, headers)
+        rows = [["01/04/2024", "CHQ DEPOSIT 000123", "1,500.00", "CR"],
+                ["02/04/2024", "Cashback reversal", "80", "Dr"],
+                ["03/04/2024", "ATM WDL", "500", "D"]]
+        self.assertEqual([(r["direction"], r["amount"], r["method"])
+                          for r in (normalize_row(row, index_map, 1) for row in rows)],
+                         [("inflow", 1500.0, "other"), ("outflow", 80.0, "other"), ("outflow", 500.0, "cash")])
+
+    def test_date_format_is_remembered_per_import(self):
+        # an ambiguous date follows the format its own file established
+        us, indian = DateParser(), DateParser()
+        self.assertEqual(us("Jan 05, 2024"), datetime(2024, 1, 5))
+        self.assertEqual(indian("13/04/2024"), datetime(2024, 4, 13))
+        self.assertEqual(indian("04/05/2024"), datetime(2024, 5, 4))
+        self.assertEqual(indian.last_format, "%d/%m/%Y")
+        self.assertEqual(us.last_format, "%b %d, %Y")
+        self.assertEqual(parse_date("2024-04-13"), datetime(2024, 4, 13))
+
+
+class TestBulkSave(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        SQLModel.metadata.create_all(self.engine)
+        self.session = Session(self.engine)
+        self.session.add(Business(id=1, name="Test Traders"))
+        self.session.add(Contact(business_id=1, name="Ramesh"))
+        self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def test_bulk_save_matches_per_row_path(self):
+        parsed = [
+            {"direction": "inflow", "amount": 500.0, "method": "upi", "counterparty_name": "Ramesh"},
+            {"direction": "outflow", "amount": 120.0, "counterparty_name": "Sharma Stores", "category": "inventory"},
+            {"direction": "inflow", "amount": 900.0, "counterparty_name": "Sharma Stores",
+             "invoice": {"has_invoice": True, "due_date": "2024-07-01"}},
+            {"direction": "outflow", "amount": 40.0},
+        ]
+        items = [(p, f"msg {i}") for i, p in enumerate(parsed)]
+        ids = save_parsed_transactions_bulk(self.session, 1, items, "batch")
+
+        self.assertEqual(len(ids), 4)
+        txs = {t.id: t for t in self.session.exec(select(Transaction)).all()}
+        self.assertEqual([txs[i].raw_text for i in ids], ["msg 0", "msg 1", "msg 2", "msg 3"])
+        self.assertEqual(txs[ids[1]].category, "inventory")
+
+        contacts = self.session.exec(select(Contact.name)).all()
+        self.assertEqual(sorted(contacts), ["Ramesh", "Sharma Stores"])
+
+        inv = self.session.exec(select(Invoice)).one()
+        # raising an invoice is not a payment against it
+        self.assertIsNone(txs[ids[2]].invoice_id)
+        self.assertEqual((inv.status, inv.amount_paid), ("overdue", 0.0))
+        self.assertEqual((inv.type, inv.due_date.isoformat()), ("receivable", "2024-07-01"))
+        self.assertEqual(inv.contact_id, self.session.exec(
+            select(Contact.id).where(Contact.name == "Sharma Stores")).one())
+
+        # rollup updated exactly once per row, like the ORM path
+        save_parsed_transaction(self.session, 1, parsed[0], "msg 4", "batch")
+        total = self.session.exec(select(func.sum(MonthlyRollup.total))).one()
+        self.assertEqual(total, 2060.0)
+
+    def test_invoice_paid_in_the_same_message_is_linked(self):
+        parsed = {"direction": "inflow", "amount": 900.0, "counterparty_name": "Sharma Stores",
+                  "invoice": {"has_invoice": True, "due_date": "2024-07-01", "is_paid": True}}
+        bulk_id = save_parsed_transactions_bulk(self.session, 1, [(parsed, "msg 0")], "batch")[0]
+        tx = save_parsed_transaction(self.session, 1, parsed, "msg 1", "batch")
+        invoices = self.session.exec(select(Invoice).order_by(Invoice.id)).all()
+        self.assertEqual([self.session.get(Transaction, bulk_id).invoice_id, tx.invoice_id],
+                         [i.id for i in invoices])
+        self.assertEqual([(i.status, i.amount_paid) for i in invoices], [("paid", 900.0)] * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+import asyncio
+import unittest
+from datetime import date, datetime
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from db import get_read_session, get_session
+from models.invoice import Invoice
+from models.invoice_event import InvoiceEvent
+from models.transaction import Transaction
+from routers import business
+from services import invoice_services
+from services.invoice_services import derive_status, recompute_invoice_status, sweep_invoice_statuses
+from services.metrics_services import get_data_version
+from tests.test_cashflow import LedgerTestCase
+from workers.scheduler import Scheduler
+
+TODAY = date(2025, 3, 10)
+
+
+class InvoiceTestCase(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.received = []
+        self.listeners = patch.object(invoice_services, "STATUS_LISTENERS", [self.received.extend])
+        self.listeners.start()
+
+    def tearDown(self):
+        self.listeners.stop()
+        super().tearDown()
+
+    def add_invoice(self, amount, due, kind="receivable", status="pending", business_id=1):
+        invoice = Invoice(business_id=business_id, amount=amount, type=kind, status=status, due_date=due)
+        self.session.add(invoice)
+        self.session.commit()
+        return invoice.id
+
+    def pay(self, invoice_id, amount, direction="inflow"):
+        self.session.add(Transaction(business_id=1, invoice_id=invoice_id, direction=direction,
+                                     amount=amount, date=datetime(2025, 3, 1)))
+        self.session.commit()
+
+    def statuses(self):
+        self.session.expire_all()
+        return {i.id: (i.status, i.amount_paid) for i in self.session.exec(select(Invoice)).all()}
+
+    def sweep(self, **kwargs):
+        return sweep_invoice_statuses(self.session, today=TODAY, **kwargs)
+
+
+class TestDeriveStatus(unittest.TestCase):
+
+    def test_rules(self):
+        self.assertEqual(derive_status(100, 0, date(2025, 3, 20), TODAY), "pending")
+        self.assertEqual(derive_status(100, 40, date(2025, 3, 20), TODAY), "partial")
+        self.assertEqual(derive_status(100, 40, date(2025, 3, 1), TODAY), "overdue")
+        self.assertEqual(derive_status(100, 0, date(2025, 3, 10), TODAY), "pending")  # due today
+        self.assertEqual(derive_status(100, 99.995, date(2025, 3, 1), TODAY), "paid")
+        self.assertEqual(derive_status(100, 0, None, TODAY), "pending")
+
+    def test_recompute_leaves_unmanaged_statuses(self):
+        invoice = Invoice(business_id=1, amount=100, type="receivable", status="cancelled", due_date=date(2025, 1, 1))
+        recompute_invoice_status(invoice, TODAY)
+        self.assertEqual(invoice.status, "cancelled")
+        invoice.status = "pending"
+        recompute_invoice_status(invoice, TODAY)
+        self.assertEqual(invoice.status, "overdue")
+
+
+class TestInvoiceSweep(InvoiceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.future = self.add_invoice(1000, date(2025, 3, 20))
+        self.partial = self.add_invoice(1000, date(2025, 3, 20))
+        self.late = self.add_invoice(500, date(2025, 3, 1))
+        self.late_partial = self.add_invoice(500, date(2025, 3, 1))
+        self.settled = self.add_invoice(300, date(2025, 3, 1), status="overdue")
+        self.payable = self.add_invoice(200, date(2025, 3, 20), kind="payable")
+        self.cancelled = self.add_invoice(400, date(2025, 1, 1), status="cancelled")
+        self.pay(self.partial, 400)
+        self.pay(self.late_partial, 100)
+        self.pay(self.settled, 200)
+        self.pay(self.settled, 100)
+        self.pay(self.payable, 200, direction="outflow")
+        self.pay(self.payable, 50)  # an inflow doesn't pay a payable
+
+    def test_payments_reconciled_and_statuses_derived(self):
+        result = self.sweep()
+        self.assertEqual(self.statuses(), {
+            self.future: ("pending", 0.0),
+            self.partial: ("partial", 400.0),
+            self.late: ("overdue", 0.0),
+            self.late_partial: ("overdue", 100.0),
+            self.settled: ("paid", 300.0),
+            self.payable: ("paid", 200.0),
+            self.cancelled: ("cancelled", 0.0),
+        })
+        self.assertEqual(result["payments_updated"], 4)
+        self.assertEqual(result["by_status"], {"partial": 1, "overdue": 2, "paid": 2})
+
+    def test_every_change_is_stored_and_emitted_once(self):
+        self.sweep()
+        events = self.session.exec(select(InvoiceEvent).order_by(InvoiceEvent.invoice_id)).all()
+        self.assertEqual([(e.invoice_id, e.old_status, e.new_status) for e in events], [
+            (self.partial, "pending", "partial"),
+            (self.late, "pending", "overdue"),
+            (self.late_partial, "pending", "overdue"),
+            (self.settled, "overdue", "paid"),
+            (self.payable, "pending", "paid"),
+        ])
+        self.assertEqual(sorted(e["invoice_id"] for e in self.received), [e.invoice_id for e in events])
+
+        again = self.sweep()
+        self.assertEqual((again["payments_updated"], again["status_changes"]), (0, 0))
+        self.assertEqual(len(self.received), 5)
+
+    def test_sweep_bumps_data_version_only_on_change(self):
+        start = get_data_version(self.session, 1)
+        self.sweep()
+        self.assertEqual(get_data_version(self.session, 1), start + 1)
+        self.sweep()
+        self.assertEqual(get_data_version(self.session, 1), start + 1)
+
+    def test_later_payment_moves_overdue_to_paid(self):
+        self.sweep()
+        self.pay(self.late, 500)
+        self.sweep()
+        self.assertEqual(self.statuses()[self.late], ("paid", 500.0))
+        self.assertEqual(self.received[-1]["old_status"], "overdue")
+
+    def test_business_scope(self):
+        from models.business import Business
+
+        self.session.add(Business(id=2, name="Other"))
+        self.session.commit()
+        other = self.add_invoice(100, date(2025, 1, 1), business_id=2)
+        self.sweep(business_ids=[2])
+        statuses = self.statuses()
+        self.assertEqual(statuses[other][0], "overdue")
+        self.assertEqual(statuses[self.late][0], "pending")
+
+
+class TestOrmStatusEvents(InvoiceTestCase):
+
+    def test_manual_status_change_is_recorded(self):
+        invoice_id = self.add_invoice(100, date(2025, 3, 20))
+        invoice = self.session.get(Invoice, invoice_id)
+        invoice.status = "cancelled"
+        self.session.commit()
+        event = self.session.exec(select(InvoiceEvent)).one()
+        self.assertEqual((event.old_status, event.new_status), ("pending", "cancelled"))
+        self.assertIsNotNone(self.session.get(Invoice, invoice_id).status_changed_at)
+        self.assertEqual([e["new_status"] for e in self.received], ["cancelled"])
+
+    def test_change_after_commit_is_recorded(self):
+        invoice = self.session.get(Invoice, self.add_invoice(100, date(2025, 1, 1)))
+        invoice.description = "Diwali order"
+        self.session.commit()
+        # expired by the commit; the old status is loaded before it is overwritten
+        invoice.status = "overdue"
+        self.session.commit()
+        event = self.session.exec(select(InvoiceEvent)).one()
+        self.assertEqual((event.old_status, event.new_status), ("pending", "overdue"))
+        self.assertIsNotNone(invoice.status_changed_at)
+
+    def test_rolled_back_changes_are_not_emitted(self):
+        invoice = self.session.get(Invoice, self.add_invoice(100, date(2025, 3, 20)))
+        invoice.status = "paid"
+        self.session.flush()
+        self.session.rollback()
+        self.assertEqual(self.received, [])
+
+    def test_event_feed(self):
+        self.add_invoice(100, date(2025, 1, 1))
+        self.sweep()
+        app = FastAPI()
+        app.include_router(business.router, prefix="/business")
+        app.dependency_overrides[get_session] = lambda: self.session
+        app.dependency_overrides[get_read_session] = lambda: self.session
+        client = TestClient(app)
+        events = client.get("/business/1/invoice_events").json()
+        self.assertEqual([e["new_status"] for e in events], ["overdue"])
+        self.assertEqual(client.get(f"/business/1/invoice_events?after_id={events[0]['id']}").json(), [])
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_runs_tasks_periodically_and_skips_disabled(self):
+        scheduler = Scheduler()
+        calls = []
+
+        @scheduler.every(0.01, name="tick")
+        async def tick():
+            calls.append("tick")
+            if len(calls) == 1:
+                raise RuntimeError("first run fails, the loop keeps going")
+
+        @scheduler.every(lambda: 0)
+        async def disabled():
+            calls.append("disabled")
+
+        async def scenario():
+            scheduler.start()
+            await asyncio.sleep(0.1)
+            await scheduler.stop()
+
+        asyncio.run(scenario())
+        self.assertGreater(calls.count("tick"), 2)
+        self.assertNotIn("disabled", calls)
+
+    def test_invoice_sweep_is_scheduled_through_the_job_queue(self):
+        self.assertIn("invoice_status_sweep", [name for name, _, _ in invoice_services.scheduler.entries])
+        with patch.object(invoice_services.job_queue, "submit", new_callable=AsyncMock) as submit:
+            asyncio.run(invoice_services.schedule_invoice_sweep())
+        submit.assert_called_once_with("invoice_status_sweep", {}, dedupe_on={})
+
+
+if __name__ == "__main__":
+    unittest.main()
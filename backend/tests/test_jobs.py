@@ -0,0 +1,181 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from db import get_session
+from migrations import _m011_unique_active_jobs
+from models.job import Job
+from routers import forecast, insights, jobs as jobs_router, reports
+from workers.jobs import JOB_HANDLERS, JobQueue, register_job
+
+
+class JobQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # file-backed, so each worker thread gets its own connection as in production
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'jobs.db')}")
+        SQLModel.metadata.create_all(self.engine)
+        self.queue = JobQueue(self.engine, workers=2, poll_interval=0.01, timeout=5)
+        self.calls = []
+
+        @register_job("test_echo")
+        async def echo(payload, db):
+            self.calls.append(payload)
+            if payload.get("fail"):
+                raise RuntimeError("boom")
+            return {"echo": payload["value"]}
+
+    def tearDown(self):
+        JOB_HANDLERS.pop("test_echo", None)
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+
+class TestJobQueue(JobQueueTestCase):
+
+    def test_identical_in_flight_jobs_are_deduplicated(self):
+        async def scenario():
+            first, created_first = await self.queue.submit("test_echo", {"value": 1})
+            second, created_second = await self.queue.submit("test_echo", {"value": 1})
+            other, _ = await self.queue.submit("test_echo", {"value": 2})
+            ran = await self.queue.run_pending()
+            again, created_again = await self.queue.submit("test_echo", {"value": 1})
+            return first, created_first, second, created_second, other, ran, again, created_again
+
+        first, c1, second, c2, other, ran, again, c3 = asyncio.run(scenario())
+        self.assertTrue(c1)
+        self.assertFalse(c2)
+        self.assertEqual(first.id, second.id)
+        self.assertNotEqual(first.id, other.id)
+        self.assertEqual(ran, 2)
+        # finished jobs are not reused
+        self.assertTrue(c3)
+        self.assertNotEqual(again.id, first.id)
+
+        done = self.queue.get(first.id)
+        self.assertEqual((done.status, done.result, done.attempts), ("succeeded", '{"echo": 1}', 1))
+
+    def test_racing_submits_queue_one_job(self):
+        # both submitters miss each other in the lookup; the unique index decides
+        with patch.object(JobQueue, "_active", side_effect=[None, None, None]) as lookup:
+            first, created_first = self.queue._submit("test_echo", {"value": 1})
+            lookup.side_effect = [None, first]
+            second, created_second = self.queue._submit("test_echo", {"value": 1})
+        self.assertEqual((created_first, created_second, second.id), (True, False, first.id))
+        with Session(self.engine) as session:
+            self.assertEqual(len(session.exec(select(Job)).all()), 1)
+
+    def test_migration_retires_duplicate_active_jobs(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("DROP INDEX ux_job_dedupe_key_active"))
+            conn.execute(Job.__table__.insert(), [
+                {"kind": "test_echo", "dedupe_key": "k", "status": status, "payload": "{}",
+                 "attempts": 0, "created_at": datetime.utcnow()}
+                for status in ("succeeded", "queued", "running", "queued")
+            ])
+            _m011_unique_active_jobs(conn)
+        with Session(self.engine) as session:
+            statuses = session.exec(select(Job.status).order_by(Job.id)).all()
+        self.assertEqual(statuses, ["succeeded", "queued", "failed", "failed"])
+        with self.assertRaises(IntegrityError), self.engine.begin() as conn:
+            conn.execute(Job.__table__.insert(), {"kind": "test_echo", "dedupe_key": "k", "status": "running",
+                                                  "payload": "{}", "attempts": 0, "created_at": datetime.utcnow()})
+
+    def test_failures_are_recorded(self):
+        async def scenario():
+            job, _ = await self.queue.submit("test_echo", {"value": 1, "fail": True})
+            await self.queue.run_pending()
+            return job
+
+        failed = self.queue.get(asyncio.run(scenario()).id)
+        self.assertEqual((failed.status, failed.error), ("failed", "boom"))
+
+    def test_workers_pick_up_submitted_jobs(self):
+        async def scenario():
+            self.queue.start()
+            try:
+                job, _ = await self.queue.submit("test_echo", {"value": 3})
+                for _ in range(200):
+                    if self.queue.get(job.id).status == "succeeded":
+                        break
+                    await asyncio.sleep(0.01)
+            finally:
+                await self.queue.stop()
+            return job
+
+        self.assertEqual(self.queue.get(asyncio.run(scenario()).id).status, "succeeded")
+
+    def test_stale_running_jobs_are_requeued(self):
+        with Session(self.engine) as session:
+            session.add(Job(kind="test_echo", dedupe_key="k", payload='{"value": 4}', status="running",
+                            started_at=datetime.utcnow() - timedelta(hours=1)))
+            session.commit()
+        self.assertEqual(asyncio.run(self.queue.run_pending()), 1)
+        self.assertEqual(self.calls, [{"value": 4}])
+
+
+class TestJobRoutes(JobQueueTestCase):
+
+    def test_background_report_returns_job_then_result(self):
+        app = FastAPI()
+        app.include_router(reports.router, prefix="/reports")
+        app.include_router(jobs_router.router, prefix="/jobs")
+        app.dependency_overrides[get_session] = lambda: Session(self.engine)
+        client = TestClient(app)
+
+        async def fake_report(metrics):
+            return {"summary": f"revenue {metrics['revenue']}"}
+
+        with patch("routers.jobs.job_queue", self.queue), \
+                patch("routers.reports.agenerate_financial_report", side_effect=fake_report):
+            submitted = client.post("/reports/financial?background=true", json={"metrics": {"revenue": 10}})
+            self.assertEqual(submitted.status_code, 202)
+            job_id = submitted.json()["job_id"]
+
+            duplicate = client.post("/reports/financial?background=true", json={"metrics": {"revenue": 10}})
+            self.assertEqual(duplicate.json()["job_id"], job_id)
+            self.assertTrue(duplicate.json()["deduplicated"])
+
+            self.assertEqual(client.get(f"/jobs/{job_id}/result").status_code, 202)
+            asyncio.run(self.queue.run_pending())
+
+            result = client.get(f"/jobs/{job_id}/result")
+            self.assertEqual(result.status_code, 200)
+            self.assertEqual(result.json()["result"], {"report": {"summary": "revenue 10"}})
+            self.assertEqual(client.get(f"/jobs/{job_id}").json()["status"], "succeeded")
+            self.assertEqual(client.get("/jobs/999").status_code, 404)
+
+            # default path is unchanged
+            direct = client.post("/reports/financial", json={"metrics": {"revenue": 10}})
+            self.assertEqual(direct.json(), {"report": {"summary": "revenue 10"}})
+
+    def test_unknown_business_fails_the_job_and_404s_the_request(self):
+        app = FastAPI()
+        app.include_router(forecast.router, prefix="/forecast")
+        app.include_router(insights.router, prefix="/insights")
+        app.include_router(jobs_router.router, prefix="/jobs")
+        app.dependency_overrides[get_session] = lambda: Session(self.engine)
+        client = TestClient(app)
+
+        with patch("routers.jobs.job_queue", self.queue):
+            job_ids = [client.get(f"/{kind}/42?background=true").json()["job_id"] for kind in ("forecast", "insights")]
+            asyncio.run(self.queue.run_pending())
+            for job_id in job_ids:
+                job = client.get(f"/jobs/{job_id}").json()
+                self.assertEqual((job["status"], job["error"]), ("failed", "Business not found"))
+            for kind in ("forecast", "insights"):
+                self.assertEqual(client.get(f"/{kind}/42").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
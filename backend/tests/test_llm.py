@@ -0,0 +1,336 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from utils import llm
+from config import settings
+from utils.llm_cache import CacheTier, ResponseCache, MemoryLRUCache, SQLiteCache, make_cache_key
+from google.api_core import exceptions as google_exceptions
+
+from utils import llm_gateway
+from utils.llm_context import compact_context, estimate_tokens, summarize_list
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.memory = MemoryLRUCache(max_entries=2, ttl=60)
+        self.sqlite = SQLiteCache(os.path.join(self.tmpdir.name, "cache.db"), ttl=60)
+        self.cache = ResponseCache([self.memory, self.sqlite])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_covers_every_input(self):
+        base = make_cache_key("m", "p", "c", {"temperature": 0.2})
+        self.assertEqual(base, make_cache_key("m", "p", "c", {"temperature": 0.2}))
+        self.assertNotEqual(base, make_cache_key("m2", "p", "c", {"temperature": 0.2}))
+        self.assertNotEqual(base, make_cache_key("m", "p", "c2", {"temperature": 0.2}))
+        self.assertNotEqual(base, make_cache_key("m", "p", "c", {"temperature": 0.3}))
+
+    def test_lru_eviction_and_sqlite_promotion(self):
+        for k in ("a", "b", "c"):
+            self.cache.set(k, {"v": k}, agent="parser")
+        self.assertIsNone(self.memory.get("a"))  # evicted from the LRU tier
+        self.assertEqual(self.cache.get("a", agent="parser"), {"v": "a"})
+        self.assertEqual(self.memory.get("a"), {"v": "a"})  # promoted back
+        self.assertEqual(self.cache.stats()["parser"]["hit_sqlite"], 1)
+
+    def test_ttl_and_invalidation(self):
+        self.cache.set("x", {"v": 1}, agent="insight", ttl=-1)
+        self.assertIsNone(self.cache.get("x"))
+        self.cache.set("y", {"v": 2}, agent="insight")
+        self.cache.set("z", {"v": 3}, agent="forecast")
+        self.cache.invalidate(agent="insight")
+        self.assertIsNone(self.cache.get("y"))
+        self.assertEqual(self.cache.get("z"), {"v": 3})
+        self.assertEqual(self.cache.stats()["_all"]["miss"], 2)
+
+    def test_tiers_implement_the_whole_interface(self):
+        class GetOnly(CacheTier):
+            def get(self, key):
+                return None
+
+        with self.assertRaises(TypeError):
+            GetOnly()
+
+    def test_tests_keep_the_persistent_tier_out_of_the_tree(self):
+        self.assertFalse(os.path.abspath(settings.LLM_CACHE_PATH).startswith(os.path.abspath(settings.BASE_DIR) + os.sep))
+
+
+class TestGenerateContentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.original = llm.response_cache
+        llm.set_response_cache(ResponseCache([MemoryLRUCache()]))
+        llm._get_model.cache_clear()
+        llm_gateway.reset_gateway()
+
+    def tearDown(self):
+        llm.set_response_cache(self.original)
+        llm._get_model.cache_clear()
+
+    def test_repeat_call_served_from_cache(self):
+        model = MagicMock()
+        model.generate_content.return_value.text = '{"amount": 1500.0}'
+        with patch.object(llm, "api_key", "mock_key"), \
+             patch.object(llm.genai, "GenerativeModel", return_value=model):
+            first = llm.generate_content("PROMPT", "Rs 1500 credited", agent="parser")
+            second = llm.generate_content("PROMPT", "Rs 1500 credited", agent="parser")
+            uncached = llm.generate_content("PROMPT", "Rs 1500 credited", agent="reminder")
+
+        self.assertEqual(first, second)
+        self.assertEqual(uncached, first)
+        self.assertEqual(model.generate_content.call_count, 2)
+        self.assertEqual(llm.llm_cache_stats()["parser"], {"miss": 1, "store": 1, "hit_memory": 1})
+
+    def test_errors_are_not_cached(self):
+        with patch.object(llm, "api_key", "mock_key"), \
+             patch.object(llm.settings, "LLM_RETRY_BASE_SECONDS", 0), \
+             patch.object(llm.genai, "GenerativeModel", side_effect=RuntimeError("boom")):
+            self.assertIn("error", llm.generate_content("PROMPT", "ctx", agent="parser"))
+        self.assertNotIn("store", llm.llm_cache_stats()["parser"])
+
+
+class TestContextCompaction(unittest.TestCase):
+
+    def history(self, n):
+        return [{"id": i, "amount": float(i * 10), "direction": "inflow" if i % 3 else "outflow",
+                 "description": f"UPI payment {i}", "note": None} for i in range(1, n + 1)]
+
+    def test_small_inputs_are_kept_whole(self):
+        metrics = {"total_inflow": 1234.5678, "growth": None, "tags": [], "months": [1.0, 2.0]}
+        self.assertEqual(compact_context(metrics, budget=100), '{"total_inflow":1234.57,"months":[1.0,2.0]}')
+
+    def test_long_lists_become_statistics_and_top_items(self):
+        summary = summarize_list(self.history(30), top_k=3)
+        self.assertEqual((summary["n"], summary["omitted"]), (30, 27))
+        self.assertEqual(summary["stats"]["amount"], {"min": 10.0, "mean": 155.0, "max": 300.0, "sum": 4650.0})
+        self.assertNotIn("id", summary["stats"])
+        self.assertEqual(summary["counts"]["direction"], {"inflow": 20, "outflow": 10})
+        self.assertEqual([item["id"] for item in summary["top"]], [28, 29, 30])
+
+    def test_context_fits_the_budget(self):
+        data = {"recent_transactions": self.history(500), "metrics": {"dso": 41.0}}
+        text = compact_context(data, budget=400)
+        self.assertLessEqual(estimate_tokens(text), 400)
+        parsed = json.loads(text)
+        self.assertEqual(parsed["recent_transactions"]["n"], 500)
+        self.assertEqual(parsed["metrics"], {"dso": 41.0})
+        with patch.object(llm.settings, "LLM_CONTEXT_BUDGETS", {"risk": 400}):
+            self.assertEqual(compact_context(data, agent="risk"), text)
+
+    def test_tokens_are_logged_per_agent(self):
+        model = MagicMock()
+        model.generate_content.return_value.text = '{"ok": true}'
+        model.generate_content.return_value.usage_metadata.prompt_token_count = 120
+        model.generate_content.return_value.usage_metadata.candidates_token_count = 7
+        llm._token_counts.clear()
+        with patch.object(llm, "api_key", "mock_key"), \
+             patch.object(llm.genai, "GenerativeModel", return_value=model), \
+             self.assertLogs(llm.logger, "INFO") as logs:
+            llm.generate_content("PROMPT", "ctx", agent="insight_tokens")
+        self.assertEqual(llm.llm_token_stats()["insight_tokens"], {"calls": 1, "tokens_in": 120, "tokens_out": 7})
+        self.assertTrue(any("in=120 out=7" in line for line in logs.output))
+
+
+class TestAsyncGenerateContent(unittest.TestCase):
+
+    def setUp(self):
+        llm._get_model.cache_clear()
+        llm._global_semaphore = None
+        llm._model_semaphores.clear()
+        llm_gateway.reset_gateway()
+
+    def tearDown(self):
+        llm._get_model.cache_clear()
+        llm._global_semaphore = None
+        llm._model_semaphores.clear()
+
+    def test_concurrency_is_capped_per_model(self):
+        in_flight, peak = 0, 0
+
+        async def fake_call(*args, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            response = MagicMock()
+            response.text = '{"ok": true}'
+            return response
+
+        model = MagicMock()
+        model.generate_content_async = fake_call
+
+        async def run():
+            return await asyncio.gather(*[
+                llm.agenerate_content("PROMPT", f"ctx {i}") for i in range(10)
+            ])
+
+        with patch.object(llm, "api_key", "mock_key"), \
+             patch.object(llm.settings, "LLM_MAX_CONCURRENCY_PER_MODEL", 3), \
+             patch.object(llm.genai, "GenerativeModel", return_value=model) as factory:
+            results = asyncio.run(run())
+
+        self.assertEqual(results, [{"ok": True}] * 10)
+        self.assertEqual(peak, 3)
+        factory.assert_called_once()  # one shared client per (model, prompt)
+
+
+
+def fake_response(text='{"ok": true}'):
+    response = MagicMock()
+    response.text = text
+    return response
+
+
+class TestGateway(unittest.TestCase):
+
+    def setUp(self):
+        llm._get_model.cache_clear()
+        llm._global_semaphore = None
+        llm._model_semaphores.clear()
+        llm_gateway.reset_gateway()
+        self.original = llm.response_cache
+        llm.set_response_cache(ResponseCache([MemoryLRUCache()]))
+        self.settings = patch.multiple(llm.settings, LLM_MODEL="primary", LLM_FALLBACK_MODELS=["cheap"],
+                                       LLM_RETRIES=1, LLM_RETRY_BASE_SECONDS=0, LLM_BREAKER_FAILURES=2,
+                                       LLM_BREAKER_COOLDOWN_SECONDS=60, LLM_HEDGE_AGENTS=[],
+                                       LLM_DEADLINES={}, LLM_DEADLINE_SECONDS=5)
+        self.settings.start()
+        self.key = patch.object(llm, "api_key", "mock_key")
+        self.key.start()
+
+    def tearDown(self):
+        self.key.stop()
+        self.settings.stop()
+        llm.set_response_cache(self.original)
+        llm._get_model.cache_clear()
+        llm_gateway.reset_gateway()
+
+    def models(self, **behaviour):
+        """Patches the SDK so each model name gets its own mock client."""
+        clients = {name: MagicMock(**{"generate_content.side_effect": effect}) for name, effect in behaviour.items()}
+        patcher = patch.object(llm.genai, "GenerativeModel", side_effect=lambda name, **kw: clients[name])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return clients
+
+    def test_retry_then_fallback_model_and_breaker(self):
+        clients = self.models(primary=google_exceptions.ServiceUnavailable("503"), cheap=[fake_response('{"v": 1}'), fake_response('{"v": 2}')])
+        self.assertEqual(llm.generate_content("P", "ctx", agent="insight"), {"v": 1})
+        self.assertEqual(clients["primary"].generate_content.call_count, 2)  # first try + one retry
+        self.assertEqual(llm_gateway.breaker("primary").state, "open")
+
+        # the open primary is skipped without a call; fallback answers are not cached
+        self.assertEqual(llm.generate_content("P", "ctx", agent="insight"), {"v": 2})
+        self.assertEqual(clients["primary"].generate_content.call_count, 2)
+        self.assertNotIn("store", llm.llm_cache_stats().get("insight", {}))
+
+    def test_open_circuits_fail_fast_and_recover_through_a_probe(self):
+        for model in ("primary", "cheap"):
+            for _ in range(2):
+                llm_gateway.breaker(model).record_failure()
+        clients = self.models(primary=[fake_response()], cheap=[])
+        self.assertIn("error", llm.generate_content("P", "ctx", agent="insight"))
+        clients["primary"].generate_content.assert_not_called()
+
+        with patch.object(llm_gateway.time, "monotonic", return_value=llm_gateway.time.monotonic() + 61):
+            self.assertEqual(llm.generate_content("P", "ctx", agent="insight"), {"ok": True})
+        self.assertEqual(llm_gateway.breaker("primary").state, "closed")
+
+    def test_bad_output_is_retried_without_tripping_the_breaker(self):
+        self.models(primary=[fake_response("not json"), fake_response('{"ok": true}')], cheap=[])
+        self.assertEqual(llm.generate_content("P", "ctx", agent="insight"), {"ok": True})
+        self.assertEqual(llm_gateway.breaker("primary")._consecutive, 0)
+
+    def test_permanent_errors_fail_fast_without_tripping_the_breaker(self):
+        clients = self.models(primary=google_exceptions.InvalidArgument("bad request"), cheap=[fake_response()])
+        self.assertIn("bad request", llm.generate_content("P", "ctx", agent="insight")["error"])
+        self.assertEqual(clients["primary"].generate_content.call_count, 1)
+        clients["cheap"].generate_content.assert_not_called()
+        self.assertEqual((llm_gateway.breaker("primary").state, llm_gateway.breaker("primary")._consecutive),
+                         ("closed", 0))
+
+    def half_open(self, model):
+        with patch.object(llm.settings, "LLM_BREAKER_COOLDOWN_SECONDS", 0):
+            for _ in range(2):
+                llm_gateway.breaker(model).record_failure()
+        return llm_gateway.breaker(model)
+
+    def test_probe_is_released_when_the_deadline_is_spent(self):
+        fallback = self.half_open("cheap")
+
+        def slow_primary(*args, **kwargs):
+            time.sleep(0.06)
+            raise google_exceptions.ServiceUnavailable("503")
+
+        clients = self.models(primary=slow_primary, cheap=[fake_response('{"v": 1}')])
+        with patch.object(llm.settings, "LLM_DEADLINES", {"insight": 0.05}):
+            self.assertIn("deadline", llm.generate_content("P", "ctx", agent="insight")["error"])
+        clients["cheap"].generate_content.assert_not_called()
+        self.assertFalse(fallback._probing)
+
+        # the healthy fallback still gets its probe and closes
+        self.assertEqual(llm.generate_content("P", "ctx 2", agent="insight"), {"v": 1})
+        self.assertEqual(fallback.state, "closed")
+
+    def test_probe_is_released_when_the_caller_cancels(self):
+        probed = self.half_open("primary")
+        started = asyncio.Event()
+
+        async def hang(*args, **kwargs):
+            started.set()
+            await asyncio.sleep(10)
+
+        client = MagicMock()
+        client.generate_content_async = hang
+
+        async def run():
+            task = asyncio.ensure_future(llm.agenerate_content("P", "ctx", agent="insight"))
+            await started.wait()
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with patch.object(llm.genai, "GenerativeModel", return_value=client):
+            asyncio.run(run())
+        self.assertEqual((probed.state, probed._probing), ("half_open", False))
+        self.assertTrue(probed.allow())
+
+    def test_async_deadline_and_hedging(self):
+        calls = []
+
+        async def slow_then_fast(*args, **kwargs):
+            calls.append(kwargs["request_options"]["timeout"])
+            await asyncio.sleep(1.0 if len(calls) == 1 else 0.01)
+            return fake_response('{"n": %d}' % len(calls))
+
+        client = MagicMock()
+        client.generate_content_async = slow_then_fast
+        with patch.object(llm.genai, "GenerativeModel", return_value=client), \
+             patch.multiple(llm.settings, LLM_HEDGE_AGENTS=["insight"], LLM_HEDGE_DELAY_SECONDS=0.05,
+                            LLM_HEDGE_MIN_SAMPLES=1000):
+            started = time.monotonic()
+            result = asyncio.run(llm.agenerate_content("P", "ctx", agent="insight"))
+        self.assertEqual(result, {"n": 2})  # the hedge answered first
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertLessEqual(calls[0], 5)
+
+        calls.clear()
+        with patch.object(llm.genai, "GenerativeModel", return_value=client), \
+             patch.multiple(llm.settings, LLM_DEADLINES={"insight": 0.1}, LLM_FALLBACK_MODELS=[]):
+            started = time.monotonic()
+            result = asyncio.run(llm.agenerate_content("P", "other ctx", agent="insight"))
+        self.assertIn("deadline", result["error"])
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import asyncio
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from models.contact import Contact
+from models.invoice import Invoice
+from services import matching_services
+from services.matching_services import LedgerIndex, amatch_transaction, get_ledger_index, match_locally
+from tests.test_cashflow import LedgerTestCase
+from utils.matching import jaro_winkler, name_similarity, normalize_name
+
+CONTACTS = [
+    {"id": 1, "name": "M/s Sharma & Sons Pvt Ltd"},
+    {"id": 2, "name": "Ramesh Kumar"},
+    {"id": 3, "name": "Ramesh Kumari"},
+    {"id": 4, "name": "Gupta Electricals"},
+]
+INVOICES = [
+    {"id": 10, "contact_id": 1, "amount": 4500.0, "due_date": "2025-01-10", "status": "pending"},
+    {"id": 11, "contact_id": 4, "amount": 4500.0, "due_date": "2025-03-01", "status": "overdue"},
+    {"id": 12, "contact_id": 2, "amount": 999.0, "due_date": "2025-01-05", "status": "pending"},
+]
+
+
+class TestMatchingHelpers(unittest.TestCase):
+
+    def test_normalize_and_similarity(self):
+        self.assertEqual(normalize_name("M/s. Sharma & Sons Pvt. Ltd."), "sharma sons")
+        self.assertEqual(jaro_winkler("sharma", "sharma"), 1.0)
+        self.assertGreater(jaro_winkler("sharma sons", "sharma son"), 0.95)
+        self.assertLess(jaro_winkler("sharma", "gupta"), 0.6)
+        self.assertEqual(normalize_name("Ramesh Kumari"), "ramesh kumari")
+        # a different first name must not look like a typo
+        self.assertLess(name_similarity("rajesh kumar", "ramesh kumar"), 0.9)
+        self.assertGreater(name_similarity("kumar ramesh", "ramesh kumar"), 0.9)
+
+
+class TestLocalMatching(unittest.TestCase):
+
+    def setUp(self):
+        self.index = LedgerIndex(CONTACTS, INVOICES)
+
+    def test_exact_name_and_invoice_resolve_locally(self):
+        result, _ = match_locally(self.index, {"counterparty": "SHARMA AND SONS", "amount": 4500})
+        self.assertEqual(result["contact_match"], {"contact_id": 1, "match_type": "exact", "confidence": 1.0})
+        self.assertEqual(result["invoice_match"], {"invoice_id": 10, "match_type": "exact"})
+
+    def test_confident_typo_is_fuzzy(self):
+        result, _ = match_locally(self.index, {"counterparty": "Gupta Electricls", "amount": 120})
+        self.assertEqual(result["contact_match"]["contact_id"], 4)
+        self.assertEqual(result["contact_match"]["match_type"], "fuzzy")
+        self.assertEqual(result["invoice_match"]["match_type"], "none")
+
+    def test_unknown_counterparty_is_new(self):
+        result, _ = match_locally(self.index, {"counterparty": "Zeta Logistics", "amount": 50})
+        self.assertEqual(result["contact_match"]["match_type"], "new")
+
+    def test_ambiguous_names_go_to_llm_with_top_k_only(self):
+        sent = []
+
+        async def fake_llm(transaction, snapshot):
+            sent.append(snapshot)
+            return {"contact_match": {"contact_id": 2, "match_type": "fuzzy", "confidence": 0.8},
+                    "invoice_match": {"invoice_id": 12, "match_type": "exact"}}
+
+        with patch("services.matching_services.amatch_ledger_entry", side_effect=fake_llm):
+            result = asyncio.run(amatch_transaction({"counterparty": "Ramesh K", "amount": 999}, self.index))
+        self.assertEqual(result["resolved_by"], "llm")
+        ids = [c["id"] for c in sent[0]["contacts"]]
+        self.assertEqual(set(ids[:2]), {2, 3})
+        self.assertNotIn(1, ids)
+        self.assertEqual([i["id"] for i in sent[0]["invoices"]], [12])
+
+    def test_llm_failure_falls_back_to_best_candidate(self):
+        async def broken_llm(transaction, snapshot):
+            return {"error": "LLM client not initialized"}
+
+        with patch("services.matching_services.amatch_ledger_entry", side_effect=broken_llm):
+            result = asyncio.run(amatch_transaction({"counterparty": "Ramesh K", "amount": 5}, self.index))
+        self.assertEqual(result["resolved_by"], "index_fallback")
+        self.assertIn(result["contact_match"]["contact_id"], (2, 3))
+
+
+class TestLedgerIndexCache(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        matching_services._index_cache.clear()
+
+    def test_index_rebuilt_after_ledger_writes(self):
+        self.session.add(Contact(business_id=1, name="Sharma Stores"))
+        self.session.commit()
+        first = get_ledger_index(self.session, 1)
+        self.assertIs(get_ledger_index(self.session, 1), first)
+
+        self.session.add(Invoice(business_id=1, amount=300.0, type="receivable", due_date=date(2025, 1, 1)))
+        self.session.add(Invoice(business_id=1, amount=300.0, type="receivable", status="paid"))
+        self.session.commit()
+        second = get_ledger_index(self.session, 1)
+        self.assertIsNot(second, first)
+        self.assertEqual([i["amount"] for i in second.invoices], [300.0])
+        self.assertEqual(second.search_contacts("sharma stores")[0][1]["name"], "Sharma Stores")
+
+
+if __name__ == "__main__":
+    unittest.main()
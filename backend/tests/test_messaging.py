@@ -0,0 +1,203 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from db import get_session
+from models.business import Business
+from models.outbound_message import OutboundMessage
+from routers import actions, webhooks
+from utils.whatsapp import FakeTwilioTransport
+from workers.messaging import MessageQueue, TokenBucket, apply_status_callback, make_idempotency_key
+
+
+def messages(count, business_id=1):
+    return [{"business_id": business_id, "to": f"+9190000{i:05d}", "body": f"Reminder {i}",
+             "idempotency_key": make_idempotency_key("test", i)} for i in range(count)]
+
+
+class ScriptedTransport:
+    """Returns the queued responses per recipient, then succeeds."""
+    name = "scripted"
+
+    def __init__(self, script):
+        self.script = {to: list(responses) for to, responses in script.items()}
+        self.calls = []
+
+    async def send(self, to, body):
+        self.calls.append(to)
+        pending = self.script.get(to)
+        if pending:
+            return pending.pop(0)
+        return {"status": "sent", "sid": f"SM{len(self.calls)}"}
+
+
+class MessageQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # file-backed, so threadpool calls get their own connections as in production
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'messages.db')}")
+        SQLModel.metadata.create_all(self.engine)
+        with Session(self.engine) as session:
+            session.add(Business(id=1, name="Test Traders"))
+            session.commit()
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def make_queue(self, transport, **kwargs):
+        kwargs.setdefault("rate", 1000)
+        kwargs.setdefault("retry_base", 0.01)
+        return MessageQueue(self.engine, transport, **kwargs)
+
+    def rows(self):
+        with Session(self.engine) as session:
+            return {m.to_phone: m for m in session.exec(select(OutboundMessage)).all()}
+
+
+class TestMessageQueue(MessageQueueTestCase):
+
+    def test_bulk_submit_is_idempotent_and_sends_once(self):
+        transport = FakeTwilioTransport(latency=0, rate_limit=None)
+        queue = self.make_queue(transport)
+
+        async def scenario():
+            first = await queue.submit_many(messages(5))
+            again = await queue.submit_many(messages(5) + messages(5)[:1])
+            await queue.run_pending()
+            after_send = await queue.submit_many(messages(2))
+            await queue.run_pending()
+            return first, again, after_send
+
+        first, again, after_send = asyncio.run(scenario())
+        self.assertTrue(all(created for _, created in first))
+        self.assertFalse(any(created for _, created in again + after_send))
+        self.assertEqual([row.id for row, _ in again[:5]], [row.id for row, _ in first])
+        self.assertEqual(len(transport.sent), 5)
+        rows = self.rows()
+        self.assertTrue(all(m.status == "sent" and m.provider_sid for m in rows.values()))
+
+    def test_retries_429_and_5xx_then_gives_up_on_permanent_errors(self):
+        transport = ScriptedTransport({
+            "+919000000000": [{"status": "error", "status_code": 429, "error": "Too Many Requests", "retry_after": 0.01}],
+            "+919000000001": [{"status": "error", "status_code": 503, "error": "Unavailable"},
+                              {"status": "error", "status_code": None, "error": "timeout"}],
+            "+919000000002": [{"status": "error", "status_code": 400, "error": "Invalid To number"}],
+            "+919000000003": [{"status": "error", "status_code": 500, "error": "boom"}] * 5,
+        })
+        queue = self.make_queue(transport, max_attempts=3)
+
+        async def scenario():
+            await queue.submit_many(messages(4))
+            return await queue.run_pending(wait_for_retries=True)
+
+        attempts = asyncio.run(scenario())
+        rows = self.rows()
+        self.assertEqual((rows["+919000000000"].status, rows["+919000000000"].attempts), ("sent", 2))
+        self.assertEqual((rows["+919000000001"].status, rows["+919000000001"].attempts), ("sent", 3))
+        self.assertEqual((rows["+919000000002"].status, rows["+919000000002"].attempts), ("failed", 1))
+        self.assertIn("400", rows["+919000000002"].last_error)
+        self.assertEqual((rows["+919000000003"].status, rows["+919000000003"].attempts), ("failed", 3))
+        self.assertEqual(attempts, 2 + 3 + 1 + 3)
+
+    def test_status_callbacks_only_move_forward(self):
+        queue = self.make_queue(ScriptedTransport({}))
+
+        async def scenario():
+            await queue.submit_many(messages(1))
+            await queue.run_pending()
+
+        asyncio.run(scenario())
+        sid = self.rows()["+919000000000"].provider_sid
+        with Session(self.engine) as session:
+            self.assertTrue(apply_status_callback(session, sid, "delivered"))
+            self.assertFalse(apply_status_callback(session, sid, "sent"))
+            self.assertTrue(apply_status_callback(session, sid, "read"))
+            self.assertFalse(apply_status_callback(session, "SMunknown", "read"))
+        self.assertEqual(self.rows()["+919000000000"].status, "read")
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_rate_is_enforced_after_the_burst(self):
+        bucket = TokenBucket(rate=100, capacity=5)
+
+        async def scenario():
+            start = time.monotonic()
+            for _ in range(15):
+                await bucket.acquire()
+            return time.monotonic() - start
+
+        elapsed = asyncio.run(scenario())
+        self.assertGreaterEqual(elapsed, 0.09)  # 10 tokens beyond the burst at 100/s
+        self.assertLess(elapsed, 1.0)
+
+
+class TestMessagingRoutes(MessageQueueTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.queue = self.make_queue(ScriptedTransport({}))
+        app = FastAPI()
+        app.include_router(actions.router, prefix="/actions")
+        app.include_router(webhooks.router, prefix="/webhooks")
+
+        def session_override():
+            with Session(self.engine) as session:
+                yield session
+
+        app.dependency_overrides[get_session] = session_override
+        self.patch = patch.object(actions, "message_queue", self.queue)
+        self.patch.start()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.patch.stop()
+        super().tearDown()
+
+    def test_reminder_is_queued_once_per_invoice_per_day(self):
+        payload = {"business_id": 1, "customer_name": "Raju", "customer_phone": "+919876543210",
+                   "invoice_number": "INV-7", "amount_due": 1500.0, "due_date": "2025-01-15"}
+
+        async def reminder(context):
+            return {"message": f"Hi {context['customer_name']}, please pay {context['invoice_number']}"}
+
+        with patch("agents.reminder_agent.agenerate_payment_reminder", side_effect=reminder) as agent:
+            first = self.client.post("/actions/send_whatsapp_reminder", json=payload).json()
+            second = self.client.post("/actions/send_whatsapp_reminder", json=payload).json()
+        self.assertEqual(agent.call_count, 1)
+        self.assertEqual(first["delivery"]["status"], "queued")
+        self.assertFalse(first["delivery"]["deduplicated"])
+        self.assertTrue(second["delivery"]["deduplicated"])
+        self.assertEqual(first["delivery"]["message_id"], second["delivery"]["message_id"])
+        self.assertEqual(second["message"], first["message"])
+
+        asyncio.run(self.queue.run_pending())
+        status = self.client.get(f"/actions/messages/{first['delivery']['message_id']}").json()
+        self.assertEqual(status["status"], "sent")
+        self.client.post("/webhooks/whatsapp/status",
+                         data={"MessageSid": status["provider_sid"], "MessageStatus": "delivered"})
+        status = self.client.get(f"/actions/messages/{first['delivery']['message_id']}").json()
+        self.assertEqual(status["status"], "delivered")
+
+    def test_bulk_endpoint(self):
+        body = {"messages": [{"business_id": 1, "to": "+911", "body": "a"},
+                             {"business_id": 1, "to": "+912", "body": "b", "idempotency_key": "inv-2-d1"},
+                             {"business_id": 1, "to": "+911", "body": "a"}]}
+        result = self.client.post("/actions/messages/bulk", json=body).json()
+        self.assertEqual((result["queued"], result["deduplicated"]), (2, 1))
+        self.assertEqual(result["messages"][1]["idempotency_key"], "inv-2-d1")
+        self.assertEqual(result["messages"][0]["message_id"], result["messages"][2]["message_id"])
+        self.assertEqual(self.client.get("/actions/messages/999").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
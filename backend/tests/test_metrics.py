@@ -0,0 +1,115 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from google.api_core.exceptions import ServiceUnavailable
+
+import main
+from db import get_read_session, get_session
+from utils import llm
+from utils.llm_gateway import reset_gateway
+from utils.metrics import Metric, Registry, RequestStats, agent_fallbacks, db_query_seconds, http_request_db_queries, \
+    http_request_seconds, llm_call_seconds, llm_errors
+from tests.test_cashflow import LedgerTestCase
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_prometheus_text_format(self):
+        registry = Registry()
+        calls = registry.counter("calls_total", "Calls.", ("agent",))
+        latency = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+        calls.inc(agent="insight")
+        calls.inc(2, agent="insight")
+        for value in (0.05, 0.5, 3.0):
+            latency.observe(value, route='/risk/{business_id}')
+        self.assertEqual(registry.render().splitlines(), [
+            "# HELP calls_total Calls.",
+            "# TYPE calls_total counter",
+            'calls_total{agent="insight"} 3',
+            "# HELP latency_seconds Latency.",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{route="/risk/{business_id}",le="0.1"} 1',
+            'latency_seconds_bucket{route="/risk/{business_id}",le="1"} 2',
+            'latency_seconds_bucket{route="/risk/{business_id}",le="+Inf"} 3',
+            'latency_seconds_sum{route="/risk/{business_id}"} 3.55',
+            'latency_seconds_count{route="/risk/{business_id}"} 3',
+        ])
+
+    def test_metric_kinds_must_render_samples(self):
+        with self.assertRaises(TypeError):
+            Metric("bare", "No samples.")
+
+    def test_request_stats_add_up_across_threads(self):
+        stats = RequestStats()
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: [stats.add_query(0.001) for _ in range(1000)], range(8)))
+        self.assertEqual(stats.db_queries, 8000)
+        self.assertAlmostEqual(stats.db_seconds, 8.0)
+
+
+class TestInstrumentation(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        main.app.dependency_overrides[get_session] = lambda: self.session
+        main.app.dependency_overrides[get_read_session] = lambda: self.session
+        self.client = TestClient(main.app)
+
+    def tearDown(self):
+        main.app.dependency_overrides.clear()
+        super().tearDown()
+
+    def test_requests_are_timed_per_route_with_their_db_queries(self):
+        route = dict(method="GET", route="/risk/{business_id}/demand")
+        before = (http_request_seconds.count(status=200, **route), http_request_db_queries.count(**route),
+                  http_request_db_queries.sum(**route), db_query_seconds.count(operation="select"))
+        for business_id in (1, 2):
+            self.assertEqual(self.client.get(f"/risk/{business_id}/demand").status_code, 200)
+        self.assertEqual(http_request_seconds.count(status=200, **route), before[0] + 2)
+        self.assertEqual(http_request_db_queries.count(**route), before[1] + 2)
+        self.assertGreaterEqual(http_request_db_queries.sum(**route), before[2] + 4)
+        self.assertGreater(db_query_seconds.count(operation="select"), before[3])
+
+        body = self.client.get("/metrics")
+        self.assertTrue(body.headers["content-type"].startswith("text/plain"))
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/risk/{business_id}/demand",'
+                      'status="200"}', body.text)
+        self.client.get("/no/such/path")
+        self.assertGreater(http_request_seconds.count(method="GET", route="unmatched", status=404), 0)
+
+    def test_streamed_responses_are_timed_to_the_last_chunk(self):
+        def body():
+            yield "started\n"
+            time.sleep(0.2)
+            yield "done\n"
+
+        main.app.add_api_route("/test/stream", lambda: StreamingResponse(body(), media_type="application/x-ndjson"))
+        try:
+            route = dict(method="GET", route="/test/stream", status=200)
+            self.assertEqual(self.client.get("/test/stream").text, "started\ndone\n")
+        finally:
+            main.app.router.routes.pop()
+        self.assertEqual(http_request_seconds.count(**route), 1)
+        self.assertGreaterEqual(http_request_seconds.sum(**route), 0.2)
+
+    def test_llm_errors_and_fallbacks_are_counted(self):
+        from agents.insight_agent import generate_insights
+        reset_gateway()
+        errors, fallbacks = llm_errors.value(agent="insight"), agent_fallbacks.value(agent="insight")
+        calls = llm_call_seconds.count(agent="insight", model="m", outcome="error")
+        with patch.object(llm, "api_key", "mock_key"), \
+             patch.multiple(llm.settings, LLM_MODEL="m", LLM_RETRIES=1, LLM_RETRY_BASE_SECONDS=0,
+                            LLM_FALLBACK_MODELS=[], LLM_CACHE_AGENTS=[]), \
+             patch.object(llm.genai, "GenerativeModel", side_effect=ServiceUnavailable("boom")):
+            self.assertTrue(generate_insights({"x": 1})["fallback"])
+        self.assertEqual(llm_errors.value(agent="insight"), errors + 1)
+        self.assertEqual(agent_fallbacks.value(agent="insight"), fallbacks + 1)
+        self.assertEqual(llm_call_seconds.count(agent="insight", model="m", outcome="error"), calls + 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from models.business import Business
+from models.job import Job
+from models.narrative import Narrative
+from services import narrative_services
+from services.narrative_services import bucket_value, cached_narrative, fingerprint
+from workers.jobs import JobQueue
+
+METRICS = {
+    "business_id": 1,
+    "business_name": "Test Traders",
+    "monthly_revenue": {"2025-01": 120000.0, "2025-02": 131000.0},
+    "total_inflow_last_3m": 251000.0,
+    "overdue_amount": 0.0,
+    "revenue_growth_percent": 9.2,
+}
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def test_small_changes_keep_the_fingerprint(self):
+        nudged = json.loads(json.dumps(METRICS))
+        nudged["total_inflow_last_3m"] = 251900.0   # +0.4%
+        nudged["overdue_amount"] = 120.0            # below the absolute step
+        nudged["revenue_growth_percent"] = 9.6
+        self.assertEqual(fingerprint(METRICS), fingerprint(nudged))
+
+    def test_meaningful_changes_move_the_fingerprint(self):
+        for key, value in [("total_inflow_last_3m", 300000.0), ("overdue_amount", 4000.0),
+                           ("revenue_growth_percent", -3.0), ("business_name", "Other")]:
+            changed = dict(METRICS, **{key: value})
+            self.assertNotEqual(fingerprint(METRICS), fingerprint(changed), key)
+
+    def test_ignored_keys_and_signs(self):
+        self.assertEqual(fingerprint(dict(METRICS, as_of="2025-01-01")), fingerprint(dict(METRICS, as_of="2025-01-02")))
+        self.assertNotEqual(bucket_value(-5000.0), bucket_value(5000.0))
+
+
+class TestNarrativeStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'narratives.db')}")
+        SQLModel.metadata.create_all(self.engine)
+        self.session = Session(self.engine)
+        self.session.add(Business(id=1, name="Test Traders"))
+        self.session.commit()
+        self.queue = JobQueue(self.engine, workers=1, poll_interval=0.01, timeout=5)
+        self.calls = []
+        self.reply = {"insights": [{"title": "first"}]}
+
+        async def fake_insights(metrics):
+            self.calls.append(metrics)
+            return json.loads(json.dumps(self.reply))
+
+        self.patches = [
+            patch.dict(narrative_services.NARRATIVE_AGENTS, {"insight": fake_insights}),
+            patch("services.narrative_services.job_queue", self.queue),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.session.close()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def narrative(self, metrics):
+        return asyncio.run(cached_narrative(self.session, 1, "insight", metrics))
+
+    def jobs(self):
+        return self.session.exec(select(Job)).all()
+
+    def test_reused_until_fingerprint_drifts_then_refreshed_in_background(self):
+        self.assertEqual(self.narrative(METRICS), {"insights": [{"title": "first"}]})
+        self.assertEqual(self.narrative(dict(METRICS, total_inflow_last_3m=251500.0)), {"insights": [{"title": "first"}]})
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.jobs(), [])
+
+        self.reply = {"insights": [{"title": "second"}]}
+        changed = dict(METRICS, total_inflow_last_3m=400000.0)
+        # stale text is served at once; the refresh is queued (once) instead
+        self.assertEqual(self.narrative(changed), {"insights": [{"title": "first"}]})
+        self.narrative(changed)
+        self.assertEqual(len(self.jobs()), 1)
+        self.assertEqual(len(self.calls), 1)
+
+        asyncio.run(self.queue.run_pending())
+        self.assertEqual(self.calls[-1]["total_inflow_last_3m"], 400000.0)
+        self.session.expire_all()
+        self.assertEqual(self.narrative(changed), {"insights": [{"title": "second"}]})
+
+    def test_fallback_text_is_not_treated_as_fresh(self):
+        self.reply = {"insights": [{"title": "mock"}], "fallback": True}
+        self.narrative(METRICS)
+        row = self.session.exec(select(Narrative)).one()
+        self.assertTrue(row.is_fallback)
+
+        self.narrative(METRICS)
+        self.assertEqual(len(self.jobs()), 1)
+        self.reply = {"insights": [{"title": "real"}]}
+        asyncio.run(self.queue.run_pending())
+        self.session.expire_all()
+        self.assertEqual(self.narrative(METRICS), {"insights": [{"title": "real"}]})
+
+    def test_errors_are_not_stored_and_old_narratives_expire(self):
+        self.reply = {"error": "LLM client not initialized"}
+        self.narrative(METRICS)
+        self.assertEqual(self.session.exec(select(Narrative)).all(), [])
+
+        self.reply = {"insights": []}
+        self.narrative(METRICS)
+        row = self.session.exec(select(Narrative)).one()
+        row.updated_at = datetime.utcnow() - timedelta(days=30)
+        self.session.add(row)
+        self.session.commit()
+        self.narrative(METRICS)
+        self.assertEqual(len(self.jobs()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import patch
+
+from agents import parser_agent
+from utils.parsing import fast_path_stats, match_transaction_template, parse_transaction_fast
+
+
+class TestFastPathTemplates(unittest.TestCase):
+
+    def assertParsed(self, text, direction, amount, method, counterparty):
+        result = match_transaction_template(text)
+        self.assertIsNotNone(result, text)
+        self.assertEqual(
+            (result["direction"], result["amount"], result["method"], result["counterparty_name"]),
+            (direction, amount, method, counterparty),
+        )
+        self.assertGreaterEqual(result["confidence"], 0.85)
+
+    def test_bank_alerts(self):
+        self.assertParsed("Rs.1500.00 credited to A/c XX1234 on 12-05-24 by UPI ref 412345678901 from RAJU KUMAR",
+                          "inflow", 1500.0, "upi", "Raju Kumar")
+        self.assertParsed("INR 2,500.00 debited from A/c no. XX1234 on 05-Jan-24 via IMPS. Avl Bal INR 10,234.50",
+                          "outflow", 2500.0, "bank", None)
+        self.assertParsed("Your A/c XX1234 is credited with Rs 1,500.00 on 12/05/2024 by UPI from raju@okaxis",
+                          "inflow", 1500.0, "upi", "raju@okaxis")
+        self.assertParsed("Rs.800.00 debited A/c XX1234 Info: UPI/P2M/412345678/SHARMA STORES",
+                          "outflow", 800.0, "upi", "Sharma Stores")
+
+    def test_upi_apps_pos_and_free_text(self):
+        self.assertParsed("You paid ₹450 to Sharma Stores", "outflow", 450.0, "upi", "Sharma Stores")
+        self.assertParsed("₹1,200 received from Anita Sharma", "inflow", 1200.0, "upi", "Anita Sharma")
+        self.assertParsed("Rs 2,340.00 spent on your HDFC Bank Card XX1234 at BIG BAZAAR on 2024-05-12",
+                          "outflow", 2340.0, "pos", "Big Bazaar")
+        self.assertParsed("Received 1500 from Raju via UPI", "inflow", 1500.0, "upi", "Raju")
+
+    def test_schema_matches_llm_prompt(self):
+        result = match_transaction_template("You paid ₹450 to Sharma Stores")
+        for key in ("direction", "amount", "currency", "method", "counterparty_name", "category", "invoice"):
+            self.assertIn(key, result)
+        self.assertEqual(result["invoice"]["has_invoice"], False)
+
+    def test_invoice_mentions_and_unknown_text_are_not_confident(self):
+        self.assertIsNone(match_transaction_template("Hello, are we meeting tomorrow?"))
+        result = match_transaction_template("Paid 3000 to Gupta Suppliers for invoice INV-2024 due 20 May")
+        self.assertLess(result["confidence"], 0.85)
+
+
+class TestParserAgentFastPath(unittest.TestCase):
+
+    def setUp(self):
+        fast_path_stats.reset()
+
+    def test_fast_path_skips_llm_and_counts_hits(self):
+        with patch("agents.parser_agent.generate_content") as mock_llm:
+            mock_llm.return_value = {"direction": "outflow", "amount": 3000.0, "invoice": {"has_invoice": True}}
+            fast = parser_agent.parse_transaction_with_ai("You paid ₹450 to Sharma Stores")
+            slow = parser_agent.parse_transaction_with_ai("Paid 3000 to Gupta Suppliers for invoice INV-2024")
+
+        self.assertEqual(fast["parser"], "rules")
+        self.assertEqual(slow["amount"], 3000.0)
+        mock_llm.assert_called_once()
+        stats = fast_path_stats.snapshot()
+        self.assertEqual((stats["attempts"], stats["hits"], stats["hit_rate"]), (2, 1, 0.5))
+
+    def test_threshold_is_respected(self):
+        self.assertIsNone(parse_transaction_fast("Received 1500 from Raju via UPI", min_confidence=0.99))
+
+
+if __name__ == "__main__":
+    unittest.main()
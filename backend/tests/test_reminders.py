@@ -0,0 +1,172 @@
+import asyncio
+import json
+import unittest
+from datetime import date, timedelta
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from config import settings
+from db import get_session
+from models.business import Business
+from models.contact import Contact
+from models.invoice import Invoice
+from models.outbound_message import OutboundMessage
+from routers import actions
+from services import reminder_services
+from services.reminder_services import reminder_targets, run_reminder_campaign
+from tests.test_messaging import MessageQueueTestCase, ScriptedTransport
+
+TODAY = date(2025, 3, 10)
+
+
+class ReminderCampaignTestCase(MessageQueueTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.queue = self.make_queue(ScriptedTransport({}))
+        self.patch = patch.object(reminder_services, "message_queue", self.queue)
+        self.patch.start()
+        self.session = Session(self.engine)
+
+    def tearDown(self):
+        self.session.close()
+        self.patch.stop()
+        super().tearDown()
+
+    def add_contact(self, name, phone="+919800000001"):
+        contact = Contact(business_id=1, name=name, phone=phone)
+        self.session.add(contact)
+        self.session.commit()
+        return contact.id
+
+    def add_invoice(self, contact_id, amount, due_in_days, status="pending", kind="receivable"):
+        invoice = Invoice(business_id=1, contact_id=contact_id, amount=amount, type=kind, status=status,
+                          due_date=TODAY + timedelta(days=due_in_days))
+        self.session.add(invoice)
+        self.session.commit()
+        return invoice.id
+
+    def campaign(self, **kwargs):
+        return asyncio.run(run_reminder_campaign(self.session, 1, today=TODAY, **kwargs))
+
+    def queued(self):
+        return self.session.exec(select(OutboundMessage).order_by(OutboundMessage.id)).all()
+
+
+class TestReminderCampaign(ReminderCampaignTestCase):
+
+    def setUp(self):
+        super().setUp()
+        raju = self.add_contact("Raju", "+919800000001")
+        anita = self.add_contact("Anita", "+919800000002")
+        nophone = self.add_contact("No Phone", None)
+        self.overdue = self.add_invoice(raju, 1500.0, -12)
+        self.overdue_flagged = self.add_invoice(anita, 800.0, -3, status="overdue")
+        self.soon = self.add_invoice(anita, 400.0, 2)
+        self.add_invoice(raju, 999.0, 20)                          # not due soon
+        self.add_invoice(raju, 700.0, -5, status="paid")
+        self.add_invoice(raju, 300.0, -5, kind="payable")
+        self.add_invoice(nophone, 250.0, -1)
+
+    def test_targets_come_from_one_query_with_days_overdue(self):
+        targets = reminder_targets(self.session, 1, TODAY, 3)
+        self.assertEqual([t["invoice_id"] for t in targets],
+                         [self.overdue, self.overdue_flagged, targets[2]["invoice_id"], self.soon])
+        self.assertEqual([t["days_overdue"] for t in targets], [12, 3, 1, -2])
+        self.assertIsNone(targets[2]["phone"])
+
+    def test_standard_tone_uses_template_and_queues_once(self):
+        with patch("agents.reminder_agent.agenerate_content") as llm:
+            result = self.campaign()
+            again = self.campaign()
+        llm.assert_not_called()
+
+        stats = result["stats"]
+        self.assertEqual((stats["invoices"], stats["queued"], stats["skipped_no_phone"], stats["template"]),
+                         (4, 3, 1, 3))
+        messages = self.queued()
+        self.assertEqual([m.invoice_id for m in messages], [self.overdue, self.overdue_flagged, self.soon])
+        self.assertIn("Test Traders", messages[0].body)
+        self.assertNotIn("Demo Business", messages[0].body)
+        self.assertIn("overdue by 12 days", messages[0].body)
+        self.assertIn("due in 2 days", messages[2].body)
+
+        self.assertEqual((again["stats"]["queued"], again["stats"]["already_queued"], again["stats"]["template"]),
+                         (0, 3, 0))
+        self.assertEqual(len(self.queued()), 3)
+
+    def test_custom_tone_batches_llm_calls(self):
+        calls = []
+
+        async def fake_llm(prompt, content, agent=None):
+            items = json.loads(content)
+            calls.append(len(items))
+            # the model "forgets" the last item of each batch
+            return {"messages": [{"i": item["i"], "message": f"Namaste {item['customer_name']}"} for item in items[:-1]]}
+
+        with patch("agents.reminder_agent.agenerate_content", side_effect=fake_llm), \
+                patch.object(settings, "REMINDER_LLM_BATCH_SIZE", 2):
+            result = self.campaign(tone="warm, in Hinglish", dry_run=True)
+        self.assertEqual(calls, [2, 1])
+        self.assertEqual((result["stats"]["llm"], result["stats"]["fallback"], result["stats"]["llm_calls"]), (1, 2, 2))
+        self.assertEqual(result["reminders"][0]["message"], "Namaste Raju")
+        self.assertIn("Test Traders", result["reminders"][1]["message"])
+        self.assertEqual(self.queued(), [])
+
+    def test_unknown_business(self):
+        with self.assertRaises(ValueError):
+            asyncio.run(run_reminder_campaign(self.session, 42, today=TODAY))
+        # the background job fails with the domain error, not an HTTP one
+        with self.assertRaises(ValueError):
+            asyncio.run(actions.reminder_campaign_job({"business_id": 42}, self.session))
+
+    def test_default_language_is_shared_with_single_reminders(self):
+        self.add_invoice(self.add_contact("Raju"), 500.0, -5)
+        seen = set()
+
+        async def fake_llm(prompt, content, agent=None):
+            items = json.loads(content)
+            seen.update(item["preferred_language"] for item in items)
+            return {"messages": [{"i": item["i"], "message": "Namaste"} for item in items]}
+
+        with patch("agents.reminder_agent.agenerate_content", side_effect=fake_llm), \
+                patch.object(settings, "REMINDER_LANGUAGE", "Hinglish"):
+            self.campaign(tone="warm", dry_run=True)
+        self.assertEqual(seen, {"Hinglish"})
+        self.assertIsNone(actions.SendReminderRequest.model_fields["preferred_language"].default)
+
+
+class TestCampaignAtScale(ReminderCampaignTestCase):
+
+    def test_thousands_of_invoices_in_one_request(self):
+        self.session.add_all([Contact(business_id=1, name=f"Customer {i}", phone=f"+9198{i:08d}") for i in range(2000)])
+        self.session.commit()
+        contact_ids = self.session.exec(select(Contact.id)).all()
+        self.session.add_all([
+            Invoice(business_id=1, contact_id=cid, amount=100.0 + i, type="receivable",
+                    due_date=TODAY - timedelta(days=i % 60))
+            for i, cid in enumerate(contact_ids)
+        ])
+        self.session.commit()
+
+        app = FastAPI()
+        app.include_router(actions.router, prefix="/actions")
+
+        def session_override():
+            with Session(self.engine) as session:
+                yield session
+
+        app.dependency_overrides[get_session] = session_override
+        with patch.object(settings, "REMINDER_CAMPAIGN_CHUNK", 500):
+            response = TestClient(app).post("/actions/reminders/campaign", json={"business_id": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["stats"]["queued"], 2000)
+        self.assertEqual(len(self.queued()), 2000)
+        self.assertEqual(TestClient(app).post("/actions/reminders/campaign", json={"business_id": 7}).status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from db import get_session
+from models.business import Business
+from models.contact import Contact
+from models.invoice import Invoice
+from models.transaction import Transaction
+from routers import risk as risk_router
+from services.narrative_services import NARRATIVE_AGENTS
+from services.risk_services import score_business_risk
+from tests.test_cashflow import LedgerTestCase
+
+TODAY = date(2024, 6, 30)
+
+
+class RiskTestCase(LedgerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.slow = self.contact("Slow Traders")
+        self.prompt = self.contact("Prompt Retail")
+        self.new = self.contact("New Customer")
+        for months_ago in (5, 4, 3):
+            due = TODAY - timedelta(days=30 * months_ago)
+            # Slow Traders pays ~40 days late, in two parts; Prompt Retail pays on the due date
+            self.settled(self.slow, 1000.0, due, [(due + timedelta(days=35), 500.0), (due + timedelta(days=45), 500.0)])
+            self.settled(self.prompt, 1000.0, due, [(due, 1000.0)])
+        self.slow_open = self.open_invoice(self.slow, 2000.0, TODAY - timedelta(days=20), status="overdue")
+        self.prompt_open = self.open_invoice(self.prompt, 1500.0, TODAY + timedelta(days=10))
+        self.new_open = self.open_invoice(self.new, 800.0, TODAY + timedelta(days=5))
+        self.session.add(Invoice(business_id=1, contact_id=self.slow, amount=5000.0, type="payable",
+                                 status="overdue", due_date=TODAY - timedelta(days=60)))
+        self.session.commit()
+
+    def contact(self, name):
+        contact = Contact(business_id=1, name=name)
+        self.session.add(contact)
+        self.session.commit()
+        return contact.id
+
+    def settled(self, contact_id, amount, due, payments):
+        invoice = Invoice(business_id=1, contact_id=contact_id, amount=amount, amount_paid=amount,
+                          type="receivable", status="paid", due_date=due)
+        self.session.add(invoice)
+        self.session.commit()
+        for when, paid in payments:
+            self.session.add(Transaction(business_id=1, invoice_id=invoice.id, direction="inflow", amount=paid,
+                                         date=datetime.combine(when, datetime.min.time())))
+
+    def open_invoice(self, contact_id, amount, due, status="pending"):
+        invoice = Invoice(business_id=1, contact_id=contact_id, amount=amount, type="receivable",
+                          status=status, due_date=due)
+        self.session.add(invoice)
+        self.session.commit()
+        return invoice.id
+
+
+class TestRiskScoring(RiskTestCase):
+
+    def test_scores_open_receivables_riskiest_first(self):
+        risk = score_business_risk(self.session, 1, today=TODAY)
+        by_id = {inv["invoice_id"]: inv for inv in risk["invoices"]}
+        self.assertEqual([inv["invoice_id"] for inv in risk["invoices"]],
+                         [self.slow_open, self.new_open, self.prompt_open])
+        self.assertEqual((risk["open_invoices"], risk["amount_due"]), (3, 4300.0))
+
+        slow = by_id[self.slow_open]
+        self.assertEqual(slow["risk_band"], "high")
+        self.assertEqual((slow["features"]["partial_ratio"], slow["features"]["days_overdue"]), (0.75, 20.0))
+        self.assertGreater(slow["features"]["mean_days_late"], 20.0)
+        self.assertIn("late on average", slow["reason"])
+        self.assertEqual(slow["contact_name"], "Slow Traders")
+
+        prompt = by_id[self.prompt_open]
+        self.assertEqual(prompt["risk_band"], "low")
+        self.assertLess(prompt["features"]["mean_days_late"], slow["features"]["mean_days_late"])
+        self.assertEqual(prompt["features"]["days_since_last_payment"], 90.0)
+
+        new = by_id[self.new_open]
+        self.assertEqual(new["features"]["days_since_last_payment"], 180.0)
+        self.assertEqual(new["reason"], "No payment history yet")
+        self.assertLess(prompt["risk_score"], new["risk_score"])
+
+    def test_partial_payment_on_open_invoice_counts(self):
+        invoice = self.session.get(Invoice, self.prompt_open)
+        invoice.amount_paid, invoice.status = 500.0, "partial"
+        self.session.add(Transaction(business_id=1, invoice_id=invoice.id, direction="inflow", amount=500.0,
+                                     date=datetime(2024, 6, 25)))
+        self.session.commit()
+        prompt = next(inv for inv in score_business_risk(self.session, 1, today=TODAY)["invoices"]
+                      if inv["invoice_id"] == self.prompt_open)
+        self.assertEqual((prompt["amount_due"], prompt["features"]["partial_ratio"]), (1000.0, 0.25))
+        self.assertEqual(prompt["features"]["days_since_last_payment"], 5.0)
+
+    def test_empty_book_and_unknown_business(self):
+        self.session.add(Business(id=2, name="Empty"))
+        self.session.commit()
+        risk = score_business_risk(self.session, 2, today=TODAY)
+        self.assertEqual((risk["open_invoices"], risk["invoices"], risk["expected_late_amount"]), (0, [], 0.0))
+        with self.assertRaises(ValueError):
+            score_business_risk(self.session, 99)
+
+
+class TestRiskRoute(RiskTestCase):
+
+    def setUp(self):
+        super().setUp()
+        app = FastAPI()
+        app.include_router(risk_router.router, prefix="/risk")
+        app.dependency_overrides[get_session] = lambda: self.session
+        self.client = TestClient(app)
+
+    def test_route_scores_and_limits(self):
+        response = self.client.get("/risk/1?limit=1")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body["open_invoices"], len(body["invoices"])), (3, 1))
+        self.assertEqual(body["invoices"][0]["invoice_id"], self.slow_open)
+        self.assertNotIn("explanation", body)
+        self.assertEqual(self.client.get("/risk/99").status_code, 404)
+
+    def test_explanation_is_optional_and_gets_the_local_scores(self):
+        explain = AsyncMock(return_value={"summary": "Chase Slow Traders", "priorities": [], "recommendations": []})
+        with patch.dict(NARRATIVE_AGENTS, {"risk": explain}):
+            body = self.client.get("/risk/1?explain=true").json()
+        self.assertEqual(body["explanation"]["summary"], "Chase Slow Traders")
+        [inputs] = explain.call_args.args
+        self.assertEqual(inputs["invoices"][0]["invoice_id"], self.slow_open)
+
+    def test_analyze_uses_local_scores_for_a_business(self):
+        llm = AsyncMock(return_value={"late_payment_risk": [{"invoice_id": 1, "risk_score": 0.99, "reason": "?"}],
+                                      "high_demand_signals": []})
+        with patch.object(risk_router, "aanalyze_risk_and_demand", llm):
+            body = self.client.post("/risk/analyze", json={"history": [], "context": {"business_id": 1}}).json()
+        scores = body["risk_analysis"]["late_payment_risk"]
+        self.assertEqual([s["invoice_id"] for s in scores][0], self.slow_open)
+        self.assertEqual(len(scores), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
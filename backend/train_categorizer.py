@@ -0,0 +1,29 @@
+import argparse
+import time
+from sqlmodel import Session
+from db import engine, init_db
+from services.categorization_services import train_category_model
+from services.forecast_services import all_business_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local transaction categorizer (global + per business).")
+    parser.add_argument("--business-id", type=int, default=None, help="only this business (and the global model)")
+    parser.add_argument("--full", action="store_true", help="retrain from scratch instead of incrementally")
+    args = parser.parse_args()
+
+    init_db()
+    started = time.perf_counter()
+    with Session(engine) as session:
+        ids = [args.business_id] if args.business_id is not None else all_business_ids(session)
+        for business_id in [None] + ids:
+            result = train_category_model(session, business_id, full=args.full)
+            if result["trained"] or business_id is None:
+                accuracy = result["accuracy"]
+                print(f"{result['model']}: +{result['trained']} rows, {result['samples']} total, "
+                      f"accuracy {accuracy if accuracy is None else round(accuracy, 3)}")
+    print(f"Trained in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
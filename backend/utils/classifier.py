@@ -0,0 +1,209 @@
+# backend/utils/classifier.py
+"""
+Small text classifier in NumPy: hashed word/bigram/char-trigram features
+and a multinomial logistic regression trained with AdaGrad mini-batches.
+
+partial_fit only ever adds to the model, so new labelled rows (and new
+classes) can be folded in without retraining from scratch. Each first pass
+over a mini-batch is scored before the update (progressive validation),
+which gives accuracy and coverage estimates without a separate hold-out.
+AdaGrad's squared-gradient sums are as large as the weights and only matter
+for training, so inference copies drop them.
+"""
+import json
+import os
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z]+|\d+")
+BIAS_FEATURE = "__bias__"
+
+
+def _bucket(feature: str, dim: int) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % dim
+
+
+def _number_shape(token: str) -> str:
+    # amounts/refs vary per row; their length carries the signal
+    return f"#{min(len(token), 8)}"
+
+
+def text_features(text: str) -> List[str]:
+    words = [_number_shape(t) if t.isdigit() else t for t in TOKEN_RE.findall((text or "").lower())]
+    features = [BIAS_FEATURE]
+    features += [f"w:{w}" for w in words]
+    features += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        if len(w) > 3 and not w.startswith("#"):
+            padded = f"<{w}>"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return features
+
+
+def vectorize(texts: Sequence[str], dim: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CSR triple (indptr, indices, values); rows are log-scaled counts, L2-normalised."""
+    indptr, indices, values = [0], [], []
+    for text in texts:
+        counts: Dict[int, int] = {}
+        for feature in text_features(text):
+            idx = _bucket(feature, dim)
+            counts[idx] = counts.get(idx, 0) + 1
+        row = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        row /= np.linalg.norm(row)
+        indices.extend(counts.keys())
+        values.extend(row.tolist())
+        indptr.append(len(indices))
+    return (np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int64),
+            np.asarray(values, dtype=np.float32))
+
+
+class HashedLinearClassifier:
+
+    def __init__(self, dim: int = 2 ** 16, learning_rate: float = 0.5, l2: float = 1e-6):
+        self.dim = dim
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.classes: List[str] = []
+        self.weights = np.zeros((dim, 0), dtype=np.float32)
+        self._grad_sq: Optional[np.ndarray] = np.zeros((dim, 0), dtype=np.float32)
+        self.meta: Dict[str, Any] = {"samples": 0, "eval_seen": 0, "eval_correct": 0,
+                                     "eval_covered": 0, "eval_covered_correct": 0}
+
+    # --- inference -------------------------------------------------------------
+
+    def _logits(self, indptr: np.ndarray, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        contrib = self.weights[indices] * values[:, None]
+        # every row has the bias feature, so no row is empty
+        return np.add.reduceat(contrib, indptr[:-1], axis=0)
+
+    def _proba(self, indptr, indices, values) -> np.ndarray:
+        logits = self._logits(indptr, indices, values)
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        if not self.classes:
+            return np.zeros((len(texts), 0), dtype=np.float32)
+        return self._proba(*vectorize(texts, self.dim))
+
+    def predict(self, texts: Sequence[str]) -> List[Tuple[Optional[str], float]]:
+        """(label, probability) per text; (None, 0.0) before any training."""
+        if not self.classes:
+            return [(None, 0.0)] * len(texts)
+        proba = self.predict_proba(texts)
+        best = proba.argmax(axis=1)
+        return [(self.classes[c], float(proba[i, c])) for i, c in enumerate(best)]
+
+    # --- training --------------------------------------------------------------
+
+    @property
+    def trainable(self) -> bool:
+        return self._grad_sq is not None
+
+    def _require_trainable(self):
+        if self._grad_sq is None:
+            raise ValueError("model was loaded for inference only")
+
+    def for_inference(self) -> "HashedLinearClassifier":
+        """Copy sharing the weights but without the AdaGrad state; it can predict, not train or save."""
+        model = HashedLinearClassifier(self.dim, self.learning_rate, self.l2)
+        model.classes = list(self.classes)
+        model.meta = dict(self.meta)
+        model.weights = self.weights
+        model._grad_sq = None
+        return model
+
+    def _add_classes(self, labels: Sequence[str]):
+        new = sorted(set(labels) - set(self.classes))
+        if not new:
+            return
+        self.classes.extend(new)
+        pad = np.zeros((self.dim, len(new)), dtype=np.float32)
+        self.weights = np.hstack([self.weights, pad])
+        self._grad_sq = np.hstack([self._grad_sq, pad])
+
+    def _record_eval(self, proba: np.ndarray, targets: np.ndarray, min_confidence: float):
+        best = proba.argmax(axis=1)
+        confident = proba[np.arange(len(best)), best] >= min_confidence
+        correct = best == targets
+        self.meta["eval_seen"] += int(len(best))
+        self.meta["eval_correct"] += int(correct.sum())
+        self.meta["eval_covered"] += int(confident.sum())
+        self.meta["eval_covered_correct"] += int((correct & confident).sum())
+
+    def partial_fit(self, texts: Sequence[str], labels: Sequence[str], epochs: int = 2,
+                    batch_size: int = 256, min_confidence: float = 0.8, seed: int = 0):
+        """
+        Folds (texts, labels) into the model. The first epoch scores each
+        mini-batch before learning from it; `min_confidence` is the threshold
+        the coverage estimate is computed at.
+        """
+        self._require_trainable()
+        if not texts:
+            return
+        trained_before = bool(self.classes)
+        self._add_classes(labels)
+        class_of = {c: i for i, c in enumerate(self.classes)}
+        targets = np.fromiter((class_of[label] for label in labels), dtype=np.int64, count=len(labels))
+        rng = np.random.default_rng(seed)
+        n_classes = len(self.classes)
+
+        for epoch in range(epochs):
+            order = rng.permutation(len(texts))
+            for offset in range(0, len(order), batch_size):
+                rows = order[offset:offset + batch_size]
+                indptr, indices, values = vectorize([texts[i] for i in rows], self.dim)
+                proba = self._proba(indptr, indices, values)
+                if epoch == 0 and (trained_before or offset > 0):
+                    self._record_eval(proba, targets[rows], min_confidence)
+
+                error = proba
+                error[np.arange(len(rows)), targets[rows]] -= 1.0
+                row_of_nnz = np.repeat(np.arange(len(rows)), np.diff(indptr))
+                features, inverse = np.unique(indices, return_inverse=True)
+                grad = np.zeros((len(features), n_classes), dtype=np.float32)
+                np.add.at(grad, inverse, error[row_of_nnz] * values[:, None])
+                grad /= len(rows)
+                grad += self.l2 * self.weights[features]
+                self._grad_sq[features] += grad * grad
+                self.weights[features] -= self.learning_rate * grad / (np.sqrt(self._grad_sq[features]) + 1e-8)
+        self.meta["samples"] += len(texts)
+
+    # --- metrics / persistence -------------------------------------------------
+
+    def metrics(self) -> Dict[str, Any]:
+        seen, covered = self.meta["eval_seen"], self.meta["eval_covered"]
+        return {
+            "samples": self.meta["samples"],
+            "classes": list(self.classes),
+            "accuracy": self.meta["eval_correct"] / seen if seen else None,
+            "coverage": covered / seen if seen else None,
+            "covered_accuracy": self.meta["eval_covered_correct"] / covered if covered else None,
+        }
+
+    def save(self, path: str):
+        """Writes atomically (temp file + rename) so readers never see a partial model."""
+        self._require_trainable()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp, weights=self.weights, grad_sq=self._grad_sq,
+            config=np.array(json.dumps({"dim": self.dim, "learning_rate": self.learning_rate, "l2": self.l2,
+                                        "classes": self.classes, "meta": self.meta})),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, trainable: bool = True) -> "HashedLinearClassifier":
+        """trainable=False skips the AdaGrad state, roughly halving the memory of a model used to predict."""
+        with np.load(path) as data:
+            config = json.loads(str(data["config"]))
+            model = cls(config["dim"], config["learning_rate"], config["l2"])
+            model.classes = config["classes"]
+            model.meta.update(config["meta"])
+            model.weights = data["weights"]
+            model._grad_sq = data["grad_sq"] if trainable else None
+        return model
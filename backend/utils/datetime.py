@@ -0,0 +1,78 @@
+from datetime import date, datetime
+from typing import Optional, Tuple
+
+
+def parse_iso_date(value) -> Optional[date]:
+    """date/datetime/'YYYY-MM-DD' → date; anything unparseable → None."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+
+DATE_FORMATS = [
+    "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%d-%m-%y",
+    "%d-%b-%Y", "%d-%b-%y", "%d %b %Y", "%d %b %y", "%d %B %Y", "%b %d, %Y",
+    "%Y/%m/%d", "%Y%m%d",
+]
+
+
+def _parse_date(value, preferred: Optional[str] = None) -> Tuple[Optional[datetime], Optional[str]]:
+    """(datetime, strptime format that matched the whole text, if any)."""
+    if value is None or value == "":
+        return None, None
+    if isinstance(value, datetime):
+        return value, None
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day), None
+
+    text = str(value).strip()
+    if preferred:
+        try:
+            return datetime.strptime(text, preferred), preferred
+        except ValueError:
+            pass
+    try:
+        return datetime.fromisoformat(text), None
+    except ValueError:
+        pass
+    for candidate in (text, text.split(" ")[0]):
+        for fmt in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(candidate, fmt)
+            except ValueError:
+                continue
+            return parsed, fmt if candidate == text else None
+    return None, None
+
+
+def parse_date(value) -> Optional[datetime]:
+    """
+    Normalises statement dates (ISO, dd/mm/yyyy, 05-Jan-24, Excel datetimes, ...)
+    to a datetime. Day-first formats win for ambiguous dd/mm vs mm/dd strings,
+    as in Indian bank statements.
+    """
+    return _parse_date(value)[0]
+
+
+class DateParser:
+    """
+    parse_date() for the rows of one file: the last successful format is
+    tried first, since a file uses one format throughout. Create one per
+    import; the remembered format must not leak into other uploads.
+    """
+
+    def __init__(self):
+        self.last_format: Optional[str] = None
+
+    def __call__(self, value) -> Optional[datetime]:
+        parsed, fmt = _parse_date(value, self.last_format)
+        if fmt:
+            self.last_format = fmt
+        return parsed
@@ -1,9 +1,18 @@
+import asyncio
 import json
 import os
-from typing import Dict, Any, Optional
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Any, Optional, Tuple
 import google.generativeai as genai
 from config import settings
 from .logger import get_logger
+from .llm_cache import ResponseCache, MemoryLRUCache, SQLiteCache, make_cache_key
+from . import llm_gateway
+from .llm_gateway import GatewayError
+from .llm_context import estimate_tokens
+from .metrics import llm_cache_requests, llm_call_seconds, llm_errors, llm_tokens
 
 logger = get_logger(__name__)
 
@@ -18,45 +27,231 @@ if api_key:
 else:
     logger.warning("No GEMINI_API_KEY provided.")
 
-def generate_content(prompt: str, context: str, model: str = None) -> Dict[str, Any]:
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "response_mime_type": "application/json",
+}
+
+
+def _build_response_cache() -> ResponseCache:
+    tiers = [MemoryLRUCache(settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL_SECONDS)]
+    if settings.LLM_CACHE_PATH:
+        try:
+            tiers.append(SQLiteCache(settings.LLM_CACHE_PATH, settings.LLM_CACHE_TTL_SECONDS))
+        except Exception as e:
+            logger.warning(f"Persistent LLM cache disabled: {e}")
+    return ResponseCache(tiers)
+
+
+response_cache = _build_response_cache()
+
+
+def set_response_cache(cache: ResponseCache):
+    """Swaps the cache implementation (e.g. different tiers, or an empty list to disable)."""
+    global response_cache
+    response_cache = cache
+
+
+def invalidate_llm_cache(agent: Optional[str] = None, key: Optional[str] = None):
+    """Drops cached responses for one key, one agent, or everything."""
+    response_cache.invalidate(key=key, agent=agent)
+
+
+def llm_cache_stats() -> Dict[str, Dict[str, int]]:
+    return response_cache.stats()
+
+
+def _cache_enabled(agent: Optional[str]) -> bool:
+    return agent is not None and agent in settings.LLM_CACHE_AGENTS
+
+
+def _cache_lookup(target_model: str, prompt: str, context: str,
+                  agent: Optional[str]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """Returns (cache_key, cached_result); cache_key is None when the agent has not opted in."""
+    if not _cache_enabled(agent):
+        return None, None
+    cache_key = make_cache_key(target_model, prompt, context, GENERATION_CONFIG)
+    cached = response_cache.get(cache_key, agent=agent)
+    llm_cache_requests.inc(agent=agent, result="miss" if cached is None else "hit")
+    if cached is not None:
+        logger.info(f"LLM cache hit for agent={agent}")
+    return cache_key, cached
+
+
+def _cache_store(cache_key: Optional[str], result: Any, agent: Optional[str]):
+    # Only well-formed, non-error responses are worth replaying.
+    if cache_key and isinstance(result, dict) and "error" not in result:
+        response_cache.set(cache_key, result, agent=agent)
+
+
+_token_lock = threading.Lock()
+_token_counts: Dict[str, Dict[str, int]] = {}
+
+
+def _usage(response: Any, field: str, fallback: str) -> int:
+    value = getattr(getattr(response, "usage_metadata", None), field, None)
+    return value if isinstance(value, int) else estimate_tokens(fallback)
+
+
+def _record_tokens(agent: Optional[str], target_model: str, prompt: str, context: str, response: Any, content: str):
+    """Logs tokens in/out of one call (provider usage when reported, else estimated) and adds them up per agent."""
+    tokens_in = _usage(response, "prompt_token_count", prompt + context)
+    tokens_out = _usage(response, "candidates_token_count", content)
+    logger.info(f"LLM tokens agent={agent} model={target_model} in={tokens_in} out={tokens_out}")
+    llm_tokens.observe(tokens_in, agent=agent, direction="in")
+    llm_tokens.observe(tokens_out, agent=agent, direction="out")
+    with _token_lock:
+        for name in ("_all", agent or "_unnamed"):
+            bucket = _token_counts.setdefault(name, {"calls": 0, "tokens_in": 0, "tokens_out": 0})
+            bucket["calls"] += 1
+            bucket["tokens_in"] += tokens_in
+            bucket["tokens_out"] += tokens_out
+
+
+def _observe_call(agent: Optional[str], target_model: str, started: float, outcome: str):
+    llm_call_seconds.observe(time.perf_counter() - started, agent=agent, model=target_model, outcome=outcome)
+
+
+def llm_token_stats() -> Dict[str, Dict[str, int]]:
+    with _token_lock:
+        return {name: dict(counts) for name, counts in _token_counts.items()}
+
+
+@lru_cache(maxsize=64)
+def _get_model(target_model: str, prompt: str) -> "genai.GenerativeModel":
+    """One shared client per (model, system prompt); the SDK reuses its transport across calls."""
+    return genai.GenerativeModel(target_model, system_instruction=prompt)
+
+
+_global_semaphore: Optional[asyncio.Semaphore] = None
+_model_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _semaphores(target_model: str) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    if target_model not in _model_semaphores:
+        _model_semaphores[target_model] = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY_PER_MODEL)
+    return _global_semaphore, _model_semaphores[target_model]
+
+
+def _parse(agent: Optional[str], target_model: str, prompt: str, context: str, response: Any) -> Dict[str, Any]:
+    content = response.text.strip()
+    logger.debug(f"Gemini response: {content}")
+    _record_tokens(agent, target_model, prompt, context, response, content)
+    return json.loads(content)
+
+
+def _failed(agent: Optional[str], error: GatewayError) -> Dict[str, Any]:
+    logger.error(f"Gemini API error: {error}")
+    llm_errors.inc(agent=agent)
+    return {"error": str(error)}
+
+
+def _served(agent: Optional[str], target_model: str, cache_key: Optional[str], result: Dict[str, Any],
+            served_by: str) -> Dict[str, Any]:
+    # answers from a fallback model are not cached under the requested model's key
+    if served_by == target_model:
+        _cache_store(cache_key, result, agent)
+    return result
+
+
+def generate_content(prompt: str, context: str, model: str = None, agent: Optional[str] = None) -> Dict[str, Any]:
     """
     Generates content using Google Gemini.
-    
+
     Args:
         prompt: The system/instruction prompt.
         context: The user input/data context.
         model: Optional model override. Defaults to settings.LLM_MODEL.
-        
+        agent: Name of the calling agent. Agents listed in settings.LLM_CACHE_AGENTS
+            are served from the response cache when the same call was made before.
+
+    The call goes through utils.llm_gateway (agent deadline, retries, circuit
+    breaker, fallback models).
+
     Returns:
         Parsed JSON dictionary from the LLM response.
     """
+    target_model = model or settings.LLM_MODEL
+    cache_key, cached = _cache_lookup(target_model, prompt, context, agent)
+    if cached is not None:
+        return cached
+
     if not api_key:
         logger.warning("Gemini client not initialized (missing API key?)")
+        llm_errors.inc(agent=agent)
         return {"error": "LLM client not initialized"}
 
+    def attempt(candidate: str, timeout: float) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            logger.debug(f"Calling Gemini model: {candidate}")
+            response = _get_model(candidate, prompt).generate_content(
+                f"INPUT_DATA:\n{context}",
+                generation_config=genai.GenerationConfig(**GENERATION_CONFIG),
+                request_options={"timeout": timeout},
+            )
+            result = _parse(agent, candidate, prompt, context, response)
+        except Exception as e:
+            logger.warning(f"Gemini attempt failed (model={candidate}, agent={agent}): {e}")
+            _observe_call(agent, candidate, started, "error")
+            raise
+        _observe_call(agent, candidate, started, "ok")
+        return result
+
+    try:
+        result, served_by = llm_gateway.call(agent, target_model, attempt)
+    except GatewayError as e:
+        return _failed(agent, e)
+    return _served(agent, target_model, cache_key, result, served_by)
+
+
+async def agenerate_content(prompt: str, context: str, model: str = None, agent: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Async variant of generate_content for `async def` routes.
+
+    Reuses the shared model client and waits on a global plus a per-model
+    semaphore (settings.LLM_MAX_CONCURRENCY / LLM_MAX_CONCURRENCY_PER_MODEL),
+    so one worker can hold many in-flight calls without flooding the provider.
+    Attempts are cancelled at the agent's deadline and may be hedged.
+    """
     target_model = model or settings.LLM_MODEL
-    
+    cache_key, cached = _cache_lookup(target_model, prompt, context, agent)
+    if cached is not None:
+        return cached
+
+    if not api_key:
+        logger.warning("Gemini client not initialized (missing API key?)")
+        llm_errors.inc(agent=agent)
+        return {"error": "LLM client not initialized"}
+
+    async def attempt(candidate: str, timeout: float) -> Dict[str, Any]:
+        global_limit, model_limit = _semaphores(candidate)
+        # timed from before the semaphores: waiting for a slot is part of the call's latency
+        started = time.perf_counter()
+        try:
+            async with global_limit, model_limit:
+                logger.debug(f"Calling Gemini model (async): {candidate}")
+                response = await _get_model(candidate, prompt).generate_content_async(
+                    f"INPUT_DATA:\n{context}",
+                    generation_config=genai.GenerationConfig(**GENERATION_CONFIG),
+                    request_options={"timeout": timeout},
+                )
+            result = _parse(agent, candidate, prompt, context, response)
+        except asyncio.CancelledError:
+            _observe_call(agent, candidate, started, "cancelled")
+            raise
+        except Exception as e:
+            logger.warning(f"Gemini attempt failed (model={candidate}, agent={agent}): {e}")
+            _observe_call(agent, candidate, started, "error")
+            raise
+        _observe_call(agent, candidate, started, "ok")
+        return result
+
     try:
-        logger.info(f"Calling Gemini model: {target_model}")
-        
-        gemini_model = genai.GenerativeModel(
-            target_model,
-            system_instruction=prompt,
-        )
-        
-        response = gemini_model.generate_content(
-            f"INPUT_DATA:\n{context}",
-            generation_config=genai.GenerationConfig(
-                temperature=0.2,
-                response_mime_type="application/json",
-            )
-        )
-        
-        content = response.text.strip()
-        logger.debug(f"Gemini response: {content}")
-        
-        return json.loads(content)
-        
-    except Exception as e:
-        logger.error(f"Gemini API error: {e}")
-        return {"error": str(e)}
+        result, served_by = await llm_gateway.acall(agent, target_model, attempt)
+    except GatewayError as e:
+        return _failed(agent, e)
+    return _served(agent, target_model, cache_key, result, served_by)
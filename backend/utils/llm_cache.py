@@ -0,0 +1,207 @@
+# backend/utils/llm_cache.py
+"""
+Content-addressed cache for LLM responses.
+
+Keys are a SHA-256 over (model, prompt, context, generation config). Lookups
+go through an in-process LRU tier first and a persistent SQLite tier second;
+SQLite hits are promoted into memory. Each entry remembers the agent that
+produced it so a single agent's entries can be invalidated.
+"""
+import abc
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def make_cache_key(model: str, prompt: str, context: str, config: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "context": context, "config": config},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheTier(abc.ABC):
+    """Interface every tier implements; values are JSON-serialisable dicts."""
+    name = "tier"
+
+    @abc.abstractmethod
+    def get(self, key: str) -> Optional[Dict]:
+        """The live value for key, or None."""
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Dict, agent: Optional[str] = None, ttl: Optional[float] = None):
+        """Stores value; ttl in seconds overrides the tier default."""
+
+    @abc.abstractmethod
+    def delete(self, key: str):
+        """Drops one entry."""
+
+    @abc.abstractmethod
+    def clear(self, agent: Optional[str] = None):
+        """Drops the entries of one agent, or all of them."""
+
+
+class MemoryLRUCache(CacheTier):
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[Dict, Optional[float], Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def set(self, key, value, agent=None, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (copy.deepcopy(value), expires_at, agent)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self, agent=None):
+        with self._lock:
+            if agent is None:
+                self._data.clear()
+            else:
+                for key in [k for k, (_, _, a) in self._data.items() if a == agent]:
+                    del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache(CacheTier):
+    name = "sqlite"
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, agent TEXT,"
+                " created_at REAL NOT NULL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_agent ON llm_cache (agent)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < time.time():
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+        return json.loads(value)
+
+    def set(self, key, value, agent=None, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, agent, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), agent, now, now + ttl if ttl else None),
+            )
+
+    def delete(self, key):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def clear(self, agent=None):
+        with self._lock, self._connect() as conn:
+            if agent is None:
+                conn.execute("DELETE FROM llm_cache")
+            else:
+                conn.execute("DELETE FROM llm_cache WHERE agent = ?", (agent,))
+
+
+class ResponseCache:
+    """Tiered cache with hit/miss counters (overall and per agent)."""
+
+    def __init__(self, tiers: List[CacheTier]):
+        self.tiers = tiers
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, agent: Optional[str], event: str):
+        with self._lock:
+            for name in ("_all", agent or "_unnamed"):
+                bucket = self._counters.setdefault(name, {})
+                bucket[event] = bucket.get(event, 0) + 1
+
+    def get(self, key: str, agent: Optional[str] = None) -> Optional[Dict]:
+        for i, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                logger.warning(f"LLM cache tier '{tier.name}' read failed: {e}")
+                continue
+            if value is not None:
+                for upper in self.tiers[:i]:
+                    upper.set(key, value, agent=agent)
+                self._count(agent, f"hit_{tier.name}")
+                return value
+        self._count(agent, "miss")
+        return None
+
+    def set(self, key: str, value: Dict, agent: Optional[str] = None, ttl: Optional[float] = None):
+        for tier in self.tiers:
+            try:
+                tier.set(key, value, agent=agent, ttl=ttl)
+            except Exception as e:
+                logger.warning(f"LLM cache tier '{tier.name}' write failed: {e}")
+        self._count(agent, "store")
+
+    def invalidate(self, key: Optional[str] = None, agent: Optional[str] = None):
+        """Drops one key, every entry of one agent, or (no arguments) everything."""
+        for tier in self.tiers:
+            if key is not None:
+                tier.delete(key)
+            else:
+                tier.clear(agent=agent)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counters.items()}
+
+    def reset_stats(self):
+        with self._lock:
+            self._counters.clear()
@@ -0,0 +1,141 @@
+# backend/utils/llm_context.py
+"""
+Prompt-size reduction for agent inputs.
+
+compact_context() turns an agent's input into minimal JSON before it is
+sent: no whitespace, nulls and empty values dropped, floats rounded, and
+any list longer than the sample size replaced by a summary
+{"n", "stats", "counts", "top", "omitted"} (numeric min/mean/max/sum per
+field, value counts for low-cardinality text fields, and the top-k items).
+If the result is still over the agent's token budget
+(settings.LLM_CONTEXT_BUDGETS, else LLM_CONTEXT_TOKEN_BUDGET) the samples
+shrink, then long strings are cut, until it fits.
+
+Field names are kept as they are: the agent prompts refer to them.
+"""
+import json
+from typing import Any, Dict, List, Optional
+from config import settings
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+FLOAT_DIGITS = 2
+# Text fields with at most this many distinct values are summarised as counts
+MAX_COUNTED_VALUES = 8
+# Items in long lists are ranked by the first of these fields they have
+RANK_FIELDS = ("risk_score", "confidence", "amount_due", "amount", "total")
+# String lengths tried, in order, when samples alone don't fit the budget
+STRING_LIMITS = (400, 120, 40)
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English/Hinglish text and JSON; no tokenizer round-trip
+    return len(text) // 4 + 1
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _rank(item: Any) -> float:
+    if isinstance(item, dict):
+        for field in RANK_FIELDS:
+            if _is_number(item.get(field)):
+                return abs(item[field])
+    return 0.0
+
+
+def summarize_list(items: List[Any], top_k: int) -> Dict[str, Any]:
+    """Statistics over a long list plus its top_k items (by RANK_FIELDS, in their original order)."""
+    summary: Dict[str, Any] = {"n": len(items)}
+    numbers = [v for v in items if _is_number(v)]
+    if numbers:
+        summary["stats"] = _stats(numbers)
+    records = [v for v in items if isinstance(v, dict)]
+    if records:
+        fields: Dict[str, List[Any]] = {}
+        for record in records:
+            for key, value in record.items():
+                fields.setdefault(key, []).append(value)
+        stats, counts = {}, {}
+        for key, values in fields.items():
+            nums = [v for v in values if _is_number(v)]
+            if nums and not key.endswith("id"):
+                stats[key] = _stats(nums)
+            texts = [v for v in values if isinstance(v, str)]
+            distinct = set(texts)
+            if texts and len(distinct) <= MAX_COUNTED_VALUES and len(distinct) < len(texts):
+                counts[key] = {v: texts.count(v) for v in sorted(distinct)}
+        if stats:
+            summary["stats"] = stats
+        if counts:
+            summary["counts"] = counts
+    if top_k > 0:
+        keep = sorted(sorted(range(len(items)), key=lambda i: -_rank(items[i]))[:top_k])
+        summary["top"] = [items[i] for i in keep]
+    summary["omitted"] = len(items) - min(top_k, len(items))
+    return summary
+
+
+def _stats(values: List[float]) -> Dict[str, float]:
+    total = float(sum(values))
+    return {
+        "min": round(float(min(values)), FLOAT_DIGITS),
+        "mean": round(total / len(values), FLOAT_DIGITS),
+        "max": round(float(max(values)), FLOAT_DIGITS),
+        "sum": round(total, FLOAT_DIGITS),
+    }
+
+
+def compact(data: Any, top_k: Optional[int] = None, max_string: Optional[int] = None) -> Any:
+    """
+    Drops empty values, rounds floats, cuts strings to max_string and
+    summarises lists longer than top_k (None keeps every list whole).
+    """
+    if isinstance(data, dict):
+        out = {}
+        for key, value in data.items():
+            value = compact(value, top_k, max_string)
+            if value is None or value == "" or value == [] or value == {}:
+                continue
+            out[key] = value
+        return out
+    if isinstance(data, (list, tuple)):
+        items = [compact(v, top_k, max_string) for v in data]
+        return summarize_list(items, top_k) if top_k is not None and len(items) > top_k else items
+    if isinstance(data, float):
+        return round(data, FLOAT_DIGITS)
+    if isinstance(data, str) and max_string is not None and len(data) > max_string:
+        return data[:max_string] + "…"
+    return data
+
+
+def token_budget(agent: Optional[str]) -> int:
+    return settings.LLM_CONTEXT_BUDGETS.get(agent, settings.LLM_CONTEXT_TOKEN_BUDGET)
+
+
+def compact_context(data: Any, agent: Optional[str] = None, budget: Optional[int] = None) -> str:
+    """Smallest faithful JSON for `data` that fits the agent's token budget (see module docstring)."""
+    budget = budget or token_budget(agent)
+    # Whole lists first: inputs that fit are only stripped of whitespace and empties
+    attempts = [(None, None)] + [(k, None) for k in _halvings(settings.LLM_CONTEXT_LIST_TOP_K)]
+    attempts += [(0, limit) for limit in STRING_LIMITS]
+    for k, max_string in attempts:
+        text = compact_json(compact(data, k, max_string))
+        if estimate_tokens(text) <= budget:
+            return text
+    logger.warning(f"LLM context for agent={agent} is ~{estimate_tokens(text)} tokens, over its {budget} budget")
+    return text
+
+
+def _halvings(k: int) -> List[int]:
+    steps = []
+    while k > 0:
+        steps.append(k)
+        k //= 2
+    return steps + [0]
@@ -0,0 +1,296 @@
+# backend/utils/llm_gateway.py
+"""
+Resilience around LLM provider calls.
+
+call() / acall() run one logical request through a model chain (the
+requested model, then settings.LLM_FALLBACK_MODELS) under the agent's
+deadline (settings.LLM_DEADLINES, else LLM_DEADLINE_SECONDS):
+
+- each model has a circuit breaker; after LLM_BREAKER_FAILURES failures in
+  a row it opens and the model is skipped for LLM_BREAKER_COOLDOWN_SECONDS,
+  then a single probe decides whether it closes again. With every model
+  open the call fails at once, so the agent's cached or fallback result is
+  served without waiting on the provider;
+- failed attempts are retried up to LLM_RETRIES times per model with
+  full-jitter exponential backoff, never past the deadline;
+- for agents in LLM_HEDGE_AGENTS (async only) a second identical request
+  is sent once the first has run longer than the model's recent p95
+  latency, and whichever answers first wins.
+
+An attempt is a callable (model, timeout) -> result that raises on
+failure. Only transient failures (timeouts, connection errors, 429 and
+5xx responses) are retried and count against the breaker; other provider
+errors (bad request, auth, unknown model) fail the call at once.
+ValueError means the provider answered but the output was unusable: it is
+retried but does not count against the breaker.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+from google.api_core import exceptions as google_exceptions
+from config import settings
+from .logger import get_logger
+from .metrics import registry
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Successful latencies kept per model for the hedging delay
+LATENCY_WINDOW = 200
+
+llm_retries = registry.counter("llm_retries_total", "LLM attempts retried after a failure.", ("agent", "model"))
+llm_hedges = registry.counter("llm_hedges_total", "Hedged LLM requests sent, by which one answered.",
+                              ("agent", "model", "winner"))
+llm_breaker_events = registry.counter("llm_breaker_events_total", "Circuit breaker transitions and rejections.",
+                                      ("model", "event"))
+llm_model_fallbacks = registry.counter("llm_model_fallbacks_total", "Calls answered by a fallback model.",
+                                       ("agent", "model"))
+
+
+class GatewayError(Exception):
+    pass
+
+
+TRANSIENT_ERRORS = (
+    TimeoutError, ConnectionError,
+    google_exceptions.ServerError, google_exceptions.TooManyRequests, google_exceptions.RetryError,
+)
+
+
+def is_transient(error: BaseException) -> bool:
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive failures -> half-open after `cooldown` -> one probe."""
+
+    def __init__(self, name: str, failures: int, cooldown: float):
+        self.name = name
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+        llm_breaker_events.inc(model=self.name, event="rejected")
+        return False
+
+    def release(self):
+        """Gives back a half-open probe that ended without a verdict (not run, cancelled, permanent error)."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                llm_breaker_events.inc(model=self.name, event="closed")
+                logger.info(f"LLM circuit for {self.name} closed")
+            self.state = "closed"
+            self._consecutive = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.state == "half_open" or self._consecutive >= self.failures:
+                if self.state != "open":
+                    llm_breaker_events.inc(model=self.name, event="opened")
+                    logger.warning(f"LLM circuit for {self.name} opened after {self._consecutive} failures")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class LatencyTracker:
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[str, LatencyTracker] = {}
+_registry_lock = threading.Lock()
+
+
+def breaker(model: str) -> CircuitBreaker:
+    with _registry_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(model, settings.LLM_BREAKER_FAILURES,
+                                              settings.LLM_BREAKER_COOLDOWN_SECONDS)
+        return _breakers[model]
+
+
+def _latency(model: str) -> LatencyTracker:
+    with _registry_lock:
+        return _latencies.setdefault(model, LatencyTracker())
+
+
+def reset_gateway():
+    """Forgets breaker state and latency history (tests, or after a config change)."""
+    with _registry_lock:
+        _breakers.clear()
+        _latencies.clear()
+
+
+def model_chain(model: str) -> List[str]:
+    return [model] + [m for m in settings.LLM_FALLBACK_MODELS if m != model]
+
+
+def deadline_for(agent: Optional[str]) -> float:
+    return settings.LLM_DEADLINES.get(agent, settings.LLM_DEADLINE_SECONDS)
+
+
+def backoff_delay(retry: int) -> float:
+    """Full jitter: uniform over [0, min(max, base * 2^retry)]."""
+    return random.uniform(0, min(settings.LLM_RETRY_MAX_SECONDS, settings.LLM_RETRY_BASE_SECONDS * 2 ** retry))
+
+
+def hedge_delay(model: str) -> float:
+    p95 = _latency(model).percentile(settings.LLM_HEDGE_PERCENTILE)
+    return p95 if p95 is not None else settings.LLM_HEDGE_DELAY_SECONDS
+
+
+def _settle(agent: Optional[str], model: str, candidate: str, error: Optional[BaseException], elapsed: float):
+    if error is None:
+        breaker(candidate).record_success()
+        _latency(candidate).add(elapsed)
+        if candidate != model:
+            llm_model_fallbacks.inc(agent=agent, model=candidate)
+    elif isinstance(error, ValueError):
+        # the provider answered; only the output was unusable
+        breaker(candidate).record_success()
+    elif is_transient(error):
+        breaker(candidate).record_failure()
+    else:
+        breaker(candidate).release()
+
+
+def call(agent: Optional[str], model: str, attempt: Callable[[str, float], T]) -> Tuple[T, str]:
+    """Runs `attempt` through the chain; returns (result, model that answered) or raises GatewayError."""
+    deadline = time.monotonic() + deadline_for(agent)
+    last_error: Optional[BaseException] = None
+    for candidate in model_chain(model):
+        for retry in range(settings.LLM_RETRIES + 1):
+            if retry:
+                llm_retries.inc(agent=agent, model=candidate)
+                time.sleep(min(backoff_delay(retry - 1), max(0.0, deadline - time.monotonic())))
+            remaining = deadline - time.monotonic()
+            # the deadline is checked before allow() so a half-open probe is never taken and left unused
+            if remaining <= 0:
+                raise GatewayError(_reason(agent, last_error, deadline_spent=True))
+            if not breaker(candidate).allow():
+                break
+            started = time.monotonic()
+            try:
+                result = attempt(candidate, remaining)
+            except Exception as e:
+                _settle(agent, model, candidate, e, time.monotonic() - started)
+                if not (is_transient(e) or isinstance(e, ValueError)):
+                    raise GatewayError(_reason(agent, e)) from e
+                last_error = e
+                continue
+            except BaseException:
+                breaker(candidate).release()
+                raise
+            _settle(agent, model, candidate, None, time.monotonic() - started)
+            return result, candidate
+    raise GatewayError(_reason(agent, last_error))
+
+
+async def acall(agent: Optional[str], model: str,
+                attempt: Callable[[str, float], Awaitable[T]]) -> Tuple[T, str]:
+    """Async call(); attempts are cancelled at the deadline and may be hedged (LLM_HEDGE_AGENTS)."""
+    deadline = time.monotonic() + deadline_for(agent)
+    last_error: Optional[BaseException] = None
+    hedge = agent in settings.LLM_HEDGE_AGENTS
+    for candidate in model_chain(model):
+        for retry in range(settings.LLM_RETRIES + 1):
+            if retry:
+                llm_retries.inc(agent=agent, model=candidate)
+                await asyncio.sleep(min(backoff_delay(retry - 1), max(0.0, deadline - time.monotonic())))
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise GatewayError(_reason(agent, last_error, deadline_spent=True))
+            if not breaker(candidate).allow():
+                break
+            started = time.monotonic()
+            try:
+                if hedge:
+                    result = await asyncio.wait_for(_hedged(agent, candidate, attempt, remaining), remaining)
+                else:
+                    result = await asyncio.wait_for(attempt(candidate, remaining), remaining)
+            except Exception as e:
+                _settle(agent, model, candidate, e, time.monotonic() - started)
+                if not (is_transient(e) or isinstance(e, ValueError)):
+                    raise GatewayError(_reason(agent, e)) from e
+                last_error = e
+                continue
+            except BaseException:
+                # cancelled by the caller: no verdict on the model's health
+                breaker(candidate).release()
+                raise
+            _settle(agent, model, candidate, None, time.monotonic() - started)
+            return result, candidate
+    raise GatewayError(_reason(agent, last_error))
+
+
+async def _hedged(agent: Optional[str], model: str, attempt: Callable[[str, float], Awaitable[T]],
+                  timeout: float) -> T:
+    primary = asyncio.ensure_future(attempt(model, timeout))
+    hedge = None
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay(model))
+        if done:
+            return primary.result()
+        hedge = asyncio.ensure_future(attempt(model, timeout))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    llm_hedges.inc(agent=agent, model=model, winner="hedge" if task is hedge else "primary")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+def _reason(agent: Optional[str], error: Optional[BaseException], deadline_spent: bool = False) -> str:
+    if isinstance(error, asyncio.TimeoutError) or (deadline_spent and error is None):
+        return f"LLM deadline exceeded for agent={agent}"
+    if error is None:
+        return f"LLM unavailable for agent={agent} (circuit open)"
+    if deadline_spent:
+        return f"LLM deadline exceeded for agent={agent}: {error}"
+    return str(error) or type(error).__name__
@@ -0,0 +1,89 @@
+# backend/utils/matching.py
+"""
+String helpers for contact matching: name normalisation, character
+trigrams with Dice overlap, and Jaro-Winkler similarity (pure Python,
+no extra dependency).
+"""
+import re
+from typing import List, Set
+
+# Honorifics and legal-form words that do not identify a counterparty
+NAME_STOPWORDS = {
+    "m", "s", "ms", "mr", "mrs", "miss", "dr", "shri", "sri", "smt",
+    "pvt", "private", "ltd", "limited", "llp", "inc", "co", "company", "and",
+}
+
+
+def normalize_name(name: str) -> str:
+    """'M/s. Sharma & Sons Pvt Ltd' -> 'sharma sons'."""
+    words = re.sub(r"[^a-z0-9]+", " ", (name or "").lower()).split()
+    kept = [w for w in words if w not in NAME_STOPWORDS]
+    return " ".join(kept or words)
+
+
+def name_tokens(name: str) -> List[str]:
+    return normalize_name(name).split()
+
+
+def trigrams(normalized: str) -> Set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def jaro_winkler(a: str, b: str, prefix_scale: float = 0.1) -> float:
+    if a == b:
+        return 1.0
+    len_a, len_b = len(a), len(b)
+    if not len_a or not len_b:
+        return 0.0
+    window = max(max(len_a, len_b) // 2 - 1, 0)
+    matched_a = [False] * len_a
+    matched_b = [False] * len_b
+    matches = 0
+    for i, ch in enumerate(a):
+        for j in range(max(0, i - window), min(i + window + 1, len_b)):
+            if not matched_b[j] and b[j] == ch:
+                matched_a[i] = matched_b[j] = True
+                matches += 1
+                break
+    if not matches:
+        return 0.0
+
+    transpositions, j = 0, 0
+    for i in range(len_a):
+        if matched_a[i]:
+            while not matched_b[j]:
+                j += 1
+            if a[i] != b[j]:
+                transpositions += 1
+            j += 1
+    m = float(matches)
+    jaro = (m / len_a + m / len_b + (m - transpositions / 2) / m) / 3
+
+    prefix = 0
+    for ca, cb in zip(a[:4], b[:4]):
+        if ca != cb:
+            break
+        prefix += 1
+    return jaro + prefix * prefix_scale * (1 - jaro)
+
+
+def token_sort(normalized: str) -> str:
+    """Word-order-insensitive form, so 'sons sharma' compares equal to 'sharma sons'."""
+    return " ".join(sorted(normalized.split()))
+
+
+def name_similarity(a: str, b: str) -> float:
+    """
+    Blend of Jaro-Winkler (typo-tolerant, word-order-insensitive) and trigram
+    Dice (penalises a different word, e.g. 'rajesh kumar' vs 'ramesh kumar')
+    over normalised names.
+    """
+    jw = max(jaro_winkler(a, b), jaro_winkler(token_sort(a), token_sort(b)))
+    return (jw + dice(trigrams(a), trigrams(b))) / 2
@@ -0,0 +1,229 @@
+# backend/utils/metrics.py
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms carry labels and are kept in a process-wide
+registry; GET /metrics renders them (see main.py). The request-timing
+middleware opens a RequestStats per request, and the SQLAlchemy hooks
+installed by instrument_engine add each query's time to it, so DB time is
+reported per route as well as per statement type.
+"""
+import abc
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self._samples())
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """Sample lines, without the HELP and TYPE header."""
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(v)}" for key, v in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def sum(self, **labels) -> float:
+        entry = self._values.get(self._key(labels))
+        return entry[1] if entry else 0.0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _labels(self.label_names, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route", "status"))
+http_request_db_seconds = registry.histogram(
+    "http_request_db_seconds", "Time spent in DB queries per HTTP request.", ("method", "route"), DB_BUCKETS)
+http_request_db_queries = registry.histogram(
+    "http_request_db_queries", "DB queries issued per HTTP request.", ("method", "route"),
+    (1, 2, 5, 10, 20, 50, 100, 250, 1000))
+db_query_seconds = registry.histogram(
+    "db_query_duration_seconds", "DB query latency by statement type.", ("operation",), DB_BUCKETS)
+llm_call_seconds = registry.histogram(
+    "llm_call_duration_seconds", "LLM provider call latency.", ("agent", "model", "outcome"))
+llm_tokens = registry.histogram(
+    "llm_tokens", "Tokens per LLM call.", ("agent", "direction"), TOKEN_BUCKETS)
+llm_cache_requests = registry.counter(
+    "llm_cache_requests_total", "LLM response cache lookups.", ("agent", "result"))
+llm_errors = registry.counter(
+    "llm_errors_total", "LLM calls that failed (no client, provider error, bad JSON).", ("agent",))
+agent_fallbacks = registry.counter(
+    "agent_fallbacks_total", "Agent results replaced by the local fallback or mock data.", ("agent",))
+
+
+class RequestStats:
+    # one request's queries may run on several threadpool threads at once
+    __slots__ = ("db_seconds", "db_queries", "_lock")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self._lock = threading.Lock()
+
+    def add_query(self, seconds: float):
+        with self._lock:
+            self.db_seconds += seconds
+            self.db_queries += 1
+
+
+# Set by the request-timing middleware; copied into threadpool calls with the context
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None)
+
+
+def route_label(scope: dict) -> str:
+    """The matched route's path template, so ids don't explode the label set."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+_instrumented = False
+
+
+def instrument_engine(engine_cls=Engine):
+    """Times every cursor execution of every engine (idempotent)."""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+
+    @event.listens_for(engine_cls, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine_cls, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        db_query_seconds.observe(elapsed, operation=_operation(statement))
+        stats = current_request.get()
+        if stats is not None:
+            stats.add_query(elapsed)
+
+    @event.listens_for(engine_cls, "handle_error")
+    def _failed(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return word if word in ("select", "insert", "update", "delete", "with", "pragma") else "other"
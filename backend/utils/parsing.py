@@ -0,0 +1,291 @@
+# backend/utils/parsing.py
+"""
+Rule-based fast path for transaction messages.
+
+Most bank / UPI / POS alerts follow a handful of fixed templates, e.g.
+"Rs.1500 credited to A/c XX1234 by UPI/...". parse_transaction_fast() tries
+the template library below and returns a dict in the same schema as
+TRANSACTION_PARSER_PROMPT (plus "confidence" and "parser"), so callers only
+need the LLM when no template matches with enough confidence.
+"""
+import csv
+import io
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+AMOUNT = r"(?:rs\.?|inr|₹)\s*(?P<amount>\d[\d,]*(?:\.\d{1,2})?)"
+BARE_AMOUNT = r"(?:(?:rs\.?|inr|₹)\s*)?(?P<amount>\d[\d,]*(?:\.\d{1,2})?)"
+# A counterparty name runs until a connector word, punctuation or end of text.
+NAME = r"(?P<counterparty>[A-Za-z][A-Za-z0-9 .&'\-]{0,60}?)"
+NAME_END = r"(?=\s*(?:[.,;:(]|$|\s-\s|\b(?:on|via|ref|refno|using|upi|for|at|avl|info|txn|thru|through|dt|date)\b))"
+VPA = r"(?P<vpa>[\w.\-]{2,}@[A-Za-z]{2,})"
+
+
+@dataclass(frozen=True)
+class Template:
+    name: str
+    pattern: "re.Pattern"
+    direction: str
+    method: str
+    confidence: float
+
+
+def _t(name: str, pattern: str, direction: str, method: str, confidence: float) -> Template:
+    return Template(name, re.compile(pattern, re.IGNORECASE), direction, method, confidence)
+
+
+TEMPLATES: List[Template] = [
+    # Bank alerts (HDFC / SBI / ICICI / Axis / Kotak style)
+    _t("bank_amount_credited", AMOUNT + r"\s+(?:has been\s+|is\s+|was\s+)?credited\b", "inflow", "bank", 0.92),
+    _t("bank_account_credited",
+       r"\b(?:a/?c|acct|account)\b[^.]*?\s(?:is\s+|has been\s+|was\s+)?credited\s+(?:with|by|for)\s+" + BARE_AMOUNT,
+       "inflow", "bank", 0.92),
+    _t("bank_amount_debited", AMOUNT + r"\s+(?:has been\s+|is\s+|was\s+)?debited\b", "outflow", "bank", 0.92),
+    _t("bank_account_debited",
+       r"\b(?:a/?c|acct|account)\b[^.]*?\s(?:is\s+|has been\s+|was\s+)?debited\s+(?:with|by|for)\s+" + BARE_AMOUNT,
+       "outflow", "bank", 0.92),
+    # UPI apps (GPay / PhonePe / Paytm / BHIM) and bank UPI confirmations
+    _t("upi_sent", r"\b(?:you\s+)?(?:sent|paid|transferred)\s+" + AMOUNT + r"\s+(?:from\s+.*?\s+)?to\s+(?:vpa\s+)?(?:"
+       + VPA + r"|" + NAME + NAME_END + r")", "outflow", "upi", 0.93),
+    _t("upi_received", r"\b(?:you\s+)?(?:have\s+)?(?:received|got)\s+" + AMOUNT + r"\s+from\s+(?:vpa\s+)?(?:"
+       + VPA + r"|" + NAME + NAME_END + r")", "inflow", "upi", 0.93),
+    _t("upi_amount_received", AMOUNT + r"\s+received\s+from\s+(?:vpa\s+)?(?:" + VPA + r"|" + NAME + NAME_END + r")",
+       "inflow", "upi", 0.93),
+    _t("upi_payment_to", r"\bpayment of\s+" + AMOUNT + r"\s+(?:to|towards)\s+(?:" + VPA + r"|" + NAME + NAME_END + r")",
+       "outflow", "upi", 0.9),
+    # Card / POS slips
+    _t("card_spend", AMOUNT + r"\s+(?:was\s+)?(?:spent|debited|charged)\b[^.]*?\bcard\b[^.]*?\bat\s+" + NAME + NAME_END,
+       "outflow", "pos", 0.94),
+    _t("card_txn", r"\btxn\s+of\s+" + AMOUNT + r"\b[^.]*?\bcard\b[^.]*?\bat\s+" + NAME + NAME_END,
+       "outflow", "pos", 0.94),
+    _t("pos_slip", r"\b(?:sale|purchase)\b[^\n]*?\b(?:amount|amt|total)\s*[:\-]?\s*" + BARE_AMOUNT, "inflow", "pos", 0.86),
+    # Cash
+    _t("cash_withdrawn", AMOUNT + r"\s+(?:has been\s+|was\s+)?withdrawn\b", "outflow", "cash", 0.9),
+    _t("atm_withdrawal", r"\batm\s+(?:wdl|withdrawal)\b[^.]*?" + AMOUNT, "outflow", "cash", 0.9),
+    # Free text forwarded by the merchant ("Received 1500 from Raju via UPI")
+    _t("free_text_received", r"^\s*(?:received|recd|rcvd|got)\s+" + BARE_AMOUNT + r"\s+from\s+" + NAME + NAME_END,
+       "inflow", "other", 0.88),
+    _t("free_text_paid", r"^\s*(?:paid|sent|gave)\s+" + BARE_AMOUNT + r"\s+to\s+" + NAME + NAME_END,
+       "outflow", "other", 0.88),
+]
+
+# Counterparty lookups used when the matching template does not capture one.
+COUNTERPARTY_PATTERNS = [
+    re.compile(r"\bupi/(?:p2[ampm]/)?\d+/" + NAME + r"(?=/|$|[.,;]|\s+(?:on|ref|refno|dt)\b)", re.IGNORECASE),
+    re.compile(r";\s*" + NAME + r"\s+credited\b", re.IGNORECASE),
+    re.compile(r"\b(?:from|by|to)\s+(?:vpa\s+)?" + VPA, re.IGNORECASE),
+    re.compile(r"\b(?:trf\s+(?:to|from)|transfer\s+(?:to|from))\s+" + NAME + NAME_END, re.IGNORECASE),
+    re.compile(r"\b(?:credited|received)\b[^.]*?\bfrom\s+" + NAME + NAME_END, re.IGNORECASE),
+    re.compile(r"\b(?:debited|paid)\b[^.]*?\b(?:to|towards)\s+" + NAME + NAME_END, re.IGNORECASE),
+]
+
+METHOD_KEYWORDS = [
+    ("upi", re.compile(r"\bupi\b|\bvpa\b|@(?:ok\w+|ybl|paytm|ibl|axl|upi|apl)\b|\b(?:gpay|google pay|phonepe|paytm|bhim)\b", re.IGNORECASE)),
+    ("bank", re.compile(r"\b(?:neft|imps|rtgs|net ?banking|cheque|chq)\b", re.IGNORECASE)),
+    ("pos", re.compile(r"\b(?:card|pos)\b", re.IGNORECASE)),
+    ("cash", re.compile(r"\b(?:atm|cash)\b", re.IGNORECASE)),
+]
+
+INVOICE_HINT = re.compile(r"\b(?:inv(?:oice)?|bill)\s*(?:no\.?|number|#)?\s*[:\-]?\s*[A-Z0-9]*\d", re.IGNORECASE)
+BALANCE_CLAUSE = re.compile(r"\b(?:avl\.?|avail(?:able)?\.?)\s*(?:bal(?:ance)?|lmt|limit)\b.*?(?=[.;]|$)", re.IGNORECASE)
+NOISE_NAMES = {"your", "you", "a/c", "ac", "account", "bank", "upi", "vpa", "card"}
+
+
+class FastPathStats:
+    """Thread-safe counters for the fast-path hit rate."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.hits = 0
+        self.by_template: Dict[str, int] = {}
+
+    def reset(self):
+        with self._lock:
+            self.attempts = 0
+            self.hits = 0
+            self.by_template = {}
+
+    def record(self, template: Optional[str]):
+        with self._lock:
+            self.attempts += 1
+            if template:
+                self.hits += 1
+                self.by_template[template] = self.by_template.get(template, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "misses": self.attempts - self.hits,
+                "hit_rate": self.hits / self.attempts if self.attempts else 0.0,
+                "by_template": dict(self.by_template),
+            }
+
+
+fast_path_stats = FastPathStats()
+
+
+def parse_amount(value: str) -> Optional[float]:
+    try:
+        return float(value.replace(",", ""))
+    except (AttributeError, ValueError):
+        return None
+
+
+SIGNED_AMOUNT_NOISE = re.compile(r"(?:rs\.?|inr|₹|,|\s)", re.IGNORECASE)
+
+
+def parse_signed_amount(value) -> Optional[float]:
+    """
+    Statement amount → signed float. Handles "1,234.50", "₹500", "500 Dr"
+    (negative), "500 Cr", "(500)" and "500-". Blank or junk → None.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = SIGNED_AMOUNT_NOISE.sub("", str(value))
+    if not text:
+        return None
+    sign = 1.0
+    lowered = text.lower()
+    if lowered.endswith("dr"):
+        sign, text = -1.0, text[:-2]
+    elif lowered.endswith("cr"):
+        text = text[:-2]
+    if text.startswith("(") and text.endswith(")"):
+        sign, text = -sign, text[1:-1]
+    if text.endswith("-"):
+        sign, text = -sign, text[:-1]
+    try:
+        return sign * float(text)
+    except ValueError:
+        return None
+
+
+def iter_csv_rows(stream: BinaryIO, encoding: str = "utf-8-sig") -> Iterator[List[str]]:
+    """Yields CSV rows (header first) from a binary stream without loading the file."""
+    text = io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline="")
+    try:
+        for row in csv.reader(text):
+            if any(cell.strip() for cell in row):
+                yield row
+    finally:
+        text.detach()
+
+
+def iter_xlsx_rows(stream: BinaryIO) -> Iterator[List[Any]]:
+    """Yields rows of the first sheet of an XLSX workbook in openpyxl read-only mode."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            if any(cell not in (None, "") for cell in row):
+                yield list(row)
+    finally:
+        workbook.close()
+
+
+def iter_table_rows(stream: BinaryIO, filename: str) -> Iterator[List[Any]]:
+    """CSV or XLSX rows depending on the file extension (CSV when unknown)."""
+    if (filename or "").lower().endswith((".xlsx", ".xlsm")):
+        return iter_xlsx_rows(stream)
+    return iter_csv_rows(stream)
+
+
+def _clean_name(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    name = re.sub(r"\s+", " ", name).strip(" .-&'")
+    if len(name) < 2 or name.lower() in NOISE_NAMES:
+        return None
+    return name.title() if name.isupper() else name
+
+
+def detect_method(text: str, default: str = "other") -> str:
+    for method, pattern in METHOD_KEYWORDS:
+        if pattern.search(text):
+            return method
+    return default
+
+
+def _counterparty(match: "re.Match", text: str) -> Optional[str]:
+    groups = match.groupdict()
+    name = groups.get("vpa") or _clean_name(groups.get("counterparty"))
+    if name:
+        return name
+    for pattern in COUNTERPARTY_PATTERNS:
+        m = pattern.search(text)
+        if m:
+            found = m.groupdict().get("vpa") or _clean_name(m.groupdict().get("counterparty"))
+            if found:
+                return found
+    return None
+
+
+def match_transaction_template(raw_text: str) -> Optional[Dict[str, Any]]:
+    """
+    Best template match for raw_text in the TRANSACTION_PARSER_PROMPT schema,
+    with a "confidence" in [0, 1], or None when nothing matches.
+    """
+    if not raw_text:
+        return None
+    text = BALANCE_CLAUSE.sub("", raw_text.strip())
+
+    candidates = []
+    for template in TEMPLATES:
+        m = template.pattern.search(text)
+        if not m:
+            continue
+        amount = parse_amount(m.group("amount"))
+        if not amount:
+            continue
+        candidates.append((template, m, amount))
+    if not candidates:
+        return None
+
+    template, m, amount = max(candidates, key=lambda c: c[0].confidence)
+    confidence = template.confidence
+    # Templates disagreeing on direction or amount means the text is not a plain alert.
+    if len({c[0].direction for c in candidates}) > 1 or len({c[2] for c in candidates}) > 1:
+        confidence -= 0.3
+
+    counterparty = _counterparty(m, text)
+    has_invoice = bool(INVOICE_HINT.search(text))
+    if has_invoice:
+        # Invoice numbers and due dates are left to the LLM.
+        confidence -= 0.2
+
+    direction = template.direction
+    return {
+        "direction": direction,
+        "amount": amount,
+        "currency": "INR",
+        "method": detect_method(text, template.method),
+        "counterparty_name": counterparty,
+        "category": "sales" if direction == "inflow" else "other",
+        "invoice": {"has_invoice": False, "invoice_number": None, "due_date": None},
+        "notes": f"Parsed by rule template '{template.name}'",
+        "confidence": round(max(confidence, 0.0), 2),
+        "parser": "rules",
+        "template": template.name,
+    }
+
+
+def parse_transaction_fast(raw_text: str, min_confidence: float) -> Optional[Dict[str, Any]]:
+    """
+    Returns the template parse when its confidence reaches min_confidence,
+    otherwise None (caller falls back to the LLM). Every call is counted in
+    fast_path_stats.
+    """
+    result = match_transaction_template(raw_text)
+    if result is None or result["confidence"] < min_confidence:
+        fast_path_stats.record(None)
+        return None
+    fast_path_stats.record(result["template"])
+    return result
@@ -1,21 +1,41 @@
 # backend/utils/whatsapp.py
+"""
+WhatsApp transports. Every transport has `async send(to, body)` returning a
+dict: {"status": "sent" | "mock", "sid": ...} on success, or
+{"status": "error", "error": ..., "status_code": int | None,
+"retry_after": seconds | None} on failure. workers.messaging decides what
+to retry from status_code.
+"""
+import asyncio
 import os
+import random
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from twilio.base.exceptions import TwilioRestException
 from twilio.rest import Client
-from .logger import get_logger  # if you have one, else just use print
+from .logger import get_logger
 
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_WHATSAPP_FROM = os.getenv("TWILIO_WHATSAPP_FROM", "whatsapp:+14155238886")
+TWILIO_STATUS_CALLBACK_URL = os.getenv("TWILIO_STATUS_CALLBACK_URL")
 
-logger = get_logger(__name__) if "get_logger" in dir() else None
+logger = get_logger(__name__)
 
 client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN else None
 
 
+def whatsapp_address(phone: str) -> str:
+    return phone if phone.startswith("whatsapp:") else f"whatsapp:{phone}"
+
+
 def send_whatsapp_message(to_phone_e164: str, message: str):
     """
     to_phone_e164: phone number in E.164 with 'whatsapp:' prefix, e.g. 'whatsapp:+919876543210'
     message: text body
+    Blocking single send; bulk and retried sends go through workers.messaging.
     """
     if client is None:
         # For dev/demo when keys are missing
@@ -25,15 +45,96 @@ def send_whatsapp_message(to_phone_e164: str, message: str):
     try:
         msg = client.messages.create(
             from_=TWILIO_WHATSAPP_FROM,
-            to=f"whatsapp:{to_phone_e164}" if not to_phone_e164.startswith("whatsapp:") else to_phone_e164,
+            to=whatsapp_address(to_phone_e164),
             body=message,
         )
-        if logger:
-            logger.info(f"Sent WhatsApp message SID={msg.sid} to {msg.to}")
+        logger.info(f"Sent WhatsApp message SID={msg.sid} to {msg.to}")
         return {"status": "sent", "sid": msg.sid, "to": msg.to}
     except Exception as e:
-        if logger:
-            logger.error(f"Error sending WhatsApp message: {e}")
-        else:
-            print("Error sending WhatsApp:", e)
+        logger.error(f"Error sending WhatsApp message: {e}")
         return {"status": "error", "error": str(e)}
+
+
+class MockTransport:
+    """Logs instead of sending; used when Twilio credentials are missing."""
+    name = "mock"
+
+    async def send(self, to: str, body: str) -> Dict[str, Any]:
+        logger.info(f"[MOCK WHATSAPP] To: {to} | Message: {body}")
+        return {"status": "mock", "sid": f"MOCK{uuid.uuid4().hex[:24]}"}
+
+
+class TwilioTransport:
+    """The Twilio REST client, run in the threadpool so sends overlap."""
+    name = "twilio"
+
+    def __init__(self, twilio_client: Client, from_: str = TWILIO_WHATSAPP_FROM,
+                 status_callback: Optional[str] = TWILIO_STATUS_CALLBACK_URL):
+        self.client = twilio_client
+        self.from_ = from_
+        self.status_callback = status_callback
+
+    def _create(self, to: str, body: str):
+        kwargs = {"from_": self.from_, "to": whatsapp_address(to), "body": body}
+        if self.status_callback:
+            kwargs["status_callback"] = self.status_callback
+        return self.client.messages.create(**kwargs)
+
+    async def send(self, to: str, body: str) -> Dict[str, Any]:
+        try:
+            msg = await run_in_threadpool(self._create, to, body)
+        except TwilioRestException as e:
+            return {"status": "error", "error": e.msg or str(e), "status_code": e.status, "retry_after": None}
+        except Exception as e:
+            # network-level failure: no HTTP status, treated as retryable
+            return {"status": "error", "error": str(e) or e.__class__.__name__, "status_code": None, "retry_after": None}
+        return {"status": "sent", "sid": msg.sid}
+
+
+class FakeTwilioTransport:
+    """
+    Offline stand-in for load tests: simulated latency, a per-second send
+    limit answered with 429 + Retry-After, and random 5xx errors.
+    """
+    name = "fake"
+
+    def __init__(self, latency: float = 0.05, rate_limit: Optional[float] = 80.0,
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self.sent: List[Dict[str, Any]] = []
+        self.responses: Dict[int, int] = {}
+
+    def _count(self, status_code: int):
+        self.responses[status_code] = self.responses.get(status_code, 0) + 1
+
+    async def send(self, to: str, body: str) -> Dict[str, Any]:
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._window_start, self._window_count = now, 0
+        self._window_count += 1
+        if self.rate_limit is not None and self._window_count > self.rate_limit:
+            self._count(429)
+            return {"status": "error", "error": "Too Many Requests", "status_code": 429,
+                    "retry_after": max(1.0 - (now - self._window_start), 0.05)}
+        await asyncio.sleep(self.latency)
+        if self._rng.random() < self.error_rate:
+            self._count(503)
+            return {"status": "error", "error": "Service Unavailable", "status_code": 503, "retry_after": None}
+        self._count(201)
+        sid = f"SM{uuid.uuid4().hex}"
+        self.sent.append({"sid": sid, "to": to, "body": body})
+        return {"status": "sent", "sid": sid}
+
+
+def default_transport(kind: str = "auto"):
+    """"twilio", "fake" or "mock"; "auto" picks Twilio when credentials are configured."""
+    if kind == "fake":
+        return FakeTwilioTransport()
+    if kind == "mock" or client is None:
+        return MockTransport()
+    return TwilioTransport(client)
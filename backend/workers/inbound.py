@@ -0,0 +1,254 @@
+# backend/workers/inbound.py
+"""
+Durable inbound WhatsApp log with a background consumer.
+
+append() is all the webhook does: an INSERT into the RawEvent table that is
+skipped when the provider's message id (Twilio MessageSid) is already
+logged, so retried webhooks never create a second row. While the consumer
+is running, concurrent appends are group-committed by a writer task (one
+transaction for everything that arrived during the previous commit), so a
+burst of webhooks doesn't queue up behind one commit each. Consumer tasks
+claim "received" rows with a conditional UPDATE and hand each to
+services.inbound_services.process_inbound_event; failures are retried up
+to INBOUND_MAX_ATTEMPTS times, rows left "processing" by a dead process
+are requeued after PROCESSING_TIMEOUT_SECONDS.
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session
+from config import settings
+from models.raw_event import RawEvent
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROCESSING_TIMEOUT_SECONDS = 300
+# Most appends committed in one transaction
+APPEND_BATCH = 500
+
+
+class InboundConsumer:
+
+    def __init__(self, engine: Optional[Engine] = None, batch_size: Optional[int] = None,
+                 poll_interval: Optional[float] = None, max_attempts: Optional[int] = None,
+                 concurrency: Optional[int] = None):
+        self._engine = engine
+        self.batch_size = batch_size or settings.INBOUND_BATCH_SIZE
+        self.poll_interval = poll_interval if poll_interval is not None else settings.INBOUND_POLL_INTERVAL_SECONDS
+        self.max_attempts = max_attempts or settings.INBOUND_MAX_ATTEMPTS
+        self.concurrency = concurrency or settings.INBOUND_CONCURRENCY
+        self._task: Optional[asyncio.Task] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._appends: Optional[asyncio.Queue] = None
+        self._running = False
+        self._in_flight: set = set()
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            from db import engine
+            self._engine = engine
+        return self._engine
+
+    # --- log ----------------------------------------------------------------
+
+    @staticmethod
+    def _insert(conn, row: Dict[str, Any]) -> Tuple[Optional[int], bool]:
+        table = RawEvent.__table__
+        dialect = conn.dialect.name
+        if row.get("external_id") and dialect in ("sqlite", "postgresql"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            event_id = conn.execute(
+                dialect_insert(table).values(**row)
+                .on_conflict_do_nothing(index_elements=["external_id"])
+                .returning(table.c.id)
+            ).scalar()
+            if event_id is not None:
+                return event_id, True
+        else:
+            try:
+                with conn.begin_nested():
+                    return conn.execute(insert(table).values(**row).returning(table.c.id)).scalar(), True
+            except IntegrityError:
+                pass
+        existing = conn.execute(select(table.c.id).where(table.c.external_id == row["external_id"])).scalar()
+        return existing, False
+
+    def _append_many(self, rows: List[Dict[str, Any]]) -> List[Tuple[Optional[int], bool]]:
+        with self.engine.begin() as conn:
+            return [self._insert(conn, row) for row in rows]
+
+    async def _writer(self):
+        while self._running:
+            batch = [await self._appends.get()]
+            while len(batch) < APPEND_BATCH and not self._appends.empty():
+                batch.append(self._appends.get_nowait())
+            try:
+                results = await run_in_threadpool(self._append_many, [row for row, _ in batch])
+            except Exception as e:
+                logger.error(f"Inbound append of {len(batch)} events failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def append(self, source: str, text: str, sender: Optional[str] = None, external_id: Optional[str] = None,
+                     payload: Optional[Dict[str, Any]] = None) -> Tuple[Optional[int], bool]:
+        """Logs an inbound message; returns (event id, created). A repeated external_id is not logged twice."""
+        now = datetime.utcnow()
+        row = {
+            "source": source, "raw_text": text, "sender": sender, "external_id": external_id or None,
+            "payload": json.dumps(payload, default=str) if payload is not None else None,
+            "status": "received", "attempts": 0, "created_at": now, "updated_at": now,
+        }
+        if self._appends is None:
+            [(event_id, created)] = await run_in_threadpool(self._append_many, [row])
+        else:
+            future = asyncio.get_running_loop().create_future()
+            await self._appends.put((row, future))
+            event_id, created = await future
+        if created and self._wakeup is not None:
+            self._wakeup.set()
+        return event_id, created
+
+    def get(self, event_id: int) -> Optional[RawEvent]:
+        with Session(self.engine) as session:
+            return session.get(RawEvent, event_id)
+
+    # --- consumer -----------------------------------------------------------
+
+    def _claim(self, limit: int) -> List[int]:
+        now = datetime.utcnow()
+        with Session(self.engine) as session:
+            session.execute(
+                update(RawEvent)
+                .where(RawEvent.status == "processing",
+                       RawEvent.updated_at < now - timedelta(seconds=PROCESSING_TIMEOUT_SECONDS))
+                .values(status="received", updated_at=now)
+            )
+            candidates = session.execute(
+                select(RawEvent.id).where(RawEvent.status == "received").order_by(RawEvent.id).limit(limit)
+            ).scalars().all()
+            claimed = []
+            for event_id in candidates:
+                result = session.execute(
+                    update(RawEvent)
+                    .where(RawEvent.id == event_id, RawEvent.status == "received")
+                    .values(status="processing", attempts=RawEvent.attempts + 1, updated_at=now)
+                )
+                if result.rowcount == 1:
+                    claimed.append(event_id)
+            session.commit()
+            self._in_flight.update(claimed)
+            return claimed
+
+    def _release(self, event_ids: List[int]):
+        """Hands claimed but unprocessed events back (on shutdown)."""
+        with Session(self.engine) as session:
+            session.execute(
+                update(RawEvent)
+                .where(RawEvent.id.in_(event_ids), RawEvent.status == "processing")
+                .values(status="received", attempts=RawEvent.attempts - 1, updated_at=datetime.utcnow())
+            )
+            session.commit()
+
+    def _process(self, event_id: int):
+        from services.inbound_services import process_inbound_event
+
+        with Session(self.engine) as session:
+            event = session.get(RawEvent, event_id)
+            try:
+                process_inbound_event(session, event)
+            except Exception as e:
+                logger.error(f"Inbound event {event_id} failed: {e}")
+                session.rollback()
+                event = session.get(RawEvent, event_id)
+                event.status = "failed" if event.attempts >= self.max_attempts else "received"
+                event.error = str(e) or e.__class__.__name__
+                event.updated_at = datetime.utcnow()
+                session.add(event)
+                session.commit()
+            finally:
+                self._in_flight.discard(event_id)
+
+    async def _process_batch(self) -> int:
+        claimed = await run_in_threadpool(self._claim, self.batch_size)
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def process(event_id: int):
+            async with limit:
+                await run_in_threadpool(self._process, event_id)
+
+        await asyncio.gather(*[process(event_id) for event_id in claimed])
+        return len(claimed)
+
+    async def run_pending(self) -> int:
+        """Processes logged events until none are left; returns how many were claimed. Used by tests and scripts."""
+        count = 0
+        while True:
+            claimed = await self._process_batch()
+            if not claimed:
+                return count
+            count += claimed
+
+    async def _worker(self):
+        while self._running:
+            try:
+                if await self._process_batch():
+                    continue
+            except Exception as e:
+                logger.error(f"Inbound event batch failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Starts the consumer on the running event loop (idempotent)."""
+        if self._task is not None:
+            return
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._appends = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._writer())
+        self._task = asyncio.create_task(self._worker())
+        logger.info("Started inbound event consumer")
+
+    async def stop(self):
+        # the flag also ends loops whose cancellation a threadpool call absorbed
+        self._running = False
+        if self._wakeup is not None:
+            self._wakeup.set()
+        tasks = [t for t in (self._task, self._writer_task) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = self._writer_task = None
+        self._wakeup = None
+        if self._in_flight:
+            await run_in_threadpool(self._release, sorted(self._in_flight))
+            self._in_flight.clear()
+        appends, self._appends = self._appends, None
+        # appends still waiting for the writer are committed here
+        while appends is not None and not appends.empty():
+            row, future = appends.get_nowait()
+            [result] = await run_in_threadpool(self._append_many, [row])
+            if not future.done():
+                future.set_result(result)
+
+
+inbound_consumer = InboundConsumer()
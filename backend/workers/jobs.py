@@ -0,0 +1,206 @@
+# backend/workers/jobs.py
+"""
+In-process background jobs backed by the `job` table (no external broker).
+
+Handlers are registered per kind with @register_job and receive the JSON
+payload plus a fresh Session. submit() de-duplicates against queued/running
+jobs with the same kind and payload; a partial unique index on dedupe_key
+settles concurrent submits. Worker tasks claim queued rows with a
+conditional UPDATE, so several API processes can share one table; rows left
+"running" by a dead process are requeued after twice JOB_TIMEOUT_SECONDS.
+"""
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from config import settings
+from models.job import Job
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+JobHandler = Callable[[Dict[str, Any], Session], Awaitable[Any]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def register_job(kind: str):
+    """Decorator registering an async handler(payload, session) for a job kind."""
+    def decorator(fn: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+def make_dedupe_key(kind: str, payload: Dict[str, Any]) -> str:
+    body = json.dumps({"kind": kind, "payload": payload}, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class JobQueue:
+
+    def __init__(self, engine: Optional[Engine] = None, workers: Optional[int] = None,
+                 poll_interval: Optional[float] = None, timeout: Optional[float] = None):
+        self._engine = engine
+        self.workers = workers or settings.JOB_WORKERS
+        self.poll_interval = poll_interval if poll_interval is not None else settings.JOB_POLL_INTERVAL_SECONDS
+        self.timeout = timeout if timeout is not None else settings.JOB_TIMEOUT_SECONDS
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            from db import engine
+            self._engine = engine
+        return self._engine
+
+    # --- submission / lookup -------------------------------------------------
+
+    def _submit(self, kind: str, payload: Dict[str, Any],
+                dedupe_on: Optional[Dict[str, Any]] = None) -> Tuple[Job, bool]:
+        dedupe_key = make_dedupe_key(kind, payload if dedupe_on is None else dedupe_on)
+        with Session(self.engine) as session:
+            existing = self._active(session, dedupe_key)
+            if existing:
+                return existing, False
+            job = Job(kind=kind, dedupe_key=dedupe_key, payload=json.dumps(payload, default=str))
+            session.add(job)
+            try:
+                session.commit()
+            except IntegrityError:
+                # another submit queued the same job since the lookup above
+                session.rollback()
+                existing = self._active(session, dedupe_key)
+                if existing is None:
+                    raise
+                return existing, False
+            session.refresh(job)
+            return job, True
+
+    @staticmethod
+    def _active(session: Session, dedupe_key: str) -> Optional[Job]:
+        return session.exec(
+            select(Job).where(Job.dedupe_key == dedupe_key, Job.status.in_(ACTIVE_STATUSES)).order_by(Job.id)
+        ).first()
+
+    async def submit(self, kind: str, payload: Dict[str, Any],
+                     dedupe_on: Optional[Dict[str, Any]] = None) -> Tuple[Job, bool]:
+        """
+        Queues a job, or returns the identical in-flight one. Returns (job, created).
+        `dedupe_on` replaces the payload as the identity of the job when given.
+        """
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job, created = await run_in_threadpool(self._submit, kind, payload, dedupe_on)
+        if created and self._wakeup is not None:
+            self._wakeup.set()
+        return job, created
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with Session(self.engine) as session:
+            return session.get(Job, job_id)
+
+    # --- execution -----------------------------------------------------------
+
+    def _claim(self) -> Optional[Job]:
+        with Session(self.engine) as session:
+            stale = datetime.utcnow() - timedelta(seconds=self.timeout * 2)
+            session.execute(
+                update(Job)
+                .where(Job.status == "running", Job.started_at < stale)
+                .values(status="queued")
+            )
+            candidates = session.exec(
+                select(Job.id).where(Job.status == "queued").order_by(Job.created_at, Job.id).limit(5)
+            ).all()
+            for job_id in candidates:
+                claimed = session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == "queued")
+                    .values(status="running", started_at=datetime.utcnow(), attempts=Job.attempts + 1)
+                )
+                if claimed.rowcount == 1:
+                    session.commit()
+                    return session.get(Job, job_id)
+            session.commit()
+        return None
+
+    def _finish(self, job_id: int, result: Any = None, error: Optional[str] = None):
+        with Session(self.engine) as session:
+            session.execute(
+                update(Job).where(Job.id == job_id).values(
+                    status="failed" if error else "succeeded",
+                    result=None if error else json.dumps(result, default=str),
+                    error=error,
+                    finished_at=datetime.utcnow(),
+                )
+            )
+            session.commit()
+
+    async def _execute(self, job: Job):
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None:
+            await run_in_threadpool(self._finish, job.id, None, f"Unknown job kind: {job.kind}")
+            return
+        try:
+            with Session(self.engine) as session:
+                result = await asyncio.wait_for(handler(json.loads(job.payload), session), self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Job {job.id} ({job.kind}) timed out after {self.timeout}s")
+            await run_in_threadpool(self._finish, job.id, None, "Timed out")
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {e}")
+            await run_in_threadpool(self._finish, job.id, None, str(e) or e.__class__.__name__)
+        else:
+            await run_in_threadpool(self._finish, job.id, result)
+
+    async def run_pending(self) -> int:
+        """Runs queued jobs until none are left; returns how many ran. Used by tests and scripts."""
+        count = 0
+        while True:
+            job = await run_in_threadpool(self._claim)
+            if job is None:
+                return count
+            await self._execute(job)
+            count += 1
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await run_in_threadpool(self._claim)
+            except Exception as e:
+                logger.error(f"Job claim failed: {e}")
+                job = None
+            if job is not None:
+                await self._execute(job)
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Starts the worker tasks on the running event loop (idempotent)."""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Started {self.workers} job workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+
+job_queue = JobQueue()
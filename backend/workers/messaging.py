@@ -0,0 +1,381 @@
+# backend/workers/messaging.py
+"""
+Outbound WhatsApp queue backed by the `outbound_message` table.
+
+submit_many() inserts messages keyed by idempotency key (a repeated key
+returns the existing row instead of sending twice). Workers claim due rows
+with a conditional UPDATE, send them concurrently through the transport
+behind a token bucket, and persist the outcome: "sent" with the provider
+SID, a retry with exponential backoff (or the provider's Retry-After) on
+429/5xx/network errors, or "failed" once WHATSAPP_MAX_ATTEMPTS is reached
+or the error is not retryable. Twilio status callbacks later move rows to
+"delivered"/"read"/"failed" (routers.webhooks).
+"""
+import asyncio
+import hashlib
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from config import settings
+from models.outbound_message import OutboundMessage
+from utils.logger import get_logger
+from utils.whatsapp import default_transport
+
+logger = get_logger(__name__)
+
+# Rows left "sending" this long (a crashed process) are requeued
+SENDING_TIMEOUT_SECONDS = 300
+MAX_BACKOFF_SECONDS = 600
+# Provider states a status callback may move a row to, in delivery order
+PROVIDER_STATUSES = ("sent", "delivered", "read")
+FAILED_PROVIDER_STATUSES = ("failed", "undelivered")
+
+
+def make_idempotency_key(*parts: Any) -> str:
+    """Stable key from the message's identity, e.g. ("reminder", invoice_id, stage)."""
+    body = ":".join(str(p) for p in parts)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:40]
+
+
+def is_retryable(result: Dict[str, Any]) -> bool:
+    code = result.get("status_code")
+    return code is None or code == 429 or code >= 500
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # one lock per event loop; the module-level queue can outlive a loop (tests, scripts)
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock, self._lock_loop = asyncio.Lock(), loop
+        return self._lock
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        """Stops handing out tokens for `seconds` (the provider said Retry-After)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self):
+        async with self._get_lock():
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    self._updated = time.monotonic()
+                    continue
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+class MessageQueue:
+
+    def __init__(self, engine: Optional[Engine] = None, transport=None, rate: Optional[float] = None,
+                 burst: Optional[float] = None, concurrency: Optional[int] = None,
+                 max_attempts: Optional[int] = None, retry_base: Optional[float] = None,
+                 poll_interval: Optional[float] = None):
+        self._engine = engine
+        self.transport = transport or default_transport(settings.WHATSAPP_TRANSPORT)
+        self.bucket = TokenBucket(rate or settings.WHATSAPP_RATE_PER_SECOND, burst or settings.WHATSAPP_BURST)
+        self.concurrency = concurrency or settings.WHATSAPP_CONCURRENCY
+        self.max_attempts = max_attempts or settings.WHATSAPP_MAX_ATTEMPTS
+        self.retry_base = retry_base if retry_base is not None else settings.WHATSAPP_RETRY_BASE_SECONDS
+        self.poll_interval = poll_interval if poll_interval is not None else settings.JOB_POLL_INTERVAL_SECONDS
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def engine(self) -> Engine:
+        if self._engine is None:
+            from db import engine
+            self._engine = engine
+        return self._engine
+
+    # --- submission / lookup -------------------------------------------------
+
+    def _submit_many(self, messages: Sequence[Dict[str, Any]]) -> List[Tuple[OutboundMessage, bool]]:
+        keys = [m["idempotency_key"] for m in messages]
+        # rows are returned after the session closes, so keep them loaded past commit
+        with Session(self.engine, expire_on_commit=False) as session:
+            existing = {
+                row.idempotency_key: row
+                for offset in range(0, len(keys), 500)
+                for row in session.exec(
+                    select(OutboundMessage).where(OutboundMessage.idempotency_key.in_(keys[offset:offset + 500]))
+                )
+            }
+            created = {}
+            for message in messages:
+                key = message["idempotency_key"]
+                if key in existing or key in created:
+                    continue
+                created[key] = OutboundMessage(
+                    business_id=message["business_id"], invoice_id=message.get("invoice_id"),
+                    idempotency_key=key, to_phone=message["to"], body=message["body"],
+                )
+            session.add_all(created.values())
+            try:
+                session.commit()
+            except IntegrityError:
+                # a concurrent submit inserted some of the same keys; fall back to row by row
+                session.rollback()
+                return [self._submit_one(session, m) for m in messages]
+        results, seen = [], set()
+        for key in keys:
+            row = existing.get(key) or created[key]
+            results.append((row, key in created and key not in seen))
+            seen.add(key)
+        return results
+
+    def _submit_one(self, session: Session, message: Dict[str, Any]) -> Tuple[OutboundMessage, bool]:
+        key = message["idempotency_key"]
+        row = session.exec(select(OutboundMessage).where(OutboundMessage.idempotency_key == key)).first()
+        if row is not None:
+            return row, False
+        row = OutboundMessage(business_id=message["business_id"], invoice_id=message.get("invoice_id"),
+                              idempotency_key=key, to_phone=message["to"], body=message["body"])
+        session.add(row)
+        try:
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            return session.exec(select(OutboundMessage).where(OutboundMessage.idempotency_key == key)).one(), False
+        return row, True
+
+    async def submit_many(self, messages: Sequence[Dict[str, Any]]) -> List[Tuple[OutboundMessage, bool]]:
+        """
+        Queues messages ({"business_id", "to", "body", "idempotency_key",
+        optional "invoice_id"}). Returns (row, created) per input, in order.
+        """
+        if not messages:
+            return []
+        results = await run_in_threadpool(self._submit_many, list(messages))
+        if self._wakeup is not None and any(created for _, created in results):
+            self._wakeup.set()
+        return results
+
+    async def submit(self, message: Dict[str, Any]) -> Tuple[OutboundMessage, bool]:
+        return (await self.submit_many([message]))[0]
+
+    def get(self, message_id: int) -> Optional[OutboundMessage]:
+        with Session(self.engine) as session:
+            return session.get(OutboundMessage, message_id)
+
+    def existing_keys(self, keys: Sequence[str]) -> set:
+        """The subset of `keys` that already has a message."""
+        found = set()
+        with Session(self.engine) as session:
+            for offset in range(0, len(keys), 500):
+                found.update(session.exec(
+                    select(OutboundMessage.idempotency_key)
+                    .where(OutboundMessage.idempotency_key.in_(list(keys[offset:offset + 500])))
+                ).all())
+        return found
+
+    def get_by_key(self, idempotency_key: str) -> Optional[OutboundMessage]:
+        with Session(self.engine) as session:
+            return session.exec(
+                select(OutboundMessage).where(OutboundMessage.idempotency_key == idempotency_key)
+            ).first()
+
+    # --- delivery ------------------------------------------------------------
+
+    def _claim(self, limit: int) -> List[OutboundMessage]:
+        now = datetime.utcnow()
+        with Session(self.engine) as session:
+            session.execute(
+                update(OutboundMessage)
+                .where(OutboundMessage.status == "sending",
+                       OutboundMessage.updated_at < now - timedelta(seconds=SENDING_TIMEOUT_SECONDS))
+                .values(status="queued", updated_at=now)
+            )
+            due = session.exec(
+                select(OutboundMessage.id)
+                .where(OutboundMessage.status == "queued", OutboundMessage.next_attempt_at <= now)
+                .order_by(OutboundMessage.next_attempt_at, OutboundMessage.id)
+                .limit(limit)
+            ).all()
+            claimed = []
+            for message_id in due:
+                result = session.execute(
+                    update(OutboundMessage)
+                    .where(OutboundMessage.id == message_id, OutboundMessage.status == "queued")
+                    .values(status="sending", attempts=OutboundMessage.attempts + 1, updated_at=now)
+                )
+                if result.rowcount == 1:
+                    claimed.append(message_id)
+            session.commit()
+            if not claimed:
+                return []
+            return list(session.exec(select(OutboundMessage).where(OutboundMessage.id.in_(claimed))).all())
+
+    def _backoff(self, attempts: int, retry_after: Optional[float]) -> float:
+        if retry_after:
+            return float(retry_after)
+        delay = min(self.retry_base * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _record(self, message: OutboundMessage, result: Dict[str, Any]):
+        now = datetime.utcnow()
+        if result.get("status") in ("sent", "mock"):
+            values = dict(status="sent", provider_sid=result.get("sid"), sent_at=now, last_error=None)
+        elif is_retryable(result) and message.attempts < self.max_attempts:
+            delay = self._backoff(message.attempts, result.get("retry_after"))
+            values = dict(status="queued", next_attempt_at=now + timedelta(seconds=delay),
+                          last_error=_error_text(result))
+        else:
+            values = dict(status="failed", last_error=_error_text(result))
+        with Session(self.engine) as session:
+            session.execute(update(OutboundMessage).where(OutboundMessage.id == message.id)
+                            .values(updated_at=now, **values))
+            session.commit()
+
+    async def _deliver(self, message: OutboundMessage, limit: asyncio.Semaphore):
+        async with limit:
+            await self.bucket.acquire()
+            try:
+                result = await self.transport.send(message.to_phone, message.body)
+            except Exception as e:
+                result = {"status": "error", "error": str(e) or e.__class__.__name__, "status_code": None}
+            if result.get("status_code") == 429:
+                self.bucket.pause(float(result.get("retry_after") or 1.0))
+            await run_in_threadpool(self._record, message, result)
+
+    async def _send_batch(self) -> int:
+        batch = await run_in_threadpool(self._claim, self.concurrency * 4)
+        if batch:
+            limit = asyncio.Semaphore(self.concurrency)
+            await asyncio.gather(*(self._deliver(m, limit) for m in batch))
+        return len(batch)
+
+    def _next_due_in(self) -> Optional[float]:
+        with Session(self.engine) as session:
+            next_at = session.exec(
+                select(OutboundMessage.next_attempt_at).where(OutboundMessage.status == "queued")
+                .order_by(OutboundMessage.next_attempt_at).limit(1)
+            ).first()
+        if next_at is None:
+            return None
+        return max((next_at - datetime.utcnow()).total_seconds(), 0.0)
+
+    async def run_pending(self, wait_for_retries: bool = False) -> int:
+        """
+        Sends everything due now; returns how many send attempts were made.
+        With wait_for_retries, also sleeps until scheduled retries are due,
+        so it returns only when nothing is left queued. Used by tests and scripts.
+        """
+        attempts = 0
+        while True:
+            sent = await self._send_batch()
+            attempts += sent
+            if sent:
+                continue
+            if not wait_for_retries:
+                return attempts
+            wait = await run_in_threadpool(self._next_due_in)
+            if wait is None:
+                return attempts
+            await asyncio.sleep(wait)
+
+    async def _worker(self):
+        while True:
+            try:
+                if await self._send_batch():
+                    continue
+            except Exception as e:
+                logger.error(f"Outbound message batch failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Starts the delivery loop on the running event loop (idempotent)."""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._worker())
+        logger.info(f"Started outbound message worker ({self.transport.name} transport)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._wakeup = None
+
+
+def _error_text(result: Dict[str, Any]) -> str:
+    code = result.get("status_code")
+    error = result.get("error") or "send failed"
+    return f"{code}: {error}" if code else error
+
+
+def apply_status_callback(session: Session, provider_sid: str, provider_status: str) -> bool:
+    """
+    Records a Twilio status callback. Statuses only move forward
+    (sent -> delivered -> read); returns whether a row changed.
+    """
+    message = session.exec(select(OutboundMessage).where(OutboundMessage.provider_sid == provider_sid)).first()
+    if message is None:
+        return False
+    provider_status = provider_status.lower()
+    if provider_status in FAILED_PROVIDER_STATUSES:
+        status = "failed"
+    elif provider_status in PROVIDER_STATUSES:
+        status = provider_status
+        if message.status in PROVIDER_STATUSES and \
+                PROVIDER_STATUSES.index(message.status) >= PROVIDER_STATUSES.index(status):
+            return False
+    else:
+        return False # queued/accepted/sending on Twilio's side: nothing new
+    message.status = status
+    if status == "failed":
+        message.last_error = f"provider: {provider_status}"
+    message.updated_at = datetime.utcnow()
+    session.add(message)
+    session.commit()
+    return True
+
+
+def message_status(message: OutboundMessage, created: Optional[bool] = None) -> Dict[str, Any]:
+    status = {
+        "message_id": message.id,
+        "idempotency_key": message.idempotency_key,
+        "status": message.status,
+        "attempts": message.attempts,
+        "provider_sid": message.provider_sid,
+        "last_error": message.last_error,
+        "invoice_id": message.invoice_id,
+        "to": message.to_phone,
+    }
+    if created is not None:
+        status["deduplicated"] = not created
+    return status
+
+
+message_queue = MessageQueue()
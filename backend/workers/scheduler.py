@@ -0,0 +1,68 @@
+# backend/workers/scheduler.py
+"""
+In-process periodic tasks. Services register async callables with
+@scheduler.every(interval, name=...); start() runs each on the event loop,
+once at startup and then every `interval` seconds. The interval may be a
+callable read on start, so tests and settings can change it; zero or less
+disables the task. Work that must not run twice across API processes
+should be submitted to the job queue (with dedupe_on) rather than run here.
+"""
+import asyncio
+from typing import Awaitable, Callable, List, Optional, Tuple, Union
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Interval = Union[float, Callable[[], float]]
+Task = Callable[[], Awaitable[None]]
+
+
+class Scheduler:
+
+    def __init__(self):
+        self.entries: List[Tuple[str, Interval, Task]] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def every(self, interval: Interval, name: Optional[str] = None):
+        """Decorator registering an async task to run every `interval` seconds."""
+        def decorator(fn: Task) -> Task:
+            self.entries.append((name or fn.__name__, interval, fn))
+            return fn
+        return decorator
+
+    @staticmethod
+    def _seconds(interval: Interval) -> float:
+        return float(interval() if callable(interval) else interval)
+
+    async def _loop(self, name: str, seconds: float, fn: Task):
+        while True:
+            try:
+                await fn()
+            except Exception as e:
+                logger.error(f"Scheduled task {name} failed: {e}")
+            await asyncio.sleep(seconds)
+
+    async def run_all(self):
+        """Runs every registered task once. Used by tests and scripts."""
+        for name, _, fn in self.entries:
+            await fn()
+
+    def start(self):
+        """Starts the enabled tasks on the running event loop (idempotent)."""
+        if self._tasks:
+            return
+        for name, interval, fn in self.entries:
+            seconds = self._seconds(interval)
+            if seconds <= 0:
+                continue
+            self._tasks.append(asyncio.create_task(self._loop(name, seconds, fn)))
+        logger.info(f"Started {len(self._tasks)} scheduled tasks")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+scheduler = Scheduler()
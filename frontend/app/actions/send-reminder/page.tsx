@@ -217,12 +217,14 @@ export default function SendReminderPage() {
             {response && (
                 <div className="result-card rounded-2xl border border-white/60 dark:border-slate-700/60 bg-white/80 dark:bg-slate-900/80 backdrop-blur-xl p-6 shadow-xl">
                     <div className="flex items-start gap-4">
-                        <div className={`p-3 rounded-full ${response.delivery.status === 'error' ? 'bg-rose-100 text-rose-600' : 'bg-emerald-100 text-emerald-600'}`}>
-                            {response.delivery.status === 'error' ? <AlertCircle size={24} /> : <CheckCircle size={24} />}
+                        <div className={`p-3 rounded-full ${['error', 'failed'].includes(response.delivery.status) ? 'bg-rose-100 text-rose-600' : 'bg-emerald-100 text-emerald-600'}`}>
+                            {['error', 'failed'].includes(response.delivery.status) ? <AlertCircle size={24} /> : <CheckCircle size={24} />}
                         </div>
                         <div className="flex-1 space-y-2">
                             <h4 className="text-lg font-semibold text-slate-900 dark:text-white">
-                                {response.delivery.status === 'error' ? 'Delivery Failed' : 'Message Sent Successfully'}
+                                {['error', 'failed'].includes(response.delivery.status)
+                                    ? 'Delivery Failed'
+                                    : response.delivery.status === 'queued' ? 'Message Queued for Delivery' : 'Message Sent Successfully'}
                             </h4>
                             <p className="text-sm text-slate-600 dark:text-slate-300">
                                 {response.message}
@@ -37,11 +37,14 @@ export interface SendReminderRequest {
 export interface ReminderResponse {
     message: string;
     delivery: {
-        status: 'mock' | 'sent' | 'error';
+        status: 'queued' | 'sending' | 'sent' | 'delivered' | 'read' | 'failed' | 'mock' | 'error';
         to: string;
         body: string;
         sid?: string;
         error?: string;
+        message_id?: number;
+        provider_sid?: string | null;
+        last_error?: string | null;
     };
 }
 